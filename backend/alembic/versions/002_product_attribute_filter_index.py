@@ -0,0 +1,27 @@
+"""Add composite index for product attribute filters
+
+Revision ID: 002_product_attribute_filter_index
+Revises: 001_add_payout_system
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '002_product_attribute_filter_index'
+down_revision = '001_add_payout_system'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Lets GET /products answer brand/size/color/attribute filters with an index seek
+    op.create_index(
+        'ix_product_attributes_name_value_product',
+        'product_attributes',
+        ['name', 'value', 'product_id'],
+    )
+
+
+def downgrade():
+    op.drop_index('ix_product_attributes_name_value_product', table_name='product_attributes')
@@ -0,0 +1,52 @@
+"""Add category facet store tables
+
+Revision ID: 003_category_facet_store
+Revises: 002_product_attribute_filter_index
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '003_category_facet_store'
+down_revision = '002_product_attribute_filter_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Create category_facet_counts table
+    op.create_table(
+        'category_facet_counts',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('category_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('categories.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('facet', sa.String(20), nullable=False),
+        sa.Column('name', sa.String(255), nullable=False, server_default=''),
+        sa.Column('value', sa.String(500), nullable=False, server_default=''),
+        sa.Column('numeric_value', sa.Numeric(12, 2), nullable=True),
+        sa.Column('count', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime, nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+    )
+    op.create_index(
+        'ix_category_facet_counts_key',
+        'category_facet_counts',
+        ['category_id', 'facet', 'name', 'value'],
+        unique=True,
+    )
+
+    # Create product_facet_snapshots table
+    op.create_table(
+        'product_facet_snapshots',
+        sa.Column('product_id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('category_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('keys', sa.Text, nullable=False),
+        sa.Column('updated_at', sa.DateTime, nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+    )
+
+
+def downgrade():
+    op.drop_table('product_facet_snapshots')
+    op.drop_index('ix_category_facet_counts_key', table_name='category_facet_counts')
+    op.drop_table('category_facet_counts')
@@ -0,0 +1,50 @@
+"""Add category closure table
+
+Revision ID: 004_category_closure
+Revises: 003_category_facet_store
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '004_category_closure'
+down_revision = '003_category_facet_store'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Create category_closure table
+    op.create_table(
+        'category_closure',
+        sa.Column('ancestor_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('categories.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('descendant_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('categories.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('depth', sa.Integer, nullable=False, server_default='0'),
+    )
+    op.create_index(
+        'ix_category_closure_descendant',
+        'category_closure',
+        ['descendant_id', 'depth'],
+    )
+
+    # Backfill from categories.parent_id
+    op.execute("""
+        WITH RECURSIVE tree (ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM categories
+            UNION ALL
+            SELECT c.parent_id, tree.descendant_id, tree.depth + 1
+            FROM tree
+            JOIN categories c ON c.id = tree.ancestor_id
+            WHERE c.parent_id IS NOT NULL
+        )
+        INSERT INTO category_closure (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, descendant_id, depth FROM tree
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_category_closure_descendant', table_name='category_closure')
+    op.drop_table('category_closure')
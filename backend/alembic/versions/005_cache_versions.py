@@ -0,0 +1,29 @@
+"""Add shared cache version counters
+
+Revision ID: 005_cache_versions
+Revises: 004_category_closure
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005_cache_versions'
+down_revision = '004_category_closure'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Create cache_versions table
+    op.create_table(
+        'cache_versions',
+        sa.Column('name', sa.String(100), primary_key=True),
+        sa.Column('version', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime, nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+    )
+
+
+def downgrade():
+    op.drop_table('cache_versions')
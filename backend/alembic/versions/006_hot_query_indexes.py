@@ -0,0 +1,52 @@
+"""Add composite indexes for the hot listing and lookup queries
+
+Revision ID: 006_hot_query_indexes
+Revises: 005_cache_versions
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '006_hot_query_indexes'
+down_revision = '005_cache_versions'
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, columns); kept in sync with __table_args__ on the models
+INDEXES = [
+    # Product listings, rails and vendor dashboards
+    ('ix_products_status_created_at', 'products', ['status', 'created_at', 'id']),
+    ('ix_products_status_sales_count', 'products', ['status', 'sales_count']),
+    ('ix_products_status_featured_sales_count', 'products', ['status', 'is_featured', 'sales_count']),
+    ('ix_products_category_status_created_at', 'products', ['category_id', 'status', 'created_at', 'id']),
+    ('ix_products_vendor_created_at', 'products', ['vendor_id', 'created_at', 'id']),
+    ('ix_product_images_product_sort_order', 'product_images', ['product_id', 'sort_order']),
+    ('ix_product_variants_product_id', 'product_variants', ['product_id']),
+
+    # Orders
+    ('ix_orders_user_created_at', 'orders', ['user_id', 'created_at']),
+    ('ix_orders_created_at', 'orders', ['created_at']),
+    ('ix_orders_payment_status_paid_at', 'orders', ['payment_status', 'paid_at']),
+    ('ix_order_items_order_id', 'order_items', ['order_id']),
+    ('ix_order_items_product_id', 'order_items', ['product_id']),
+    ('ix_order_items_vendor_created_at', 'order_items', ['vendor_id', 'created_at']),
+    ('ix_order_status_history_order_id', 'order_status_history', ['order_id']),
+
+    # Notifications, reviews, carts
+    ('ix_notifications_user_created_at', 'notifications', ['user_id', 'created_at']),
+    ('ix_notifications_user_is_read_created_at', 'notifications', ['user_id', 'is_read', 'created_at']),
+    ('ix_reviews_product_approved_created_at', 'reviews', ['product_id', 'is_approved', 'created_at']),
+    ('ix_cart_items_cart_id', 'cart_items', ['cart_id']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,35 @@
+"""Add weighted search vector and trigram index on products
+
+Revision ID: 007_product_search_vector
+Revises: 006_hot_query_indexes
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+from app.core.pg_search_setup import (
+    ADD_SEARCH_VECTOR_COLUMN,
+    CREATE_NAME_TRGM_INDEX,
+    CREATE_SEARCH_VECTOR_INDEX,
+    CREATE_TRGM_EXTENSION,
+)
+
+# revision identifiers, used by Alembic.
+revision = '007_product_search_vector'
+down_revision = '006_hot_query_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Same statements the app runs at startup (app.core.pg_search_setup)
+    op.execute(CREATE_TRGM_EXTENSION)
+    op.execute(ADD_SEARCH_VECTOR_COLUMN)
+    op.execute(CREATE_SEARCH_VECTOR_INDEX)
+    op.execute(CREATE_NAME_TRGM_INDEX)
+
+
+def downgrade():
+    op.drop_index('ix_products_name_trgm', table_name='products')
+    op.drop_index('ix_products_search_vector', table_name='products')
+    op.drop_column('products', 'search_vector')
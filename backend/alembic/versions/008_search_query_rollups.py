@@ -0,0 +1,43 @@
+"""Add search query rollup table
+
+Revision ID: 008_search_query_rollups
+Revises: 007_product_search_vector
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '008_search_query_rollups'
+down_revision = '007_product_search_vector'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Create search_query_rollups table
+    op.create_table(
+        'search_query_rollups',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('granularity', sa.String(10), nullable=False),
+        sa.Column('bucket_start', sa.DateTime, nullable=False),
+        sa.Column('query', sa.String(500), nullable=False),
+        sa.Column('search_count', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('results_total', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('click_count', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('zero_result_count', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('last_zero_result_at', sa.DateTime, nullable=True),
+    )
+    op.create_index(
+        'ix_search_query_rollups_key',
+        'search_query_rollups',
+        ['granularity', 'bucket_start', 'query'],
+        unique=True,
+    )
+
+
+def downgrade():
+    op.drop_index('ix_search_query_rollups_key', table_name='search_query_rollups')
+    op.drop_table('search_query_rollups')
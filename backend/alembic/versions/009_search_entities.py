@@ -0,0 +1,36 @@
+"""Add search_entities global search index
+
+Revision ID: 009_search_entities
+Revises: 008_search_query_rollups
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+from app.core.pg_search_setup import (
+    CREATE_SEARCH_ENTITIES_INDEX,
+    CREATE_SEARCH_ENTITIES_SYNC,
+    CREATE_SEARCH_ENTITIES_TABLE,
+    POPULATE_SEARCH_ENTITIES,
+)
+
+# revision identifiers, used by Alembic.
+revision = '009_search_entities'
+down_revision = '008_search_query_rollups'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Same statements the app runs at startup (app.core.pg_search_setup)
+    op.execute(CREATE_SEARCH_ENTITIES_TABLE)
+    op.execute(CREATE_SEARCH_ENTITIES_INDEX)
+    for statement in CREATE_SEARCH_ENTITIES_SYNC + POPULATE_SEARCH_ENTITIES:
+        op.execute(statement)
+
+
+def downgrade():
+    for table, entity_type in (('products', 'product'), ('categories', 'category'), ('vendors', 'vendor')):
+        op.execute(f"DROP TRIGGER IF EXISTS search_entities_sync_{entity_type} ON {table}")
+        op.execute(f"DROP FUNCTION IF EXISTS search_entities_sync_{entity_type}()")
+    op.drop_table('search_entities')
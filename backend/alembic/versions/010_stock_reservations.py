@@ -0,0 +1,48 @@
+"""Add stock reservations and products.reserved_quantity
+
+Revision ID: 010_stock_reservations
+Revises: 009_search_entities
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '010_stock_reservations'
+down_revision = '009_search_entities'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'products',
+        sa.Column('reserved_quantity', sa.Integer, nullable=False, server_default='0'),
+    )
+
+    # Create stock_reservations table
+    op.create_table(
+        'stock_reservations',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            'product_id', postgresql.UUID(as_uuid=True),
+            sa.ForeignKey('products.id', ondelete='CASCADE'), nullable=False,
+        ),
+        sa.Column('cart_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('quantity', sa.Integer, nullable=False),
+        sa.Column('expires_at', sa.DateTime, nullable=False),
+        sa.Column('created_at', sa.DateTime, nullable=False),
+    )
+    op.create_index('ix_stock_reservations_product_id', 'stock_reservations', ['product_id'])
+    op.create_index('ix_stock_reservations_cart_id', 'stock_reservations', ['cart_id'])
+    op.create_index('ix_stock_reservations_expires_at', 'stock_reservations', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_stock_reservations_expires_at', table_name='stock_reservations')
+    op.drop_index('ix_stock_reservations_cart_id', table_name='stock_reservations')
+    op.drop_index('ix_stock_reservations_product_id', table_name='stock_reservations')
+    op.drop_table('stock_reservations')
+    op.drop_column('products', 'reserved_quantity')
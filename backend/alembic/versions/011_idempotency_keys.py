@@ -0,0 +1,43 @@
+"""Add idempotency_keys
+
+Revision ID: 011_idempotency_keys
+Revises: 010_stock_reservations
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '011_idempotency_keys'
+down_revision = '010_stock_reservations'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Create idempotency_keys table
+    op.create_table(
+        'idempotency_keys',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('scope', sa.String(50), nullable=False),
+        sa.Column('key', sa.String(255), nullable=False),
+        sa.Column('fingerprint', sa.String(64), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False),
+        sa.Column('response_status', sa.Integer, nullable=True),
+        sa.Column('response_body', sa.Text, nullable=True),
+        sa.Column('expires_at', sa.DateTime, nullable=False),
+        sa.Column('created_at', sa.DateTime, nullable=False),
+    )
+    op.create_index(
+        'ix_idempotency_keys_user_scope_key', 'idempotency_keys', ['user_id', 'scope', 'key'], unique=True
+    )
+    op.create_index('ix_idempotency_keys_expires_at', 'idempotency_keys', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_idempotency_keys_expires_at', table_name='idempotency_keys')
+    op.drop_index('ix_idempotency_keys_user_scope_key', table_name='idempotency_keys')
+    op.drop_table('idempotency_keys')
@@ -0,0 +1,41 @@
+"""Add outbox_events
+
+Revision ID: 012_outbox_events
+Revises: 011_idempotency_keys
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '012_outbox_events'
+down_revision = '011_idempotency_keys'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Create outbox_events table
+    op.create_table(
+        'outbox_events',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('event_type', sa.String(50), nullable=False),
+        sa.Column('payload', sa.Text, nullable=False),
+        sa.Column('dedupe_key', sa.String(255), nullable=True, unique=True),
+        sa.Column('status', sa.String(20), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('available_at', sa.DateTime, nullable=False),
+        sa.Column('last_error', sa.Text, nullable=True),
+        sa.Column('created_at', sa.DateTime, nullable=False),
+        sa.Column('processed_at', sa.DateTime, nullable=True),
+    )
+    op.create_index(
+        'ix_outbox_events_status_available_at', 'outbox_events', ['status', 'available_at']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_outbox_events_status_available_at', table_name='outbox_events')
+    op.drop_table('outbox_events')
@@ -10,12 +10,14 @@ from pydantic import BaseModel, EmailStr
 from decimal import Decimal
 import csv
 import io
+import logging
 
 from app.core.database import get_db
+from app.core.pagination import keyset_paginate, next_cursor
 from app.core.security import get_current_admin, get_password_hash
 from app.core.fts5_setup import (
     check_fts5_exists, get_fts5_stats, rebuild_fts5_index,
-    optimize_fts5_index, populate_fts5_table, create_fts5_table
+    populate_fts5_table, create_fts5_table
 )
 from app.models.user import User, UserRole, AuthProvider
 from app.models.vendor import Vendor, VendorStatus
@@ -23,7 +25,24 @@ from app.models.product import Product, ProductStatus
 from app.models.order import Order, OrderItem, OrderStatus, PaymentStatus
 from app.models.review import Review
 from app.models.category import Category
+from app.models.outbox_event import OutboxEvent
 from app.schemas.common import MessageResponse
+from app.services.category_tree import category_cache, is_descendant
+from app.services.facets import FacetService
+from app.services.product_cache import product_detail_cache
+from app.services.product_cards import card_query
+from app.services.product_events import products_changed
+from app.services.search_cache import catalog_changed, search_caches
+from app.services.autocomplete import completion_index
+from app.services.fts5_maintenance import fts5_maintenance
+from app.services.idempotency import idempotency_store
+from app.services.inventory import stock_reaper
+from app.services.outbox import DEAD, PENDING, outbox_status, outbox_worker
+from app.services.search_analytics import search_rollups
+from app.services.search_log import search_logger
+from app.services.spelling import spelling_index
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -580,9 +599,10 @@ class ProductListItem(BaseModel):
 
 class ProductListResponse(BaseModel):
     products: List[ProductListItem]
-    total: int
+    total: Optional[int]
     page: int
     limit: int
+    next_cursor: Optional[str] = None
 
 
 @router.get("/products", response_model=ProductListResponse)
@@ -592,13 +612,13 @@ async def list_products(
     search: Optional[str] = None,
     status: Optional[str] = None,
     vendor_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
     current_user: User = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db)
 ):
     """List all products with filtering and pagination"""
-    from sqlalchemy.orm import selectinload
-
-    query = select(Product).options(selectinload(Product.vendor), selectinload(Product.category), selectinload(Product.images))
+    query = card_query()
     count_query = select(func.count(Product.id))
 
     if search:
@@ -621,14 +641,18 @@ async def list_products(
         query = query.where(Product.vendor_id == vendor_id)
         count_query = count_query.where(Product.vendor_id == vendor_id)
 
-    total_result = await db.execute(count_query)
-    total = total_result.scalar() or 0
+    total = None
+    if include_total:
+        total_result = await db.execute(count_query)
+        total = total_result.scalar() or 0
 
-    offset = (page - 1) * limit
-    query = query.order_by(Product.created_at.desc()).offset(offset).limit(limit)
+    query = keyset_paginate(
+        query, Product.created_at, Product.id,
+        limit=limit, cursor=cursor, offset=(page - 1) * limit
+    )
 
     result = await db.execute(query)
-    products = result.scalars().all()
+    products = result.all()
 
     return ProductListResponse(
         products=[
@@ -638,19 +662,21 @@ async def list_products(
                 slug=p.slug,
                 price=float(p.price),
                 compare_price=float(p.compare_at_price) if p.compare_at_price else None,
-                vendor_name=p.vendor.business_name if p.vendor else "Unknown",
-                category=p.category.name if p.category else None,
+                vendor_name=p.vendor_name or "Unknown",
+                category=p.category_name,
                 status=p.status.value,
                 stock_quantity=p.quantity,
                 sales_count=p.sales_count,
                 created_at=p.created_at.isoformat(),
-                images=[img.url for img in p.images] if p.images else []
+                # Cards carry the primary image only; the detail endpoint has the gallery
+                images=[p.primary_image] if p.primary_image else []
             )
             for p in products
         ],
         total=total,
         page=page,
-        limit=limit
+        limit=limit,
+        next_cursor=next_cursor(products, limit, Product.created_at, Product.id)
     )
 
 
@@ -751,7 +777,9 @@ async def update_product(
         except ValueError:
             raise HTTPException(status_code=400, detail=f"Invalid status: {product_data['status']}")
 
+    await FacetService(db).sync_products([product.id])
     await db.commit()
+    products_changed([product.id])
     return MessageResponse(message="Product updated successfully")
 
 
@@ -776,7 +804,9 @@ async def update_product_status(
         except ValueError:
             raise HTTPException(status_code=400, detail=f"Invalid status: {new_status}")
 
+    await FacetService(db).sync_products([product.id])
     await db.commit()
+    products_changed([product.id])
     return MessageResponse(message=f"Product status updated to {new_status}")
 
 
@@ -794,7 +824,9 @@ async def admin_delete_product(
         raise HTTPException(status_code=404, detail="Product not found")
 
     product.status = ProductStatus.DELETED
+    await FacetService(db).sync_products([product.id])
     await db.commit()
+    products_changed([product.id])
 
     return MessageResponse(message="Product has been deleted")
 
@@ -1218,25 +1250,30 @@ class CategoryCreateRequest(BaseModel):
     is_active: bool = True
 
 
-def build_category_tree(categories: List[Category], parent_id=None) -> List[dict]:
-    """Build a tree structure from flat category list"""
-    tree = []
+def build_category_tree(categories: List[Category], product_counts: Optional[dict] = None) -> List[dict]:
+    """Build a tree structure from flat category list in a single pass"""
+    product_counts = product_counts or {}
+    children_by_parent = {}
     for cat in categories:
-        cat_parent_id = str(cat.parent_id) if cat.parent_id else None
-        if cat_parent_id == parent_id:
-            children = build_category_tree(categories, str(cat.id))
+        children_by_parent.setdefault(cat.parent_id, []).append(cat)
+
+    def build(parent):
+        tree = []
+        for cat in children_by_parent.get(parent, []):
             tree.append({
                 "id": str(cat.id),
                 "name": cat.name,
                 "slug": cat.slug,
                 "description": cat.description,
                 "image_url": cat.image_url,
-                "parent_id": cat_parent_id,
-                "product_count": len(cat.products) if cat.products else 0,
+                "parent_id": str(cat.parent_id) if cat.parent_id else None,
+                "product_count": product_counts.get(cat.id, 0),
                 "is_active": cat.is_active,
-                "children": children
+                "children": build(cat.id)
             })
-    return tree
+        return tree
+
+    return build(None)
 
 
 @router.get("/categories")
@@ -1245,16 +1282,20 @@ async def list_categories_admin(
     db: AsyncSession = Depends(get_db)
 ):
     """List all categories in tree structure"""
-    from sqlalchemy.orm import selectinload
-
     result = await db.execute(
-        select(Category)
-        .options(selectinload(Category.products))
-        .order_by(Category.sort_order, Category.name)
+        select(Category).order_by(Category.sort_order, Category.name)
     )
     categories = result.scalars().all()
 
-    return build_category_tree(list(categories), None)
+    # Count products per category instead of loading them
+    count_result = await db.execute(
+        select(Product.category_id, func.count(Product.id))
+        .where(Product.category_id.isnot(None))
+        .group_by(Product.category_id)
+    )
+    product_counts = dict(count_result.all())
+
+    return build_category_tree(list(categories), product_counts)
 
 
 @router.post("/categories", response_model=MessageResponse)
@@ -1293,6 +1334,8 @@ async def create_category(
 
     db.add(category)
     await db.commit()
+    await category_cache.invalidate(db)
+    catalog_changed()
 
     return MessageResponse(message=f"Category '{data.name}' created successfully")
 
@@ -1328,12 +1371,20 @@ async def update_category(
             category.parent_id = None
         else:
             try:
-                category.parent_id = UUID(data.parent_id)
+                new_parent_id = UUID(data.parent_id)
             except ValueError:
                 raise HTTPException(status_code=400, detail="Invalid parent_id")
+            if await is_descendant(db, category.id, new_parent_id):
+                raise HTTPException(
+                    status_code=400,
+                    detail="Cannot move a category under itself or its subcategories"
+                )
+            category.parent_id = new_parent_id
     category.is_active = data.is_active
 
     await db.commit()
+    await category_cache.invalidate(db)
+    catalog_changed()
 
     return MessageResponse(message=f"Category '{category.name}' updated successfully")
 
@@ -1363,6 +1414,8 @@ async def delete_category(
 
     await db.delete(category)
     await db.commit()
+    await category_cache.invalidate(db)
+    catalog_changed()
 
     return MessageResponse(message=f"Category deleted successfully")
 
@@ -1397,9 +1450,10 @@ class UserResponse(BaseModel):
 
 class UserListResponse(BaseModel):
     users: List[UserResponse]
-    total: int
+    total: Optional[int]
     page: int
     limit: int
+    next_cursor: Optional[str] = None
 
 
 @router.get("/users", response_model=UserListResponse)
@@ -1409,6 +1463,8 @@ async def list_users(
     search: Optional[str] = None,
     role: Optional[str] = None,
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
     current_user: User = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db)
 ):
@@ -1442,13 +1498,17 @@ async def list_users(
             query = query.where(User.is_active == False)
             count_query = count_query.where(User.is_active == False)
 
-    # Get total count
-    total_result = await db.execute(count_query)
-    total = total_result.scalar() or 0
+    # Get total count (optional, cursor clients can skip it)
+    total = None
+    if include_total:
+        total_result = await db.execute(count_query)
+        total = total_result.scalar() or 0
 
     # Apply pagination
-    offset = (page - 1) * limit
-    query = query.order_by(User.created_at.desc()).offset(offset).limit(limit)
+    query = keyset_paginate(
+        query, User.created_at, User.id,
+        limit=limit, cursor=cursor, offset=(page - 1) * limit
+    )
 
     result = await db.execute(query)
     users = result.scalars().all()
@@ -1472,7 +1532,8 @@ async def list_users(
         ],
         total=total,
         page=page,
-        limit=limit
+        limit=limit,
+        next_cursor=next_cursor(users, limit, User.created_at, User.id)
     )
 
 
@@ -3464,6 +3525,14 @@ async def send_test_email(
                 message=f"Test email '{request.email_type}' logged (SMTP not configured). Check server logs."
             )
 
+    except HTTPException:
+        raise
+    except email_service.EmailDeliveryError as e:
+        # Already logged by the email service
+        raise HTTPException(
+            status_code=502,
+            detail=f"Failed to send test email: {str(e)}"
+        )
     except Exception as e:
         logger.error(f"Failed to send test email: {e}")
         raise HTTPException(
@@ -3497,7 +3566,8 @@ async def get_fts5_status(
     return {
         "status": "active",
         "exists": True,
-        "statistics": stats
+        "statistics": stats,
+        "maintenance": fts5_maintenance.stats()
     }
 
 
@@ -3574,7 +3644,7 @@ async def optimize_fts5(
             detail="FTS5 table does not exist. Use initialize endpoint first."
         )
 
-    success = await optimize_fts5_index(db)
+    success = await fts5_maintenance.optimize(db)
 
     if not success:
         raise HTTPException(
@@ -3606,3 +3676,125 @@ async def repopulate_fts5(
     return MessageResponse(
         message=f"FTS5 table repopulated with {count} products"
     )
+
+
+# ============================================================================
+# Category Facet Store
+# ============================================================================
+
+
+@router.post("/facets/rebuild")
+async def rebuild_category_facets(
+    current_user: User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """Recompute category filter counts from scratch (after bulk imports or drift)"""
+    try:
+        count = await FacetService(db).rebuild()
+    except Exception:
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to rebuild category facets"
+        )
+
+    return MessageResponse(
+        message=f"Category facets rebuilt for {count} products"
+    )
+
+
+# ============================================================================
+# In-process Caches
+# ============================================================================
+
+
+@router.get("/cache/stats")
+async def get_cache_stats(
+    current_user: User = Depends(get_current_admin)
+):
+    """Hit/miss counters of this worker's response caches"""
+    return {
+        "caches": [
+            category_cache.stats(),
+            product_detail_cache.stats(),
+            *(cache.stats() for cache in search_caches.values()),
+        ]
+    }
+
+
+@router.get("/search/log/stats")
+async def get_search_log_stats(
+    current_user: User = Depends(get_current_admin)
+):
+    """Queue depth and counters of this worker's background search log"""
+    return search_logger.stats()
+
+
+@router.get("/search/rollups/stats")
+async def get_search_rollup_stats(
+    current_user: User = Depends(get_current_admin)
+):
+    """Run and prune counters of this worker's search analytics aggregator"""
+    return search_rollups.stats()
+
+
+@router.get("/search/spelling/stats")
+async def get_spelling_index_stats(
+    current_user: User = Depends(get_current_admin)
+):
+    """Size and update counters of this worker's "did you mean" index"""
+    return spelling_index.stats()
+
+
+@router.get("/search/autocomplete/stats")
+async def get_autocomplete_index_stats(
+    current_user: User = Depends(get_current_admin)
+):
+    """Size and update counters of this worker's autocomplete index"""
+    return completion_index.stats()
+
+
+@router.get("/inventory/holds/stats")
+async def get_stock_hold_stats(
+    current_user: User = Depends(get_current_admin)
+):
+    """Run counters of this worker's expired checkout hold reaper"""
+    return stock_reaper.stats()
+
+
+@router.get("/idempotency/stats")
+async def get_idempotency_stats(
+    current_user: User = Depends(get_current_admin)
+):
+    """Execution, replay and purge counters of this worker's Idempotency-Key store"""
+    return idempotency_store.stats()
+
+
+@router.get("/outbox/stats")
+async def get_outbox_stats(
+    current_user: User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """Outbox backlog by status, plus this worker's delivery counters"""
+    return {
+        **await outbox_status(db),
+        "worker": outbox_worker.stats(),
+    }
+
+
+@router.post("/outbox/{event_id}/retry", response_model=MessageResponse)
+async def retry_outbox_event(
+    event_id: UUID,
+    current_user: User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """Put a dead-lettered outbox event back in the queue"""
+    result = await db.execute(
+        OutboxEvent.__table__.update()
+        .where(OutboxEvent.id == event_id, OutboxEvent.status == DEAD)
+        .values(status=PENDING, attempts=0, available_at=datetime.utcnow(), last_error=None)
+    )
+    if not result.rowcount:
+        raise HTTPException(status_code=404, detail="Dead outbox event not found")
+    await db.commit()
+
+    return MessageResponse(message="Outbox event queued for retry")
@@ -14,6 +14,7 @@ from app.models.user import User
 from app.models.product import Product, ProductStatus
 from app.models.conversation import Conversation, Message, ConversationType, MessageRole
 from app.models.order import Order
+from app.services.rails import rail_snapshots
 
 router = APIRouter()
 
@@ -948,15 +949,13 @@ async def personalized_feed(
         # For anonymous users, use trending products
 
         if not current_user:
-            # Return trending/featured products
-            result = await db.execute(
-                select(Product)
-                .where(
-                    Product.status == ProductStatus.ACTIVE,
-                    Product.is_featured == True
-                )
-                .limit(20)
-            )
+            # Return featured products from the homepage rail snapshot
+            product_list = await rail_snapshots.anonymous_feed(db)
+            return {
+                "products": product_list,
+                "personalization_type": "trending",
+                "total_recommendations": len(product_list)
+            }
         else:
             # Get user's recent orders to infer preferences
             result = await db.execute(
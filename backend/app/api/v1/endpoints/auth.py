@@ -23,6 +23,7 @@ from app.schemas.user import (
     PasswordReset, PasswordResetConfirm, PasswordChange, RefreshTokenRequest
 )
 from app.schemas.common import MessageResponse
+from app.services.outbox import enqueue
 
 router = APIRouter()
 limiter = Limiter(key_func=get_remote_address)
@@ -48,7 +49,6 @@ def verify_image_magic_bytes(contents: bytes) -> bool:
 async def register(
     request: Request,
     user_data: UserCreate,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db)
 ):
     """Register a new user"""
@@ -77,14 +77,12 @@ async def register(
     # Create empty cart for user
     cart = Cart(user_id=user.id)
     db.add(cart)
+
+    # Queue the welcome email + notification with the user
+    await enqueue(db, "user.registered", {"user_id": user.id, "email": user.email, "first_name": user.first_name})
     await db.commit()
     await db.refresh(user)
 
-    # Send welcome email + notification in background
-    background_tasks.add_task(
-        _send_welcome_background, user.id, user.email, user.first_name
-    )
-
     # Generate tokens
     access_token = create_access_token(data={"sub": str(user.id)})
     refresh_token = create_refresh_token(data={"sub": str(user.id)})
@@ -432,21 +430,3 @@ async def delete_account(
     await db.commit()
 
     return MessageResponse(message="Your account has been permanently deleted")
-
-
-# ---------------------------------------------------------------------------
-# Background task helpers
-# ---------------------------------------------------------------------------
-
-async def _send_welcome_background(user_id, email: str, first_name: str):
-    """Run welcome notification + email in a background task with its own DB session."""
-    from app.core.database import AsyncSessionLocal as async_session_factory
-    from app.services.notifications import notify_welcome
-
-    async with async_session_factory() as db:
-        try:
-            await notify_welcome(db, user_id, email, first_name)
-            await db.commit()
-        except Exception as exc:
-            import logging
-            logging.getLogger(__name__).error("Welcome email background task failed: %s", exc)
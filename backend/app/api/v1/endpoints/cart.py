@@ -15,6 +15,8 @@ from app.schemas.cart import (
     ApplyCouponRequest, CartItemProductResponse
 )
 from app.schemas.common import MessageResponse
+from app.services.inventory import available_to_cart
+from app.services.product_cards import card_query
 
 router = APIRouter()
 
@@ -31,8 +33,7 @@ async def get_or_create_cart(
         result = await db.execute(
             select(Cart)
             .where(Cart.user_id == user.id)
-            .options(selectinload(Cart.items).selectinload(CartItem.product).selectinload(Product.images),
-            selectinload(Cart.items).selectinload(CartItem.product).selectinload(Product.vendor))
+            .options(selectinload(Cart.items))
         )
         cart = result.scalar_one_or_none()
 
@@ -44,8 +45,7 @@ async def get_or_create_cart(
         result = await db.execute(
             select(Cart)
             .where(Cart.session_id == session_id)
-            .options(selectinload(Cart.items).selectinload(CartItem.product).selectinload(Product.images),
-            selectinload(Cart.items).selectinload(CartItem.product).selectinload(Product.vendor))
+            .options(selectinload(Cart.items))
         )
         cart = result.scalar_one_or_none()
 
@@ -57,12 +57,20 @@ async def get_or_create_cart(
     return cart
 
 
-def serialize_cart(cart: Cart) -> CartResponse:
-    """Serialize cart to response"""
+async def serialize_cart(cart: Cart, db: AsyncSession) -> CartResponse:
+    """Serialize cart to response, loading product cards in one query"""
+    product_ids = {item.product_id for item in cart.items}
+    cards = {}
+    if product_ids:
+        result = await db.execute(
+            card_query(Product.shipping_cost).where(Product.id.in_(product_ids))
+        )
+        cards = {row.id: row for row in result.all()}
+
     items = []
     valid_items = []
     for item in cart.items:
-        product = item.product
+        product = cards.get(item.product_id)
         if product is None:
             continue
         valid_items.append(item)
@@ -79,9 +87,9 @@ def serialize_cart(cart: Cart) -> CartResponse:
                 name=product.name,
                 slug=product.slug,
                 price=product.price,
-                primary_image=product.images[0].url if product.images and len(product.images) > 0 else None,
+                primary_image=product.primary_image,
                 quantity=product.quantity,
-                vendor_name=product.vendor.business_name if product.vendor else "Unknown",
+                vendor_name=product.vendor_name or "Unknown",
                 shipping_cost=product.shipping_cost or 0
             ),
             variant_name=None,
@@ -119,7 +127,7 @@ async def get_cart(
     if not cart:
         raise HTTPException(status_code=400, detail="Could not get or create cart")
 
-    return serialize_cart(cart)
+    return await serialize_cart(cart, db)
 
 
 @router.post("/items", response_model=CartResponse)
@@ -141,15 +149,15 @@ async def add_to_cart(
     result = await db.execute(
         select(Product)
         .where(Product.id == item_data.product_id, Product.status == ProductStatus.ACTIVE)
-        .options(selectinload(Product.images), selectinload(Product.vendor))
     )
     product = result.scalar_one_or_none()
 
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    # Check stock
-    if product.track_inventory and product.quantity < item_data.quantity:
+    # Check stock, leaving out units held for other carts' checkouts
+    available = await available_to_cart(db, product, cart.id)
+    if product.track_inventory and available < item_data.quantity:
         raise HTTPException(status_code=400, detail="Insufficient stock")
 
     # Check for existing cart item
@@ -165,7 +173,7 @@ async def add_to_cart(
     if existing_item:
         # Update quantity
         new_quantity = existing_item.quantity + item_data.quantity
-        if product.track_inventory and product.quantity < new_quantity:
+        if product.track_inventory and available < new_quantity:
             raise HTTPException(status_code=400, detail="Insufficient stock")
         existing_item.quantity = new_quantity
     else:
@@ -194,12 +202,11 @@ async def add_to_cart(
     result = await db.execute(
         select(Cart)
         .where(Cart.id == cart.id)
-        .options(selectinload(Cart.items).selectinload(CartItem.product).selectinload(Product.images),
-            selectinload(Cart.items).selectinload(CartItem.product).selectinload(Product.vendor))
+        .options(selectinload(Cart.items))
     )
     cart = result.scalar_one()
 
-    return serialize_cart(cart)
+    return await serialize_cart(cart, db)
 
 
 @router.put("/items/{item_id}", response_model=CartResponse)
@@ -227,8 +234,9 @@ async def update_cart_item(
     if current_user and cart.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    # Check stock
-    if cart_item.product.track_inventory and cart_item.product.quantity < item_data.quantity:
+    # Check stock, leaving out units held for other carts' checkouts
+    product = cart_item.product
+    if product.track_inventory and await available_to_cart(db, product, cart.id) < item_data.quantity:
         raise HTTPException(status_code=400, detail="Insufficient stock")
 
     cart_item.quantity = item_data.quantity
@@ -238,12 +246,11 @@ async def update_cart_item(
     result = await db.execute(
         select(Cart)
         .where(Cart.id == cart.id)
-        .options(selectinload(Cart.items).selectinload(CartItem.product).selectinload(Product.images),
-            selectinload(Cart.items).selectinload(CartItem.product).selectinload(Product.vendor))
+        .options(selectinload(Cart.items))
     )
     cart = result.scalar_one()
 
-    return serialize_cart(cart)
+    return await serialize_cart(cart, db)
 
 
 @router.delete("/items/{item_id}", response_model=CartResponse)
@@ -275,12 +282,11 @@ async def remove_from_cart(
     result = await db.execute(
         select(Cart)
         .where(Cart.id == cart_id)
-        .options(selectinload(Cart.items).selectinload(CartItem.product).selectinload(Product.images),
-            selectinload(Cart.items).selectinload(CartItem.product).selectinload(Product.vendor))
+        .options(selectinload(Cart.items))
     )
     cart = result.scalar_one()
 
-    return serialize_cart(cart)
+    return await serialize_cart(cart, db)
 
 
 @router.delete("/", response_model=MessageResponse)
@@ -322,8 +328,7 @@ async def apply_coupon(
     result = await db.execute(
         select(Cart)
         .where(Cart.user_id == current_user.id)
-        .options(selectinload(Cart.items).selectinload(CartItem.product).selectinload(Product.images),
-            selectinload(Cart.items).selectinload(CartItem.product).selectinload(Product.vendor))
+        .options(selectinload(Cart.items))
     )
     cart = result.scalar_one_or_none()
 
@@ -341,7 +346,7 @@ async def apply_coupon(
     else:
         raise HTTPException(status_code=400, detail="Invalid coupon code")
 
-    return serialize_cart(cart)
+    return await serialize_cart(cart, db)
 
 
 @router.delete("/coupon", response_model=CartResponse)
@@ -353,8 +358,7 @@ async def remove_coupon(
     result = await db.execute(
         select(Cart)
         .where(Cart.user_id == current_user.id)
-        .options(selectinload(Cart.items).selectinload(CartItem.product).selectinload(Product.images),
-            selectinload(Cart.items).selectinload(CartItem.product).selectinload(Product.vendor))
+        .options(selectinload(Cart.items))
     )
     cart = result.scalar_one_or_none()
 
@@ -366,7 +370,7 @@ async def remove_coupon(
     await db.commit()
     await db.refresh(cart)
 
-    return serialize_cart(cart)
+    return await serialize_cart(cart, db)
 
 
 @router.post("/merge", response_model=CartResponse)
@@ -389,12 +393,11 @@ async def merge_cart(
         user_result = await db.execute(
             select(Cart)
             .where(Cart.user_id == current_user.id)
-            .options(selectinload(Cart.items).selectinload(CartItem.product).selectinload(Product.images),
-            selectinload(Cart.items).selectinload(CartItem.product).selectinload(Product.vendor))
+            .options(selectinload(Cart.items))
         )
         user_cart = user_result.scalar_one_or_none()
         if user_cart:
-            return serialize_cart(user_cart)
+            return await serialize_cart(user_cart, db)
         raise HTTPException(status_code=404, detail="No cart found")
 
     # Get or create user cart
@@ -411,7 +414,7 @@ async def merge_cart(
         guest_cart.session_id = None
         await db.commit()
         await db.refresh(guest_cart)
-        return serialize_cart(guest_cart)
+        return await serialize_cart(guest_cart, db)
 
     # Merge items
     for guest_item in guest_cart.items:
@@ -441,9 +444,8 @@ async def merge_cart(
     result = await db.execute(
         select(Cart)
         .where(Cart.id == user_cart.id)
-        .options(selectinload(Cart.items).selectinload(CartItem.product).selectinload(Product.images),
-            selectinload(Cart.items).selectinload(CartItem.product).selectinload(Product.vendor))
+        .options(selectinload(Cart.items))
     )
     user_cart = result.scalar_one()
 
-    return serialize_cart(user_cart)
+    return await serialize_cart(user_cart, db)
@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from collections import defaultdict
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from sqlalchemy.orm import selectinload
@@ -13,9 +15,15 @@ from app.models.category import Category
 from app.models.product import Product, ProductStatus
 from app.schemas.category import CategoryCreate, CategoryUpdate, CategoryResponse, CategoryTreeResponse, CategoryDetailResponse, CategoryChildResponse
 from app.schemas.common import MessageResponse
+from app.services.category_tree import category_cache, is_descendant
+from app.services.search_cache import catalog_changed
 
 router = APIRouter()
 
+# Public reads are served as pre-serialized JSON from category_cache
+_tree_adapter = TypeAdapter(List[CategoryTreeResponse])
+_list_adapter = TypeAdapter(List[CategoryResponse])
+
 
 @router.get("/", response_model=List[CategoryResponse])
 async def list_categories(
@@ -46,6 +54,12 @@ async def get_category_tree(
     db: AsyncSession = Depends(get_db)
 ):
     """Get full category tree with product counts"""
+    content = await category_cache.get_or_build(db, "tree", lambda: _build_category_tree(db))
+    return Response(content=content, media_type="application/json")
+
+
+async def _build_category_tree(db: AsyncSession) -> bytes:
+    """Build the serialized category tree"""
     # Get all categories
     result = await db.execute(
         select(Category)
@@ -62,37 +76,41 @@ async def get_category_tree(
     )
     product_counts = dict(count_result.all())
 
-    # Build tree
+    # Group children by parent in one pass (query order is kept per parent)
+    children_by_parent = defaultdict(list)
+    for cat in all_categories:
+        children_by_parent[cat.parent_id].append(cat)
+
+    # Build tree, visiting each category once
     def build_tree(parent_id=None):
         children = []
-        for cat in all_categories:
-            if cat.parent_id == parent_id:
-                child_tree = build_tree(cat.id)
-                child_count = product_counts.get(cat.id, 0)
-                # Add children's counts
-                for child in child_tree:
-                    child_count += child.product_count
-
-                children.append(CategoryTreeResponse(
-                    id=cat.id,
-                    parent_id=cat.parent_id,
-                    name=cat.name,
-                    slug=cat.slug,
-                    description=cat.description,
-                    image_url=cat.image_url,
-                    icon=cat.icon,
-                    meta_title=cat.meta_title,
-                    meta_description=cat.meta_description,
-                    sort_order=cat.sort_order,
-                    is_active=cat.is_active,
-                    is_featured=cat.is_featured,
-                    created_at=cat.created_at,
-                    children=child_tree,
-                    product_count=child_count
-                ))
+        for cat in children_by_parent.get(parent_id, []):
+            child_tree = build_tree(cat.id)
+            child_count = product_counts.get(cat.id, 0)
+            # Add children's counts
+            for child in child_tree:
+                child_count += child.product_count
+
+            children.append(CategoryTreeResponse(
+                id=cat.id,
+                parent_id=cat.parent_id,
+                name=cat.name,
+                slug=cat.slug,
+                description=cat.description,
+                image_url=cat.image_url,
+                icon=cat.icon,
+                meta_title=cat.meta_title,
+                meta_description=cat.meta_description,
+                sort_order=cat.sort_order,
+                is_active=cat.is_active,
+                is_featured=cat.is_featured,
+                created_at=cat.created_at,
+                children=child_tree,
+                product_count=child_count
+            ))
         return children
 
-    return build_tree()
+    return _tree_adapter.dump_json(build_tree())
 
 
 @router.get("/featured", response_model=List[CategoryResponse])
@@ -101,15 +119,18 @@ async def get_featured_categories(
     db: AsyncSession = Depends(get_db)
 ):
     """Get featured categories"""
-    result = await db.execute(
-        select(Category)
-        .where(Category.is_active == True, Category.is_featured == True)
-        .order_by(Category.sort_order)
-        .limit(limit)
-    )
-    categories = result.scalars().all()
+    async def build() -> bytes:
+        result = await db.execute(
+            select(Category)
+            .where(Category.is_active == True, Category.is_featured == True)
+            .order_by(Category.sort_order)
+            .limit(limit)
+        )
+        categories = result.scalars().all()
+        return _list_adapter.dump_json([CategoryResponse.model_validate(c) for c in categories])
 
-    return [CategoryResponse.model_validate(c) for c in categories]
+    content = await category_cache.get_or_build(db, f"featured:{limit}", build)
+    return Response(content=content, media_type="application/json")
 
 
 @router.get("/{slug}", response_model=CategoryDetailResponse)
@@ -118,16 +139,24 @@ async def get_category(
     db: AsyncSession = Depends(get_db)
 ):
     """Get category by slug with children"""
+    content = await category_cache.get_or_build(db, f"slug:{slug}", lambda: _build_category_detail(db, slug))
+    if content is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Category not found"
+        )
+    return Response(content=content, media_type="application/json")
+
+
+async def _build_category_detail(db: AsyncSession, slug: str) -> Optional[bytes]:
+    """Build the serialized category detail, or None if there is no such category"""
     result = await db.execute(
         select(Category).where(Category.slug == slug, Category.is_active == True)
     )
     category = result.scalar_one_or_none()
 
     if not category:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Category not found"
-        )
+        return None
 
     # Fetch children (subcategories)
     children_result = await db.execute(
@@ -164,7 +193,7 @@ async def get_category(
         for c in children
     ]
 
-    return CategoryDetailResponse(
+    detail = CategoryDetailResponse(
         id=category.id,
         parent_id=category.parent_id,
         name=category.name,
@@ -180,6 +209,7 @@ async def get_category(
         created_at=category.created_at,
         children=children_response
     )
+    return detail.model_dump_json().encode()
 
 
 @router.get("/{slug}/subcategories", response_model=List[CategoryResponse])
@@ -245,6 +275,8 @@ async def create_category(
     db.add(category)
     await db.commit()
     await db.refresh(category)
+    await category_cache.invalidate(db)
+    catalog_changed()
 
     return CategoryResponse.model_validate(category)
 
@@ -267,11 +299,22 @@ async def update_category(
         )
 
     update_data = category_data.model_dump(exclude_unset=True)
+
+    # A category cannot be moved under itself or one of its descendants
+    new_parent_id = update_data.get("parent_id")
+    if new_parent_id and await is_descendant(db, category.id, new_parent_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot move a category under itself or its subcategories"
+        )
+
     for field, value in update_data.items():
         setattr(category, field, value)
 
     await db.commit()
     await db.refresh(category)
+    await category_cache.invalidate(db)
+    catalog_changed()
 
     return CategoryResponse.model_validate(category)
 
@@ -314,5 +357,7 @@ async def delete_category(
 
     await db.delete(category)
     await db.commit()
+    await category_cache.invalidate(db)
+    catalog_changed()
 
     return MessageResponse(message="Category deleted successfully")
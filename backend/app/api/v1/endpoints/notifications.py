@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, update
 from typing import List, Optional
@@ -8,6 +8,7 @@ from pydantic import BaseModel
 
 from app.core.database import get_db
 from app.core.security import get_current_user
+from app.core.pagination import keyset_paginate, next_cursor, NEXT_CURSOR_HEADER
 from app.models.user import User
 from app.models.notification import Notification, NotificationType
 from app.schemas.common import MessageResponse
@@ -46,9 +47,11 @@ class NotificationPreferences(BaseModel):
 
 @router.get("/", response_model=List[NotificationResponse])
 async def get_notifications(
+    response: Response,
     skip: int = 0,
     limit: int = 20,
     unread_only: bool = False,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -58,10 +61,14 @@ async def get_notifications(
     if unread_only:
         query = query.where(Notification.is_read == False)
 
-    query = query.order_by(Notification.created_at.desc()).offset(skip).limit(limit)
+    query = keyset_paginate(query, Notification.created_at, Notification.id, limit=limit, cursor=cursor, offset=skip)
     result = await db.execute(query)
     notifications = result.scalars().all()
 
+    cursor_token = next_cursor(notifications, limit, Notification.created_at, Notification.id)
+    if cursor_token:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_token
+
     return [NotificationResponse.model_validate(n) for n in notifications]
 
 
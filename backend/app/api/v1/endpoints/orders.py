@@ -1,15 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Header, status, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import delete, select, func
 from sqlalchemy.orm import selectinload
 from typing import List, Optional
-from uuid import UUID
+from uuid import UUID, uuid4
 from datetime import datetime, timedelta
 from decimal import Decimal
 
 from app.core.database import get_db
 from app.core.security import get_current_user, get_current_vendor, get_current_admin
 from app.core.config import settings
+from app.core.pagination import keyset_paginate, next_cursor, NEXT_CURSOR_HEADER
 from app.models.user import User
 from app.models.vendor import Vendor
 from app.models.cart import Cart, CartItem
@@ -18,9 +19,14 @@ from app.models.order import Order, OrderItem, OrderStatusHistory, OrderStatus,
 from app.schemas.order import (
     OrderCreate, OrderResponse, OrderListResponse, OrderItemResponse,
     OrderUpdateStatus, OrderTrackingResponse, OrderTrackingItemResponse,
-    OrderStatusHistoryResponse, RefundRequest
+    OrderStatusHistoryResponse, RefundRequest, CheckoutHoldItem, CheckoutHoldResponse
 )
 from app.schemas.common import MessageResponse, PaginatedResponse
+from app.services.facets import FacetService
+from app.services.idempotency import IDEMPOTENCY_KEY_HEADER, Complete, idempotency_store
+from app.services.inventory import InsufficientStock, hold_stock, release_stock, reserve_stock
+from app.services.outbox import enqueue, queue_vendor_credit
+from app.services.product_events import products_changed
 
 router = APIRouter()
 
@@ -28,11 +34,35 @@ router = APIRouter()
 @router.post("/", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
 async def create_order(
     order_data: OrderCreate,
-    background_tasks: BackgroundTasks,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_KEY_HEADER),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Create a new order from cart"""
+    """Create a new order from cart; retries with the same Idempotency-Key get the first result"""
+    return await place_order(order_data, current_user, db, idempotency_key=idempotency_key)
+
+
+async def place_order(
+    order_data: OrderCreate,
+    current_user: User,
+    db: AsyncSession,
+    idempotency_key: Optional[str] = None
+):
+    """Turn the user's cart into a paid order, once per idempotency key if one is given"""
+    return await idempotency_store.run_once(
+        db, current_user.id, "orders.create", idempotency_key, order_data,
+        lambda complete: _place_order(order_data, current_user, db, complete),
+        status_code=status.HTTP_201_CREATED,
+    )
+
+
+async def _place_order(
+    order_data: OrderCreate,
+    current_user: User,
+    db: AsyncSession,
+    complete: Complete
+) -> OrderResponse:
+    """Turn the user's cart into a paid order, completing its idempotency key in the same commit"""
     # Get user's cart
     cart_result = await db.execute(
         select(Cart)
@@ -54,23 +84,36 @@ async def create_order(
     # Calculate totals
     subtotal = Decimal("0")
     shipping_amount = Decimal("0")
+    stock_needed = {}
     for item in cart.items:
-        if item.product.track_inventory and item.product.quantity < item.quantity:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Insufficient stock for {item.product.name}"
-            )
+        if item.product.track_inventory:
+            stock_needed[item.product_id] = stock_needed.get(item.product_id, 0) + item.quantity
         subtotal += item.price * item.quantity
         # Vendor-set shipping cost per product
         product_shipping = Decimal(str(item.product.shipping_cost or 0))
         shipping_amount += product_shipping * item.quantity
 
+    # Take the stock first, checked and decremented by the database in one
+    # statement, so concurrent checkouts cannot oversell; the cart's
+    # checkout holds are converted in the same statement
+    try:
+        sold_out = await reserve_stock(db, stock_needed, cart_id=cart.id)
+    except InsufficientStock as e:
+        names = ", ".join(item.product.name for item in cart.items if item.product_id in e.product_ids)
+        await db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail=f"Insufficient stock for {names}"
+        )
+
     tax_amount = subtotal * Decimal("0.08")  # 8% tax
     discount_amount = cart.discount_amount
     total = subtotal + tax_amount + shipping_amount - discount_amount
 
-    # Create order
+    # Create order; the order, its items and its history are built in memory
+    # and written by one flush (one INSERT per table)
     order = Order(
+        id=uuid4(),
         user_id=current_user.id,
         order_number=Order.generate_order_number(),
         status=OrderStatus.CONFIRMED,
@@ -114,10 +157,8 @@ async def create_order(
         order.billing_postal_code = order_data.billing_address.postal_code
         order.billing_country = order_data.billing_address.country
 
-    db.add(order)
-    await db.flush()
-
     # Create order items
+    order_items = []
     for cart_item in cart.items:
         product = cart_item.product
         vendor = product.vendor
@@ -127,8 +168,7 @@ async def create_order(
         commission_amount = item_total * Decimal(str(commission_rate / 100))
         vendor_amount = item_total - commission_amount
 
-        order_item = OrderItem(
-            order_id=order.id,
+        order_items.append(OrderItem(
             product_id=product.id,
             vendor_id=vendor.id if vendor else None,
             product_name=product.name,
@@ -142,49 +182,32 @@ async def create_order(
             commission_amount=commission_amount,
             vendor_amount=vendor_amount,
             status=OrderStatus.CONFIRMED
-        )
-        db.add(order_item)
-
-        # Update product inventory
-        if product.track_inventory:
-            product.quantity -= cart_item.quantity
-            product.sales_count += cart_item.quantity
+        ))
+    order.items = order_items
 
     # Add status history
-    status_history = OrderStatusHistory(
-        order_id=order.id,
+    order.status_history = [OrderStatusHistory(
         status=OrderStatus.CONFIRMED,
         notes="Order placed and confirmed"
-    )
-    db.add(status_history)
+    )]
+    db.add(order)
 
     # Clear cart
-    for item in cart.items:
-        await db.delete(item)
+    product_ids = [item.product_id for item in cart.items]
+    await db.execute(
+        delete(CartItem)
+        .where(CartItem.cart_id == cart.id)
+        .execution_options(synchronize_session=False)
+    )
     cart.coupon_code = None
     cart.discount_amount = 0
 
-    await db.commit()
-    await db.refresh(order)
-
-    # Load order with relationships
-    result = await db.execute(
-        select(Order)
-        .where(Order.id == order.id)
-        .options(
-            selectinload(Order.items),
-            selectinload(Order.status_history)
-        )
-    )
-    order = result.scalar_one()
-
-    # Send order confirmation email + notification in background
+    # Queue the confirmation email + notification with the order
     order_items_for_email = [
         {"name": item.product_name, "quantity": item.quantity, "unit_price": float(item.unit_price)}
-        for item in order.items
+        for item in order_items
     ]
-    background_tasks.add_task(
-        _send_order_confirmation_background,
+    await enqueue(db, "order.confirmed", dict(
         user_id=current_user.id,
         email=current_user.email,
         first_name=current_user.first_name,
@@ -197,16 +220,78 @@ async def create_order(
         total=float(order.total),
         currency=order.currency,
         estimated_delivery=order.estimated_delivery.strftime("%B %d, %Y") if order.estimated_delivery else None,
+        shipping_address=dict(
+            name=f"{order.shipping_first_name} {order.shipping_last_name}",
+            street=order.shipping_address_line1,
+            apartment=order.shipping_address_line2,
+            city=order.shipping_city,
+            state=order.shipping_state,
+            zip=order.shipping_postal_code,
+            country=order.shipping_country,
+            phone=order.shipping_phone,
+        ),
+    ))
+
+    # Only products the order sold out leave the in-stock facet or change
+    # what a search returns
+    await FacetService(db).sync_products(sold_out)
+    await db.flush()
+    response = OrderResponse.model_validate(order)
+    await complete(response)
+    await db.commit()
+    products_changed(product_ids, search=bool(sold_out))
+
+    return response
+
+
+@router.post("/checkout/start", response_model=CheckoutHoldResponse)
+async def start_checkout(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Hold the cart's stock while the customer checks out"""
+    cart_result = await db.execute(
+        select(Cart)
+        .where(Cart.user_id == current_user.id)
+        .options(selectinload(Cart.items).selectinload(CartItem.product))
     )
+    cart = cart_result.scalar_one_or_none()
 
-    return OrderResponse.model_validate(order)
+    if not cart or not cart.items:
+        raise HTTPException(status_code=400, detail="Cart is empty")
+
+    stock_needed = {}
+    for item in cart.items:
+        if item.product.track_inventory:
+            stock_needed[item.product_id] = stock_needed.get(item.product_id, 0) + item.quantity
+
+    try:
+        expires_at = await hold_stock(db, cart.id, stock_needed, settings.STOCK_HOLD_TTL_SECONDS)
+    except InsufficientStock as e:
+        names = ", ".join(item.product.name for item in cart.items if item.product_id in e.product_ids)
+        await db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail=f"Insufficient stock for {names}"
+        )
+    await db.commit()
+
+    return CheckoutHoldResponse(
+        expires_at=expires_at,
+        items=[
+            CheckoutHoldItem(product_id=product_id, quantity=quantity)
+            for product_id, quantity in stock_needed.items()
+        ]
+    )
 
 
 @router.get("/", response_model=List[OrderListResponse])
 async def get_my_orders(
+    response: Response,
     skip: int = 0,
     limit: int = 20,
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -216,10 +301,14 @@ async def get_my_orders(
     if status:
         query = query.where(Order.status == status)
 
-    query = query.order_by(Order.created_at.desc()).offset(skip).limit(limit)
+    query = keyset_paginate(query, Order.created_at, Order.id, limit=limit, cursor=cursor, offset=skip)
     result = await db.execute(query)
     orders = result.scalars().all()
 
+    cursor_token = next_cursor(orders, limit, Order.created_at, Order.id)
+    if cursor_token:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_token
+
     return [
         OrderListResponse(
             id=o.id,
@@ -370,12 +459,17 @@ async def cancel_order(
     db.add(status_history)
 
     # Restore inventory
+    restock = {}
     for item in order.items:
-        if item.product:
-            item.product.quantity += item.quantity
+        if item.product_id:
+            restock[item.product_id] = restock.get(item.product_id, 0) + item.quantity
         item.status = OrderStatus.CANCELLED
+    restocked = await release_stock(db, restock)
 
+    # Only products back in stock rejoin the in-stock facet
+    await FacetService(db).sync_products(restocked)
     await db.commit()
+    products_changed(list(restock), search=bool(restocked))
     await db.refresh(order)
 
     return OrderResponse.model_validate(order)
@@ -385,9 +479,11 @@ async def cancel_order(
 
 @router.get("/vendor/orders", response_model=List[dict])
 async def get_vendor_orders(
+    response: Response,
     skip: int = 0,
     limit: int = 20,
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_vendor),
     db: AsyncSession = Depends(get_db)
 ):
@@ -405,10 +501,14 @@ async def get_vendor_orders(
     if status:
         query = query.where(OrderItem.status == status)
 
-    query = query.order_by(OrderItem.created_at.desc()).offset(skip).limit(limit)
+    query = keyset_paginate(query, OrderItem.created_at, OrderItem.id, limit=limit, cursor=cursor, offset=skip)
     result = await db.execute(query)
     items = result.scalars().all()
 
+    cursor_token = next_cursor(items, limit, OrderItem.created_at, OrderItem.id)
+    if cursor_token:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_token
+
     return [
         {
             "id": str(item.id),
@@ -521,11 +621,9 @@ async def update_order_item_status(
     if status_data.tracking_number:
         item.tracking_number = status_data.tracking_number
 
-    # Update vendor sales when item is delivered
+    # Credit the vendor (through the outbox) when the item is delivered
     if item.status == OrderStatus.DELIVERED and old_item_status != OrderStatus.DELIVERED:
-        vendor.total_sales += item.total
-        vendor.total_earnings += item.vendor_amount
-        vendor.balance += item.vendor_amount
+        await queue_vendor_credit(db, item.id)
 
     # Sync parent order status based on all items
     all_items_result = await db.execute(
@@ -653,7 +751,6 @@ async def get_admin_order(
 async def admin_update_order_status(
     order_id: UUID,
     status_data: OrderUpdateStatus,
-    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db)
 ):
@@ -691,13 +788,9 @@ async def admin_update_order_status(
     )
     db.add(status_history)
 
-    await db.commit()
-    await db.refresh(order)
-
-    # Notify customer of status change
+    # Queue the customer's status notification with the change
     if order.user and old_status != order.status:
-        background_tasks.add_task(
-            _send_order_status_background,
+        await enqueue(db, "order.status_changed", dict(
             user_id=order.user.id,
             email=order.user.email,
             first_name=order.user.first_name,
@@ -706,7 +799,10 @@ async def admin_update_order_status(
             new_status=status_data.status,
             tracking_number=status_data.tracking_number,
             carrier=status_data.carrier,
-        )
+        ))
+
+    await db.commit()
+    await db.refresh(order)
 
     return OrderResponse.model_validate(order)
 
@@ -777,48 +873,3 @@ async def get_order(
         raise HTTPException(status_code=404, detail="Order not found")
 
     return OrderResponse.model_validate(order)
-
-
-# ---------------------------------------------------------------------------
-# Background task helpers for email/notification dispatch
-# ---------------------------------------------------------------------------
-
-async def _send_order_confirmation_background(
-    user_id, email, first_name, order_id, order_number,
-    items, subtotal, shipping, tax, total, currency, estimated_delivery,
-):
-    from app.core.database import AsyncSessionLocal
-    from app.services.notifications import notify_order_confirmed
-    import logging
-
-    async with AsyncSessionLocal() as db:
-        try:
-            await notify_order_confirmed(
-                db=db, user_id=user_id, email=email, first_name=first_name,
-                order_id=order_id, order_number=order_number, items=items,
-                subtotal=subtotal, shipping=shipping, tax=tax,
-                total=total, currency=currency, estimated_delivery=estimated_delivery,
-            )
-            await db.commit()
-        except Exception as exc:
-            logging.getLogger(__name__).error("Order confirmation email failed: %s", exc)
-
-
-async def _send_order_status_background(
-    user_id, email, first_name, order_id, order_number,
-    new_status, tracking_number=None, carrier=None,
-):
-    from app.core.database import AsyncSessionLocal
-    from app.services.notifications import notify_order_status_change
-    import logging
-
-    async with AsyncSessionLocal() as db:
-        try:
-            await notify_order_status_change(
-                db=db, user_id=user_id, email=email, first_name=first_name,
-                order_id=order_id, order_number=order_number,
-                new_status=new_status, tracking_number=tracking_number, carrier=carrier,
-            )
-            await db.commit()
-        except Exception as exc:
-            logging.getLogger(__name__).error("Order status email failed: %s", exc)
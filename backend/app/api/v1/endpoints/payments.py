@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import Optional
+from typing import Any, Optional
 from uuid import UUID
 from pydantic import BaseModel
 from decimal import Decimal
@@ -14,6 +14,7 @@ from app.models.user import User
 from app.models.order import Order, OrderStatus, PaymentStatus
 from app.models.payment import Payment, PaymentGateway, TransactionStatus
 from app.schemas.common import MessageResponse
+from app.services.idempotency import IDEMPOTENCY_KEY_HEADER, Complete, idempotency_store
 
 router = APIRouter()
 
@@ -35,14 +36,37 @@ class WebhookPayload(BaseModel):
     payload: dict
 
 
+def _gateway_unavailable(gateway: str, error: Any, status_code: int = 503) -> HTTPException:
+    """
+    Error for a gateway that could not be reached (503) or failed on its
+    side (502). Unlike a 4xx, a 5xx is not stored for the Idempotency-Key,
+    so a retry with the same key calls the gateway again.
+    """
+    return HTTPException(status_code=status_code, detail=f"{gateway} unavailable: {error}")
+
+
 # Stripe Integration
 @router.post("/stripe/create-intent", response_model=PaymentIntentResponse)
 async def create_stripe_payment_intent(
     data: PaymentIntentCreate,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_KEY_HEADER),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Create Stripe payment intent"""
+    return await idempotency_store.run_once(
+        db, current_user.id, "payments.stripe.create_intent", idempotency_key, data,
+        lambda complete: _create_stripe_payment_intent(data, current_user, db, complete),
+    )
+
+
+async def _create_stripe_payment_intent(
+    data: PaymentIntentCreate,
+    current_user: User,
+    db: AsyncSession,
+    complete: Complete
+) -> PaymentIntentResponse:
+    """Create the intent with Stripe and record the pending payment"""
     if not settings.STRIPE_SECRET_KEY:
         raise HTTPException(status_code=500, detail="Stripe not configured")
 
@@ -84,14 +108,20 @@ async def create_stripe_payment_intent(
             status=TransactionStatus.PENDING
         )
         db.add(payment)
-        await db.commit()
 
-        return PaymentIntentResponse(
+        response = PaymentIntentResponse(
             client_secret=intent.client_secret,
             gateway="stripe"
         )
+        await complete(response)
+        await db.commit()
+        return response
 
-    except stripe.error.StripeError as e:
+    except (stripe.APIConnectionError, stripe.RateLimitError) as e:
+        raise _gateway_unavailable("Stripe", e)
+    except stripe.APIError as e:
+        raise _gateway_unavailable("Stripe", e, status_code=502)
+    except stripe.StripeError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
@@ -172,14 +202,29 @@ async def stripe_webhook(
 @router.post("/paypal/create-order", response_model=PaymentIntentResponse)
 async def create_paypal_order(
     data: PaymentIntentCreate,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_KEY_HEADER),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Create PayPal order"""
+    return await idempotency_store.run_once(
+        db, current_user.id, "payments.paypal.create_order", idempotency_key, data,
+        lambda complete: _create_paypal_order(data, current_user, db, complete),
+    )
+
+
+async def _create_paypal_order(
+    data: PaymentIntentCreate,
+    current_user: User,
+    db: AsyncSession,
+    complete: Complete
+) -> PaymentIntentResponse:
+    """Create the payment with PayPal and record it as pending"""
     if not settings.PAYPAL_CLIENT_ID or not settings.PAYPAL_CLIENT_SECRET:
         raise HTTPException(status_code=500, detail="PayPal not configured")
 
     import paypalrestsdk
+    import requests
     paypalrestsdk.configure({
         "mode": settings.PAYPAL_MODE,
         "client_id": settings.PAYPAL_CLIENT_ID,
@@ -227,20 +272,28 @@ async def create_paypal_order(
                 status=TransactionStatus.PENDING
             )
             db.add(payment)
-            await db.commit()
 
             approval_url = next(
                 link.href for link in paypal_payment.links if link.rel == "approval_url"
             )
 
-            return PaymentIntentResponse(
+            response = PaymentIntentResponse(
                 payment_url=approval_url,
                 transaction_id=paypal_payment.id,
                 gateway="paypal"
             )
+            await complete(response)
+            await db.commit()
+            return response
         else:
             raise HTTPException(status_code=400, detail=paypal_payment.error)
 
+    except HTTPException:
+        raise
+    except (requests.ConnectionError, requests.Timeout) as e:
+        raise _gateway_unavailable("PayPal", e)
+    except paypalrestsdk.exceptions.ServerError as e:
+        raise _gateway_unavailable("PayPal", e, status_code=502)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -293,10 +346,24 @@ async def execute_paypal_payment(
 @router.post("/flutterwave/initialize", response_model=PaymentIntentResponse)
 async def initialize_flutterwave(
     data: PaymentIntentCreate,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_KEY_HEADER),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Initialize Flutterwave payment"""
+    return await idempotency_store.run_once(
+        db, current_user.id, "payments.flutterwave.initialize", idempotency_key, data,
+        lambda complete: _initialize_flutterwave(data, current_user, db, complete),
+    )
+
+
+async def _initialize_flutterwave(
+    data: PaymentIntentCreate,
+    current_user: User,
+    db: AsyncSession,
+    complete: Complete
+) -> PaymentIntentResponse:
+    """Start the payment with Flutterwave and record it as pending"""
     if not settings.FLUTTERWAVE_SECRET_KEY:
         raise HTTPException(status_code=500, detail="Flutterwave not configured")
 
@@ -332,6 +399,8 @@ async def initialize_flutterwave(
                     }
                 }
             )
+        if response.status_code >= 500:
+            raise _gateway_unavailable("Flutterwave", f"HTTP {response.status_code}", status_code=502)
 
         data = response.json()
 
@@ -346,15 +415,21 @@ async def initialize_flutterwave(
                 status=TransactionStatus.PENDING
             )
             db.add(payment)
-            await db.commit()
 
-            return PaymentIntentResponse(
+            response = PaymentIntentResponse(
                 payment_url=data["data"]["link"],
                 gateway="flutterwave"
             )
+            await complete(response)
+            await db.commit()
+            return response
         else:
             raise HTTPException(status_code=400, detail=data.get("message", "Payment failed"))
 
+    except HTTPException:
+        raise
+    except httpx.TransportError as e:
+        raise _gateway_unavailable("Flutterwave", e)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -363,14 +438,29 @@ async def initialize_flutterwave(
 @router.post("/razorpay/create-order", response_model=PaymentIntentResponse)
 async def create_razorpay_order(
     data: PaymentIntentCreate,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_KEY_HEADER),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Create Razorpay order"""
+    return await idempotency_store.run_once(
+        db, current_user.id, "payments.razorpay.create_order", idempotency_key, data,
+        lambda complete: _create_razorpay_order(data, current_user, db, complete),
+    )
+
+
+async def _create_razorpay_order(
+    data: PaymentIntentCreate,
+    current_user: User,
+    db: AsyncSession,
+    complete: Complete
+) -> PaymentIntentResponse:
+    """Create the order with Razorpay and record the pending payment"""
     if not settings.RAZORPAY_KEY_ID or not settings.RAZORPAY_KEY_SECRET:
         raise HTTPException(status_code=500, detail="Razorpay not configured")
 
     import razorpay
+    import requests
 
     result = await db.execute(
         select(Order).where(Order.id == data.order_id, Order.user_id == current_user.id)
@@ -405,14 +495,22 @@ async def create_razorpay_order(
             status=TransactionStatus.PENDING
         )
         db.add(payment)
-        await db.commit()
 
-        return PaymentIntentResponse(
+        response = PaymentIntentResponse(
             client_secret=razorpay_order["id"],
             transaction_id=razorpay_order["id"],
             gateway="razorpay"
         )
-
+        await complete(response)
+        await db.commit()
+        return response
+
+    except HTTPException:
+        raise
+    except (requests.ConnectionError, requests.Timeout) as e:
+        raise _gateway_unavailable("Razorpay", e)
+    except (razorpay.errors.ServerError, razorpay.errors.GatewayError) as e:
+        raise _gateway_unavailable("Razorpay", e, status_code=502)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -491,10 +589,23 @@ async def get_payment_methods():
 @router.post("/confirm")
 async def confirm_payment(
     data: dict,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_KEY_HEADER),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Generic payment confirmation endpoint"""
+    return await idempotency_store.run_once(
+        db, current_user.id, "payments.confirm", idempotency_key, data,
+        lambda complete: _confirm_payment(data, current_user, db),
+    )
+
+
+async def _confirm_payment(
+    data: dict,
+    current_user: User,
+    db: AsyncSession
+) -> dict:
+    """Look up a payment by its gateway intent"""
     payment_intent_id = data.get("payment_intent_id")
     if not payment_intent_id:
         raise HTTPException(status_code=400, detail="payment_intent_id required")
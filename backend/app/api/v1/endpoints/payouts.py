@@ -18,6 +18,7 @@ from app.schemas.payout import (
     EarningsResponse, PayoutApprove, PayoutReject, PayoutItemResponse
 )
 from app.schemas.common import MessageResponse
+from app.services.outbox import queue_vendor_credit
 
 router = APIRouter()
 
@@ -337,17 +338,11 @@ async def reject_payout(
 
 async def calculate_and_update_vendor_balance(
     db: AsyncSession,
-    order_item: OrderItem,
-    vendor: Vendor
+    order_item: OrderItem
 ):
     """
-    Calculate commission and update vendor balance when order is delivered.
-    This should be called from order status update endpoint.
+    Queue the vendor's credit for a delivered order item.
+    The outbox worker updates the balance once per item; the caller commits.
     """
     if order_item.status == OrderStatus.DELIVERED:
-        # Update vendor balance and total earnings
-        vendor.balance += order_item.vendor_amount
-        vendor.total_earnings += order_item.vendor_amount
-        vendor.total_sales += order_item.total
-
-        await db.commit()
+        await queue_vendor_credit(db, order_item.id)
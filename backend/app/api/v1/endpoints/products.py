@@ -1,14 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, or_, and_
 from sqlalchemy.orm import selectinload
-from typing import List, Optional
+from typing import Dict, List, Optional
 from uuid import UUID
 from decimal import Decimal
 from slugify import slugify
 import json
 
 from app.core.database import get_db
+from app.core.pagination import keyset_paginate, next_cursor, NEXT_CURSOR_HEADER
 from app.core.security import get_current_user, get_current_vendor, get_approved_vendor, get_current_admin
 from app.models.user import User
 from app.models.vendor import Vendor, VendorStatus
@@ -20,12 +21,73 @@ from app.schemas.product import (
     CategoryFiltersResponse, FilterSection, FilterOptionItem, VendorFilterOption
 )
 from app.schemas.common import MessageResponse, PaginatedResponse
+from app.services.category_tree import descendant_ids_by_slug_query, get_descendant_ids
+from app.services.facets import FacetService
+from app.services.product_cache import product_detail_cache
+from app.services.product_cards import card_query, card_from_row
+from app.services.product_events import products_changed
+from app.services.rails import (
+    rail_snapshots, rail_query, RAIL_FEATURED, RAIL_NEW_ARRIVALS, RAIL_BEST_SELLERS
+)
+from app.services.view_counter import view_counter
 
 router = APIRouter()
 
 
+def _parse_attribute_filters(
+    brands: Optional[str],
+    sizes: Optional[str],
+    colors: Optional[str],
+    attributes: Optional[str],
+) -> Dict[str, List[str]]:
+    """Merge the brand/size/color shortcuts and the attributes JSON into {name: [values]}"""
+    attr_filters: Dict[str, List[str]] = {}
+    if attributes:
+        try:
+            parsed = json.loads(attributes)
+        except json.JSONDecodeError:
+            parsed = {}
+        if isinstance(parsed, dict):
+            for name, values in parsed.items():
+                if isinstance(values, (str, int, float)):
+                    values = [values]
+                if isinstance(values, list):
+                    attr_filters[str(name)] = [str(v) for v in values]
+
+    if brands:
+        attr_filters["Brand"] = [b.strip() for b in brands.split(",")]
+    if sizes:
+        attr_filters["Size"] = [s.strip() for s in sizes.split(",")]
+    if colors:
+        attr_filters["Color"] = [c.strip() for c in colors.split(",")]
+
+    return attr_filters
+
+
+def _attribute_filter_clauses(attr_filters: Dict[str, List[str]]) -> list:
+    """
+    Build one EXISTS clause per attribute name.
+
+    Each clause is answered from the (name, value, product_id) index on
+    product_attributes, so products are filtered without loading attributes.
+    """
+    clauses = []
+    for attr_name, values in attr_filters.items():
+        clauses.append(
+            select(ProductAttribute.id)
+            .where(
+                ProductAttribute.product_id == Product.id,
+                ProductAttribute.name == attr_name,
+                ProductAttribute.value.in_(values),
+            )
+            .exists()
+        )
+    return clauses
+
+
 @router.get("/", response_model=List[ProductListResponse])
 async def list_products(
+    response: Response,
     skip: int = 0,
     limit: int = 20,
     category: Optional[str] = None,
@@ -44,27 +106,17 @@ async def list_products(
     attributes: Optional[str] = None,  # JSON string of {attr_name: [values]}
     sort_by: str = "created_at",
     sort_order: str = "desc",
+    cursor: Optional[str] = None,  # Opaque keyset cursor from X-Next-Cursor; replaces skip
     db: AsyncSession = Depends(get_db)
 ):
     """List products with filters"""
-    import json
-
-    query = select(Product).where(Product.status == ProductStatus.ACTIVE)
+    # Sorting (id as tie-breaker keeps pages stable) and pagination in the database
+    sort_column = getattr(Product, sort_by, Product.created_at)
+    query = card_query(sort_column).where(Product.status == ProductStatus.ACTIVE)
 
-    # Filter by category slug (joins with Category table)
+    # Filter by category slug, including subcategories at any depth
     if category:
-        # Get category and its subcategories
-        cat_result = await db.execute(
-            select(Category).where(Category.slug == category)
-        )
-        cat = cat_result.scalar_one_or_none()
-        if cat:
-            # Include subcategories in the filter
-            sub_result = await db.execute(
-                select(Category.id).where(Category.parent_id == cat.id)
-            )
-            category_ids = [cat.id] + [row[0] for row in sub_result.all()]
-            query = query.where(Product.category_id.in_(category_ids))
+        query = query.where(Product.category_id.in_(descendant_ids_by_slug_query(category)))
     elif category_id:
         query = query.where(Product.category_id == category_id)
 
@@ -92,85 +144,24 @@ async def list_products(
         if seller_ids:
             query = query.where(Product.vendor_id.in_(seller_ids))
 
-    # Get products first, then filter by attributes
-    query = query.options(
-        selectinload(Product.images),
-        selectinload(Product.vendor),
-        selectinload(Product.category),
-        selectinload(Product.attributes)
-    )
+    # Filter by attributes (Brand, Size, Color, etc.) in SQL
+    attr_filters = _parse_attribute_filters(brands, sizes, colors, attributes)
+    for clause in _attribute_filter_clauses(attr_filters):
+        query = query.where(clause)
 
-    # Sorting
-    sort_column = getattr(Product, sort_by, Product.created_at)
-    if sort_order == "desc":
-        query = query.order_by(sort_column.desc())
-    else:
-        query = query.order_by(sort_column.asc())
+    query = keyset_paginate(
+        query, sort_column, Product.id,
+        limit=limit, descending=sort_order == "desc", cursor=cursor, offset=skip
+    )
 
     result = await db.execute(query)
-    products = result.scalars().all()
-
-    # Filter by attributes (Brand, Size, Color, etc.)
-    filtered_products = products
+    rows = result.all()
 
-    # Parse attribute filters
-    brand_list = [b.strip() for b in brands.split(",")] if brands else []
-    size_list = [s.strip() for s in sizes.split(",")] if sizes else []
-    color_list = [c.strip() for c in colors.split(",")] if colors else []
+    cursor_token = next_cursor(rows, limit, sort_column, Product.id, descending=sort_order == "desc")
+    if cursor_token:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_token
 
-    # Parse additional attributes JSON
-    attr_filters = {}
-    if attributes:
-        try:
-            attr_filters = json.loads(attributes)
-        except json.JSONDecodeError:
-            pass
-
-    # Add specific filters to attr_filters
-    if brand_list:
-        attr_filters["Brand"] = brand_list
-    if size_list:
-        attr_filters["Size"] = size_list
-    if color_list:
-        attr_filters["Color"] = color_list
-
-    # Apply attribute filters
-    if attr_filters:
-        def matches_attributes(product, filters):
-            product_attrs = {attr.name: attr.value for attr in product.attributes}
-            for attr_name, values in filters.items():
-                if attr_name in product_attrs:
-                    if product_attrs[attr_name] not in values:
-                        return False
-                else:
-                    # Product doesn't have this attribute, exclude it
-                    return False
-            return True
-
-        filtered_products = [p for p in products if matches_attributes(p, attr_filters)]
-
-    # Apply pagination after filtering
-    total_filtered = len(filtered_products)
-    filtered_products = filtered_products[skip:skip + limit]
-
-    return [
-        ProductListResponse(
-            id=p.id,
-            name=p.name,
-            slug=p.slug,
-            price=p.price,
-            compare_at_price=p.compare_at_price,
-            currency=p.currency,
-            quantity=p.quantity,
-            status=p.status.value,
-            rating=p.rating,
-            review_count=p.review_count,
-            primary_image=p.images[0].url if p.images else None,
-            vendor_name=p.vendor.business_name if p.vendor else None,
-            category_name=p.category.name if p.category else None
-        )
-        for p in filtered_products
-    ]
+    return [card_from_row(row) for row in rows]
 
 
 @router.get("/featured", response_model=List[ProductListResponse])
@@ -179,33 +170,7 @@ async def get_featured_products(
     db: AsyncSession = Depends(get_db)
 ):
     """Get featured products"""
-    result = await db.execute(
-        select(Product)
-        .where(Product.status == ProductStatus.ACTIVE, Product.is_featured == True)
-        .options(selectinload(Product.images), selectinload(Product.vendor))
-        .order_by(Product.sales_count.desc())
-        .limit(limit)
-    )
-    products = result.scalars().all()
-
-    return [
-        ProductListResponse(
-            id=p.id,
-            name=p.name,
-            slug=p.slug,
-            price=p.price,
-            compare_at_price=p.compare_at_price,
-            currency=p.currency,
-            quantity=p.quantity,
-            status=p.status.value,
-            rating=p.rating,
-            review_count=p.review_count,
-            primary_image=p.images[0].url if p.images else None,
-            vendor_name=p.vendor.business_name if p.vendor else None,
-            category_name=None
-        )
-        for p in products
-    ]
+    return await _rail_response(db, RAIL_FEATURED, limit)
 
 
 @router.get("/new-arrivals", response_model=List[ProductListResponse])
@@ -214,33 +179,7 @@ async def get_new_arrivals(
     db: AsyncSession = Depends(get_db)
 ):
     """Get new arrival products"""
-    result = await db.execute(
-        select(Product)
-        .where(Product.status == ProductStatus.ACTIVE)
-        .options(selectinload(Product.images), selectinload(Product.vendor))
-        .order_by(Product.created_at.desc())
-        .limit(limit)
-    )
-    products = result.scalars().all()
-
-    return [
-        ProductListResponse(
-            id=p.id,
-            name=p.name,
-            slug=p.slug,
-            price=p.price,
-            compare_at_price=p.compare_at_price,
-            currency=p.currency,
-            quantity=p.quantity,
-            status=p.status.value,
-            rating=p.rating,
-            review_count=p.review_count,
-            primary_image=p.images[0].url if p.images else None,
-            vendor_name=p.vendor.business_name if p.vendor else None,
-            category_name=None
-        )
-        for p in products
-    ]
+    return await _rail_response(db, RAIL_NEW_ARRIVALS, limit)
 
 
 @router.get("/best-sellers", response_model=List[ProductListResponse])
@@ -249,33 +188,17 @@ async def get_best_sellers(
     db: AsyncSession = Depends(get_db)
 ):
     """Get best selling products"""
-    result = await db.execute(
-        select(Product)
-        .where(Product.status == ProductStatus.ACTIVE)
-        .options(selectinload(Product.images), selectinload(Product.vendor))
-        .order_by(Product.sales_count.desc())
-        .limit(limit)
-    )
-    products = result.scalars().all()
-
-    return [
-        ProductListResponse(
-            id=p.id,
-            name=p.name,
-            slug=p.slug,
-            price=p.price,
-            compare_at_price=p.compare_at_price,
-            currency=p.currency,
-            quantity=p.quantity,
-            status=p.status.value,
-            rating=p.rating,
-            review_count=p.review_count,
-            primary_image=p.images[0].url if p.images else None,
-            vendor_name=p.vendor.business_name if p.vendor else None,
-            category_name=None
-        )
-        for p in products
-    ]
+    return await _rail_response(db, RAIL_BEST_SELLERS, limit)
+
+
+async def _rail_response(db: AsyncSession, rail: str, limit: int):
+    """Serve a homepage rail from its snapshot, querying only for oversized limits"""
+    content = await rail_snapshots.product_rail(db, rail, limit)
+    if content is not None:
+        return Response(content=content, media_type="application/json")
+
+    result = await db.execute(rail_query(rail, limit))
+    return [card_from_row(row) for row in result.all()]
 
 
 @router.get("/filters/{category_slug}", response_model=CategoryFiltersResponse)
@@ -283,9 +206,7 @@ async def get_category_filters(
     category_slug: str,
     db: AsyncSession = Depends(get_db)
 ):
-    """Get available filter options for a category"""
-    from collections import defaultdict
-
+    """Get available filter options for a category (served from the facet store)"""
     # Get category
     cat_result = await db.execute(
         select(Category).where(Category.slug == category_slug)
@@ -298,68 +219,16 @@ async def get_category_filters(
             detail="Category not found"
         )
 
-    # Get all subcategory IDs (including this category)
-    category_ids = [category.id]
-    sub_result = await db.execute(
-        select(Category.id).where(Category.parent_id == category.id)
-    )
-    category_ids.extend([row[0] for row in sub_result.all()])
+    # Get all subcategory IDs at any depth (including this category)
+    category_ids = await get_descendant_ids(db, category.id)
 
-    # Get all active products in this category tree
-    products_query = (
-        select(Product)
-        .where(
-            Product.status == ProductStatus.ACTIVE,
-            Product.category_id.in_(category_ids)
-        )
-        .options(
-            selectinload(Product.attributes),
-            selectinload(Product.vendor)
-        )
-    )
-    result = await db.execute(products_query)
-    products = result.scalars().all()
-
-    # Calculate filter options
-    price_min = Decimal("0")
-    price_max = Decimal("0")
-    attribute_values = defaultdict(lambda: defaultdict(int))  # {attr_name: {value: count}}
-    vendor_counts = defaultdict(lambda: {"name": "", "rating": 0.0, "count": 0})
+    # Read the precomputed counts for this category tree
+    facets = await FacetService(db).get_category_facets(category_ids)
+    attribute_values = facets["attributes"]
     rating_counts = {5: 0, 4: 0, 3: 0, 2: 0, 1: 0}
-    has_on_sale = False
-    in_stock_count = 0
-
-    for product in products:
-        # Price range
-        if price_min == 0 or product.price < price_min:
-            price_min = product.price
-        if product.price > price_max:
-            price_max = product.price
-
-        # On sale check
-        if product.compare_at_price and product.compare_at_price > product.price:
-            has_on_sale = True
-
-        # In stock count
-        if product.quantity > 0:
-            in_stock_count += 1
-
-        # Rating distribution
-        product_rating = int(product.rating) if product.rating else 0
-        if product_rating >= 1:
-            rating_counts[min(product_rating, 5)] += 1
-
-        # Vendor/Seller
-        if product.vendor:
-            vendor_id = str(product.vendor.id)
-            vendor_counts[vendor_id]["name"] = product.vendor.business_name
-            vendor_counts[vendor_id]["rating"] = product.vendor.rating or 0.0
-            vendor_counts[vendor_id]["count"] += 1
-
-        # Attribute values (Size, Color, Material, Brand, etc.)
-        for attr in product.attributes:
-            if attr.is_visible:
-                attribute_values[attr.name][attr.value] += 1
+    rating_counts.update(facets["rating"])
+    price_min = facets["price_min"] or Decimal("0")
+    price_max = facets["price_max"] or Decimal("0")
 
     # Build attribute filter sections
     attribute_filters = []
@@ -398,15 +267,25 @@ async def get_category_filters(
                 ))
 
     # Build vendor filter options
+    top_vendors = sorted(facets["vendors"].items(), key=lambda x: -x[1])[:15]  # Limit to top 15 vendors
+    vendor_info = {}
+    if top_vendors:
+        vendor_result = await db.execute(
+            select(Vendor.id, Vendor.business_name, Vendor.rating)
+            .where(Vendor.id.in_([vid for vid, _ in top_vendors]))
+        )
+        vendor_info = {row.id: row for row in vendor_result.all()}
+
     vendors = [
         VendorFilterOption(
-            id=UUID(vid),
-            name=data["name"],
-            rating=data["rating"],
-            count=data["count"]
+            id=vid,
+            name=vendor_info[vid].business_name,
+            rating=vendor_info[vid].rating or 0.0,
+            count=count
         )
-        for vid, data in sorted(vendor_counts.items(), key=lambda x: -x[1]["count"])
-    ][:15]  # Limit to top 15 vendors
+        for vid, count in top_vendors
+        if vid in vendor_info
+    ]
 
     return CategoryFiltersResponse(
         category_id=category.id,
@@ -416,10 +295,10 @@ async def get_category_filters(
         attribute_filters=attribute_filters,
         vendors=vendors,
         rating_counts=rating_counts,
-        has_on_sale=has_on_sale,
+        has_on_sale=facets["on_sale"] > 0,
         has_free_shipping=False,  # Could be computed based on shipping settings
-        in_stock_count=in_stock_count,
-        total_count=len(products)
+        in_stock_count=facets["in_stock"],
+        total_count=facets["total"]
     )
 
 
@@ -430,54 +309,67 @@ async def get_product(
 ):
     """Get product by slug or ID"""
     # Try to parse as UUID first (for vendor dashboard)
-    product = None
-    is_uuid_lookup = False
-
     try:
-        product_id = UUID(slug_or_id)
+        cache_key = f"id:{UUID(slug_or_id)}"
         is_uuid_lookup = True
-        result = await db.execute(
-            select(Product)
-            .where(Product.id == product_id)
-            .options(
-                selectinload(Product.images),
-                selectinload(Product.variants),
-                selectinload(Product.attributes),
-                selectinload(Product.vendor),
-                selectinload(Product.category)
+    except (ValueError, AttributeError):
+        cache_key = f"slug:{slug_or_id}"
+        is_uuid_lookup = False
+
+    cached = product_detail_cache.get(cache_key)
+    if cached is None:
+        generation = product_detail_cache.generation
+        product = await _load_product_detail(db, slug_or_id, is_uuid_lookup)
+        if not product:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Product not found"
             )
+        cached = (product.id, ProductResponse.model_validate(product).model_dump_json().encode())
+        # Store under both keys, so the dashboard (id) and the storefront
+        # (slug) share one entry; slug lookups only ever see active products
+        keys = {cache_key, f"id:{product.id}"}
+        if product.status == ProductStatus.ACTIVE:
+            keys.add(f"slug:{product.slug}")
+        for key in keys:
+            product_detail_cache.set(key, cached, tag=product.id, generation=generation)
+
+    product_id, content = cached
+
+    # Count views only for public slug-based access (written in batches)
+    if not is_uuid_lookup:
+        view_counter.record(product_id)
+
+    return Response(content=content, media_type="application/json")
+
+
+async def _load_product_detail(db: AsyncSession, slug_or_id: str, is_uuid_lookup: bool) -> Optional[Product]:
+    """Load a product with everything ProductResponse needs"""
+    product = None
+    options = (
+        selectinload(Product.images),
+        selectinload(Product.variants),
+        selectinload(Product.attributes),
+        selectinload(Product.vendor),
+        selectinload(Product.category)
+    )
+
+    if is_uuid_lookup:
+        result = await db.execute(
+            select(Product).where(Product.id == UUID(slug_or_id)).options(*options)
         )
         product = result.scalar_one_or_none()
-    except (ValueError, AttributeError):
-        pass
 
     # If not found by UUID or not a valid UUID, search by slug
     if not product:
         result = await db.execute(
             select(Product)
             .where(Product.slug == slug_or_id, Product.status == ProductStatus.ACTIVE)
-            .options(
-                selectinload(Product.images),
-                selectinload(Product.variants),
-                selectinload(Product.attributes),
-                selectinload(Product.vendor),
-                selectinload(Product.category)
-            )
+            .options(*options)
         )
         product = result.scalar_one_or_none()
 
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Product not found"
-        )
-
-    # Increment view count only for public slug-based access
-    if not is_uuid_lookup:
-        product.view_count += 1
-        await db.commit()
-
-    return ProductResponse.model_validate(product)
+    return product
 
 
 # Vendor endpoints
@@ -497,36 +389,15 @@ async def get_my_products(
     if not vendor:
         raise HTTPException(status_code=404, detail="Vendor profile not found")
 
-    query = select(Product).where(Product.vendor_id == vendor.id)
+    query = card_query().where(Product.vendor_id == vendor.id)
 
     if status:
         query = query.where(Product.status == status)
 
-    query = query.options(
-        selectinload(Product.images)
-    ).order_by(Product.created_at.desc()).offset(skip).limit(limit)
+    query = query.order_by(Product.created_at.desc()).offset(skip).limit(limit)
 
     result = await db.execute(query)
-    products = result.scalars().all()
-
-    return [
-        ProductListResponse(
-            id=p.id,
-            name=p.name,
-            slug=p.slug,
-            price=p.price,
-            compare_at_price=p.compare_at_price,
-            currency=p.currency,
-            quantity=p.quantity,
-            status=p.status.value,
-            rating=p.rating,
-            review_count=p.review_count,
-            primary_image=p.images[0].url if p.images else None,
-            vendor_name=vendor.business_name,
-            category_name=None
-        )
-        for p in products
-    ]
+    return [card_from_row(row) for row in result.all()]
 
 
 @router.post("/", response_model=ProductResponse, status_code=status.HTTP_201_CREATED)
@@ -625,7 +496,9 @@ async def create_product(
             )
             db.add(attribute)
 
+    await FacetService(db).sync_products([product.id])
     await db.commit()
+    products_changed([product.id])
     await db.refresh(product)
 
     # Reload with relationships
@@ -722,7 +595,9 @@ async def update_product(
             )
             db.add(variant)
 
+    await FacetService(db).sync_products([product.id])
     await db.commit()
+    products_changed([product.id])
 
     # Reload product with fresh data
     result = await db.execute(
@@ -763,7 +638,9 @@ async def delete_product(
         raise HTTPException(status_code=404, detail="Product not found")
 
     await db.delete(product)
+    await FacetService(db).sync_products([product_id])
     await db.commit()
+    products_changed([product_id])
 
     return MessageResponse(message="Product deleted successfully")
 
@@ -808,6 +685,7 @@ async def update_product_images(
         db.add(image)
 
     await db.commit()
+    products_changed([product.id])
     await db.refresh(product)
 
     return ProductResponse.model_validate(product)
@@ -843,6 +721,8 @@ async def update_inventory(
     elif quantity > 0 and product.status == ProductStatus.OUT_OF_STOCK:
         product.status = ProductStatus.ACTIVE
 
+    await FacetService(db).sync_products([product.id])
     await db.commit()
+    products_changed([product.id])
 
     return MessageResponse(message="Inventory updated successfully")
@@ -19,6 +19,8 @@ from app.schemas.review import (
     VendorReviewResponse, ReviewVoteRequest, ReviewStatsResponse
 )
 from app.schemas.common import MessageResponse
+from app.services.facets import FacetService
+from app.services.product_events import products_changed
 
 router = APIRouter()
 
@@ -239,7 +241,9 @@ async def create_review(
         product.vendor.rating = float(vendor_avg or 0)
         product.vendor.total_reviews = vendor_count or 0
 
+    await FacetService(db).sync_products([product.id])
     await db.commit()
+    products_changed([product.id])
     await db.refresh(review)
 
     return ReviewResponse(
@@ -318,7 +322,9 @@ async def delete_review(
         product.rating = float(avg_rating or 0)
         product.review_count = review_count or 0
 
+    await FacetService(db).sync_products([product_id])
     await db.commit()
+    products_changed([product_id])
 
     return MessageResponse(message="Review deleted successfully")
 
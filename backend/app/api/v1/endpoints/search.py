@@ -1,7 +1,6 @@
 from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, or_, func, text
-from sqlalchemy.orm import selectinload
 from typing import List, Optional
 from uuid import UUID
 from decimal import Decimal
@@ -15,12 +14,22 @@ from app.core.sanitize import sanitize_search_query
 from app.models.product import Product, ProductStatus
 from app.models.category import Category
 from app.models.vendor import Vendor, VendorStatus
-from app.models.search_query import SearchQuery
-from app.services.search import SearchService
+from app.services.autocomplete import completion_index
+from app.services.category_tree import descendant_ids_query
+from app.services.product_cards import card_query
+from app.services.rails import rail_snapshots, load_trending
+from app.services.search import SearchService, PRODUCT, CATEGORY, VENDOR
+from app.services.search_log import search_logger
+from app.services.search_cache import (
+    cached_search, search_cache_key, SEARCH_GLOBAL, SEARCH_PRODUCTS
+)
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Categories and vendors returned by global search
+GLOBAL_SEARCH_GROUP_LIMIT = 5
+
 
 class SearchResult(BaseModel):
     type: str  # product, category, vendor
@@ -57,65 +66,83 @@ async def global_search(
     request: Request = None,
     db: AsyncSession = Depends(get_db)
 ):
-    """Global search across products, categories, and vendors using FTS5"""
+    """Global search across products, categories, and vendors using full-text search"""
     start_time = time.time()
     q = sanitize_search_query(q) or q
 
-    # Initialize search service
+    response = await cached_search(
+        SEARCH_GLOBAL,
+        search_cache_key(q, db.get_bind().dialect.name, limit=limit),
+        lambda: _global_search(db, q, limit),
+    )
+
+    # Log search query (written in the background)
+    search_logger.record(
+        query=q,
+        results_count=response.total_results,
+        search_time_ms=int((time.time() - start_time) * 1000),
+        ip_address=request.client.host if request else None,
+        user_agent=request.headers.get("user-agent") if request else None,
+    )
+
+    # Entries are shared by queries that normalize alike; echo this one
+    return response.model_copy(update={"query": q})
+
+
+async def _global_search(db: AsyncSession, q: str, limit: int) -> SearchResponse:
+    """Products, categories and vendors matching q"""
     search_service = SearchService(db)
 
-    # Search products using FTS5
-    try:
-        products_data, total_products = await search_service.search_products(q, limit=limit)
-
-        # Get full product objects for images
-        if products_data:
-            product_ids = [p["id"] for p in products_data]
-            product_result = await db.execute(
-                select(Product)
-                .where(Product.id.in_(product_ids))
-                .options(selectinload(Product.images))
+    # One ranked query over the search_entities index
+    if await search_service.full_text_backend():
+        try:
+            hits = await search_service.search_entities(
+                q, {PRODUCT: limit, CATEGORY: GLOBAL_SEARCH_GROUP_LIMIT, VENDOR: GLOBAL_SEARCH_GROUP_LIMIT}
             )
-            products_map = {str(p.id): p for p in product_result.scalars().all()}
-
-            # Enrich product data with images
-            for p_data in products_data:
-                product = products_map.get(p_data["id"])
-                if product and product.images:
-                    p_data["image"] = product.images[0].url
-    except Exception as e:
-        logger.error(f"FTS5 product search failed: {e}")
-        # Fallback to simple search
-        search_term = f"%{q}%"
-        product_result = await db.execute(
-            select(Product)
-            .where(
-                Product.status == ProductStatus.ACTIVE,
-                or_(
-                    Product.name.ilike(search_term),
-                    Product.description.ilike(search_term),
-                )
+            return _search_response(
+                q,
+                products=[
+                    {
+                        "id": str(h.entity_id),
+                        "name": h.name,
+                        "slug": h.slug,
+                        "price": float(h.price),
+                        "image": h.image,
+                        "rating": h.rating,
+                        "review_count": h.review_count
+                    }
+                    for h in hits[PRODUCT]
+                ],
+                categories=[
+                    {"id": str(h.entity_id), "name": h.name, "slug": h.slug, "image": h.image}
+                    for h in hits[CATEGORY]
+                ],
+                vendors=[
+                    {"id": str(h.entity_id), "name": h.name, "slug": h.slug, "logo": h.image, "rating": h.rating}
+                    for h in hits[VENDOR]
+                ],
+            )
+        except Exception as e:
+            logger.error(f"Full-text global search failed: {e}")
+            await db.rollback()
+
+    # Fallback to simple search
+    search_term = f"%{q}%"
+    product_result = await db.execute(
+        card_query()
+        .where(
+            Product.status == ProductStatus.ACTIVE,
+            or_(
+                Product.name.ilike(search_term),
+                Product.description.ilike(search_term),
             )
-            .options(selectinload(Product.images))
-            .order_by(Product.rating.desc())
-            .limit(limit)
         )
-        products = product_result.scalars().all()
-        products_data = [
-            {
-                "id": str(p.id),
-                "name": p.name,
-                "slug": p.slug,
-                "price": float(p.price),
-                "image": p.images[0].url if p.images else None,
-                "rating": p.rating,
-                "review_count": p.review_count
-            }
-            for p in products
-        ]
+        .order_by(Product.rating.desc())
+        .limit(limit)
+    )
+    products = product_result.all()
 
     # Search categories
-    search_term = f"%{q}%"
     category_result = await db.execute(
         select(Category)
         .where(
@@ -125,7 +152,7 @@ async def global_search(
                 Category.description.ilike(search_term)
             )
         )
-        .limit(5)
+        .limit(GLOBAL_SEARCH_GROUP_LIMIT)
     )
     categories = category_result.scalars().all()
 
@@ -139,38 +166,23 @@ async def global_search(
                 Vendor.description.ilike(search_term)
             )
         )
-        .limit(5)
+        .limit(GLOBAL_SEARCH_GROUP_LIMIT)
     )
     vendors = vendor_result.scalars().all()
 
-    # Log search query
-    search_time_ms = int((time.time() - start_time) * 1000)
-    search_log = SearchQuery(
-        query=q,
-        results_count=len(products_data) + len(categories) + len(vendors),
-        search_time_ms=search_time_ms,
-        ip_address=request.client.host if request else None,
-        user_agent=request.headers.get("user-agent") if request else None,
-    )
-    db.add(search_log)
-    try:
-        await db.commit()
-    except Exception as e:
-        logger.error(f"Failed to log search query: {e}")
-        await db.rollback()
-
-    return SearchResponse(
+    return _search_response(
+        q,
         products=[
             {
-                "id": p.get("id"),
-                "name": p.get("name"),
-                "slug": p.get("slug"),
-                "price": p.get("price"),
-                "image": p.get("image"),
-                "rating": p.get("rating"),
-                "review_count": p.get("review_count")
+                "id": str(p.id),
+                "name": p.name,
+                "slug": p.slug,
+                "price": float(p.price),
+                "image": p.primary_image,
+                "rating": p.rating,
+                "review_count": p.review_count
             }
-            for p in products_data
+            for p in products
         ],
         categories=[
             {
@@ -191,7 +203,15 @@ async def global_search(
             }
             for v in vendors
         ],
-        total_results=len(products_data) + len(categories) + len(vendors),
+    )
+
+
+def _search_response(q: str, products: List[dict], categories: List[dict], vendors: List[dict]) -> SearchResponse:
+    return SearchResponse(
+        products=products,
+        categories=categories,
+        vendors=vendors,
+        total_results=len(products) + len(categories) + len(vendors),
         query=q
     )
 
@@ -209,112 +229,33 @@ async def search_products(
     sort: str = "relevance",
     page: int = 1,
     page_size: int = 20,
+    exact_total: bool = False,  # Also count pages past the last result (costs a second FTS pass)
     request: Request = None,
     db: AsyncSession = Depends(get_db)
 ):
-    """Advanced product search with filters and FTS5 support"""
+    """Advanced product search with filters and full-text search support"""
     start_time = time.time()
 
-    # Use FTS5 for text search if available
-    if q and sort == "relevance":
-        search_service = SearchService(db)
-        try:
-            # Get FTS5 results
-            offset = (page - 1) * page_size
-            fts_results, fts_total = await search_service.search_products_fts5(
-                q, limit=page_size * 3, offset=0  # Get more results for filtering
-            )
-
-            # Apply filters to FTS5 results
-            filtered_ids = []
-            for result in fts_results:
-                # We need to get full product to apply filters
-                prod_result = await db.execute(
-                    select(Product)
-                    .where(Product.id == result["id"])
-                    .options(
-                        selectinload(Product.vendor),
-                        selectinload(Product.category)
-                    )
-                )
-                prod = prod_result.scalar_one_or_none()
-                if not prod:
-                    continue
-
-                # Apply filters
-                if category:
-                    cat_result = await db.execute(
-                        select(Category).where(Category.slug == category)
-                    )
-                    cat = cat_result.scalar_one_or_none()
-                    if cat and prod.category_id != cat.id:
-                        continue
-
-                if vendor:
-                    vendor_result = await db.execute(
-                        select(Vendor).where(Vendor.slug == vendor)
-                    )
-                    v = vendor_result.scalar_one_or_none()
-                    if v and prod.vendor_id != v.id:
-                        continue
-
-                if min_price is not None and prod.price < min_price:
-                    continue
-                if max_price is not None and prod.price > max_price:
-                    continue
-                if rating is not None and prod.rating < rating:
-                    continue
-                if in_stock and prod.quantity <= 0:
-                    continue
-                if on_sale and not (prod.compare_at_price and prod.compare_at_price > prod.price):
-                    continue
-
-                filtered_ids.append(str(prod.id))
-
-            # Get paginated subset
-            paginated_ids = filtered_ids[offset:offset + page_size]
-
-            # Fetch full products
-            if paginated_ids:
-                product_result = await db.execute(
-                    select(Product)
-                    .where(Product.id.in_(paginated_ids))
-                    .options(
-                        selectinload(Product.images),
-                        selectinload(Product.vendor),
-                        selectinload(Product.category)
-                    )
-                )
-                products = product_result.scalars().all()
-                # Sort by FTS5 rank order
-                products = sorted(products, key=lambda p: paginated_ids.index(str(p.id)))
-            else:
-                products = []
-
-            total = len(filtered_ids)
-
-        except Exception as e:
-            logger.warning(f"FTS5 search failed, falling back to LIKE: {e}")
-            # Fall back to standard search
-            products, total = await _standard_product_search(
-                db, q, category, vendor, min_price, max_price,
-                rating, in_stock, on_sale, sort, page, page_size
-            )
-
-    else:
-        # Standard search with filters
-        products, total = await _standard_product_search(
-            db, q, category, vendor, min_price, max_price,
-            rating, in_stock, on_sale, sort, page, page_size
-        )
+    key = search_cache_key(
+        q, db.get_bind().dialect.name, category=category, vendor=vendor, min_price=min_price, max_price=max_price,
+        rating=rating, in_stock=in_stock, on_sale=on_sale, sort=sort,
+        page=page, page_size=page_size, exact_total=exact_total,
+    )
+    response = await cached_search(
+        SEARCH_PRODUCTS,
+        key,
+        lambda: _product_search(
+            db, q, category, vendor, min_price, max_price, rating, in_stock, on_sale,
+            sort, page, page_size, exact_total
+        ),
+    )
 
-    # Log search query
+    # Log search query (written in the background)
     if q:
-        search_time_ms = int((time.time() - start_time) * 1000)
-        search_log = SearchQuery(
+        search_logger.record(
             query=q,
-            results_count=total,
-            search_time_ms=search_time_ms,
+            results_count=response.total,
+            search_time_ms=int((time.time() - start_time) * 1000),
             filters_applied=str({
                 "category": category,
                 "vendor": vendor,
@@ -327,12 +268,51 @@ async def search_products(
             ip_address=request.client.host if request else None,
             user_agent=request.headers.get("user-agent") if request else None,
         )
-        db.add(search_log)
+
+    return response
+
+
+async def _product_search(
+    db: AsyncSession,
+    q: Optional[str],
+    category: Optional[str],
+    vendor: Optional[str],
+    min_price: Optional[Decimal],
+    max_price: Optional[Decimal],
+    rating: Optional[float],
+    in_stock: Optional[bool],
+    on_sale: Optional[bool],
+    sort: str,
+    page: int,
+    page_size: int,
+    exact_total: bool
+) -> ProductSearchResponse:
+    """One page of filtered product search results"""
+    offset = (page - 1) * page_size
+    conditions = await _search_conditions(
+        db, category, vendor, min_price, max_price, rating, in_stock, on_sale
+    )
+
+    # Use full-text search if available; filters and paging run in the same query
+    search_service = SearchService(db)
+    if q and sort == "relevance" and await search_service.full_text_backend():
         try:
-            await db.commit()
+            products, total = await search_service.search_product_cards(
+                q, conditions, limit=page_size, offset=offset, exact_total=exact_total
+            )
         except Exception as e:
-            logger.error(f"Failed to log search query: {e}")
+            logger.warning(f"Full-text search failed, falling back to LIKE: {e}")
             await db.rollback()
+            # Fall back to standard search
+            products, total = await _standard_product_search(
+                db, q, conditions, sort, offset, page_size
+            )
+
+    else:
+        # Standard search with filters
+        products, total = await _standard_product_search(
+            db, q, conditions, sort, offset, page_size
+        )
 
     # Get filter options
     filters = {
@@ -350,12 +330,12 @@ async def search_products(
                 "price": float(p.price),
                 "compare_at_price": float(p.compare_at_price) if p.compare_at_price else None,
                 "currency": p.currency,
-                "image": p.images[0].url if p.images else None,
+                "image": p.primary_image,
                 "rating": p.rating,
                 "review_count": p.review_count,
                 "in_stock": p.quantity > 0,
-                "vendor_name": p.vendor.business_name if p.vendor else None,
-                "category_name": p.category.name if p.category else None
+                "vendor_name": p.vendor_name,
+                "category_name": p.category_name
             }
             for p in products
         ],
@@ -367,9 +347,8 @@ async def search_products(
     )
 
 
-async def _standard_product_search(
+async def _search_conditions(
     db: AsyncSession,
-    q: Optional[str],
     category: Optional[str],
     vendor: Optional[str],
     min_price: Optional[Decimal],
@@ -377,64 +356,75 @@ async def _standard_product_search(
     rating: Optional[float],
     in_stock: Optional[bool],
     on_sale: Optional[bool],
-    sort: str,
-    page: int,
-    page_size: int
-) -> tuple:
-    """Standard product search using LIKE queries"""
-    query = select(Product).where(Product.status == ProductStatus.ACTIVE)
+) -> list:
+    """
+    WHERE clauses on Product for the search filters.
 
-    # Text search
-    if q:
-        search_term = f"%{q}%"
-        query = query.where(
-            or_(
-                Product.name.ilike(search_term),
-                Product.description.ilike(search_term),
-                Product.short_description.ilike(search_term)
-            )
-        )
+    Category and vendor slugs are resolved here, once per request; an unknown
+    slug leaves that filter out.
+    """
+    conditions = []
 
-    # Category filter
+    # Category filter, including subcategories
     if category:
         cat_result = await db.execute(
-            select(Category).where(Category.slug == category)
+            select(Category.id).where(Category.slug == category)
         )
-        cat = cat_result.scalar_one_or_none()
-        if cat:
-            query = query.where(
-                or_(
-                    Product.category_id == cat.id,
-                    Product.category.has(Category.parent_id == cat.id)
-                )
-            )
+        category_id = cat_result.scalar_one_or_none()
+        if category_id:
+            conditions.append(Product.category_id.in_(descendant_ids_query(category_id)))
 
     # Vendor filter
     if vendor:
         vendor_result = await db.execute(
-            select(Vendor).where(Vendor.slug == vendor)
+            select(Vendor.id).where(Vendor.slug == vendor)
         )
-        v = vendor_result.scalar_one_or_none()
-        if v:
-            query = query.where(Product.vendor_id == v.id)
+        vendor_id = vendor_result.scalar_one_or_none()
+        if vendor_id:
+            conditions.append(Product.vendor_id == vendor_id)
 
     # Price filter
     if min_price is not None:
-        query = query.where(Product.price >= min_price)
+        conditions.append(Product.price >= min_price)
     if max_price is not None:
-        query = query.where(Product.price <= max_price)
+        conditions.append(Product.price <= max_price)
 
     # Rating filter
     if rating is not None:
-        query = query.where(Product.rating >= rating)
+        conditions.append(Product.rating >= rating)
 
     # Stock filter
     if in_stock:
-        query = query.where(Product.quantity > 0)
+        conditions.append(Product.quantity > 0)
 
     # On sale filter
     if on_sale:
-        query = query.where(Product.compare_at_price > Product.price)
+        conditions.append(Product.compare_at_price > Product.price)
+
+    return conditions
+
+
+async def _standard_product_search(
+    db: AsyncSession,
+    q: Optional[str],
+    conditions: list,
+    sort: str,
+    offset: int,
+    page_size: int
+) -> tuple:
+    """Standard product search using LIKE queries"""
+    query = card_query().where(Product.status == ProductStatus.ACTIVE, *conditions)
+
+    # Text search
+    if q:
+        search_term = f"%{q}%"
+        query = query.where(
+            or_(
+                Product.name.ilike(search_term),
+                Product.description.ilike(search_term),
+                Product.short_description.ilike(search_term)
+            )
+        )
 
     # Count total
     count_query = select(func.count()).select_from(query.subquery())
@@ -456,15 +446,10 @@ async def _standard_product_search(
         query = query.order_by(Product.rating.desc(), Product.sales_count.desc())
 
     # Pagination
-    offset = (page - 1) * page_size
-    query = query.options(
-        selectinload(Product.images),
-        selectinload(Product.vendor),
-        selectinload(Product.category)
-    ).offset(offset).limit(page_size)
+    query = query.offset(offset).limit(page_size)
 
     result = await db.execute(query)
-    products = result.scalars().all()
+    products = result.all()
 
     return products, total
 
@@ -475,28 +460,16 @@ async def autocomplete(
     limit: int = 8,
     db: AsyncSession = Depends(get_db)
 ):
-    """Autocomplete suggestions using FTS5"""
-    search_service = SearchService(db)
-
-    # Get suggestions from FTS5 or fallback
-    suggestions = await search_service.get_suggestions(q, limit=limit)
-
-    # Get category suggestions
-    search_term = f"{q}%"
-    category_result = await db.execute(
-        select(Category.name)
-        .where(
-            Category.is_active == True,
-            Category.name.ilike(search_term)
-        )
-        .limit(3)
-    )
-    categories = [row[0] for row in category_result.all()]
+    """Autocomplete suggestions from the in-memory prefix index"""
+    # Reads the database only to build the index or catch up on writes
+    await completion_index.ensure_current(db)
+    suggestions = completion_index.complete(q, limit)
+    categories = completion_index.complete_categories(q, 3)
 
     # Get "Did you mean?" suggestion
     did_you_mean = None
     if len(suggestions) == 0:
-        did_you_mean = await search_service.get_did_you_mean(q)
+        did_you_mean = await SearchService(db).get_did_you_mean(q)
 
     return {
         "suggestions": suggestions,
@@ -511,24 +484,10 @@ async def trending_searches(
     db: AsyncSession = Depends(get_db)
 ):
     """Get trending search terms based on actual search analytics"""
-    search_service = SearchService(db)
-
-    # Get popular searches from analytics
-    popular = await search_service.get_popular_searches(limit=limit)
-
-    # Also get some popular product categories
-    result = await db.execute(
-        select(Category.name)
-        .where(Category.is_active == True, Category.is_featured == True)
-        .limit(5)
-    )
-    categories = [row[0] for row in result.all()]
-
-    return {
-        "trending": [item["query"] for item in popular],
-        "popular_searches": popular,
-        "popular_categories": categories
-    }
+    trending = await rail_snapshots.trending(db, limit)
+    if trending is None:
+        trending = await load_trending(db, limit)
+    return trending
 
 
 @router.get("/analytics/popular")
@@ -9,6 +9,7 @@ from slugify import slugify
 from pydantic import BaseModel, Field
 
 from app.core.database import get_db
+from app.core.pagination import keyset_paginate, next_cursor
 from app.core.security import get_current_user, get_current_vendor, get_approved_vendor, get_current_admin
 from app.models.user import User, UserRole
 from app.models.vendor import Vendor, VendorStatus, VendorPayout, PayoutStatus
@@ -19,6 +20,9 @@ from app.schemas.vendor import (
     VendorDashboardStats, VendorPayoutRequest, VendorPayoutResponse
 )
 from app.schemas.common import MessageResponse, PaginatedResponse
+from app.services.facets import FacetService
+from app.services.product_cards import card_query
+from app.services.product_events import products_changed
 
 router = APIRouter()
 
@@ -899,12 +903,13 @@ async def get_vendor_products(
     status: str = Query(default=None),
     category: str = Query(default=None),
     ordering: str = Query(default="-created_at"),
+    cursor: Optional[str] = Query(default=None),
+    include_total: bool = Query(default=True),
     current_user: User = Depends(get_current_vendor),
     db: AsyncSession = Depends(get_db)
 ):
     """Get vendor's products with pagination and filters"""
     from app.models.category import Category
-    from app.models.product import ProductImage
 
     result = await db.execute(select(Vendor).where(Vendor.user_id == current_user.id))
     vendor = result.scalar_one_or_none()
@@ -912,7 +917,11 @@ async def get_vendor_products(
     if not vendor:
         raise HTTPException(status_code=404, detail="Vendor not found")
 
-    query = select(Product).where(Product.vendor_id == vendor.id)
+    ordering = ordering or "-created_at"
+    desc_order = ordering.startswith("-")
+    order_column = getattr(Product, ordering.lstrip("-"), Product.created_at)
+
+    query = card_query(Product.sku, Product.category_id, order_column).where(Product.vendor_id == vendor.id)
 
     # Apply filters
     if search:
@@ -920,25 +929,24 @@ async def get_vendor_products(
     if status:
         query = query.where(Product.status == status)
     if category:
-        query = query.join(Category).where(Category.slug == category)
-
-    # Apply ordering
-    if ordering:
-        desc_order = ordering.startswith("-")
-        order_field = ordering.lstrip("-")
-        order_column = getattr(Product, order_field, Product.created_at)
-        query = query.order_by(order_column.desc() if desc_order else order_column.asc())
+        query = query.where(
+            Product.category_id == select(Category.id).where(Category.slug == category).scalar_subquery()
+        )
 
-    # Count total
-    count_result = await db.execute(select(func.count()).select_from(query.subquery()))
-    total = count_result.scalar()
+    # Count total (optional, cursor clients can skip it)
+    total = None
+    if include_total:
+        count_result = await db.execute(select(func.count()).select_from(query.subquery()))
+        total = count_result.scalar()
 
-    # Paginate
-    offset = (page - 1) * limit
-    query = query.offset(offset).limit(limit).options(selectinload(Product.images), selectinload(Product.category))
+    # Apply ordering and paginate
+    query = keyset_paginate(
+        query, order_column, Product.id,
+        limit=limit, descending=desc_order, cursor=cursor, offset=(page - 1) * limit
+    )
 
     result = await db.execute(query)
-    products = result.scalars().all()
+    products = result.all()
 
     return {
         "items": [
@@ -951,8 +959,10 @@ async def get_vendor_products(
                 "status": p.status.value if hasattr(p.status, 'value') else p.status,
                 "stock": p.quantity,
                 "sku": p.sku,
-                "category": {"id": str(p.category.id), "name": p.category.name} if p.category else None,
-                "images": [{"id": str(img.id), "url": img.url, "is_primary": img.is_primary} for img in p.images] if p.images else [],
+                "category": {"id": str(p.category_id), "name": p.category_name} if p.category_id else None,
+                # Cards carry the primary image only; the detail endpoint has the gallery
+                "primary_image": p.primary_image,
+                "images": [{"url": p.primary_image, "is_primary": True}] if p.primary_image else [],
                 "created_at": p.created_at.isoformat(),
             }
             for p in products
@@ -960,7 +970,8 @@ async def get_vendor_products(
         "total": total,
         "page": page,
         "limit": limit,
-        "pages": (total + limit - 1) // limit if total else 0
+        "pages": ((total + limit - 1) // limit if total else 0) if total is not None else None,
+        "next_cursor": next_cursor(products, limit, order_column, Product.id, descending=desc_order),
     }
 
 
@@ -1045,7 +1056,9 @@ async def create_vendor_product(
             )
             db.add(variant)
 
+    await FacetService(db).sync_products([product.id])
     await db.commit()
+    products_changed([product.id])
     await db.refresh(product)
 
     return {"id": str(product.id), "slug": product.slug, "message": "Product created successfully"}
@@ -1204,7 +1217,9 @@ async def update_vendor_product(
             db.add(variant)
 
     product.updated_at = datetime.utcnow()
+    await FacetService(db).sync_products([product.id])
     await db.commit()
+    products_changed([product.id])
 
     return {"message": "Product updated successfully"}
 
@@ -1231,7 +1246,9 @@ async def delete_vendor_product(
         raise HTTPException(status_code=404, detail="Product not found")
 
     await db.delete(product)
+    await FacetService(db).sync_products([product.id])
     await db.commit()
+    products_changed([product.id])
 
     return {"message": "Product deleted successfully"}
 
@@ -0,0 +1,224 @@
+"""
+In-process caches
+
+VersionedCache keeps computed values (usually pre-serialized JSON) in the
+worker's memory. Writers call invalidate(), which clears the local entries
+and bumps a shared version row in cache_versions; other workers poll that row
+at most every CACHE_VERSION_CHECK_SECONDS and drop their entries when it has
+moved. Entries also expire after a TTL as an upper bound on staleness for
+data the writers do not invalidate explicitly.
+
+LRUCache is a bounded least-recently-used cache with a TTL for hot
+per-object responses. Entries carry a tag (e.g. a product ID) so a write can
+drop every key derived from the same object.
+"""
+
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Set, Tuple
+import logging
+import time
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.cache_version import CacheVersion
+
+logger = logging.getLogger(__name__)
+
+
+class VersionedCache:
+    """Key/value cache for one worker, invalidated through a shared version"""
+
+    def __init__(self, name: str, ttl_seconds: float, check_interval_seconds: float):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.check_interval_seconds = check_interval_seconds
+
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+        # Bumped on every local clear; a value built before a clear is not stored
+        self._generation = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self) -> None:
+        """Drop this worker's entries"""
+        self._entries.clear()
+        self._generation += 1
+
+    async def _sync_version(self, db: AsyncSession) -> None:
+        """Drop local entries if another worker bumped the shared version"""
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < self.check_interval_seconds:
+            return
+
+        result = await db.execute(select(CacheVersion.version).where(CacheVersion.name == self.name))
+        version = result.scalar() or 0
+        if version != self._version:
+            self.clear()
+            self._version = version
+        self._checked_at = now
+
+    async def get_or_build(self, db: AsyncSession, key: str, build: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value for key, building and storing it on a miss.
+
+        Args:
+            db: Session used to check the shared version
+            key: Cache key
+            build: Coroutine function computing the value; None is not cached
+
+        Returns:
+            The cached or freshly built value
+        """
+        await self._sync_version(db)
+
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        generation = self._generation
+        value = await build()
+        if value is not None and generation == self._generation:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        return value
+
+    async def invalidate(self, db: AsyncSession) -> None:
+        """
+        Clear this worker's entries and bump the shared version for the others.
+
+        Call after the write has been committed. Commits the version bump.
+        """
+        self.clear()
+        self._version = None
+        try:
+            result = await db.execute(
+                update(CacheVersion)
+                .where(CacheVersion.name == self.name)
+                .values(version=CacheVersion.version + 1)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 0:
+                db.add(CacheVersion(name=self.name, version=1))
+            await db.commit()
+        except IntegrityError:
+            # Another worker created the row first; its bump is just as good
+            await db.rollback()
+        except Exception as e:
+            logger.error(f"Failed to bump cache version for {self.name}: {e}")
+            await db.rollback()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and size of this worker's cache"""
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "version": self._version,
+        }
+
+
+class LRUCache:
+    """Bounded LRU cache with per-entry TTL and tag-based invalidation"""
+
+    def __init__(self, name: str, max_entries: int, ttl_seconds: float):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (expires_at, tag, value), least recently used first
+        self._entries: "OrderedDict[str, Tuple[float, Hashable, Any]]" = OrderedDict()
+        self._keys_by_tag: Dict[Hashable, Set[str]] = {}
+        # Bumped on every invalidation; a value read before one is not stored
+        self._generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def generation(self) -> int:
+        """Token to pass to set() so values read before an invalidation are dropped"""
+        return self._generation
+
+    def get(self, key: str) -> Any:
+        """Return the value for key, or None on a miss or expired entry"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, tag, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, tag: Hashable = None, generation: Optional[int] = None) -> None:
+        """
+        Store a value, evicting the least recently used entries beyond max_entries.
+
+        Args:
+            key: Cache key
+            value: Value to store
+            tag: Object the value was derived from, for invalidate()
+            generation: generation read before the value was loaded; if an
+                invalidation happened since, the value is not stored
+        """
+        if generation is not None and generation != self._generation:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, tag, value)
+        if tag is not None:
+            self._keys_by_tag.setdefault(tag, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        _, tag, _ = self._entries.pop(key)
+        keys = self._keys_by_tag.get(tag)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_tag[tag]
+
+    def invalidate(self, tags: Iterable[Hashable]) -> None:
+        """Drop every entry stored under any of the given tags"""
+        self._generation += 1
+        for tag in tags:
+            for key in list(self._keys_by_tag.get(tag, ())):
+                self._remove(key)
+
+    def clear(self) -> None:
+        """Drop all entries"""
+        self._entries.clear()
+        self._keys_by_tag.clear()
+        self._generation += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and size of this worker's cache"""
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
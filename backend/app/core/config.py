@@ -93,6 +93,75 @@ class Settings(BaseSettings):
     PLATFORM_COMMISSION_PERCENT: float = 10.0
     MIN_PAYOUT_AMOUNT: float = 50.0
 
+    # In-process caches
+    CATEGORY_CACHE_TTL_SECONDS: int = 300  # Upper bound on stale product counts
+    CACHE_VERSION_CHECK_SECONDS: float = 2.0  # How often workers poll for invalidations
+    PRODUCT_CACHE_MAX_ENTRIES: int = 2000
+    PRODUCT_CACHE_TTL_SECONDS: int = 60  # Bounds staleness on other workers
+    SEARCH_CACHE_MAX_ENTRIES: int = 5000  # Per search endpoint
+    SEARCH_CACHE_TTL_SECONDS: int = 30
+
+    # Product view counts (buffered in memory, written in batches)
+    VIEW_COUNT_FLUSH_SECONDS: float = 10.0
+    VIEW_COUNT_FLUSH_THRESHOLD: int = 500  # Flush early once this many views are pending
+
+    # Search query log (queued in memory, bulk-inserted in the background)
+    SEARCH_LOG_FLUSH_SECONDS: float = 0.5
+    SEARCH_LOG_BATCH_SIZE: int = 200  # Flush early once this many entries are queued
+    SEARCH_LOG_MAX_PENDING: int = 10000  # Oldest entries are dropped beyond this
+
+    # FTS5 index maintenance (SQLite)
+    FTS5_AUTOMERGE: int = 8  # Segments per level before an incremental merge
+    FTS5_CRISISMERGE: int = 16  # Segments per level that force a merge in the write
+    FTS5_MERGE_INTERVAL_SECONDS: float = 60.0
+    FTS5_MERGE_PAGES: int = 500  # Work per merge step
+    FTS5_MERGE_MAX_STEPS: int = 20  # Merge steps per interval
+    FTS5_OPTIMIZE_HOUR_UTC: int = 4  # Full optimize once a day, in this low-traffic hour
+
+    # Search analytics rollups (hourly/daily counts aggregated from the log)
+    SEARCH_ROLLUP_INTERVAL_SECONDS: float = 60.0
+    SEARCH_ROLLUP_SETTLE_SECONDS: float = 300.0  # Re-aggregate hours this recent for late writes
+    SEARCH_LOG_RETENTION_DAYS: int = 7  # Raw search_queries rows
+    SEARCH_ROLLUP_HOURLY_RETENTION_DAYS: int = 2
+    SEARCH_ROLLUP_DAILY_RETENTION_DAYS: int = 90
+
+    # Checkout stock holds (counted in products.reserved_quantity until they expire)
+    STOCK_HOLD_TTL_SECONDS: int = 900
+    STOCK_HOLD_REAP_INTERVAL_SECONDS: float = 30.0
+
+    # Idempotency-Key replays (orders and payments)
+    IDEMPOTENCY_TTL_SECONDS: int = 86400  # How long a stored response is replayed
+    IDEMPOTENCY_LOCK_SECONDS: float = 60.0  # An in-progress claim older than this is abandoned
+    IDEMPOTENCY_WAIT_SECONDS: float = 30.0  # How long a duplicate waits for the first request
+    IDEMPOTENCY_PURGE_INTERVAL_SECONDS: float = 300.0
+
+    # Transactional outbox (order side effects, consumed by outbox_worker.py)
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 1.0
+    OUTBOX_LEASE_SECONDS: float = 300.0  # A taken event is retried if not finished by then
+    OUTBOX_MAX_ATTEMPTS: int = 8  # Then the event is marked dead
+    OUTBOX_BACKOFF_BASE_SECONDS: float = 5.0  # Doubles per attempt
+    OUTBOX_BACKOFF_MAX_SECONDS: float = 3600.0
+    OUTBOX_RETENTION_DAYS: int = 7  # Processed events
+    OUTBOX_RUN_IN_API: bool = False  # Dev only: consume the outbox in the API instead of outbox_worker.py
+
+    # Homepage rail snapshots
+    RAIL_SIZE: int = 48  # Items kept per rail; larger limits query directly
+    RAIL_REFRESH_SECONDS: float = 60.0
+    RAIL_MAX_STALENESS_SECONDS: float = 300.0  # Older snapshots are rebuilt inline
+    RAIL_WRITE_DEBOUNCE_SECONDS: float = 1.0
+
+    # "Did you mean" spelling index
+    SPELLING_MAX_EDIT_DISTANCE: int = 2
+    SPELLING_UPDATE_DEBOUNCE_SECONDS: float = 1.0
+    SPELLING_REBUILD_SECONDS: float = 3600.0  # Full rebuild picks up other workers' writes
+
+    # Autocomplete prefix index
+    AUTOCOMPLETE_REBUILD_SECONDS: float = 300.0  # Also refreshes popular search terms
+    AUTOCOMPLETE_UPDATE_DEBOUNCE_SECONDS: float = 1.0
+    AUTOCOMPLETE_QUERY_WINDOW_DAYS: int = 30
+    AUTOCOMPLETE_MIN_QUERY_COUNT: int = 3  # Searches needed before a term is suggested
+
     # Sentry
     SENTRY_DSN: Optional[str] = None
 
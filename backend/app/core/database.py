@@ -57,11 +57,12 @@ async def init_db():
     """Initialize database tables"""
     # Import all models to ensure they are registered with Base.metadata
     from app.models import (
-        User, Vendor, VendorPayout, Category, Product, ProductImage,
+        User, Vendor, VendorPayout, Category, CategoryClosure, Product, ProductImage,
         ProductVariant, ProductAttribute, Cart, CartItem, Order, OrderItem,
         OrderStatusHistory, Review, Wishlist, Address, Payment, PaymentMethod,
         Notification, Conversation, Message, SupportChat, SupportChatMessage,
-        SearchQuery
+        SearchQuery, SearchQueryRollup, CategoryFacetCount, ProductFacetSnapshot, CacheVersion,
+        StockReservation, IdempotencyKey, OutboxEvent
     )
     from app.models.contact import ContactSubmission, NewsletterSubscriber
 
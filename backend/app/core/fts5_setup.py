@@ -7,12 +7,21 @@ FTS5 provides advanced search capabilities including:
 - Phrase queries
 - Prefix matching
 - Token matching
+
+product_fts backs product search. search_entities is the index behind global
+search: one row per active product, active category and approved vendor,
+with an entity_type column, so a single ranked query returns the top hits
+of every type.
 """
 
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 
+from app.core.config import settings
+from app.models.product import ProductStatus
+from app.models.vendor import VendorStatus
+
 logger = logging.getLogger(__name__)
 
 
@@ -28,11 +37,37 @@ CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5(
 );
 """
 
+# Global search index over products, categories and vendors. bm25() weights
+# title over body; entity_type is 'product', 'category' or 'vendor'.
+CREATE_SEARCH_ENTITIES_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS search_entities USING fts5(
+    title,
+    body,
+    entity_type UNINDEXED,
+    entity_id UNINDEXED,
+    tokenize='porter unicode61'
+);
+"""
+
+# Every FTS5 table kept by this module; merging and optimizing apply to all
+FTS5_TABLES = ("product_fts", "search_entities")
+
+# Marker in the trigger SQL; databases whose triggers lack it get them
+# reinstalled (and the indexes repopulated) at startup
+FTS5_TRIGGER_VERSION = "-- fts5 triggers v3"
+
+# Only active products are indexed, matching populate_fts5_table(); enum
+# columns store the member name
+_ACTIVE = f"'{ProductStatus.ACTIVE.name}'"
+_APPROVED = f"'{VendorStatus.APPROVED.name}'"
+
 # Trigger to sync FTS5 when product is inserted
-CREATE_INSERT_TRIGGER = """
+CREATE_INSERT_TRIGGER = f"""
 CREATE TRIGGER IF NOT EXISTS product_fts_insert
 AFTER INSERT ON products
+WHEN NEW.status = {_ACTIVE}
 BEGIN
+    {FTS5_TRIGGER_VERSION}
     INSERT INTO product_fts(product_id, name, description, tags, category_name)
     SELECT
         NEW.id,
@@ -44,35 +79,42 @@ BEGIN
 END;
 """
 
-# Trigger to sync FTS5 when product is updated
-CREATE_UPDATE_TRIGGER = """
+# Trigger to sync FTS5 when an indexed column or the status changes; counter
+# updates (views, sales, rating) leave the index alone. The row is removed
+# and re-added only if the product is still active.
+CREATE_UPDATE_TRIGGER = f"""
 CREATE TRIGGER IF NOT EXISTS product_fts_update
-AFTER UPDATE ON products
+AFTER UPDATE OF name, description, short_description, tags, category_id, status ON products
 BEGIN
-    UPDATE product_fts
-    SET
-        name = NEW.name,
-        description = COALESCE(NEW.description, '') || ' ' || COALESCE(NEW.short_description, ''),
-        tags = COALESCE(NEW.tags, ''),
-        category_name = COALESCE((SELECT name FROM categories WHERE id = NEW.category_id), '')
-    WHERE product_id = NEW.id;
+    {FTS5_TRIGGER_VERSION}
+    DELETE FROM product_fts WHERE product_id = OLD.id;
+    INSERT INTO product_fts(product_id, name, description, tags, category_name)
+    SELECT
+        NEW.id,
+        NEW.name,
+        COALESCE(NEW.description, '') || ' ' || COALESCE(NEW.short_description, ''),
+        COALESCE(NEW.tags, ''),
+        COALESCE((SELECT name FROM categories WHERE id = NEW.category_id), '')
+    WHERE NEW.status = {_ACTIVE};
 END;
 """
 
 # Trigger to sync FTS5 when product is deleted
-CREATE_DELETE_TRIGGER = """
+CREATE_DELETE_TRIGGER = f"""
 CREATE TRIGGER IF NOT EXISTS product_fts_delete
 AFTER DELETE ON products
 BEGIN
+    {FTS5_TRIGGER_VERSION}
     DELETE FROM product_fts WHERE product_id = OLD.id;
 END;
 """
 
 # Trigger to update FTS5 when category name changes
-CREATE_CATEGORY_UPDATE_TRIGGER = """
+CREATE_CATEGORY_UPDATE_TRIGGER = f"""
 CREATE TRIGGER IF NOT EXISTS product_fts_category_update
 AFTER UPDATE OF name ON categories
 BEGIN
+    {FTS5_TRIGGER_VERSION}
     UPDATE product_fts
     SET category_name = NEW.name
     WHERE product_id IN (
@@ -81,10 +123,127 @@ BEGIN
 END;
 """
 
+# search_entities title and body of each entity type, over a row named {row}
+_PRODUCT_ENTITY = (
+    "{row}.name",
+    "COALESCE({row}.description, '') || ' ' || COALESCE({row}.short_description, '')"
+    " || ' ' || COALESCE({row}.tags, '')",
+)
+_CATEGORY_ENTITY = ("{row}.name", "COALESCE({row}.description, '')")
+_VENDOR_ENTITY = ("{row}.business_name", "COALESCE({row}.description, '')")
+
+
+def _search_entity_triggers(entity_type: str, table: str, columns: str, entity: tuple, searchable: str) -> dict:
+    """
+    Insert, update and delete triggers keeping one entity type of
+    search_entities in sync with its table. Rows are indexed while
+    `searchable` (over NEW) holds; updates of other columns are ignored.
+    """
+    title, body = (part.format(row="NEW") for part in entity)
+    insert = f"""
+    INSERT INTO search_entities(entity_type, entity_id, title, body)
+    SELECT '{entity_type}', NEW.id, {title}, {body}"""
+    delete = f"DELETE FROM search_entities WHERE entity_type = '{entity_type}' AND entity_id = OLD.id;"
+    prefix = f"search_entities_{entity_type}"
+    return {
+        f"{prefix}_insert": f"""
+CREATE TRIGGER IF NOT EXISTS {prefix}_insert
+AFTER INSERT ON {table}
+WHEN {searchable}
+BEGIN
+    {FTS5_TRIGGER_VERSION}{insert};
+END;
+""",
+        f"{prefix}_update": f"""
+CREATE TRIGGER IF NOT EXISTS {prefix}_update
+AFTER UPDATE OF {columns} ON {table}
+BEGIN
+    {FTS5_TRIGGER_VERSION}
+    {delete}{insert}
+    WHERE {searchable};
+END;
+""",
+        f"{prefix}_delete": f"""
+CREATE TRIGGER IF NOT EXISTS {prefix}_delete
+AFTER DELETE ON {table}
+BEGIN
+    {FTS5_TRIGGER_VERSION}
+    {delete}
+END;
+""",
+    }
+
+
+FTS5_TRIGGERS = {
+    "product_fts_insert": CREATE_INSERT_TRIGGER,
+    "product_fts_update": CREATE_UPDATE_TRIGGER,
+    "product_fts_delete": CREATE_DELETE_TRIGGER,
+    "product_fts_category_update": CREATE_CATEGORY_UPDATE_TRIGGER,
+    **_search_entity_triggers(
+        "product", "products", "name, description, short_description, tags, status",
+        _PRODUCT_ENTITY, f"NEW.status = {_ACTIVE}",
+    ),
+    **_search_entity_triggers(
+        "category", "categories", "name, description, is_active",
+        _CATEGORY_ENTITY, "NEW.is_active",
+    ),
+    **_search_entity_triggers(
+        "vendor", "vendors", "business_name, description, status",
+        _VENDOR_ENTITY, f"NEW.status = {_APPROVED}",
+    ),
+}
+
+# Fills search_entities from the source tables, matching the triggers
+POPULATE_SEARCH_ENTITIES = [
+    f"""
+    INSERT INTO search_entities(entity_type, entity_id, title, body)
+    SELECT '{entity_type}', r.id, {entity[0].format(row="r")}, {entity[1].format(row="r")}
+    FROM {table} r
+    WHERE {searchable.format(row="r")}
+    """
+    for entity_type, table, entity, searchable in (
+        ("product", "products", _PRODUCT_ENTITY, "{row}.status = :active"),
+        ("category", "categories", _CATEGORY_ENTITY, "{row}.is_active"),
+        ("vendor", "vendors", _VENDOR_ENTITY, "{row}.status = :approved"),
+    )
+]
+
+
+async def install_fts5_triggers(db: AsyncSession) -> None:
+    """
+    Replace the FTS5 sync triggers with the current versions.
+
+    Does not commit.
+
+    Args:
+        db: Database session
+    """
+    for name, sql in FTS5_TRIGGERS.items():
+        await db.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        await db.execute(text(sql))
+        logger.info(f"Installed FTS5 sync trigger {name}")
+
+
+async def check_fts5_triggers_current(db: AsyncSession) -> bool:
+    """
+    Check that every FTS5 sync trigger is the current version.
+
+    Args:
+        db: Database session
+
+    Returns:
+        bool: True if all triggers exist and carry FTS5_TRIGGER_VERSION
+    """
+    result = await db.execute(text("SELECT name, sql FROM sqlite_master WHERE type='trigger'"))
+    triggers = dict(result.all())
+    return all(FTS5_TRIGGER_VERSION in (triggers.get(name) or "") for name in FTS5_TRIGGERS)
+
 
 async def create_fts5_table(db: AsyncSession) -> bool:
     """
-    Create FTS5 virtual table and triggers for automatic synchronization.
+    Create the FTS5 virtual tables and triggers for automatic synchronization.
+
+    Safe to run again: existing tables are kept and the triggers replaced.
 
     Args:
         db: Database session
@@ -96,19 +255,14 @@ async def create_fts5_table(db: AsyncSession) -> bool:
         # Create FTS5 virtual table
         await db.execute(text(CREATE_FTS5_TABLE))
         logger.info("Created FTS5 virtual table 'product_fts'")
+        await db.execute(text(CREATE_SEARCH_ENTITIES_TABLE))
+        logger.info("Created FTS5 virtual table 'search_entities'")
 
         # Create triggers for auto-sync
-        await db.execute(text(CREATE_INSERT_TRIGGER))
-        logger.info("Created INSERT trigger for FTS5 sync")
-
-        await db.execute(text(CREATE_UPDATE_TRIGGER))
-        logger.info("Created UPDATE trigger for FTS5 sync")
-
-        await db.execute(text(CREATE_DELETE_TRIGGER))
-        logger.info("Created DELETE trigger for FTS5 sync")
+        await install_fts5_triggers(db)
 
-        await db.execute(text(CREATE_CATEGORY_UPDATE_TRIGGER))
-        logger.info("Created CATEGORY UPDATE trigger for FTS5 sync")
+        # Background merging settings (see configure_fts5_merging)
+        await configure_fts5_merging(db, settings.FTS5_AUTOMERGE, settings.FTS5_CRISISMERGE)
 
         await db.commit()
         return True
@@ -121,7 +275,7 @@ async def create_fts5_table(db: AsyncSession) -> bool:
 
 async def populate_fts5_table(db: AsyncSession) -> int:
     """
-    Populate FTS5 table from existing products.
+    Populate the FTS5 tables from existing products, categories and vendors.
 
     Args:
         db: Database session
@@ -144,17 +298,27 @@ async def populate_fts5_table(db: AsyncSession) -> int:
             COALESCE(c.name, '')
         FROM products p
         LEFT JOIN categories c ON p.category_id = c.id
-        WHERE p.status = 'active'
+        WHERE p.status = :active
         """
 
-        await db.execute(text(populate_sql))
+        # Enum columns store the member name
+        await db.execute(text(populate_sql), {"active": ProductStatus.ACTIVE.name})
+
+        await db.execute(text("DELETE FROM search_entities"))
+        for sql in POPULATE_SEARCH_ENTITIES:
+            await db.execute(
+                text(sql),
+                {"active": ProductStatus.ACTIVE.name, "approved": VendorStatus.APPROVED.name},
+            )
 
         # Get count of indexed products
         result = await db.execute(text("SELECT COUNT(*) FROM product_fts"))
         count = result.scalar()
+        result = await db.execute(text("SELECT COUNT(*) FROM search_entities"))
+        entities = result.scalar()
 
         await db.commit()
-        logger.info(f"Populated FTS5 table with {count} products")
+        logger.info(f"Populated FTS5 table with {count} products ({entities} search entities)")
         return count
 
     except Exception as e:
@@ -193,7 +357,8 @@ async def rebuild_fts5_index(db: AsyncSession) -> bool:
         bool: True if successful
     """
     try:
-        await db.execute(text("INSERT INTO product_fts(product_fts) VALUES('rebuild')"))
+        for table in FTS5_TABLES:
+            await db.execute(text(f"INSERT INTO {table}({table}) VALUES('rebuild')"))
         await db.commit()
         logger.info("Rebuilt FTS5 index")
         return True
@@ -214,7 +379,8 @@ async def optimize_fts5_index(db: AsyncSession) -> bool:
         bool: True if successful
     """
     try:
-        await db.execute(text("INSERT INTO product_fts(product_fts) VALUES('optimize')"))
+        for table in FTS5_TABLES:
+            await db.execute(text(f"INSERT INTO {table}({table}) VALUES('optimize')"))
         await db.commit()
         logger.info("Optimized FTS5 index")
         return True
@@ -224,6 +390,102 @@ async def optimize_fts5_index(db: AsyncSession) -> bool:
         return False
 
 
+async def configure_fts5_merging(db: AsyncSession, automerge: int, crisismerge: int) -> None:
+    """
+    Set how eagerly FTS5 merges index segments while writing.
+
+    automerge: merge once a level has this many segments (incrementally,
+    spread over later writes). crisismerge: merge synchronously once a level
+    reaches this many, bounding the segments a query has to read. The
+    values are stored in the %_config table of each FTS5 table. Does not
+    commit.
+
+    Args:
+        db: Database session
+        automerge: Segments per level that start an incremental merge
+        crisismerge: Segments per level that force a merge in the write
+    """
+    for table in FTS5_TABLES:
+        await db.execute(
+            text(f"INSERT INTO {table}({table}, rank) VALUES('automerge', :value)"),
+            {"value": automerge},
+        )
+        await db.execute(
+            text(f"INSERT INTO {table}({table}, rank) VALUES('crisismerge', :value)"),
+            {"value": crisismerge},
+        )
+
+
+async def merge_fts5_index(db: AsyncSession, pages: int) -> bool:
+    """
+    Run one incremental merge step of up to about `pages` leaf pages on
+    each FTS5 table.
+
+    Args:
+        db: Database session
+        pages: Work limit of the step, per table
+
+    Returns:
+        bool: True if the step did any work on some table (more may remain)
+    """
+    worked = False
+    for table in FTS5_TABLES:
+        before = (await db.execute(text("SELECT total_changes()"))).scalar()
+        await db.execute(
+            text(f"INSERT INTO {table}({table}, rank) VALUES('merge', :pages)"),
+            {"pages": pages},
+        )
+        after = (await db.execute(text("SELECT total_changes()"))).scalar()
+        # The merge command itself counts as one change; more means it wrote segments
+        worked = worked or after - before >= 2
+    await db.commit()
+    return worked
+
+
+def _read_varint(data: bytes, pos: int) -> tuple:
+    """Decode an SQLite varint at pos; returns (value, next position)"""
+    value = 0
+    for i in range(9):
+        byte = data[pos + i]
+        if i == 8:
+            return (value << 8) | byte, pos + 9
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value, pos + i + 1
+    return value, pos + 9
+
+
+# Follows the 4-byte cookie in structure records written by newer SQLite
+_FTS5_STRUCTURE_V2 = b"\xff\x00\x00\x01"
+
+
+async def get_fts5_structure(db: AsyncSession) -> dict:
+    """
+    Read the level and segment counts from the FTS5 structure record.
+
+    Every segment is read by each query, so the segment count is what
+    merging keeps low.
+
+    Args:
+        db: Database session
+
+    Returns:
+        dict: levels and segments (0 for an empty index)
+    """
+    # The structure record is row 10 of the %_data shadow table
+    result = await db.execute(text("SELECT block FROM product_fts_data WHERE id = 10"))
+    block = result.scalar()
+    if not block:
+        return {"levels": 0, "segments": 0}
+
+    pos = 4
+    if block[4:8] == _FTS5_STRUCTURE_V2:
+        pos = 8
+    levels, pos = _read_varint(block, pos)
+    segments, _ = _read_varint(block, pos)
+    return {"levels": levels, "segments": segments}
+
+
 async def get_fts5_stats(db: AsyncSession) -> dict:
     """
     Get FTS5 statistics.
@@ -239,15 +501,22 @@ async def get_fts5_stats(db: AsyncSession) -> dict:
         result = await db.execute(text("SELECT COUNT(*) FROM product_fts"))
         total = result.scalar()
 
-        # Get FTS5 table size (in pages)
-        result = await db.execute(text(
-            "SELECT page_count * page_size as size FROM pragma_page_count('product_fts'), pragma_page_size()"
-        ))
-        size_info = result.first()
+        # Size of the inverted index itself (the %_data shadow table)
+        result = await db.execute(text("SELECT COALESCE(SUM(LENGTH(block)), 0) FROM product_fts_data"))
+        index_size = result.scalar()
+
+        structure = await get_fts5_structure(db)
+
+        result = await db.execute(text("SELECT k, v FROM product_fts_config"))
+        config = dict(result.all())
 
         return {
             "total_products": total,
-            "index_size_bytes": size_info[0] if size_info else 0,
+            "index_size_bytes": index_size,
+            "levels": structure["levels"],
+            "segments": structure["segments"],
+            "automerge": config.get("automerge"),
+            "crisismerge": config.get("crisismerge"),
             "status": "active"
         }
     except Exception as e:
@@ -0,0 +1,179 @@
+"""
+Keyset (cursor) pagination helpers
+
+List endpoints order by (sort column, id). A cursor is an opaque token holding
+the sort it was issued for and the sort key of the last row of a page. The
+next page continues with WHERE (sort_column, id) < (:last_value, :last_id),
+which is answered from the index on the sort key, so deep pages cost the
+same as page one. OFFSET
+pagination keeps working for existing clients and also returns a cursor to
+switch over. A cursor replayed with another sort is rejected with 400.
+
+Endpoints returning a bare list send the cursor in the X-Next-Cursor header;
+endpoints returning an envelope add a next_cursor field.
+"""
+
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, List, Optional, Sequence
+from uuid import UUID
+import base64
+import binascii
+import json
+
+from fastapi import HTTPException, status
+from sqlalchemy import tuple_, literal
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _encode_value(value: Any) -> list:
+    if value is None:
+        return ["n", None]
+    if isinstance(value, bool):
+        return ["b", value]
+    if isinstance(value, datetime):
+        return ["dt", value.isoformat()]
+    if isinstance(value, Decimal):
+        return ["dec", str(value)]
+    if isinstance(value, UUID):
+        return ["uuid", str(value)]
+    if isinstance(value, int):
+        return ["i", value]
+    if isinstance(value, float):
+        return ["f", value]
+    if isinstance(value, str):
+        return ["s", value]
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+
+def _decode_value(item: list) -> Any:
+    kind, value = item
+    if kind == "n":
+        return None
+    if kind == "b":
+        return bool(value)
+    if kind == "dt":
+        return datetime.fromisoformat(value)
+    if kind == "dec":
+        return Decimal(value)
+    if kind == "uuid":
+        return UUID(value)
+    if kind == "i":
+        return int(value)
+    if kind == "f":
+        return float(value)
+    if kind == "s":
+        return str(value)
+    raise ValueError(f"Unknown cursor value type: {kind}")
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encode sort key values as an opaque URL-safe cursor"""
+    payload = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Decode a cursor produced by encode_cursor, raising 400 if it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return [_decode_value(item) for item in payload]
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def _sort_name(sort_column, descending: bool) -> str:
+    """Name of the sort a cursor belongs to, e.g. created_at:desc"""
+    return f"{sort_column.key}:{'desc' if descending else 'asc'}"
+
+
+def supports_cursor(sort_column) -> bool:
+    """Keyset comparison needs a non-nullable sort column"""
+    return getattr(sort_column.expression, "nullable", True) is False
+
+
+def keyset_paginate(
+    query,
+    sort_column,
+    id_column,
+    *,
+    limit: int,
+    descending: bool = True,
+    cursor: Optional[str] = None,
+    offset: int = 0,
+):
+    """
+    Order a query by (sort_column, id_column) and select one page.
+
+    Args:
+        query: Select statement to paginate
+        sort_column: Primary sort column (e.g. Product.created_at)
+        id_column: Unique tie-breaker column (e.g. Product.id)
+        limit: Page size
+        descending: Sort direction for both columns
+        cursor: Continue after the row encoded in this cursor (offset is ignored)
+        offset: Rows to skip when no cursor is given
+
+    Returns:
+        The paginated select statement
+    """
+    if cursor:
+        if not supports_cursor(sort_column):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Cursor pagination is not supported when sorting by {sort_column.key}"
+            )
+        values = decode_cursor(cursor)
+        if len(values) != 3:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        sort_name, last_value, last_id = values
+        if sort_name != _sort_name(sort_column, descending):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cursor was issued for a different sort order"
+            )
+        key = tuple_(sort_column, id_column)
+        bound = tuple_(literal(last_value, sort_column.type), literal(last_id, id_column.type))
+        query = query.where(key < bound if descending else key > bound)
+    elif offset:
+        query = query.offset(offset)
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    return query.limit(limit)
+
+
+def next_cursor(
+    rows: Sequence[Any],
+    limit: int,
+    sort_column,
+    id_column,
+    descending: bool = True
+) -> Optional[str]:
+    """
+    Cursor for the page after rows, or None if this was the last page.
+
+    Args:
+        rows: ORM objects of the current page, in order
+        limit: Page size that was requested
+        sort_column: Sort column used by keyset_paginate
+        id_column: Tie-breaker column used by keyset_paginate
+        descending: Sort direction used by keyset_paginate
+    """
+    if not rows or limit <= 0 or len(rows) < limit or not supports_cursor(sort_column):
+        return None
+    last = rows[-1]
+    return encode_cursor(
+        _sort_name(sort_column, descending), getattr(last, sort_column.key), getattr(last, id_column.key)
+    )
@@ -0,0 +1,218 @@
+"""
+PostgreSQL Full-Text Search Setup
+
+The PostgreSQL counterpart of fts5_setup.py. Products get a stored, generated
+tsvector column weighting the name (A) over the short description (B) and
+the description (C), with a GIN index for @@ matching and ts_rank_cd
+ranking. pg_trgm adds a trigram index on the name for prefix (ILIKE 'q%')
+and fuzzy (similarity) matching in autocomplete.
+
+Global search reads search_entities, a table of weighted tsvectors of
+active products, active categories and approved vendors keyed by
+(entity_type, entity_id), kept in sync by triggers on the three tables.
+
+Alembic revisions 007_product_search_vector and 009_search_entities create
+the same objects; the statements here are idempotent so the app can ensure
+them at startup on databases created with create_all.
+"""
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+import logging
+
+from app.models.product import ProductStatus
+from app.models.vendor import VendorStatus
+
+logger = logging.getLogger(__name__)
+
+# Text search configuration used for both the column and the queries
+TS_CONFIG = "english"
+
+CREATE_TRGM_EXTENSION = "CREATE EXTENSION IF NOT EXISTS pg_trgm"
+
+ADD_SEARCH_VECTOR_COLUMN = f"""
+ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector
+GENERATED ALWAYS AS (
+    setweight(to_tsvector('{TS_CONFIG}', coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('{TS_CONFIG}', coalesce(short_description, '')), 'B') ||
+    setweight(to_tsvector('{TS_CONFIG}', coalesce(description, '')), 'C')
+) STORED
+"""
+
+CREATE_SEARCH_VECTOR_INDEX = """
+CREATE INDEX IF NOT EXISTS ix_products_search_vector
+ON products USING GIN (search_vector)
+"""
+
+CREATE_NAME_TRGM_INDEX = """
+CREATE INDEX IF NOT EXISTS ix_products_name_trgm
+ON products USING GIN (name gin_trgm_ops)
+"""
+
+CREATE_SEARCH_ENTITIES_TABLE = """
+CREATE TABLE IF NOT EXISTS search_entities (
+    entity_type VARCHAR(16) NOT NULL,
+    entity_id UUID NOT NULL,
+    document tsvector NOT NULL,
+    PRIMARY KEY (entity_type, entity_id)
+)
+"""
+
+CREATE_SEARCH_ENTITIES_INDEX = """
+CREATE INDEX IF NOT EXISTS ix_search_entities_document
+ON search_entities USING GIN (document)
+"""
+
+
+def _weighted(row: str, a: str, b: str, c: str) -> str:
+    parts = [
+        f"setweight(to_tsvector('{TS_CONFIG}', coalesce({expr.format(row=row)}, '')), '{weight}')"
+        for expr, weight in ((a, "A"), (b, "B"), (c, "C")) if expr
+    ]
+    return " || ".join(parts)
+
+
+# entity type -> (table, columns the document depends on, searchable
+# condition, name, B-weight text, C-weight text), over a row named {row};
+# enum columns store the member name
+_SEARCH_ENTITIES = {
+    "product": (
+        "products",
+        "name, short_description, tags, description, status",
+        f"{{row}}.status = '{ProductStatus.ACTIVE.name}'",
+        "{row}.name",
+        "coalesce({row}.short_description, '') || ' ' || coalesce(array_to_string({row}.tags, ' '), '')",
+        "{row}.description",
+    ),
+    "category": (
+        "categories",
+        "name, description, is_active",
+        "{row}.is_active",
+        "{row}.name",
+        None,
+        "{row}.description",
+    ),
+    "vendor": (
+        "vendors",
+        "business_name, description, status",
+        f"{{row}}.status = '{VendorStatus.APPROVED.name}'",
+        "{row}.business_name",
+        None,
+        "{row}.description",
+    ),
+}
+
+
+def _sync_statements(entity_type: str) -> list:
+    table, columns, searchable, a, b, c = _SEARCH_ENTITIES[entity_type]
+    function = f"search_entities_sync_{entity_type}"
+    return [
+        f"""
+CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM search_entities WHERE entity_type = '{entity_type}' AND entity_id = OLD.id;
+    ELSIF {searchable.format(row="NEW")} THEN
+        INSERT INTO search_entities (entity_type, entity_id, document)
+        VALUES ('{entity_type}', NEW.id, {_weighted("NEW", a, b, c)})
+        ON CONFLICT (entity_type, entity_id) DO UPDATE SET document = EXCLUDED.document;
+    ELSE
+        DELETE FROM search_entities WHERE entity_type = '{entity_type}' AND entity_id = NEW.id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""",
+        f"DROP TRIGGER IF EXISTS {function} ON {table}",
+        f"""
+CREATE TRIGGER {function}
+AFTER INSERT OR UPDATE OF {columns} OR DELETE ON {table}
+FOR EACH ROW EXECUTE FUNCTION {function}()
+""",
+    ]
+
+
+# Functions and triggers keeping search_entities in sync
+CREATE_SEARCH_ENTITIES_SYNC = [
+    statement for entity_type in _SEARCH_ENTITIES for statement in _sync_statements(entity_type)
+]
+
+# Fills search_entities from the source tables, matching the triggers
+POPULATE_SEARCH_ENTITIES = [
+    f"""
+INSERT INTO search_entities (entity_type, entity_id, document)
+SELECT '{entity_type}', r.id, {_weighted("r", a, b, c)}
+FROM {table} r
+WHERE {searchable.format(row="r")}
+ON CONFLICT (entity_type, entity_id) DO UPDATE SET document = EXCLUDED.document
+"""
+    for entity_type, (table, _, searchable, a, b, c) in _SEARCH_ENTITIES.items()
+]
+
+
+async def check_pg_search_exists(db: AsyncSession) -> bool:
+    """
+    Check if the search_vector column and the search_entities table exist.
+
+    Args:
+        db: Database session
+
+    Returns:
+        bool: True if products.search_vector and search_entities exist
+    """
+    try:
+        result = await db.execute(text(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_name = 'products' AND column_name = 'search_vector'"
+        ))
+        if result.scalar() is None:
+            return False
+        result = await db.execute(text(
+            "SELECT 1 FROM information_schema.tables WHERE table_name = 'search_entities'"
+        ))
+        return result.scalar() is not None
+    except Exception:
+        await db.rollback()
+        return False
+
+
+async def create_pg_search(db: AsyncSession) -> bool:
+    """
+    Create the search_vector column, its GIN index, the trigram index and
+    the search_entities table with its sync triggers.
+
+    Adding the generated column fills it for existing rows; search_entities
+    is filled from the three source tables here.
+
+    Args:
+        db: Database session
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        await db.execute(text(CREATE_TRGM_EXTENSION))
+        logger.info("Enabled pg_trgm extension")
+
+        await db.execute(text(ADD_SEARCH_VECTOR_COLUMN))
+        logger.info("Added products.search_vector column")
+
+        await db.execute(text(CREATE_SEARCH_VECTOR_INDEX))
+        logger.info("Created GIN index on products.search_vector")
+
+        await db.execute(text(CREATE_NAME_TRGM_INDEX))
+        logger.info("Created trigram index on products.name")
+
+        await db.execute(text(CREATE_SEARCH_ENTITIES_TABLE))
+        await db.execute(text(CREATE_SEARCH_ENTITIES_INDEX))
+        for statement in CREATE_SEARCH_ENTITIES_SYNC + POPULATE_SEARCH_ENTITIES:
+            await db.execute(text(statement))
+        logger.info("Created and filled search_entities")
+
+        await db.commit()
+        return True
+
+    except Exception as e:
+        logger.error(f"Failed to set up PostgreSQL full-text search: {e}")
+        await db.rollback()
+        return False
@@ -3,6 +3,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 import os
 
@@ -12,7 +13,23 @@ from slowapi.errors import RateLimitExceeded
 
 from app.core.config import settings
 from app.core.database import init_db, AsyncSessionLocal
-from app.core.fts5_setup import create_fts5_table, populate_fts5_table, check_fts5_exists
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.fts5_setup import (
+    create_fts5_table, populate_fts5_table, check_fts5_exists, check_fts5_triggers_current
+)
+from app.core.pg_search_setup import check_pg_search_exists, create_pg_search
+from app.services.category_tree import is_closure_populated, rebuild_category_closure
+from app.services.autocomplete import completion_index
+from app.services.facets import FacetService
+from app.services.fts5_maintenance import fts5_maintenance
+from app.services.idempotency import IDEMPOTENCY_KEY_HEADER, REPLAYED_HEADER, idempotency_store
+from app.services.inventory import stock_reaper
+from app.services.outbox import outbox_worker
+from app.services.rails import rail_snapshots
+from app.services.search_analytics import search_rollups
+from app.services.search_log import search_logger
+from app.services.spelling import spelling_index
+from app.services.view_counter import view_counter
 from app.api.v1.router import api_router
 
 # Configure logging
@@ -47,18 +64,117 @@ async def lifespan(app: FastAPI):
                         logger.info(f"FTS5 table populated with {count} products")
                     else:
                         logger.error("Failed to create FTS5 table")
+                elif not await check_fts5_triggers_current(db):
+                    # Older triggers indexed inactive products too and did
+                    # not keep search_entities; create what is missing,
+                    # replace the triggers and reindex
+                    logger.info("Upgrading FTS5 tables and sync triggers...")
+                    await create_fts5_table(db)
+                    count = await populate_fts5_table(db)
+                    logger.info(f"FTS5 table repopulated with {count} products")
                 else:
                     logger.info("FTS5 table already exists")
 
             except Exception as e:
                 logger.error(f"Failed to initialize FTS5: {e}")
+    elif settings.DATABASE_URL.startswith("postgresql"):
+        logger.info("Initializing PostgreSQL full-text search...")
+        async with AsyncSessionLocal() as db:
+            try:
+                if not await check_pg_search_exists(db):
+                    if await create_pg_search(db):
+                        logger.info("PostgreSQL full-text search created successfully")
+                    else:
+                        logger.error("Failed to create PostgreSQL full-text search")
+                else:
+                    logger.info("PostgreSQL full-text search already exists")
+
+            except Exception as e:
+                logger.error(f"Failed to initialize PostgreSQL full-text search: {e}")
     else:
-        logger.info("FTS5 is only supported for SQLite databases")
+        logger.info("Full-text search is only supported for SQLite and PostgreSQL databases")
+
+    # Build the category closure table on first start
+    async with AsyncSessionLocal() as db:
+        try:
+            if not await is_closure_populated(db):
+                count = await rebuild_category_closure(db)
+                logger.info(f"Category closure built with {count} rows")
+        except Exception as e:
+            logger.error(f"Failed to build category closure: {e}")
+
+    # Build the category facet store on first start
+    async with AsyncSessionLocal() as db:
+        try:
+            facet_service = FacetService(db)
+            if not await facet_service.is_populated():
+                count = await facet_service.rebuild()
+                logger.info(f"Category facets built for {count} products")
+        except Exception as e:
+            logger.error(f"Failed to build category facets: {e}")
+
+    # Keep the FTS5 index merged (SQLite only)
+    fts5_task = None
+    if settings.DATABASE_URL.startswith("sqlite"):
+        fts5_task = asyncio.create_task(fts5_maintenance.run(AsyncSessionLocal))
+
+    # Write buffered product view counts in the background
+    view_counter_task = asyncio.create_task(view_counter.run(AsyncSessionLocal))
+
+    # Keep the homepage rail snapshot fresh
+    rail_task = asyncio.create_task(rail_snapshots.run(AsyncSessionLocal))
+
+    # Write queued search log entries in the background
+    search_log_task = asyncio.create_task(search_logger.run(AsyncSessionLocal))
+
+    # Aggregate the search log into analytics rollups and prune it
+    search_rollup_task = asyncio.create_task(search_rollups.run(AsyncSessionLocal))
+
+    # Build the "did you mean" spelling index and keep it up to date
+    spelling_task = asyncio.create_task(spelling_index.run(AsyncSessionLocal))
+
+    # Build the autocomplete prefix index and keep it up to date
+    autocomplete_task = asyncio.create_task(completion_index.run(AsyncSessionLocal))
+
+    # Release expired checkout stock holds
+    stock_reaper_task = asyncio.create_task(stock_reaper.run(AsyncSessionLocal))
+
+    # Drop expired Idempotency-Key responses
+    idempotency_task = asyncio.create_task(idempotency_store.run(AsyncSessionLocal))
+
+    # Outbox events are delivered by outbox_worker.py; dev setups without
+    # it may deliver them here
+    outbox_task = None
+    if settings.OUTBOX_RUN_IN_API:
+        logger.warning("OUTBOX_RUN_IN_API is on: this API process delivers outbox events (dev only)")
+        outbox_task = asyncio.create_task(outbox_worker.run(AsyncSessionLocal))
 
     yield
     # Shutdown
     logger.info("Shutting down MarketHub API...")
 
+    tasks = (
+        fts5_task, outbox_task, idempotency_task, stock_reaper_task, autocomplete_task, spelling_task,
+        search_rollup_task, search_log_task, rail_task, view_counter_task,
+    )
+    for task in tasks:
+        if task is None:
+            continue
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    async with AsyncSessionLocal() as db:
+        try:
+            await view_counter.flush(db)
+        except Exception as e:
+            logger.error(f"Failed to flush product view counts on shutdown: {e}")
+        try:
+            await search_logger.flush(db)
+        except Exception as e:
+            logger.error(f"Failed to flush search log on shutdown: {e}")
+
 
 # Create FastAPI app
 app = FastAPI(
@@ -83,7 +199,10 @@ app.add_middleware(
     allow_origins=settings.ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
-    allow_headers=["Authorization", "Content-Type", "Accept", "Origin", "X-Requested-With"],
+    allow_headers=[
+        "Authorization", "Content-Type", "Accept", "Origin", "X-Requested-With", IDEMPOTENCY_KEY_HEADER
+    ],
+    expose_headers=[NEXT_CURSOR_HEADER, REPLAYED_HEADER],
 )
 
 
@@ -1,6 +1,6 @@
 from app.models.user import User
 from app.models.vendor import Vendor, VendorPayout
-from app.models.category import Category
+from app.models.category import Category, CategoryClosure
 from app.models.product import Product, ProductImage, ProductVariant, ProductAttribute
 from app.models.cart import Cart, CartItem
 from app.models.order import Order, OrderItem, OrderStatusHistory
@@ -15,13 +15,19 @@ from app.models.banner import Banner
 from app.models.verification import VerificationApplication, VerificationDocument
 from app.models.rfq import RFQ, RFQQuote
 from app.models.payout import Payout, PayoutItem
-from app.models.search_query import SearchQuery
+from app.models.search_query import SearchQuery, SearchQueryRollup
+from app.models.facet import CategoryFacetCount, ProductFacetSnapshot
+from app.models.cache_version import CacheVersion
+from app.models.stock_reservation import StockReservation
+from app.models.idempotency_key import IdempotencyKey
+from app.models.outbox_event import OutboxEvent
 
 __all__ = [
     "User",
     "Vendor",
     "VendorPayout",
     "Category",
+    "CategoryClosure",
     "Product",
     "ProductImage",
     "ProductVariant",
@@ -49,4 +55,11 @@ __all__ = [
     "Payout",
     "PayoutItem",
     "SearchQuery",
+    "SearchQueryRollup",
+    "CategoryFacetCount",
+    "ProductFacetSnapshot",
+    "CacheVersion",
+    "StockReservation",
+    "IdempotencyKey",
+    "OutboxEvent",
 ]
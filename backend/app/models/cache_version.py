@@ -0,0 +1,21 @@
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, Integer
+from app.core.database import Base
+
+
+class CacheVersion(Base):
+    """
+    Version counter of an in-process cache, shared by all workers.
+
+    A write bumps the version; every worker compares it with the version its
+    cached entries were built from and drops them when it has moved on.
+    """
+    __tablename__ = "cache_versions"
+
+    name = Column(String(100), primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<CacheVersion {self.name}={self.version}>"
@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Integer, ForeignKey, Numeric, Text
+from sqlalchemy import Column, String, DateTime, Integer, ForeignKey, Numeric, Text, Index
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 from app.models.types import GUID
@@ -64,6 +64,9 @@ class Cart(Base):
 
 class CartItem(Base):
     __tablename__ = "cart_items"
+    __table_args__ = (
+        Index("ix_cart_items_cart_id", "cart_id"),
+    )
 
     id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     cart_id = Column(GUID(), ForeignKey("carts.id", ondelete="CASCADE"), nullable=False)
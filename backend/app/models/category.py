@@ -1,7 +1,8 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Boolean, DateTime, Text, Integer, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Boolean, DateTime, Text, Integer, ForeignKey, Index
+from sqlalchemy import event, inspect, select, insert, delete, true
+from sqlalchemy.orm import relationship, aliased
 from app.core.database import Base
 from app.models.types import GUID
 
@@ -49,3 +50,90 @@ class Category(Base):
             path.insert(0, parent.name)
             parent = parent.parent
         return " > ".join(path)
+
+
+class CategoryClosure(Base):
+    """
+    Closure table of the category hierarchy.
+
+    Holds one row for every (ancestor, descendant) pair, including each
+    category paired with itself at depth 0, so "everything under X at any
+    depth" is a single indexed lookup on ancestor_id. Maintained by the
+    mapper events below on insert, re-parent and delete.
+    """
+    __tablename__ = "category_closure"
+    __table_args__ = (
+        Index("ix_category_closure_descendant", "descendant_id", "depth"),
+    )
+
+    ancestor_id = Column(GUID(), ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    descendant_id = Column(GUID(), ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    depth = Column(Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<CategoryClosure {self.ancestor_id} -> {self.descendant_id} ({self.depth})>"
+
+
+def _attach_subtree(connection, category_id, parent_id):
+    """Link every ancestor of parent_id (inclusive) to every node in category_id's subtree"""
+    closure = CategoryClosure.__table__
+    ancestors = aliased(closure)
+    subtree = aliased(closure)
+    connection.execute(
+        insert(closure).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(
+                ancestors.c.ancestor_id,
+                subtree.c.descendant_id,
+                ancestors.c.depth + subtree.c.depth + 1,
+            )
+            # Every ancestor pairs with every subtree node
+            .select_from(ancestors.join(subtree, true()))
+            .where(
+                ancestors.c.descendant_id == parent_id,
+                subtree.c.ancestor_id == category_id,
+            )
+        )
+    )
+
+
+def _detach_subtree(connection, category_id):
+    """Remove the links between category_id's subtree and its former ancestors"""
+    closure = CategoryClosure.__table__
+    subtree_ids = select(closure.c.descendant_id).where(closure.c.ancestor_id == category_id)
+    connection.execute(
+        delete(closure).where(
+            closure.c.descendant_id.in_(subtree_ids.scalar_subquery()),
+            closure.c.ancestor_id.notin_(subtree_ids.scalar_subquery()),
+        )
+    )
+
+
+@event.listens_for(Category, "after_insert")
+def _category_closure_insert(mapper, connection, target):
+    connection.execute(
+        insert(CategoryClosure.__table__).values(
+            ancestor_id=target.id, descendant_id=target.id, depth=0
+        )
+    )
+    if target.parent_id is not None:
+        _attach_subtree(connection, target.id, target.parent_id)
+
+
+@event.listens_for(Category, "after_update")
+def _category_closure_move(mapper, connection, target):
+    if not inspect(target).attrs.parent_id.history.has_changes():
+        return
+    _detach_subtree(connection, target.id)
+    if target.parent_id is not None:
+        _attach_subtree(connection, target.id, target.parent_id)
+
+
+@event.listens_for(Category, "after_delete")
+def _category_closure_delete(mapper, connection, target):
+    closure = CategoryClosure.__table__
+    connection.execute(
+        delete(closure).where(
+            (closure.c.ancestor_id == target.id) | (closure.c.descendant_id == target.id)
+        )
+    )
@@ -0,0 +1,59 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, Integer, Numeric, ForeignKey, Text, Index
+from app.core.database import Base
+from app.models.types import GUID
+
+
+class CategoryFacetCount(Base):
+    """
+    Precomputed filter counts for the active products directly in a category.
+
+    One row per (category, facet, name, value), e.g.
+    ("attribute", "Color", "Red"), ("vendor", "", <vendor id>), ("rating", "", "4"),
+    ("price", "", "19.99"), ("in_stock", "", ""), ("on_sale", "", ""), ("total", "", "").
+    Category filters sum these rows across the category tree.
+    """
+    __tablename__ = "category_facet_counts"
+    __table_args__ = (
+        Index(
+            "ix_category_facet_counts_key",
+            "category_id", "facet", "name", "value",
+            unique=True,
+        ),
+    )
+
+    id = Column(GUID(), primary_key=True, default=uuid.uuid4)
+    category_id = Column(GUID(), ForeignKey("categories.id", ondelete="CASCADE"), nullable=False)
+
+    facet = Column(String(20), nullable=False)
+    name = Column(String(255), default="", nullable=False)
+    value = Column(String(500), default="", nullable=False)
+    numeric_value = Column(Numeric(12, 2), nullable=True)  # Set for price facets (min/max)
+
+    count = Column(Integer, default=0, nullable=False)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<CategoryFacetCount {self.facet}:{self.name}={self.value} ({self.count})>"
+
+
+class ProductFacetSnapshot(Base):
+    """
+    The facet keys a product currently contributes to category_facet_counts.
+
+    Kept so a product change can be applied as a delta (old keys -1, new keys +1)
+    without rescanning the category. Not a foreign key, so deleted products can
+    still be subtracted.
+    """
+    __tablename__ = "product_facet_snapshots"
+
+    product_id = Column(GUID(), primary_key=True)
+    category_id = Column(GUID(), nullable=True)
+    keys = Column(Text, nullable=False)  # JSON list of [facet, name, value]
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<ProductFacetSnapshot {self.product_id}>"
@@ -0,0 +1,38 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text
+from app.core.database import Base
+from app.models.types import GUID
+
+
+class IdempotencyKey(Base):
+    """
+    The first result of a request sent with an Idempotency-Key header.
+
+    A row is claimed (status in_progress) before the request runs and
+    completed with its response; retries with the same key replay the
+    response until expires_at (app.services.idempotency).
+    """
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        Index("ix_idempotency_keys_user_scope_key", "user_id", "scope", "key", unique=True),
+    )
+
+    id = Column(GUID(), primary_key=True, default=uuid.uuid4)
+    # Not a foreign key: a key only lives for its TTL
+    user_id = Column(GUID(), nullable=False)
+    scope = Column(String(50), nullable=False)  # Endpoint, e.g. "orders.create"
+    key = Column(String(255), nullable=False)
+    fingerprint = Column(String(64), nullable=False)  # SHA-256 of the request body
+
+    status = Column(String(20), nullable=False)  # in_progress, completed
+    response_status = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)  # JSON
+
+    # In progress: when the claim is considered abandoned; completed: when
+    # the stored response is dropped
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<IdempotencyKey {self.scope} {self.key} {self.status}>"
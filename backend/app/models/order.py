@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Integer, Float, ForeignKey, Enum, Numeric, Text, Boolean
+from sqlalchemy import Column, String, DateTime, Integer, Float, ForeignKey, Enum, Numeric, Text, Boolean, Index
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 from app.models.types import GUID
@@ -29,6 +29,12 @@ class PaymentStatus(str, enum.Enum):
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        Index("ix_orders_user_created_at", "user_id", "created_at"),
+        Index("ix_orders_created_at", "created_at"),
+        # Revenue reports: paid orders within a date range
+        Index("ix_orders_payment_status_paid_at", "payment_status", "paid_at"),
+    )
 
     id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     user_id = Column(GUID(), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
@@ -121,6 +127,11 @@ class Order(Base):
 
 class OrderItem(Base):
     __tablename__ = "order_items"
+    __table_args__ = (
+        Index("ix_order_items_order_id", "order_id"),
+        Index("ix_order_items_product_id", "product_id"),
+        Index("ix_order_items_vendor_created_at", "vendor_id", "created_at"),
+    )
 
     id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     order_id = Column(GUID(), ForeignKey("orders.id", ondelete="CASCADE"), nullable=False)
@@ -165,6 +176,9 @@ class OrderItem(Base):
 
 class OrderStatusHistory(Base):
     __tablename__ = "order_status_history"
+    __table_args__ = (
+        Index("ix_order_status_history_order_id", "order_id"),
+    )
 
     id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     order_id = Column(GUID(), ForeignKey("orders.id", ondelete="CASCADE"), nullable=False)
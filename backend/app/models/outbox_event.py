@@ -0,0 +1,38 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text
+from app.core.database import Base
+from app.models.types import GUID
+
+
+class OutboxEvent(Base):
+    """
+    A side effect (email, notification, balance update) queued in the same
+    transaction as the change that causes it.
+
+    The outbox worker (app.services.outbox) runs the event's handler, retries
+    failures with backoff and marks events that keep failing dead.
+    """
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        Index("ix_outbox_events_status_available_at", "status", "available_at"),
+    )
+
+    id = Column(GUID(), primary_key=True, default=uuid.uuid4)
+    event_type = Column(String(50), nullable=False)  # e.g. "order.confirmed"
+    payload = Column(Text, nullable=False)  # JSON
+    # Events with the same key are queued once
+    dedupe_key = Column(String(255), nullable=True, unique=True)
+
+    status = Column(String(20), default="pending", nullable=False)  # pending, done, dead
+    attempts = Column(Integer, default=0, nullable=False)
+    # Pending: when the event may next be taken (a retry's backoff or a
+    # running attempt's lease)
+    available_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<OutboxEvent {self.event_type} {self.status}>"
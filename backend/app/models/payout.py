@@ -43,7 +43,7 @@ class Payout(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     # Relationships
-    vendor = relationship("Vendor", back_populates="payouts")
+    vendor = relationship("Vendor")
     items = relationship("PayoutItem", back_populates="payout", cascade="all, delete-orphan")
 
     def __repr__(self):
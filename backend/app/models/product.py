@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Boolean, DateTime, Text, Integer, Float, ForeignKey, Enum, Numeric
+from sqlalchemy import Column, String, Boolean, DateTime, Text, Integer, Float, ForeignKey, Enum, Numeric, Index
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 from app.models.types import GUID, StringArray
@@ -18,6 +18,14 @@ class ProductStatus(str, enum.Enum):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # Listings filter on status and sort by one of these columns
+        Index("ix_products_status_created_at", "status", "created_at", "id"),
+        Index("ix_products_status_sales_count", "status", "sales_count"),
+        Index("ix_products_status_featured_sales_count", "status", "is_featured", "sales_count"),
+        Index("ix_products_category_status_created_at", "category_id", "status", "created_at", "id"),
+        Index("ix_products_vendor_created_at", "vendor_id", "created_at", "id"),
+    )
 
     id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     vendor_id = Column(GUID(), ForeignKey("vendors.id", ondelete="CASCADE"), nullable=False)
@@ -39,6 +47,8 @@ class Product(Base):
 
     # Inventory
     quantity = Column(Integer, default=0, nullable=False)
+    # Units held by checkouts in progress (see StockReservation)
+    reserved_quantity = Column(Integer, default=0, server_default="0", nullable=False)
     low_stock_threshold = Column(Integer, default=5, nullable=False)
     track_inventory = Column(Boolean, default=True, nullable=False)
     allow_backorder = Column(Boolean, default=False, nullable=False)
@@ -114,6 +124,11 @@ class Product(Base):
     def is_on_sale(self):
         return self.compare_at_price is not None and self.compare_at_price > self.price
 
+    @property
+    def available_quantity(self):
+        """Units that can be sold now: stock not held by other checkouts"""
+        return self.quantity - (self.reserved_quantity or 0)
+
     @property
     def in_stock(self):
         if not self.track_inventory:
@@ -123,6 +138,9 @@ class Product(Base):
 
 class ProductImage(Base):
     __tablename__ = "product_images"
+    __table_args__ = (
+        Index("ix_product_images_product_sort_order", "product_id", "sort_order"),
+    )
 
     id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     product_id = Column(GUID(), ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
@@ -147,6 +165,9 @@ class ProductImage(Base):
 
 class ProductVariant(Base):
     __tablename__ = "product_variants"
+    __table_args__ = (
+        Index("ix_product_variants_product_id", "product_id"),
+    )
 
     id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     product_id = Column(GUID(), ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
@@ -180,6 +201,10 @@ class ProductVariant(Base):
 
 class ProductAttribute(Base):
     __tablename__ = "product_attributes"
+    __table_args__ = (
+        # Serves the attribute EXISTS filters on the product listing
+        Index("ix_product_attributes_name_value_product", "name", "value", "product_id"),
+    )
 
     id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     product_id = Column(GUID(), ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Integer, ForeignKey, Text, Boolean
+from sqlalchemy import Column, String, DateTime, Integer, ForeignKey, Text, Boolean, Index
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 from app.models.types import GUID, StringArray
@@ -8,6 +8,9 @@ from app.models.types import GUID, StringArray
 
 class Review(Base):
     __tablename__ = "reviews"
+    __table_args__ = (
+        Index("ix_reviews_product_approved_created_at", "product_id", "is_approved", "created_at"),
+    )
 
     id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     user_id = Column(GUID(), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
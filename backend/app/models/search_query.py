@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Integer, ForeignKey, Text
+from sqlalchemy import Column, String, DateTime, Integer, ForeignKey, Text, Index
 from app.core.database import Base
 from app.models.types import GUID
 
@@ -33,3 +33,36 @@ class SearchQuery(Base):
 
     def __repr__(self):
         return f"<SearchQuery '{self.query}' - {self.results_count} results>"
+
+
+class SearchQueryRollup(Base):
+    """
+    Search counts per lowercased query and hour or day, aggregated from
+    search_queries by app.services.search_analytics.
+
+    Analytics read these rows instead of grouping the raw log, which is
+    pruned once it has been rolled up.
+    """
+    __tablename__ = "search_query_rollups"
+    __table_args__ = (
+        Index(
+            "ix_search_query_rollups_key",
+            "granularity", "bucket_start", "query",
+            unique=True,
+        ),
+    )
+
+    id = Column(GUID(), primary_key=True, default=uuid.uuid4)
+
+    granularity = Column(String(10), nullable=False)  # hour, day
+    bucket_start = Column(DateTime, nullable=False)
+    query = Column(String(500), nullable=False)
+
+    search_count = Column(Integer, default=0, nullable=False)
+    results_total = Column(Integer, default=0, nullable=False)  # Sum of results_count
+    click_count = Column(Integer, default=0, nullable=False)
+    zero_result_count = Column(Integer, default=0, nullable=False)
+    last_zero_result_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<SearchQueryRollup {self.granularity} {self.bucket_start} '{self.query}' ({self.search_count})>"
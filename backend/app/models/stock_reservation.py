@@ -0,0 +1,28 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, ForeignKey
+from app.core.database import Base
+from app.models.types import GUID
+
+
+class StockReservation(Base):
+    """
+    Units of a product held for a cart while its owner checks out.
+
+    Each hold is also counted in products.reserved_quantity; the reaper
+    (app.services.inventory) subtracts expired holds again.
+    """
+    __tablename__ = "stock_reservations"
+
+    id = Column(GUID(), primary_key=True, default=uuid.uuid4)
+    product_id = Column(GUID(), ForeignKey("products.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Not a foreign key: holds outlive a deleted cart until they expire, so
+    # the reaper can release the units they count
+    cart_id = Column(GUID(), nullable=False, index=True)
+    quantity = Column(Integer, nullable=False)
+
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<StockReservation {self.product_id} x{self.quantity} until {self.expires_at}>"
@@ -170,3 +170,13 @@ class RefundRequest(BaseModel):
     order_item_ids: Optional[List[UUID]] = None  # None means full refund
     reason: str
     amount: Optional[Decimal] = None  # None means full amount
+
+
+class CheckoutHoldItem(BaseModel):
+    product_id: UUID
+    quantity: int
+
+
+class CheckoutHoldResponse(BaseModel):
+    expires_at: datetime
+    items: List[CheckoutHoldItem] = []
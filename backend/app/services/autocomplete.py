@@ -0,0 +1,290 @@
+"""
+Autocomplete prefix index
+
+/search/autocomplete is answered from memory. Every completion is stored in
+a sorted array under its normalized text and under the text starting at
+each later word, so "head" completes both "Headphone Stand" and "Wireless
+Headphones". A prefix lookup is a binary search over that array. For
+prefixes of up to TOP_PREFIX_LENGTH characters, which match the most
+entries, the TOP_K best completions are precomputed.
+
+Suggestions combine active product names, weighted by sales_count, with
+search terms that returned results at least AUTOCOMPLETE_MIN_QUERY_COUNT
+times in the last AUTOCOMPLETE_QUERY_WINDOW_DAYS (read from the daily
+search rollups), weighted by that count.
+Category suggestions come from active category names, weighted by their
+active product count.
+
+The index is kept current like the other background indexes (see
+background_index.py), with a full rebuild, popular search terms included,
+every AUTOCOMPLETE_REBUILD_SECONDS. Lookups run on the event loop, so the
+heavy work stays off it: a rebuild sorts the new arrays in a worker thread
+and swaps them in, and an update refreshes the precomputed completions of
+at most REFRESH_BATCH_SIZE prefixes between yields.
+"""
+
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+import asyncio
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.category import Category
+from app.models.product import Product, ProductStatus
+from app.models.search_query import SearchQueryRollup
+from app.services.background_index import BackgroundIndex
+from app.services.search_analytics import DAY
+
+# Prefixes up to this length have their best completions precomputed
+TOP_PREFIX_LENGTH = 3
+TOP_K = 20
+# Words of a completion that a lookup can start at
+MAX_KEY_WORDS = 8
+# Prefixes whose completions are refreshed between yields to the event loop
+REFRESH_BATCH_SIZE = 200
+# Popular search terms loaded per rebuild
+MAX_QUERY_TERMS = 5000
+
+# Greater than any character a normalized key can contain
+_KEY_END = "\U0010ffff"
+
+
+def normalize(text: str) -> str:
+    """Lowercase text with whitespace collapsed"""
+    return " ".join(text.lower().split())
+
+
+def completion_keys(text: str) -> Tuple[str, ...]:
+    """Keys a completion is found under: its normalized text from each word on"""
+    words = normalize(text).split(" ")[:MAX_KEY_WORDS]
+    keys = []
+    for i in range(len(words)):
+        key = " ".join(words[i:])
+        if key and key not in keys:
+            keys.append(key)
+    return tuple(keys)
+
+
+class _PrefixIndex:
+    """Sorted (key, entry) array with the best completions of short prefixes precomputed"""
+
+    def __init__(self):
+        self._keys: List[Tuple[str, Hashable]] = []
+        # entry -> (text, weight, keys)
+        self._entries: Dict[Hashable, Tuple[str, int, Tuple[str, ...]]] = {}
+        # prefix -> best distinct texts, for prefixes up to TOP_PREFIX_LENGTH
+        self._top: Dict[str, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _ranked(self, entries: Iterable[Hashable], limit: int) -> List[str]:
+        """Distinct texts of entries, heaviest first"""
+        ranked = sorted(
+            {self._entries[entry][:2] for entry in entries},
+            key=lambda item: (-item[1], item[0]),
+        )
+        texts, seen = [], set()
+        for text, _ in ranked:
+            if text.lower() not in seen:
+                seen.add(text.lower())
+                texts.append(text)
+                if len(texts) == limit:
+                    break
+        return texts
+
+    def _scan(self, prefix: str, limit: int) -> List[str]:
+        lo = bisect_left(self._keys, (prefix,))
+        hi = bisect_left(self._keys, (prefix + _KEY_END,))
+        return self._ranked((entry for _, entry in self._keys[lo:hi]), limit)
+
+    def load(self, items: Iterable[Tuple[Hashable, str, int]]) -> None:
+        """Replace the contents with (entry, text, weight) items"""
+        self._entries = {}
+        buckets: Dict[str, List[Hashable]] = defaultdict(list)
+        keys = []
+        for entry, text, weight in items:
+            entry_keys = completion_keys(text)
+            if not entry_keys:
+                continue
+            self._entries[entry] = (text, weight, entry_keys)
+            for key in entry_keys:
+                keys.append((key, entry))
+                for length in range(1, min(len(key), TOP_PREFIX_LENGTH) + 1):
+                    buckets[key[:length]].append(entry)
+        keys.sort()
+        self._keys = keys
+        self._top = {prefix: self._ranked(entries, TOP_K) for prefix, entries in buckets.items()}
+
+    def set(self, entry: Hashable, text: Optional[str], weight: int = 0) -> Set[str]:
+        """
+        Add, replace or (with text None) remove one entry.
+
+        Returns:
+            Short prefixes whose precomputed completions need a refresh
+        """
+        dirty = set()
+        old = self._entries.pop(entry, None)
+        if old is not None:
+            for key in old[2]:
+                i = bisect_left(self._keys, (key, entry))
+                if i < len(self._keys) and self._keys[i] == (key, entry):
+                    del self._keys[i]
+                dirty.update(key[:n] for n in range(1, min(len(key), TOP_PREFIX_LENGTH) + 1))
+
+        entry_keys = completion_keys(text) if text else ()
+        if entry_keys:
+            self._entries[entry] = (text, weight, entry_keys)
+            for key in entry_keys:
+                insort(self._keys, (key, entry))
+                dirty.update(key[:n] for n in range(1, min(len(key), TOP_PREFIX_LENGTH) + 1))
+        return dirty
+
+    def refresh_top(self, prefixes: Iterable[str]) -> None:
+        for prefix in prefixes:
+            top = self._scan(prefix, TOP_K)
+            if top:
+                self._top[prefix] = top
+            else:
+                self._top.pop(prefix, None)
+
+    def entries_of_kind(self, kind: str) -> List[Hashable]:
+        return [entry for entry in self._entries if entry[0] == kind]
+
+    def complete(self, prefix: str, limit: int) -> List[str]:
+        if not prefix or limit <= 0:
+            return []
+        if len(prefix) <= TOP_PREFIX_LENGTH and limit <= TOP_K:
+            return self._top.get(prefix, [])[:limit]
+        return self._scan(prefix, limit)
+
+
+class CompletionIndex(BackgroundIndex):
+    """Product, search term and category completions served from memory"""
+
+    label = "autocomplete index"
+
+    def __init__(
+        self,
+        rebuild_interval_seconds: float,
+        update_debounce_seconds: float,
+        query_window_days: int,
+        min_query_count: int,
+    ):
+        super().__init__(update_debounce_seconds, rebuild_interval_seconds)
+        self.query_window_days = query_window_days
+        self.min_query_count = min_query_count
+
+        self._suggestions = _PrefixIndex()
+        self._categories = _PrefixIndex()
+
+    def _reset(self) -> None:
+        self._suggestions = _PrefixIndex()
+        self._categories = _PrefixIndex()
+
+    @staticmethod
+    async def _refresh_top(index: _PrefixIndex, prefixes: Set[str]) -> None:
+        """Refresh the prefixes' precomputed completions a batch at a time"""
+        prefixes = list(prefixes)
+        for start in range(0, len(prefixes), REFRESH_BATCH_SIZE):
+            index.refresh_top(prefixes[start:start + REFRESH_BATCH_SIZE])
+            await asyncio.sleep(0)
+
+    async def _load_categories(self, db: AsyncSession) -> List[Tuple[Hashable, str, int]]:
+        result = await db.execute(
+            select(Category.id, Category.name, func.count(Product.id))
+            .outerjoin(Product, and_(
+                Product.category_id == Category.id,
+                Product.status == ProductStatus.ACTIVE,
+            ))
+            .where(Category.is_active == True)
+            .group_by(Category.id, Category.name)
+        )
+        return [(("category", cid), name, count) for cid, name, count in result.all()]
+
+    async def _load_queries(self, db: AsyncSession) -> List[Tuple[Hashable, str, int]]:
+        since = datetime.utcnow() - timedelta(days=self.query_window_days)
+        with_results = func.sum(SearchQueryRollup.search_count - SearchQueryRollup.zero_result_count)
+        result = await db.execute(
+            select(SearchQueryRollup.query, with_results)
+            .where(SearchQueryRollup.granularity == DAY, SearchQueryRollup.bucket_start >= since)
+            .group_by(SearchQueryRollup.query)
+            .having(with_results >= self.min_query_count)
+            .order_by(with_results.desc())
+            .limit(MAX_QUERY_TERMS)
+        )
+        counts: Dict[str, int] = defaultdict(int)
+        for query, count in result.all():
+            counts[normalize(query)] += count
+        return [(("query", text), text, count) for text, count in counts.items() if text]
+
+    async def _build(self, db: AsyncSession) -> None:
+        """Build both indexes from the database and swap them in"""
+        result = await db.execute(
+            select(Product.id, Product.name, Product.sales_count)
+            .where(Product.status == ProductStatus.ACTIVE)
+        )
+        items = [(("product", pid), name, sales or 0) for pid, name, sales in result.all()]
+        items.extend(await self._load_queries(db))
+        categories = await self._load_categories(db)
+
+        # The new indexes are private until swapped in, so they can be
+        # sorted off the event loop
+        suggestions = _PrefixIndex()
+        await asyncio.to_thread(suggestions.load, items)
+        category_index = _PrefixIndex()
+        await asyncio.to_thread(category_index.load, categories)
+        self._suggestions, self._categories = suggestions, category_index
+
+    async def _update_products(self, db: AsyncSession, product_ids: List[UUID]) -> None:
+        found = await self._active_products(db, product_ids, Product.name, Product.sales_count)
+        dirty = set()
+        for product_id in product_ids:
+            row = found.get(product_id)
+            # Deleted and deactivated products drop out
+            name, sales = (row.name, row.sales_count or 0) if row else (None, 0)
+            dirty |= self._suggestions.set(("product", product_id), name, sales)
+        await self._refresh_top(self._suggestions, dirty)
+
+    async def _update_categories(self, db: AsyncSession) -> None:
+        categories = await self._load_categories(db)
+        current = {entry for entry, _, _ in categories}
+        dirty = set()
+        for entry in self._categories.entries_of_kind("category"):
+            if entry not in current:
+                dirty |= self._categories.set(entry, None)
+        for entry, name, count in categories:
+            dirty |= self._categories.set(entry, name, count)
+        await self._refresh_top(self._categories, dirty)
+
+    def complete(self, query: str, limit: int) -> List[str]:
+        """Best product name and search term completions of query"""
+        return self._suggestions.complete(normalize(query), limit)
+
+    def complete_categories(self, query: str, limit: int) -> List[str]:
+        """Best category name completions of query"""
+        return self._categories.complete(normalize(query), limit)
+
+    def stats(self) -> Dict[str, Any]:
+        """Size and update counters of this worker's autocomplete index"""
+        return {
+            "built": self._built,
+            "suggestions": len(self._suggestions),
+            "categories": len(self._categories),
+            "pending_products": len(self._pending_products),
+            "rebuilds": self.rebuilds,
+            "updates": self.updates,
+        }
+
+
+completion_index = CompletionIndex(
+    rebuild_interval_seconds=settings.AUTOCOMPLETE_REBUILD_SECONDS,
+    update_debounce_seconds=settings.AUTOCOMPLETE_UPDATE_DEBOUNCE_SECONDS,
+    query_window_days=settings.AUTOCOMPLETE_QUERY_WINDOW_DAYS,
+    min_query_count=settings.AUTOCOMPLETE_MIN_QUERY_COUNT,
+)
@@ -0,0 +1,165 @@
+"""
+In-memory indexes kept current from product and category writes
+
+The spelling and autocomplete indexes are built from the catalog and then
+patched as it changes. BackgroundIndex holds what they share:
+products_changed() queues product ids and catalog_changed() queues a
+re-read of the categories; run(), started from the app lifespan, applies
+the queue shortly after writes (debounced by update_debounce_seconds) and
+rebuilds everything every rebuild_interval_seconds, which also picks up
+writes made on other workers. Without a running updater, ensure_current()
+makes the next lookup catch up inline.
+
+Subclasses implement _reset(), _build(), _update_products() and
+_update_categories().
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Set
+from uuid import UUID
+import asyncio
+import logging
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.product import Product, ProductStatus
+
+logger = logging.getLogger(__name__)
+
+# Product ids per query when applying changes
+UPDATE_CHUNK_SIZE = 500
+
+
+class BackgroundIndex:
+    """Base of the catalog indexes served from memory and updated in the background"""
+
+    # Named in log messages
+    label = "index"
+
+    def __init__(self, update_debounce_seconds: float, rebuild_interval_seconds: float):
+        self.update_debounce_seconds = update_debounce_seconds
+        self.rebuild_interval_seconds = rebuild_interval_seconds
+
+        self._built = False
+        self._pending_products: Set[UUID] = set()
+        self._categories_stale = False
+        self._running = False
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+        self.rebuilds = 0
+        self.updates = 0
+
+    # -- subclass hooks ----------------------------------------------------
+
+    def _reset(self) -> None:
+        """Drop the index contents"""
+        raise NotImplementedError
+
+    async def _build(self, db: AsyncSession) -> None:
+        """Build the whole index from the database"""
+        raise NotImplementedError
+
+    async def _update_products(self, db: AsyncSession, product_ids: List[UUID]) -> None:
+        """Re-read some products; deleted and deactivated ones drop out"""
+        raise NotImplementedError
+
+    async def _update_categories(self, db: AsyncSession) -> None:
+        """Re-read the categories"""
+        raise NotImplementedError
+
+    # -- change notifications ----------------------------------------------
+
+    def products_changed(self, product_ids: Iterable[UUID]) -> None:
+        """Queue products whose indexed fields may have changed"""
+        self._pending_products.update(product_ids)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def catalog_changed(self) -> None:
+        """Queue a re-read of the categories"""
+        self._categories_stale = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def clear(self) -> None:
+        """Drop the index; the next lookup rebuilds it"""
+        self._reset()
+        self._built = False
+        self._pending_products.clear()
+        self._categories_stale = False
+
+    # -- updates -----------------------------------------------------------
+
+    async def _active_products(self, db: AsyncSession, product_ids: List[UUID], *columns) -> Dict[UUID, Any]:
+        """Rows (id, *columns) of the active ones among product_ids, read in chunks"""
+        found = {}
+        for start in range(0, len(product_ids), UPDATE_CHUNK_SIZE):
+            chunk = product_ids[start:start + UPDATE_CHUNK_SIZE]
+            result = await db.execute(
+                select(Product.id, *columns)
+                .where(Product.id.in_(chunk), Product.status == ProductStatus.ACTIVE)
+            )
+            found.update((row[0], row) for row in result.all())
+        return found
+
+    async def rebuild(self, db: AsyncSession) -> None:
+        """Rebuild the index from every active product and category"""
+        self._pending_products.clear()
+        self._categories_stale = False
+        await self._build(db)
+        self._built = True
+        self.rebuilds += 1
+
+    async def apply_pending(self, db: AsyncSession) -> None:
+        """Re-read the queued products (and categories, if stale) and patch the index"""
+        product_ids = list(self._pending_products)
+        self._pending_products.clear()
+        if product_ids:
+            await self._update_products(db, product_ids)
+
+        if self._categories_stale:
+            self._categories_stale = False
+            await self._update_categories(db)
+
+        self.updates += 1
+
+    async def ensure_current(self, db: AsyncSession) -> None:
+        """Build the index, or catch up on changes when no updater is running"""
+        if self._built and (self._running or not (self._pending_products or self._categories_stale)):
+            return
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self._built:
+                await self.rebuild(db)
+            elif self._pending_products or self._categories_stale:
+                await self.apply_pending(db)
+
+    async def run(self, session_factory) -> None:
+        """Apply changes shortly after writes and rebuild periodically, until cancelled"""
+        self._wakeup = asyncio.Event()
+        self._running = True
+        rebuild = True
+        try:
+            while True:
+                try:
+                    async with session_factory() as db:
+                        if rebuild or not self._built:
+                            await self.rebuild(db)
+                        else:
+                            await self.apply_pending(db)
+                except Exception as e:
+                    logger.error(f"Failed to update {self.label}: {e}")
+
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.rebuild_interval_seconds)
+                    # Let a burst of writes settle into one update
+                    await asyncio.sleep(self.update_debounce_seconds)
+                    rebuild = False
+                except asyncio.TimeoutError:
+                    rebuild = True
+                self._wakeup.clear()
+        finally:
+            self._running = False
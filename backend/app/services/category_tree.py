@@ -0,0 +1,106 @@
+"""
+Category hierarchy helpers backed by the category_closure table
+
+The closure rows are maintained by mapper events on Category (see
+app/models/category.py). These helpers read it and rebuild it when it is
+missing or has drifted (e.g. after bulk SQL edits).
+
+category_cache holds the serialized public category responses (tree,
+featured list, per-slug detail). Category writes must call
+category_cache.invalidate(db) after committing.
+"""
+
+from typing import Dict, List, Optional
+from uuid import UUID
+import logging
+
+from sqlalchemy import select, delete, insert, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import VersionedCache
+from app.core.config import settings
+from app.models.category import Category, CategoryClosure
+
+logger = logging.getLogger(__name__)
+
+category_cache = VersionedCache(
+    "categories",
+    ttl_seconds=settings.CATEGORY_CACHE_TTL_SECONDS,
+    check_interval_seconds=settings.CACHE_VERSION_CHECK_SECONDS,
+)
+
+
+def descendant_ids_query(category_id: UUID):
+    """Select the IDs of a category and all categories below it, at any depth"""
+    return select(CategoryClosure.descendant_id).where(CategoryClosure.ancestor_id == category_id)
+
+
+def descendant_ids_by_slug_query(slug: str):
+    """Select the IDs of the category with this slug and everything below it"""
+    return (
+        select(CategoryClosure.descendant_id)
+        .join(Category, Category.id == CategoryClosure.ancestor_id)
+        .where(Category.slug == slug)
+    )
+
+
+async def get_descendant_ids(db: AsyncSession, category_id: UUID) -> List[UUID]:
+    """IDs of a category and all of its descendants"""
+    result = await db.execute(descendant_ids_query(category_id))
+    return [row[0] for row in result.all()]
+
+
+async def is_descendant(db: AsyncSession, category_id: UUID, candidate_id: UUID) -> bool:
+    """Check whether candidate_id is category_id itself or lies below it"""
+    result = await db.execute(
+        select(CategoryClosure.depth).where(
+            CategoryClosure.ancestor_id == category_id,
+            CategoryClosure.descendant_id == candidate_id,
+        )
+    )
+    return result.first() is not None
+
+
+async def is_closure_populated(db: AsyncSession) -> bool:
+    """Check whether the closure table has rows for the existing categories"""
+    categories = (await db.execute(select(func.count(Category.id)))).scalar() or 0
+    if categories == 0:
+        return True
+    result = await db.execute(select(CategoryClosure.ancestor_id).limit(1))
+    return result.first() is not None
+
+
+async def rebuild_category_closure(db: AsyncSession) -> int:
+    """
+    Recompute the closure table from categories.parent_id.
+
+    Returns:
+        Number of closure rows written
+    """
+    try:
+        result = await db.execute(select(Category.id, Category.parent_id))
+        parents: Dict[UUID, Optional[UUID]] = dict(result.all())
+
+        rows = []
+        for category_id in parents:
+            ancestor, depth = category_id, 0
+            seen = set()
+            # Walk up to the root; the seen set guards against corrupt cycles
+            while ancestor is not None and ancestor not in seen:
+                seen.add(ancestor)
+                rows.append({"ancestor_id": ancestor, "descendant_id": category_id, "depth": depth})
+                ancestor = parents.get(ancestor)
+                depth += 1
+
+        await db.execute(delete(CategoryClosure))
+        if rows:
+            await db.execute(insert(CategoryClosure), rows)
+        await db.commit()
+
+        logger.info(f"Rebuilt category closure with {len(rows)} rows")
+        return len(rows)
+
+    except Exception as e:
+        logger.error(f"Failed to rebuild category closure: {e}")
+        await db.rollback()
+        raise
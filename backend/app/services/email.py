@@ -19,6 +19,11 @@ from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+
+class EmailDeliveryError(Exception):
+    """Raised when the SMTP server could not be reached or refused an email"""
+
+
 # Initialize Jinja2 environment
 TEMPLATES_DIR = Path(__file__).parent.parent / "templates" / "emails"
 jinja_env = Environment(
@@ -56,7 +61,14 @@ def render_template(template_name: str, context: Dict[str, Any]) -> str:
 def _send_raw_email(to_email: str, subject: str, html_body: str) -> bool:
     """
     Send an email via SMTP. Returns True on success.
-    Falls back to logging if SMTP is not configured.
+    Falls back to logging (and returns False) if SMTP is not configured.
+
+    Blocks for up to the 15 s SMTP timeout; async callers run it in a
+    thread.
+
+    Raises:
+        EmailDeliveryError: If the send failed, so callers (the outbox) can
+            retry it
     """
     if not _smtp_configured():
         logger.info(
@@ -84,7 +96,7 @@ def _send_raw_email(to_email: str, subject: str, html_body: str) -> bool:
         return True
     except Exception as exc:
         logger.error("Failed to send email to %s: %s", to_email, exc)
-        return False
+        raise EmailDeliveryError(f"Failed to send email to {to_email}: {exc}") from exc
 
 
 # ---------------------------------------------------------------------------
@@ -193,6 +205,39 @@ def send_order_delivered_email(
     return _send_raw_email(to_email, f"Order Delivered - #{order_number}", html_body)
 
 
+def send_order_status_email(
+    to_email: str,
+    first_name: str,
+    order_number: str,
+    new_status: str,
+    tracking_number: Optional[str] = None,
+    carrier: Optional[str] = None,
+) -> bool:
+    """
+    Send the email for an order status change, if the status has one
+    (shipped, delivered). Returns False for other statuses.
+    """
+    if new_status == "shipped":
+        return send_order_shipped_email(
+            to_email=to_email,
+            first_name=first_name,
+            order_number=order_number,
+            items=[],
+            shipping_address={},
+            tracking_number=tracking_number or "",
+            carrier=carrier or "",
+        )
+    if new_status == "delivered":
+        return send_order_delivered_email(
+            to_email=to_email,
+            first_name=first_name,
+            order_number=order_number,
+            items=[],
+        )
+    logger.info("No email for order %s status %s", order_number, new_status)
+    return False
+
+
 def send_payment_received_email(
     to_email: str,
     first_name: str,
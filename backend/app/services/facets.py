@@ -0,0 +1,345 @@
+"""
+Category facet store
+
+Keeps precomputed filter counts per category (attribute values, vendors,
+rating histogram, price range, stock and sale counts) in category_facet_counts
+so the category filter sidebar is answered from a few indexed reads instead of
+loading every product in the category tree.
+
+Counts are maintained incrementally: every product write calls
+FacetService.sync_products() inside the same transaction, which diffs the
+product's previous contribution (ProductFacetSnapshot) against its current
+state and applies +/- deltas. FacetService.rebuild() recomputes everything
+from scratch (see rebuild_facets.py).
+"""
+
+from collections import Counter, defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+import json
+import logging
+
+from sqlalchemy import select, update, delete, insert, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.product import Product, ProductAttribute, ProductStatus
+from app.models.facet import CategoryFacetCount, ProductFacetSnapshot
+
+logger = logging.getLogger(__name__)
+
+FACET_TOTAL = "total"
+FACET_IN_STOCK = "in_stock"
+FACET_ON_SALE = "on_sale"
+FACET_RATING = "rating"
+FACET_VENDOR = "vendor"
+FACET_PRICE = "price"
+FACET_ATTRIBUTE = "attribute"
+
+FacetKey = Tuple[str, str, str]
+
+_PRODUCT_COLUMNS = (
+    Product.id,
+    Product.category_id,
+    Product.vendor_id,
+    Product.status,
+    Product.price,
+    Product.compare_at_price,
+    Product.quantity,
+    Product.rating,
+)
+
+
+def product_facet_keys(product, attributes: Iterable[Tuple[str, str]]) -> List[FacetKey]:
+    """
+    Facet keys a product contributes to its category.
+
+    Args:
+        product: Row with the columns in _PRODUCT_COLUMNS
+        attributes: Visible (name, value) attribute pairs of the product
+
+    Returns:
+        List of (facet, name, value) keys, empty if the product is not listed
+    """
+    if product is None or product.status != ProductStatus.ACTIVE or product.category_id is None:
+        return []
+
+    keys: List[FacetKey] = [
+        (FACET_TOTAL, "", ""),
+        (FACET_VENDOR, "", str(product.vendor_id)),
+        (FACET_PRICE, "", str(Decimal(product.price).quantize(Decimal("0.01")))),
+    ]
+    if product.quantity > 0:
+        keys.append((FACET_IN_STOCK, "", ""))
+    if product.compare_at_price and product.compare_at_price > product.price:
+        keys.append((FACET_ON_SALE, "", ""))
+
+    rating = int(product.rating) if product.rating else 0
+    if rating >= 1:
+        keys.append((FACET_RATING, "", str(min(rating, 5))))
+
+    # A product lists each distinct attribute value once
+    for name, value in sorted(set(attributes)):
+        keys.append((FACET_ATTRIBUTE, name, value))
+
+    return keys
+
+
+class FacetService:
+    """Maintains and reads the per-category facet counts"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def sync_products(self, product_ids: Iterable[Optional[UUID]]) -> None:
+        """
+        Bring the facet counts in line with the current state of some products.
+
+        Call after the product changes were made (they are flushed here) and
+        before the commit, so counts change in the same transaction.
+
+        Args:
+            product_ids: Created, updated or deleted product IDs
+        """
+        ids = list({pid for pid in product_ids if pid is not None})
+        if not ids:
+            return
+
+        await self.db.flush()
+
+        result = await self.db.execute(select(*_PRODUCT_COLUMNS).where(Product.id.in_(ids)))
+        products = {row.id: row for row in result.all()}
+
+        attributes = defaultdict(list)
+        result = await self.db.execute(
+            select(ProductAttribute.product_id, ProductAttribute.name, ProductAttribute.value)
+            .where(ProductAttribute.product_id.in_(ids), ProductAttribute.is_visible == True)
+        )
+        for product_id, name, value in result.all():
+            attributes[product_id].append((name, value))
+
+        result = await self.db.execute(
+            select(ProductFacetSnapshot).where(ProductFacetSnapshot.product_id.in_(ids))
+        )
+        snapshots = {s.product_id: s for s in result.scalars().all()}
+
+        deltas: Counter = Counter()
+        for product_id in ids:
+            snapshot = snapshots.get(product_id)
+            if snapshot:
+                for facet, name, value in json.loads(snapshot.keys):
+                    deltas[(snapshot.category_id, facet, name, value)] -= 1
+
+            product = products.get(product_id)
+            keys = product_facet_keys(product, attributes[product_id])
+            for facet, name, value in keys:
+                deltas[(product.category_id, facet, name, value)] += 1
+
+            if keys and snapshot:
+                snapshot.category_id = product.category_id
+                snapshot.keys = json.dumps(keys)
+            elif keys:
+                self.db.add(ProductFacetSnapshot(
+                    product_id=product_id,
+                    category_id=product.category_id,
+                    keys=json.dumps(keys),
+                ))
+            elif snapshot:
+                await self.db.delete(snapshot)
+
+        await self._apply_deltas(deltas)
+
+    async def _apply_deltas(self, deltas: Counter) -> None:
+        """Add count deltas to existing rows, creating or pruning rows as needed"""
+        touched_categories = set()
+        created = []
+
+        for (category_id, facet, name, value), delta in deltas.items():
+            if delta == 0 or category_id is None:
+                continue
+            touched_categories.add(category_id)
+
+            if delta > 0:
+                created.append({
+                    "category_id": category_id,
+                    "facet": facet,
+                    "name": name,
+                    "value": value,
+                    "numeric_value": Decimal(value) if facet == FACET_PRICE else None,
+                    "count": delta,
+                })
+                continue
+
+            await self.db.execute(
+                update(CategoryFacetCount)
+                .where(
+                    CategoryFacetCount.category_id == category_id,
+                    CategoryFacetCount.facet == facet,
+                    CategoryFacetCount.name == name,
+                    CategoryFacetCount.value == value,
+                )
+                .values(count=CategoryFacetCount.count + delta)
+                .execution_options(synchronize_session=False)
+            )
+
+        if created:
+            # One upsert for every incremented row: concurrent writers that
+            # create the same row add to it instead of colliding on the key
+            dialect = self.db.get_bind().dialect.name
+            upsert = (pg_insert if dialect == "postgresql" else sqlite_insert)(CategoryFacetCount).values(created)
+            await self.db.execute(
+                upsert.on_conflict_do_update(
+                    index_elements=["category_id", "facet", "name", "value"],
+                    set_={
+                        "count": CategoryFacetCount.count + upsert.excluded.count,
+                        "updated_at": datetime.utcnow(),
+                    },
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+        if touched_categories:
+            await self.db.flush()
+            await self.db.execute(
+                delete(CategoryFacetCount)
+                .where(
+                    CategoryFacetCount.category_id.in_(touched_categories),
+                    CategoryFacetCount.count <= 0,
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+    async def rebuild(self) -> int:
+        """
+        Recompute all facet counts and snapshots from the products table.
+
+        Returns:
+            Number of products indexed
+        """
+        try:
+            await self.db.execute(delete(CategoryFacetCount))
+            await self.db.execute(delete(ProductFacetSnapshot))
+
+            attributes = defaultdict(list)
+            result = await self.db.execute(
+                select(ProductAttribute.product_id, ProductAttribute.name, ProductAttribute.value)
+                .join(Product, Product.id == ProductAttribute.product_id)
+                .where(Product.status == ProductStatus.ACTIVE, ProductAttribute.is_visible == True)
+            )
+            for product_id, name, value in result.all():
+                attributes[product_id].append((name, value))
+
+            result = await self.db.execute(
+                select(*_PRODUCT_COLUMNS).where(
+                    Product.status == ProductStatus.ACTIVE,
+                    Product.category_id.isnot(None),
+                )
+            )
+
+            counts: Counter = Counter()
+            snapshots = []
+            for product in result.all():
+                keys = product_facet_keys(product, attributes[product.id])
+                for key in keys:
+                    counts[(product.category_id, *key)] += 1
+                snapshots.append({
+                    "product_id": product.id,
+                    "category_id": product.category_id,
+                    "keys": json.dumps(keys),
+                })
+
+            if snapshots:
+                await self.db.execute(insert(ProductFacetSnapshot), snapshots)
+            if counts:
+                await self.db.execute(insert(CategoryFacetCount), [
+                    {
+                        "category_id": category_id,
+                        "facet": facet,
+                        "name": name,
+                        "value": value,
+                        "numeric_value": Decimal(value) if facet == FACET_PRICE else None,
+                        "count": count,
+                    }
+                    for (category_id, facet, name, value), count in counts.items()
+                ])
+
+            await self.db.commit()
+            logger.info(f"Rebuilt category facets for {len(snapshots)} products")
+            return len(snapshots)
+
+        except Exception as e:
+            logger.error(f"Failed to rebuild category facets: {e}")
+            await self.db.rollback()
+            raise
+
+    async def is_populated(self) -> bool:
+        """Check whether any facet snapshots exist"""
+        result = await self.db.execute(select(ProductFacetSnapshot.product_id).limit(1))
+        return result.first() is not None
+
+    async def get_category_facets(self, category_ids: List[UUID]) -> Dict:
+        """
+        Sum the facet counts of a set of categories.
+
+        Args:
+            category_ids: Category and the subcategories to include
+
+        Returns:
+            Dict with total, in_stock, on_sale, price_min, price_max,
+            rating ({stars: count}), vendors ({vendor_id: count}) and
+            attributes ({name: {value: count}})
+        """
+        facets = {
+            "total": 0,
+            "in_stock": 0,
+            "on_sale": 0,
+            "price_min": None,
+            "price_max": None,
+            "rating": {},
+            "vendors": {},
+            "attributes": defaultdict(dict),
+        }
+
+        result = await self.db.execute(
+            select(
+                CategoryFacetCount.facet,
+                CategoryFacetCount.name,
+                CategoryFacetCount.value,
+                func.sum(CategoryFacetCount.count),
+            )
+            .where(
+                CategoryFacetCount.category_id.in_(category_ids),
+                CategoryFacetCount.facet != FACET_PRICE,
+                CategoryFacetCount.count > 0,
+            )
+            .group_by(CategoryFacetCount.facet, CategoryFacetCount.name, CategoryFacetCount.value)
+        )
+        for facet, name, value, count in result.all():
+            count = int(count)
+            if facet == FACET_TOTAL:
+                facets["total"] = count
+            elif facet == FACET_IN_STOCK:
+                facets["in_stock"] = count
+            elif facet == FACET_ON_SALE:
+                facets["on_sale"] = count
+            elif facet == FACET_RATING:
+                facets["rating"][int(value)] = count
+            elif facet == FACET_VENDOR:
+                facets["vendors"][UUID(value)] = count
+            elif facet == FACET_ATTRIBUTE:
+                facets["attributes"][name][value] = count
+
+        result = await self.db.execute(
+            select(func.min(CategoryFacetCount.numeric_value), func.max(CategoryFacetCount.numeric_value))
+            .where(
+                CategoryFacetCount.category_id.in_(category_ids),
+                CategoryFacetCount.facet == FACET_PRICE,
+                CategoryFacetCount.count > 0,
+            )
+        )
+        facets["price_min"], facets["price_max"] = result.one()
+
+        return facets
@@ -0,0 +1,115 @@
+"""
+FTS5 index maintenance
+
+Each FTS5 write adds a small segment to the index, and every query
+has to read every segment. Without maintenance, query latency creeps up as
+the catalog churns. FTS5Maintenance.run() is started from the app lifespan
+on SQLite:
+
+- Every FTS5_MERGE_INTERVAL_SECONDS it runs incremental 'merge' steps of
+  FTS5_MERGE_PAGES pages, up to FTS5_MERGE_MAX_STEPS or until nothing is
+  left to merge. Each step is short and commits on its own, so writers are
+  never blocked for long.
+- Once a day, during FTS5_OPTIMIZE_HOUR_UTC (the low-traffic hour), it runs
+  a full 'optimize' that merges everything into a single segment.
+
+automerge and crisismerge (set when the table is created) bound the
+segments between runs. Timestamps and counters are reported by
+/admin/fts5/status.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.fts5_setup import check_fts5_exists, merge_fts5_index, optimize_fts5_index
+
+logger = logging.getLogger(__name__)
+
+# A daily optimize is skipped if one ran more recently than this
+OPTIMIZE_MIN_INTERVAL = timedelta(hours=20)
+
+
+class FTS5Maintenance:
+    """Schedules incremental merges and a daily optimize of the FTS5 tables"""
+
+    def __init__(
+        self,
+        merge_interval_seconds: float,
+        merge_pages: int,
+        merge_max_steps: int,
+        optimize_hour_utc: int,
+    ):
+        self.merge_interval_seconds = merge_interval_seconds
+        self.merge_pages = merge_pages
+        self.merge_max_steps = merge_max_steps
+        self.optimize_hour_utc = optimize_hour_utc
+
+        self.merge_steps = 0
+        self.optimizations = 0
+        self.last_merge_at: Optional[datetime] = None
+        self.last_optimize_at: Optional[datetime] = None
+
+    async def merge(self, db: AsyncSession) -> int:
+        """
+        Run merge steps until one does no work or the step limit is reached.
+
+        Returns:
+            Number of steps that did work
+        """
+        steps = 0
+        while steps < self.merge_max_steps and await merge_fts5_index(db, self.merge_pages):
+            steps += 1
+        self.merge_steps += steps
+        self.last_merge_at = datetime.utcnow()
+        return steps
+
+    async def optimize(self, db: AsyncSession) -> bool:
+        """Merge the whole index into one segment"""
+        if not await optimize_fts5_index(db):
+            return False
+        self.optimizations += 1
+        self.last_optimize_at = datetime.utcnow()
+        return True
+
+    def optimize_due(self, now: datetime) -> bool:
+        """True during the optimize hour unless an optimize ran recently"""
+        if now.hour != self.optimize_hour_utc:
+            return False
+        return self.last_optimize_at is None or now - self.last_optimize_at >= OPTIMIZE_MIN_INTERVAL
+
+    async def run(self, session_factory) -> None:
+        """Merge periodically and optimize daily until cancelled"""
+        while True:
+            await asyncio.sleep(self.merge_interval_seconds)
+            try:
+                async with session_factory() as db:
+                    if not await check_fts5_exists(db):
+                        continue
+                    if self.optimize_due(datetime.utcnow()):
+                        await self.optimize(db)
+                    else:
+                        await self.merge(db)
+            except Exception as e:
+                logger.error(f"FTS5 maintenance failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Maintenance counters and timestamps of this worker"""
+        return {
+            "merge_steps": self.merge_steps,
+            "optimizations": self.optimizations,
+            "last_merge_at": self.last_merge_at.isoformat() if self.last_merge_at else None,
+            "last_optimize_at": self.last_optimize_at.isoformat() if self.last_optimize_at else None,
+        }
+
+
+fts5_maintenance = FTS5Maintenance(
+    merge_interval_seconds=settings.FTS5_MERGE_INTERVAL_SECONDS,
+    merge_pages=settings.FTS5_MERGE_PAGES,
+    merge_max_steps=settings.FTS5_MERGE_MAX_STEPS,
+    optimize_hour_utc=settings.FTS5_OPTIMIZE_HOUR_UTC,
+)
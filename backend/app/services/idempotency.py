@@ -0,0 +1,365 @@
+"""
+Idempotency-Key handling for orders and payments
+
+Clients on flaky networks retry POST /orders/ and the payment calls. A
+request sent with an Idempotency-Key header runs once per (user, endpoint,
+key); retries get the first result back:
+
+- The key is claimed with one INSERT ... ON CONFLICT DO NOTHING into
+  idempotency_keys (status in_progress) before the request runs, and
+  completed with the response status and body, kept for
+  IDEMPOTENCY_TTL_SECONDS. A request that writes calls the complete
+  callback it is given just before its own commit, so the order or payment
+  and the completed key are committed together: there is no moment where
+  the write is committed but the claim could still be taken over and run
+  again. A 5xx or unexpected error releases the claim instead, so a retry
+  runs the request again.
+- A retry of a completed request costs one lookup on the unique
+  (user_id, scope, key) index and is answered with the stored response and
+  an Idempotent-Replayed header.
+- A duplicate that arrives while the first is still running waits for it:
+  on the same worker for its completion event, on another worker by
+  polling the row, for up to IDEMPOTENCY_WAIT_SECONDS (409 after that). An
+  in-progress claim older than IDEMPOTENCY_LOCK_SECONDS is considered
+  abandoned (its worker died) and may be taken over. A takeover deletes the
+  old row and inserts a new one, and a request completes or releases only
+  the row id it claimed, so a slow first owner finishing after a takeover
+  cannot overwrite or drop the new owner's claim.
+- Reusing a key with a different request body is rejected with 422.
+
+IdempotencyStore.run() deletes expired rows every
+IDEMPOTENCY_PURGE_INTERVAL_SECONDS; it is started from the app lifespan.
+"""
+
+from datetime import datetime, timedelta
+from hashlib import sha256
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from uuid import UUID
+import asyncio
+import json
+import logging
+import time
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.idempotency_key import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+# How often a duplicate re-reads a claim held by another worker
+POLL_INTERVAL_SECONDS = 0.2
+
+# Stores the response in the operation's transaction, before its commit
+Complete = Callable[[Any], Awaitable[None]]
+
+
+async def _no_completion(result: Any) -> None:
+    """Completion of a request sent without a key: nothing to store"""
+
+
+def request_fingerprint(scope: str, body: Any) -> str:
+    """SHA-256 of the endpoint and the canonical JSON of the request body"""
+    payload = json.dumps(jsonable_encoder(body), sort_keys=True, separators=(",", ":"))
+    return sha256(f"{scope}\n{payload}".encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """Runs keyed requests once and replays their stored responses"""
+
+    def __init__(
+        self,
+        ttl_seconds: int,
+        lock_seconds: float,
+        wait_seconds: float,
+        purge_interval_seconds: float,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.lock_seconds = lock_seconds
+        self.wait_seconds = wait_seconds
+        self.purge_interval_seconds = purge_interval_seconds
+
+        # Completion events of the requests this worker is running
+        self._in_flight: Dict[Tuple[UUID, str, str], asyncio.Event] = {}
+
+        self.executions = 0
+        self.replays = 0
+        self.waits = 0
+        self.purged = 0
+        self.last_purge_at: Optional[datetime] = None
+
+    async def run_once(
+        self,
+        db: AsyncSession,
+        user_id: UUID,
+        scope: str,
+        key: Optional[str],
+        body: Any,
+        operation: Callable[[Complete], Awaitable[Any]],
+        status_code: int = 200,
+    ) -> Any:
+        """
+        Run operation once per (user_id, scope, key).
+
+        Args:
+            db: The request's session (committed here)
+            user_id: User sending the request
+            scope: Endpoint name, e.g. "orders.create"
+            key: Idempotency-Key header; without one, operation just runs
+            body: Request body, fingerprinted to detect a reused key
+            operation: Runs the request and returns its response; given
+                a complete(response) callback to await right before its
+                commit, so the key completes in the same transaction
+            status_code: Status the endpoint answers with on success
+
+        Returns:
+            The operation's result, or a JSONResponse replaying the stored one
+
+        Raises:
+            HTTPException: 400 for an overlong key, 422 for a key reused
+                with another body, 409 if the first request is still
+                running after IDEMPOTENCY_WAIT_SECONDS
+        """
+        if key is None:
+            return await operation(_no_completion)
+        if not key or len(key) > 255:
+            raise HTTPException(status_code=400, detail="Idempotency-Key must be 1 to 255 characters")
+
+        ident = (user_id, scope, key)
+        fingerprint = request_fingerprint(scope, body)
+        deadline = time.monotonic() + self.wait_seconds
+        waited = False
+
+        while True:
+            row = await self._lookup(db, ident)
+            if row is None:
+                claim_id = await self._claim(db, ident, fingerprint)
+                if claim_id is not None:
+                    break
+                continue
+
+            if row.fingerprint != fingerprint:
+                raise HTTPException(
+                    status_code=422,
+                    detail="Idempotency-Key was already used with a different request"
+                )
+            if row.status == COMPLETED:
+                self.replays += 1
+                return JSONResponse(
+                    status_code=row.response_status,
+                    content=json.loads(row.response_body),
+                    headers={REPLAYED_HEADER: "true"},
+                )
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise HTTPException(
+                    status_code=409,
+                    detail="A request with this Idempotency-Key is still in progress"
+                )
+            if not waited:
+                self.waits += 1
+                waited = True
+            # Do not sit in a transaction while waiting
+            await db.commit()
+            await self._wait(ident, remaining)
+
+        event = self._in_flight[ident] = asyncio.Event()
+        try:
+            return await self._execute(db, claim_id, operation, status_code)
+        finally:
+            event.set()
+            if self._in_flight.get(ident) is event:
+                del self._in_flight[ident]
+
+    async def _lookup(self, db: AsyncSession, ident: Tuple[UUID, str, str]):
+        """The key's live row, dropping it first if it expired or was abandoned"""
+        user_id, scope, key = ident
+        result = await db.execute(
+            select(
+                IdempotencyKey.id, IdempotencyKey.fingerprint, IdempotencyKey.status,
+                IdempotencyKey.response_status, IdempotencyKey.response_body, IdempotencyKey.expires_at,
+            )
+            .where(IdempotencyKey.user_id == user_id, IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+        )
+        row = result.first()
+        if row is None or row.expires_at > datetime.utcnow():
+            return row
+
+        # Conditional on the row read, so only one retry takes it over
+        await db.execute(
+            delete(IdempotencyKey)
+            .where(IdempotencyKey.id == row.id, IdempotencyKey.expires_at == row.expires_at)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return None
+
+    async def _claim(self, db: AsyncSession, ident: Tuple[UUID, str, str], fingerprint: str) -> Optional[UUID]:
+        """Insert the in-progress row; its id, or None if another request got there first"""
+        user_id, scope, key = ident
+        dialect = db.get_bind().dialect.name
+        insert = pg_insert if dialect == "postgresql" else sqlite_insert
+        result = await db.execute(
+            insert(IdempotencyKey)
+            .values(
+                user_id=user_id,
+                scope=scope,
+                key=key,
+                fingerprint=fingerprint,
+                status=IN_PROGRESS,
+                expires_at=datetime.utcnow() + timedelta(seconds=self.lock_seconds),
+            )
+            .on_conflict_do_nothing()
+            .returning(IdempotencyKey.id)
+        )
+        claim_id = result.scalar()
+        await db.commit()
+        return claim_id
+
+    async def _wait(self, ident: Tuple[UUID, str, str], timeout: float) -> None:
+        """Wait for the request holding the key to finish, or a poll interval"""
+        event = self._in_flight.get(ident)
+        if event is None:
+            await asyncio.sleep(min(timeout, POLL_INTERVAL_SECONDS))
+            return
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _execute(
+        self,
+        db: AsyncSession,
+        claim_id: UUID,
+        operation: Callable[[Complete], Awaitable[Any]],
+        status_code: int,
+    ) -> Any:
+        """Run the claimed request and store its response, or release the claim"""
+        completed = False
+
+        async def complete(result: Any) -> None:
+            nonlocal completed
+            if not await self._store(db, claim_id, status_code, jsonable_encoder(result)):
+                # Another request runs it now; roll back rather than run twice
+                raise HTTPException(
+                    status_code=409,
+                    detail="A request with this Idempotency-Key is still in progress"
+                )
+            completed = True
+
+        self.executions += 1
+        try:
+            result = await operation(complete)
+        except HTTPException as e:
+            await db.rollback()
+            if e.status_code < 500:
+                await self._complete(db, claim_id, e.status_code, {"detail": e.detail})
+            else:
+                await self._release(db, claim_id)
+            raise
+        except Exception:
+            await db.rollback()
+            await self._release(db, claim_id)
+            raise
+
+        if not completed:
+            # The operation wrote nothing of its own to commit with the key
+            await self._complete(db, claim_id, status_code, jsonable_encoder(result))
+        return result
+
+    async def _complete(self, db: AsyncSession, claim_id: UUID, status_code: int, content: Any) -> None:
+        """Store the response on our claim and commit, unless it was taken over meanwhile"""
+        stored = await self._store(db, claim_id, status_code, content)
+        await db.commit()
+        if not stored:
+            logger.warning(f"Idempotency claim {claim_id} was taken over before its request finished")
+
+    async def _store(self, db: AsyncSession, claim_id: UUID, status_code: int, content: Any) -> bool:
+        """Mark our claim completed with the response, without committing; False if it was taken over"""
+        result = await db.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.id == claim_id, IdempotencyKey.status == IN_PROGRESS)
+            .values(
+                status=COMPLETED,
+                response_status=status_code,
+                response_body=json.dumps(content),
+                expires_at=datetime.utcnow() + timedelta(seconds=self.ttl_seconds),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return bool(result.rowcount)
+
+    async def _release(self, db: AsyncSession, claim_id: UUID) -> None:
+        """Drop our claim so a retry runs the request again"""
+        await db.execute(
+            delete(IdempotencyKey)
+            .where(IdempotencyKey.id == claim_id, IdempotencyKey.status == IN_PROGRESS)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+
+    async def purge(self, db: AsyncSession, now: Optional[datetime] = None) -> int:
+        """
+        Delete expired keys and abandoned claims.
+
+        Args:
+            db: Session to write with (committed here)
+            now: Current time (UTC); defaults to utcnow()
+
+        Returns:
+            Rows deleted
+        """
+        now = now or datetime.utcnow()
+        result = await db.execute(
+            delete(IdempotencyKey)
+            .where(IdempotencyKey.expires_at <= now)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+
+        deleted = result.rowcount or 0
+        self.purged += deleted
+        self.last_purge_at = now
+        return deleted
+
+    async def run(self, session_factory) -> None:
+        """Purge periodically until cancelled"""
+        while True:
+            await asyncio.sleep(self.purge_interval_seconds)
+            try:
+                async with session_factory() as db:
+                    await self.purge(db)
+            except Exception as e:
+                logger.error(f"Failed to purge idempotency keys: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters of this worker's idempotency store"""
+        return {
+            "executions": self.executions,
+            "replays": self.replays,
+            "waits": self.waits,
+            "in_flight": len(self._in_flight),
+            "purged": self.purged,
+            "last_purge_at": self.last_purge_at.isoformat() if self.last_purge_at else None,
+        }
+
+
+idempotency_store = IdempotencyStore(
+    ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+    lock_seconds=settings.IDEMPOTENCY_LOCK_SECONDS,
+    wait_seconds=settings.IDEMPOTENCY_WAIT_SECONDS,
+    purge_interval_seconds=settings.IDEMPOTENCY_PURGE_INTERVAL_SECONDS,
+)
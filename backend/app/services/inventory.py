@@ -0,0 +1,318 @@
+"""
+Stock reservation for checkout
+
+Checkout takes stock with a single conditional UPDATE across every SKU of
+the order:
+
+    UPDATE products
+    SET quantity = quantity - CASE id WHEN :a THEN :n_a ... END, ...
+    WHERE id IN (...) AND quantity - reserved_quantity >= CASE id WHEN :a THEN :n_a ... END
+    RETURNING id, quantity
+
+The database checks and decrements each row atomically, so concurrent
+checkouts of the same SKU cannot both take the last units, whatever they
+read earlier. A product missing from RETURNING is short; the caller rolls
+the transaction back, undoing the rows that were decremented, and the order
+fails as a whole.
+
+Holds: when a customer starts checking out, hold_stock() sets units aside
+for their cart for STOCK_HOLD_TTL_SECONDS, so a sold-out item is reported
+before addresses are filled in rather than at the end. A hold is a
+stock_reservations row plus its units in products.reserved_quantity, the
+per-SKU counter that makes quantity - reserved_quantity the
+available-to-sell count read by the cart and by every conditional UPDATE.
+Placing the order converts the cart's holds (reserve_stock with cart_id);
+StockReaper.run(), started from the app lifespan, releases expired holds in
+bulk every STOCK_HOLD_REAP_INTERVAL_SECONDS.
+
+Holds are claimed with DELETE ... RETURNING, so a hold is released exactly
+once, by the order or by the reaper. Every write to a product row is a
+single statement in a short transaction; no row lock is held while the
+customer is on the checkout page, so hot SKUs do not queue up behind
+pending checkouts.
+
+On PostgreSQL every multi-row product UPDATE here (taking, holding,
+releasing and reaping) locks its rows in id order first (FOR UPDATE in the
+subquery), so two of them cannot deadlock on each other. SQLite
+serializes writers on the database lock.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+import asyncio
+import logging
+
+from sqlalchemy import case, delete, func, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.product import Product
+from app.models.stock_reservation import StockReservation
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientStock(Exception):
+    """Raised when an order asks for more than is in stock"""
+
+    def __init__(self, product_ids: List[UUID]):
+        self.product_ids = product_ids
+        super().__init__(f"Insufficient stock for {len(product_ids)} product(s)")
+
+
+def _per_product(quantities: Dict[UUID, int]):
+    """CASE expression giving each product's quantity (0 for other products)"""
+    if not quantities:
+        return 0
+    return case(*[(Product.id == product_id, n) for product_id, n in quantities.items()], else_=0)
+
+
+def _locked(product_ids: List[UUID]):
+    """The products' ids, locked in id order on databases that support it"""
+    return (
+        select(Product.id)
+        .where(Product.id.in_(product_ids))
+        .order_by(Product.id)
+        .with_for_update()
+    )
+
+
+async def _take_holds(db: AsyncSession, condition) -> Dict[UUID, int]:
+    """Delete the matching holds and return their units per product"""
+    result = await db.execute(
+        delete(StockReservation)
+        .where(condition)
+        .returning(StockReservation.product_id, StockReservation.quantity)
+        .execution_options(synchronize_session=False)
+    )
+    held: Dict[UUID, int] = {}
+    for product_id, quantity in result.all():
+        held[product_id] = held.get(product_id, 0) + quantity
+    return held
+
+
+async def _take_available(
+    db: AsyncSession,
+    quantities: Dict[UUID, int],
+    released: Dict[UUID, int],
+    values: Dict[str, Any]
+) -> Dict[UUID, int]:
+    """
+    One conditional UPDATE of the products in quantities and released:
+    `released` held units count as available again, every product in
+    quantities must have its units available, and `values` are applied.
+    Products only in released are not checked: their holds are already
+    deleted, so their units must go back even if the vendor cut quantity
+    below what other carts hold.
+
+    Returns the updated products' new quantities.
+    """
+    product_ids = list(set(quantities) | set(released))
+    if not product_ids:
+        return {}
+
+    result = await db.execute(
+        update(Product)
+        .where(
+            Product.id.in_(_locked(product_ids)),
+            or_(
+                Product.id.notin_(list(quantities)),
+                Product.quantity - Product.reserved_quantity + _per_product(released) >= _per_product(quantities),
+            ),
+        )
+        .values(**values)
+        .returning(Product.id, Product.quantity)
+        .execution_options(synchronize_session=False)
+    )
+    taken = dict(result.all())
+
+    short = [product_id for product_id in quantities if product_id not in taken]
+    if short:
+        raise InsufficientStock(short)
+    return taken
+
+
+async def reserve_stock(
+    db: AsyncSession,
+    quantities: Dict[UUID, int],
+    cart_id: Optional[UUID] = None
+) -> List[UUID]:
+    """
+    Take stock for an order in one statement and count the sales.
+
+    With a cart_id, the cart's holds are claimed in the same transaction:
+    held units count as available to this order, and any the order does
+    not use go back on sale.
+
+    Does not commit. On InsufficientStock some rows may already be
+    decremented; the caller must roll back.
+
+    Args:
+        db: Database session
+        quantities: Units to take per product (inventory-tracked products only)
+        cart_id: Cart whose holds the order converts
+
+    Returns:
+        The products the order sold out
+
+    Raises:
+        InsufficientStock: With the products that do not have enough units
+    """
+    held = await _take_holds(db, StockReservation.cart_id == cart_id) if cart_id else {}
+    amount = _per_product(quantities)
+    remaining = await _take_available(db, quantities, held, {
+        "quantity": Product.quantity - amount,
+        "reserved_quantity": Product.reserved_quantity - _per_product(held),
+        "sales_count": Product.sales_count + amount,
+    })
+    return [product_id for product_id in quantities if remaining[product_id] <= 0]
+
+
+async def hold_stock(
+    db: AsyncSession,
+    cart_id: UUID,
+    quantities: Dict[UUID, int],
+    ttl_seconds: int
+) -> datetime:
+    """
+    Hold stock for a cart's checkout, replacing the cart's previous holds.
+
+    Does not commit. On InsufficientStock the caller must roll back, which
+    also keeps the previous holds.
+
+    Args:
+        db: Database session
+        cart_id: Cart checking out
+        quantities: Units to hold per product (inventory-tracked products only)
+        ttl_seconds: How long the holds last
+
+    Returns:
+        When the holds expire
+
+    Raises:
+        InsufficientStock: With the products that do not have enough units
+    """
+    previous = await _take_holds(db, StockReservation.cart_id == cart_id)
+    await _take_available(db, quantities, previous, {
+        "reserved_quantity": Product.reserved_quantity - _per_product(previous) + _per_product(quantities),
+    })
+
+    expires_at = datetime.utcnow() + timedelta(seconds=ttl_seconds)
+    if quantities:
+        await db.execute(insert(StockReservation), [
+            {"product_id": product_id, "cart_id": cart_id, "quantity": n, "expires_at": expires_at}
+            for product_id, n in quantities.items()
+        ])
+    return expires_at
+
+
+async def release_stock(db: AsyncSession, quantities: Dict[UUID, int]) -> List[UUID]:
+    """
+    Put units back in stock (e.g. for a cancelled order), in one statement.
+
+    Does not commit.
+
+    Args:
+        db: Database session
+        quantities: Units to return per product
+
+    Returns:
+        The products that were sold out and are back in stock
+    """
+    if not quantities:
+        return []
+
+    amount = _per_product(quantities)
+    result = await db.execute(
+        update(Product)
+        .where(Product.id.in_(_locked(list(quantities))))
+        .values(quantity=Product.quantity + amount)
+        .returning(Product.id, Product.quantity)
+        .execution_options(synchronize_session=False)
+    )
+    return [product_id for product_id, quantity in result.all() if quantity - quantities[product_id] <= 0]
+
+
+async def available_to_cart(db: AsyncSession, product: Product, cart_id: UUID) -> int:
+    """
+    Units of a product the cart can have: what is on sale plus what the
+    cart itself holds.
+
+    Args:
+        db: Database session
+        product: Loaded product
+        cart_id: Cart asking
+
+    Returns:
+        Available units
+    """
+    available = product.available_quantity
+    if product.reserved_quantity:
+        result = await db.execute(
+            select(func.coalesce(func.sum(StockReservation.quantity), 0))
+            .where(StockReservation.cart_id == cart_id, StockReservation.product_id == product.id)
+        )
+        available += result.scalar()
+    return available
+
+
+class StockReaper:
+    """Releases expired checkout holds in bulk"""
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+
+        self.runs = 0
+        self.released_units = 0
+        self.last_run_at: Optional[datetime] = None
+
+    async def reap(self, db: AsyncSession, now: Optional[datetime] = None) -> int:
+        """
+        Delete every expired hold and subtract its units from the products'
+        reserved counts: one DELETE and one UPDATE, committed together.
+
+        Args:
+            db: Session to write with (committed here)
+            now: Current time (UTC); defaults to utcnow()
+
+        Returns:
+            Units released
+        """
+        now = now or datetime.utcnow()
+        expired = await _take_holds(db, StockReservation.expires_at <= now)
+        if expired:
+            await db.execute(
+                update(Product)
+                .where(Product.id.in_(_locked(list(expired))))
+                .values(reserved_quantity=Product.reserved_quantity - _per_product(expired))
+                .execution_options(synchronize_session=False)
+            )
+        await db.commit()
+
+        units = sum(expired.values())
+        self.runs += 1
+        self.released_units += units
+        self.last_run_at = now
+        return units
+
+    async def run(self, session_factory) -> None:
+        """Reap periodically until cancelled"""
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                async with session_factory() as db:
+                    await self.reap(db)
+            except Exception as e:
+                logger.error(f"Failed to release expired stock holds: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Run counters of this worker's reaper"""
+        return {
+            "runs": self.runs,
+            "released_units": self.released_units,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+        }
+
+
+stock_reaper = StockReaper(interval_seconds=settings.STOCK_HOLD_REAP_INTERVAL_SECONDS)
@@ -2,8 +2,13 @@
 Notification service for Channah Marketplace.
 
 Creates in-app notifications and triggers associated emails.
+
+The notify_* helpers run as outbox handlers: the blocking SMTP send runs in
+a thread, and a failed send raises EmailDeliveryError so the outbox retries
+the event instead of recording the notification as done.
 """
 
+import asyncio
 import logging
 from typing import Optional
 from uuid import UUID
@@ -12,6 +17,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.notification import Notification, NotificationType
 from app.services.email import (
+    EmailDeliveryError,
     send_welcome_email,
     send_order_confirmation_email,
     send_order_status_email,
@@ -59,7 +65,7 @@ async def notify_welcome(
     first_name: str,
 ) -> None:
     """Send welcome notification + email after registration."""
-    email_sent = send_welcome_email(email, first_name)
+    email_sent = await asyncio.to_thread(send_welcome_email, email, first_name)
 
     await _create_notification(
         db=db,
@@ -85,9 +91,11 @@ async def notify_order_confirmed(
     total: float,
     currency: str = "USD",
     estimated_delivery: Optional[str] = None,
+    shipping_address: Optional[dict] = None,
 ) -> None:
     """Send order confirmation notification + email."""
-    email_sent = send_order_confirmation_email(
+    email_sent = await asyncio.to_thread(
+        send_order_confirmation_email,
         to_email=email,
         first_name=first_name,
         order_number=order_number,
@@ -96,6 +104,7 @@ async def notify_order_confirmed(
         shipping=shipping,
         tax=tax,
         total=total,
+        shipping_address=shipping_address or {},
         currency=currency,
         estimated_delivery=estimated_delivery,
     )
@@ -127,7 +136,8 @@ async def notify_order_status_change(
     """Send order status update notification + email."""
     status_display = new_status.replace("_", " ").title()
 
-    email_sent = send_order_status_email(
+    email_sent = await asyncio.to_thread(
+        send_order_status_email,
         to_email=email,
         first_name=first_name,
         order_number=order_number,
@@ -164,4 +174,8 @@ def trigger_password_reset_email(
     reset_token: str,
 ) -> bool:
     """Send password reset email (no DB notification for this)."""
-    return send_password_reset_email(email, first_name, reset_token)
+    try:
+        return send_password_reset_email(email, first_name, reset_token)
+    except EmailDeliveryError:
+        # Already logged; the user can request another reset
+        return False
@@ -0,0 +1,380 @@
+"""
+Transactional outbox for order side effects
+
+Order confirmation and status emails, welcome emails and vendor balance
+credits used to run inside the API process (FastAPI BackgroundTasks, or
+inline in the request). They are now queued with enqueue() in the same
+transaction as the change that causes them: the event exists exactly when
+the change is committed, and nothing is lost if a process restarts.
+
+OutboxWorker consumes the outbox in its own process (outbox_worker.py, an
+outbox_worker service in docker-compose), so API workers spend no time on
+side effects. For local development, OUTBOX_RUN_IN_API=true (as in
+.env.example) runs it in the app lifespan instead, with a warning:
+
+- A batch runs up to OUTBOX_BATCH_SIZE due events. Each is leased just
+  before its handler runs, with one UPDATE ... RETURNING that counts the
+  attempt and hides the event for OUTBOX_LEASE_SECONDS, so events waiting
+  behind a slow handler are not leased yet. On PostgreSQL the row is picked
+  with FOR UPDATE SKIP LOCKED, so several workers split the backlog. An
+  event whose worker dies mid-attempt is taken again once its lease runs
+  out.
+- Each event's handler runs in its own transaction, which also marks the
+  event done, but only if the attempt still owns it (still pending, with
+  the attempt count it was leased with). If the lease ran out and another
+  worker took the event meanwhile, the handler's writes are rolled back.
+  Database-only handlers (vendor credits) therefore apply once; emails are
+  sent at least once.
+- A failed attempt is retried after OUTBOX_BACKOFF_BASE_SECONDS, doubling
+  per attempt up to OUTBOX_BACKOFF_MAX_SECONDS. After OUTBOX_MAX_ATTEMPTS the
+  event is marked dead and kept with its last error until an admin retries
+  it (/admin/outbox/{event_id}/retry).
+- Processed events are pruned after OUTBOX_RETENTION_DAYS.
+
+Events with a dedupe_key are queued once, so a handler that must not run
+twice for the same thing (crediting a delivered item) is keyed by it.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+from uuid import UUID
+import asyncio
+import json
+import logging
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.order import OrderItem
+from app.models.outbox_event import OutboxEvent
+from app.models.vendor import Vendor
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+DONE = "done"
+DEAD = "dead"
+
+# Processed events are pruned at most this often
+PRUNE_INTERVAL = timedelta(hours=1)
+
+Handler = Callable[[AsyncSession, Dict[str, Any]], Awaitable[None]]
+
+# event type -> handler; handlers write with the session given and do not
+# commit
+HANDLERS: Dict[str, Handler] = {}
+
+
+def handles(event_type: str):
+    """Register the decorated coroutine as the handler of event_type"""
+    def register(handler: Handler) -> Handler:
+        HANDLERS[event_type] = handler
+        return handler
+    return register
+
+
+async def enqueue(
+    db: AsyncSession,
+    event_type: str,
+    payload: Dict[str, Any],
+    dedupe_key: Optional[str] = None
+) -> None:
+    """
+    Queue an event in the caller's transaction.
+
+    Does not commit: the event is written with the caller's changes or not
+    at all.
+
+    Args:
+        db: Database session
+        event_type: Registered event type, e.g. "order.confirmed"
+        payload: JSON-serializable handler arguments
+        dedupe_key: If an event with this key was already queued, do nothing
+    """
+    insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    await db.execute(
+        insert(OutboxEvent)
+        .values(
+            event_type=event_type,
+            payload=json.dumps(jsonable_encoder(payload)),
+            dedupe_key=dedupe_key,
+        )
+        .on_conflict_do_nothing()
+    )
+
+
+async def queue_vendor_credit(db: AsyncSession, order_item_id: UUID) -> None:
+    """Queue the credit of a delivered item's earnings to its vendor, once per item"""
+    await enqueue(
+        db, "order_item.delivered", {"order_item_id": order_item_id},
+        dedupe_key=f"order_item.delivered:{order_item_id}",
+    )
+
+
+class OutboxWorker:
+    """Runs queued side effects in batches, with retries and dead-lettering"""
+
+    def __init__(
+        self,
+        batch_size: int,
+        poll_interval_seconds: float,
+        lease_seconds: float,
+        max_attempts: int,
+        backoff_base_seconds: float,
+        backoff_max_seconds: float,
+        retention_days: int,
+        handlers: Optional[Dict[str, Handler]] = None,
+    ):
+        self.batch_size = batch_size
+        self.poll_interval_seconds = poll_interval_seconds
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.retention_days = retention_days
+        self.handlers = HANDLERS if handlers is None else handlers
+
+        self.batches = 0
+        self.processed = 0
+        self.retried = 0
+        self.dead = 0
+        self.lost = 0
+        self.pruned = 0
+        self.last_batch_at: Optional[datetime] = None
+        self.last_prune_at: Optional[datetime] = None
+
+    def backoff(self, attempts: int) -> timedelta:
+        """Delay before the attempt after `attempts` failed ones"""
+        seconds = self.backoff_base_seconds * 2 ** (attempts - 1)
+        return timedelta(seconds=min(seconds, self.backoff_max_seconds))
+
+    async def process_batch(self, db: AsyncSession, now: Optional[datetime] = None) -> int:
+        """
+        Run up to batch_size due events, leasing each just before it runs.
+
+        Args:
+            db: Session to work with (committed here)
+            now: Current time (UTC); defaults to utcnow()
+
+        Returns:
+            Number of events taken
+        """
+        now = now or datetime.utcnow()
+        taken = 0
+        while taken < self.batch_size:
+            event = await self._lease(db, now)
+            if event is None:
+                break
+            taken += 1
+            await self._handle(db, event, now)
+
+        self.batches += 1
+        self.last_batch_at = now
+        return taken
+
+    async def _lease(self, db: AsyncSession, now: datetime):
+        """Take the oldest due event for one attempt, or None if none is due"""
+        due = (
+            select(OutboxEvent.id)
+            .where(OutboxEvent.status == PENDING, OutboxEvent.available_at <= now)
+            .order_by(OutboxEvent.available_at, OutboxEvent.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        result = await db.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.id.in_(due), OutboxEvent.status == PENDING)
+            .values(
+                attempts=OutboxEvent.attempts + 1,
+                available_at=datetime.utcnow() + timedelta(seconds=self.lease_seconds),
+            )
+            .returning(OutboxEvent.id, OutboxEvent.event_type, OutboxEvent.payload, OutboxEvent.attempts)
+            .execution_options(synchronize_session=False)
+        )
+        event = result.first()
+        await db.commit()
+        return event
+
+    def _owned(self, event):
+        """Update of the event, matching only while this attempt still owns it"""
+        return (
+            update(OutboxEvent)
+            .where(
+                OutboxEvent.id == event.id,
+                OutboxEvent.status == PENDING,
+                OutboxEvent.attempts == event.attempts,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    async def _handle(self, db: AsyncSession, event, now: datetime) -> None:
+        """Run one event's handler and mark it done, or schedule its retry"""
+        try:
+            handler = self.handlers.get(event.event_type)
+            if handler is None:
+                raise LookupError(f"No handler for {event.event_type}")
+            await handler(db, json.loads(event.payload))
+            result = await db.execute(
+                self._owned(event).values(status=DONE, processed_at=datetime.utcnow(), last_error=None)
+            )
+            if not result.rowcount:
+                await db.rollback()
+                self.lost += 1
+                logger.warning(f"Outbox event {event.id} ({event.event_type}) lease expired before its handler finished")
+                return
+            await db.commit()
+            self.processed += 1
+            return
+        except Exception as e:
+            await db.rollback()
+            error = f"{type(e).__name__}: {e}"
+
+        values: Dict[str, Any] = {"last_error": error}
+        if event.attempts >= self.max_attempts:
+            values["status"] = DEAD
+        else:
+            values["available_at"] = now + self.backoff(event.attempts)
+        result = await db.execute(self._owned(event).values(**values))
+        await db.commit()
+        if not result.rowcount:
+            self.lost += 1
+            logger.warning(f"Outbox event {event.id} ({event.event_type}) lease expired before its handler failed: {error}")
+        elif event.attempts >= self.max_attempts:
+            self.dead += 1
+            logger.error(f"Outbox event {event.id} ({event.event_type}) is dead after {event.attempts} attempts: {error}")
+        else:
+            self.retried += 1
+            logger.warning(f"Outbox event {event.id} ({event.event_type}) failed, will retry: {error}")
+
+    async def prune(self, db: AsyncSession, now: Optional[datetime] = None) -> int:
+        """Delete events processed more than OUTBOX_RETENTION_DAYS ago"""
+        now = now or datetime.utcnow()
+        result = await db.execute(
+            delete(OutboxEvent)
+            .where(
+                OutboxEvent.status == DONE,
+                OutboxEvent.processed_at < now - timedelta(days=self.retention_days),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+
+        deleted = result.rowcount or 0
+        self.pruned += deleted
+        self.last_prune_at = now
+        return deleted
+
+    async def run(self, session_factory) -> None:
+        """Process batches until cancelled, sleeping when the outbox is drained"""
+        while True:
+            taken = 0
+            try:
+                async with session_factory() as db:
+                    taken = await self.process_batch(db)
+                    now = datetime.utcnow()
+                    if self.last_prune_at is None or now - self.last_prune_at >= PRUNE_INTERVAL:
+                        await self.prune(db, now)
+            except Exception as e:
+                logger.error(f"Outbox batch failed: {e}")
+            if taken < self.batch_size:
+                await asyncio.sleep(self.poll_interval_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch and outcome counters of this worker"""
+        return {
+            "batches": self.batches,
+            "processed": self.processed,
+            "retried": self.retried,
+            "dead": self.dead,
+            "lost": self.lost,
+            "pruned": self.pruned,
+            "last_batch_at": self.last_batch_at.isoformat() if self.last_batch_at else None,
+        }
+
+
+async def outbox_status(db: AsyncSession) -> Dict[str, Any]:
+    """Events per status and the age of the oldest pending one"""
+    result = await db.execute(
+        select(OutboxEvent.status, func.count(), func.min(OutboxEvent.created_at))
+        .group_by(OutboxEvent.status)
+    )
+    counts = {PENDING: 0, DONE: 0, DEAD: 0}
+    oldest_pending = None
+    for status, count, oldest in result.all():
+        counts[status] = count
+        if status == PENDING:
+            oldest_pending = oldest
+    return {
+        "events": counts,
+        "oldest_pending_at": oldest_pending.isoformat() if oldest_pending else None,
+    }
+
+
+outbox_worker = OutboxWorker(
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    poll_interval_seconds=settings.OUTBOX_POLL_INTERVAL_SECONDS,
+    lease_seconds=settings.OUTBOX_LEASE_SECONDS,
+    max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+    backoff_base_seconds=settings.OUTBOX_BACKOFF_BASE_SECONDS,
+    backoff_max_seconds=settings.OUTBOX_BACKOFF_MAX_SECONDS,
+    retention_days=settings.OUTBOX_RETENTION_DAYS,
+)
+
+
+# ---------------------------------------------------------------------------
+# Handlers
+# ---------------------------------------------------------------------------
+
+@handles("user.registered")
+async def _welcome(db: AsyncSession, payload: Dict[str, Any]) -> None:
+    from app.services.notifications import notify_welcome
+
+    await notify_welcome(db, UUID(payload["user_id"]), payload["email"], payload["first_name"])
+
+
+@handles("order.confirmed")
+async def _order_confirmed(db: AsyncSession, payload: Dict[str, Any]) -> None:
+    from app.services.notifications import notify_order_confirmed
+
+    await notify_order_confirmed(
+        db=db, **{**payload, "user_id": UUID(payload["user_id"]), "order_id": UUID(payload["order_id"])}
+    )
+
+
+@handles("order.status_changed")
+async def _order_status_changed(db: AsyncSession, payload: Dict[str, Any]) -> None:
+    from app.services.notifications import notify_order_status_change
+
+    await notify_order_status_change(
+        db=db, **{**payload, "user_id": UUID(payload["user_id"]), "order_id": UUID(payload["order_id"])}
+    )
+
+
+async def _credit_vendor(db: AsyncSession, vendor_id: UUID, total, vendor_amount) -> None:
+    await db.execute(
+        update(Vendor)
+        .where(Vendor.id == vendor_id)
+        .values(
+            total_sales=Vendor.total_sales + total,
+            total_earnings=Vendor.total_earnings + vendor_amount,
+            balance=Vendor.balance + vendor_amount,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+@handles("order_item.delivered")
+async def _credit_delivered_item(db: AsyncSession, payload: Dict[str, Any]) -> None:
+    """Credit the vendor with a delivered item's earnings"""
+    result = await db.execute(
+        select(OrderItem.vendor_id, OrderItem.total, OrderItem.vendor_amount)
+        .where(OrderItem.id == UUID(payload["order_item_id"]))
+    )
+    item = result.first()
+    if item is not None and item.vendor_id:
+        await _credit_vendor(db, item.vendor_id, item.total, item.vendor_amount)
+
@@ -0,0 +1,18 @@
+"""
+Product detail cache
+
+Holds the serialized ProductResponse of recently viewed products, keyed by
+both "id:<uuid>" and "slug:<slug>" and tagged with the product ID. Every
+endpoint that changes a product calls products_changed() (see
+product_events.py) after committing, which drops both keys on this worker;
+other workers pick the change up when their entry's TTL runs out.
+"""
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+
+product_detail_cache = LRUCache(
+    "product_detail",
+    max_entries=settings.PRODUCT_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.PRODUCT_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,99 @@
+"""
+Product card projection
+
+List pages render products as cards: a handful of product columns plus the
+primary image URL, the vendor's business name and the category name.
+card_query() selects exactly those values in one statement (outer joins for
+vendor and category, a correlated subquery on the (product_id, sort_order)
+index for the image), so list endpoints neither run extra eager-load queries
+nor hydrate Product objects and their relationship collections.
+
+Rows expose the Product columns under their attribute names, so they work
+with keyset_paginate/next_cursor like ORM objects do.
+"""
+
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from app.models.category import Category
+from app.models.product import Product, ProductImage
+from app.models.vendor import Vendor
+from app.schemas.product import ProductListResponse
+
+CARD_COLUMNS = (
+    Product.id,
+    Product.name,
+    Product.slug,
+    Product.price,
+    Product.compare_at_price,
+    Product.currency,
+    Product.quantity,
+    Product.status,
+    Product.rating,
+    Product.review_count,
+    Product.sales_count,
+    Product.created_at,
+)
+
+
+def primary_image_url():
+    """URL of the first image of the product in the enclosing query"""
+    return (
+        select(ProductImage.url)
+        .where(ProductImage.product_id == Product.id)
+        .order_by(ProductImage.sort_order)
+        .limit(1)
+        .correlate(Product)
+        .scalar_subquery()
+    )
+
+
+def card_query(*extra_columns):
+    """
+    Select product cards; filter, order and paginate it like select(Product).
+
+    Args:
+        extra_columns: Further Product columns the caller needs on each row
+            (e.g. a sort column, or shipping_cost for the cart)
+    """
+    # Aliased so filters that join Category/Vendor themselves do not collide
+    vendor = aliased(Vendor)
+    category = aliased(Category)
+
+    known = {column.key for column in CARD_COLUMNS}
+    extra = [column for column in extra_columns if column.key not in known]
+
+    return (
+        select(
+            *CARD_COLUMNS,
+            *extra,
+            primary_image_url().label("primary_image"),
+            vendor.business_name.label("vendor_name"),
+            category.name.label("category_name"),
+        )
+        .select_from(Product)
+        .outerjoin(vendor, vendor.id == Product.vendor_id)
+        .outerjoin(category, category.id == Product.category_id)
+    )
+
+
+def card_from_row(row: Any) -> ProductListResponse:
+    """ProductListResponse for a card_query() row"""
+    return ProductListResponse(
+        id=row.id,
+        name=row.name,
+        slug=row.slug,
+        price=row.price,
+        compare_at_price=row.compare_at_price,
+        currency=row.currency,
+        quantity=row.quantity,
+        status=row.status.value,
+        rating=row.rating,
+        review_count=row.review_count,
+        primary_image=row.primary_image,
+        vendor_name=row.vendor_name,
+        category_name=row.category_name,
+    )
+
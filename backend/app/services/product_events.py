@@ -0,0 +1,36 @@
+"""
+Post-commit hook for product changes
+
+Endpoints that create, update or delete products call products_changed()
+right after committing, so every in-process view derived from product data
+is refreshed from one place instead of at each call site.
+"""
+
+from typing import Iterable, Optional
+from uuid import UUID
+
+from app.services.autocomplete import completion_index
+from app.services.product_cache import product_detail_cache
+from app.services.rails import rail_snapshots
+from app.services.search_cache import catalog_changed
+from app.services.spelling import spelling_index
+
+
+def products_changed(product_ids: Iterable[Optional[UUID]], search: bool = True) -> None:
+    """
+    Drop cached views and searches of these products and schedule rail and
+    spelling index updates.
+
+    Pass search=False when the change cannot alter what a search returns,
+    e.g. a stock change that leaves every product in stock, so checkouts
+    do not flush the search caches.
+    """
+    ids = [pid for pid in product_ids if pid is not None]
+    if not ids:
+        return
+    product_detail_cache.invalidate(ids)
+    rail_snapshots.mark_stale()
+    spelling_index.products_changed(ids)
+    completion_index.products_changed(ids)
+    if search:
+        catalog_changed()
@@ -0,0 +1,221 @@
+"""
+Homepage rail snapshots
+
+The homepage rails (featured, new arrivals, best sellers, trending searches
+and the anonymous personalized feed) are materialised into an in-memory
+snapshot holding every item already serialized. Requests slice the snapshot
+and cost no queries.
+
+RailSnapshots.run() is started from the app lifespan and rebuilds the
+snapshot every RAIL_REFRESH_SECONDS, or shortly after a product write marks
+it stale. A rebuild assembles a complete new snapshot and swaps it in with a
+single assignment, so readers never see a half-built set of rails. If the
+snapshot is older than RAIL_MAX_STALENESS_SECONDS (e.g. no refresher is
+running), the next request rebuilds it inline.
+"""
+
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.category import Category
+from app.models.product import Product, ProductStatus
+from app.services.product_cards import card_query, card_from_row
+from app.services.search import SearchService
+
+logger = logging.getLogger(__name__)
+
+RAIL_FEATURED = "featured"
+RAIL_NEW_ARRIVALS = "new_arrivals"
+RAIL_BEST_SELLERS = "best_sellers"
+
+PRODUCT_RAILS = (RAIL_FEATURED, RAIL_NEW_ARRIVALS, RAIL_BEST_SELLERS)
+
+# Items in the anonymous personalized feed
+ANONYMOUS_FEED_SIZE = 20
+
+
+def rail_query(rail: str, limit: int):
+    """Select the cards of the active products of a rail, in rail order"""
+    query = card_query().where(Product.status == ProductStatus.ACTIVE)
+    if rail == RAIL_FEATURED:
+        query = query.where(Product.is_featured == True).order_by(Product.sales_count.desc())
+    elif rail == RAIL_NEW_ARRIVALS:
+        query = query.order_by(Product.created_at.desc())
+    elif rail == RAIL_BEST_SELLERS:
+        query = query.order_by(Product.sales_count.desc())
+    else:
+        raise ValueError(f"Unknown rail: {rail}")
+    return query.limit(limit)
+
+
+def feed_item(row) -> Dict[str, Any]:
+    """Item of the anonymous personalized feed, from a card row"""
+    return {
+        "id": str(row.id),
+        "name": row.name,
+        "price": float(row.price),
+        "image_url": row.primary_image,
+        "category": row.category_name,
+        "rating": row.rating,
+        "relevance_score": 0.8  # Placeholder
+    }
+
+
+async def load_trending(db: AsyncSession, limit: int) -> Dict[str, Any]:
+    """Trending search terms and featured categories"""
+    popular = await SearchService(db).get_popular_searches(limit=limit)
+
+    result = await db.execute(
+        select(Category.name)
+        .where(Category.is_active == True, Category.is_featured == True)
+        .limit(5)
+    )
+    categories = [row[0] for row in result.all()]
+
+    return {
+        "trending": [item["query"] for item in popular],
+        "popular_searches": popular,
+        "popular_categories": categories
+    }
+
+
+class _Snapshot:
+    """One complete, immutable set of rails"""
+
+    def __init__(
+        self,
+        products: Dict[str, List[bytes]],
+        feed: List[Dict[str, Any]],
+        trending: Dict[str, Any],
+    ):
+        self.built_at = time.monotonic()
+        self.products = products
+        self.feed = feed
+        self.trending = trending
+
+
+class RailSnapshots:
+    """Builds, swaps and serves the homepage rail snapshot"""
+
+    def __init__(self, size: int, refresh_interval_seconds: float, max_staleness_seconds: float):
+        self.size = size
+        self.refresh_interval_seconds = refresh_interval_seconds
+        self.max_staleness_seconds = max_staleness_seconds
+
+        self._snapshot: Optional[_Snapshot] = None
+        self._stale = False
+        self._running = False
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+        self.refreshes = 0
+
+    def mark_stale(self) -> None:
+        """Ask for a rebuild after a product write"""
+        self._stale = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def clear(self) -> None:
+        """Drop the snapshot; the next request rebuilds it"""
+        self._snapshot = None
+        self._stale = False
+
+    async def refresh(self, db: AsyncSession) -> None:
+        """Build a complete new snapshot and swap it in"""
+        self._stale = False
+
+        products = {}
+        feed = []
+        for rail in PRODUCT_RAILS:
+            result = await db.execute(rail_query(rail, self.size))
+            rows = result.all()
+            products[rail] = [card_from_row(row).model_dump_json().encode() for row in rows]
+            if rail == RAIL_FEATURED:
+                feed = [feed_item(row) for row in rows[:ANONYMOUS_FEED_SIZE]]
+
+        trending = await load_trending(db, self.size)
+
+        self._snapshot = _Snapshot(products, feed, trending)
+        self.refreshes += 1
+
+    async def _current(self, db: AsyncSession) -> _Snapshot:
+        """The snapshot to serve, rebuilding inline if it is missing or too old"""
+        snapshot = self._snapshot
+        if (
+            snapshot is not None
+            and time.monotonic() - snapshot.built_at < self.max_staleness_seconds
+            and not (self._stale and not self._running)
+        ):
+            return snapshot
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Another request may have rebuilt it while we waited
+            if self._snapshot is snapshot:
+                await self.refresh(db)
+            return self._snapshot
+
+    async def product_rail(self, db: AsyncSession, rail: str, limit: int) -> Optional[bytes]:
+        """
+        JSON array of the first limit cards of a rail.
+
+        Returns:
+            The serialized list, or None if limit exceeds the snapshot size
+        """
+        if limit > self.size:
+            return None
+        snapshot = await self._current(db)
+        return b"[" + b",".join(snapshot.products[rail][:max(limit, 0)]) + b"]"
+
+    async def anonymous_feed(self, db: AsyncSession) -> List[Dict[str, Any]]:
+        """Featured products for visitors without history"""
+        return (await self._current(db)).feed
+
+    async def trending(self, db: AsyncSession, limit: int) -> Optional[Dict[str, Any]]:
+        """Trending searches, or None if limit exceeds the snapshot size"""
+        if limit > self.size:
+            return None
+        trending = (await self._current(db)).trending
+        popular = trending["popular_searches"][:max(limit, 0)]
+        return {
+            "trending": [item["query"] for item in popular],
+            "popular_searches": popular,
+            "popular_categories": trending["popular_categories"]
+        }
+
+    async def run(self, session_factory) -> None:
+        """Rebuild periodically, and soon after writes, until cancelled"""
+        self._wakeup = asyncio.Event()
+        self._running = True
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.refresh_interval_seconds)
+                    # Let a burst of writes settle into one rebuild
+                    await asyncio.sleep(settings.RAIL_WRITE_DEBOUNCE_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+                try:
+                    async with session_factory() as db:
+                        await self.refresh(db)
+                except Exception as e:
+                    logger.error(f"Failed to refresh homepage rails: {e}")
+        finally:
+            self._running = False
+
+
+rail_snapshots = RailSnapshots(
+    size=settings.RAIL_SIZE,
+    refresh_interval_seconds=settings.RAIL_REFRESH_SECONDS,
+    max_staleness_seconds=settings.RAIL_MAX_STALENESS_SECONDS,
+)
@@ -1,26 +1,145 @@
 """
-Search service with FTS5 full-text search support
+Search service with full-text search support
 
-Provides advanced search functionality using SQLite FTS5 including:
-- BM25 relevance ranking
+Provides advanced search functionality using SQLite FTS5 or, on PostgreSQL,
+the weighted products.search_vector column (see app.core.pg_search_setup),
+including:
+- Relevance ranking (BM25 / ts_rank_cd)
 - Phrase queries
 - Prefix matching
 - Highlighting of matching terms
-- Spell correction suggestions
+- Spell correction suggestions (from an in-memory index)
+- Global search over products, categories and vendors from one index
+  (search_entities), top hits per type in a single query
+
+The backend is picked by dialect; callers use the same methods either way
+and fall back to LIKE when neither index exists.
 """
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text, select, or_
-from sqlalchemy.orm import selectinload
-from typing import List, Dict, Optional, Tuple
+from sqlalchemy import and_, case, column, func, literal_column, or_, select, table, text
+from typing import Any, List, Dict, Optional, Sequence, Tuple
 import re
 import logging
 
+from app.core.pg_search_setup import TS_CONFIG
 from app.models.product import Product, ProductStatus
 from app.models.category import Category
+from app.models.vendor import Vendor
+from app.services.product_cards import card_query, primary_image_url
+from app.services.search_analytics import popular_searches, zero_result_queries
+from app.services.spelling import spelling_index
 
 logger = logging.getLogger(__name__)
 
+# The FTS5 virtual table (see app.core.fts5_setup); only the join key is declared
+product_fts = table("product_fts", column("product_id"))
+# The table itself, as MATCH and bm25() expect it
+_fts_table = literal_column("product_fts")
+
+# The generated tsvector column on PostgreSQL; not mapped on Product so
+# create_all() on SQLite is unaffected
+search_vector = literal_column("products.search_vector")
+# to_tsquery() needs a regconfig, not the VARCHAR a bound string would be
+_ts_config = literal_column(f"'{TS_CONFIG}'::regconfig")
+
+# The global search index: an FTS5 table on SQLite, a tsvector table on
+# PostgreSQL (document is only used there)
+search_entities = table(
+    "search_entities", column("entity_type"), column("entity_id"), column("document")
+)
+_entities_table = literal_column("search_entities")
+
+FTS5 = "fts5"
+POSTGRES = "postgres"
+
+# search_entities.entity_type values
+PRODUCT = "product"
+CATEGORY = "category"
+VENDOR = "vendor"
+
+
+def prepare_fts5_query(query: str) -> str:
+    """
+    Prepare query for FTS5 search.
+
+    Handles:
+    - Phrase queries (words in quotes)
+    - Prefix matching (words ending with *)
+    - Boolean operators (AND, OR, NOT)
+
+    Args:
+        query: User's search query
+
+    Returns:
+        FTS5-formatted query string
+    """
+    if not query:
+        return ""
+
+    # Remove special characters that might break FTS5
+    query = re.sub(r'[^\w\s\*"+-]', ' ', query)
+
+    # Handle phrase queries (text in quotes)
+    parts = []
+    in_phrase = False
+    current = []
+
+    for char in query:
+        if char == '"':
+            if in_phrase and current:
+                parts.append(f'"{" ".join(current)}"')
+                current = []
+            in_phrase = not in_phrase
+        elif char.isspace():
+            if current:
+                word = ''.join(current)
+                if not in_phrase:
+                    # Add prefix matching for non-phrase terms
+                    if not word.endswith('*'):
+                        word = f'{word}*'
+                parts.append(word)
+                current = []
+        else:
+            current.append(char)
+
+    if current:
+        word = ''.join(current)
+        if not in_phrase and not word.endswith('*'):
+            word = f'{word}*'
+        parts.append(word)
+
+    # Join with OR for broader results
+    return ' OR '.join(parts) if parts else query
+
+
+def prepare_tsquery(query: str) -> str:
+    """
+    Prepare query for PostgreSQL to_tsquery().
+
+    Mirrors prepare_fts5_query(): quoted phrases must match in order
+    (<->), other words match as prefixes (:*), and the parts are OR-ed.
+
+    Args:
+        query: User's search query
+
+    Returns:
+        tsquery string, empty if the query has no searchable words
+    """
+    if not query:
+        return ""
+
+    parts = []
+    for phrase, word in re.findall(r'"([^"]*)"?|(\S+)', query):
+        if phrase:
+            words = re.findall(r'[^\W_]+', phrase)
+            if words:
+                parts.append(f"({' <-> '.join(words)})")
+        else:
+            parts.extend(f"{w}:*" for w in re.findall(r'[^\W_]+', word))
+
+    return ' | '.join(parts)
+
 
 class SearchService:
     """Service for full-text search operations"""
@@ -28,12 +147,18 @@ class SearchService:
     def __init__(self, db: AsyncSession):
         self.db = db
         self._fts5_available = None
+        self._pg_search_available = None
 
     async def is_fts5_available(self) -> bool:
         """Check if FTS5 table is available"""
         if self._fts5_available is not None:
             return self._fts5_available
 
+        # A failed probe would abort the transaction on other databases
+        if self.db.get_bind().dialect.name != "sqlite":
+            self._fts5_available = False
+            return False
+
         try:
             result = await self.db.execute(text(
                 "SELECT name FROM sqlite_master WHERE type='table' AND name='product_fts'"
@@ -44,83 +169,90 @@ class SearchService:
             self._fts5_available = False
             return False
 
-    def prepare_fts5_query(self, query: str) -> str:
-        """
-        Prepare query for FTS5 search.
-
-        Handles:
-        - Phrase queries (words in quotes)
-        - Prefix matching (words ending with *)
-        - Boolean operators (AND, OR, NOT)
+    async def is_pg_search_available(self) -> bool:
+        """Check if products.search_vector is available (PostgreSQL only)"""
+        if self._pg_search_available is not None:
+            return self._pg_search_available
 
-        Args:
-            query: User's search query
+        if self.db.get_bind().dialect.name != "postgresql":
+            self._pg_search_available = False
+            return False
 
-        Returns:
-            FTS5-formatted query string
-        """
-        if not query:
-            return ""
-
-        # Remove special characters that might break FTS5
-        query = re.sub(r'[^\w\s\*"+-]', ' ', query)
-
-        # Handle phrase queries (text in quotes)
-        parts = []
-        in_phrase = False
-        current = []
-
-        for char in query:
-            if char == '"':
-                if in_phrase and current:
-                    parts.append(f'"{" ".join(current)}"')
-                    current = []
-                in_phrase = not in_phrase
-            elif char.isspace():
-                if current:
-                    word = ''.join(current)
-                    if not in_phrase:
-                        # Add prefix matching for non-phrase terms
-                        if not word.endswith('*'):
-                            word = f'{word}*'
-                    parts.append(word)
-                    current = []
-            else:
-                current.append(char)
+        try:
+            result = await self.db.execute(text(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = 'products' AND column_name = 'search_vector'"
+            ))
+            self._pg_search_available = result.scalar() is not None
+            return self._pg_search_available
+        except Exception:
+            self._pg_search_available = False
+            return False
 
-        if current:
-            word = ''.join(current)
-            if not in_phrase and not word.endswith('*'):
-                word = f'{word}*'
-            parts.append(word)
+    async def full_text_backend(self) -> Optional[str]:
+        """FTS5 or POSTGRES if a full-text index is available, else None"""
+        if await self.is_fts5_available():
+            return FTS5
+        if await self.is_pg_search_available():
+            return POSTGRES
+        return None
 
-        # Join with OR for broader results
-        return ' OR '.join(parts) if parts else query
+    def prepare_fts5_query(self, query: str) -> str:
+        """Prepare query for FTS5 search (see prepare_fts5_query)"""
+        return prepare_fts5_query(query)
 
     async def search_products_fts5(
         self,
         query: str,
         limit: int = 20,
         offset: int = 0,
-        min_rank: float = -10.0
+        min_rank: float = -10.0,
+        exact_total: bool = False
     ) -> Tuple[List[Dict], int]:
         """
         Search products using FTS5 with BM25 ranking.
 
+        The total comes from a window count over the ranked matches, taken
+        on (rowid, rank) only; snippets are computed for the page's rows.
+
         Args:
             query: Search query
             limit: Maximum results to return
             offset: Number of results to skip
             min_rank: Minimum BM25 rank score (more negative = less relevant)
+            exact_total: Count separately when the page is past the last
+                result (otherwise the total is reported as 0 there)
 
         Returns:
             Tuple of (results list, total count)
         """
         try:
             fts5_query = self.prepare_fts5_query(query)
-
-            # Search with BM25 ranking
+            params = {
+                "query": fts5_query,
+                "min_rank": min_rank,
+                # Enum columns store the member name
+                "active": ProductStatus.ACTIVE.name,
+            }
+
+            # bm25() and snippet() only work inside a MATCH query. The page
+            # is ranked and counted on (rowid, rank) alone; snippets and the
+            # product columns are then computed for its rows only, matching
+            # again with the rowid pinned
             search_sql = text("""
+                WITH page AS (
+                    SELECT hits.*, COUNT(*) OVER () as total_matches
+                    FROM (
+                        SELECT pf.rowid as fts_rowid, bm25(pf.product_fts) as rank
+                        FROM product_fts pf
+                        JOIN products p ON p.id = pf.product_id
+                        WHERE pf.product_fts MATCH :query
+                            AND p.status = :active
+                            AND bm25(pf.product_fts) > :min_rank
+                    ) hits
+                    ORDER BY rank
+                    LIMIT :limit OFFSET :offset
+                )
                 SELECT
                     p.id,
                     p.name,
@@ -131,63 +263,302 @@ class SearchService:
                     p.quantity,
                     p.rating,
                     p.review_count,
-                    bm25(pf.product_fts) as rank,
+                    page.rank,
                     snippet(pf.product_fts, 0, '<mark>', '</mark>', '...', 32) as name_snippet,
-                    snippet(pf.product_fts, 1, '<mark>', '</mark>', '...', 64) as description_snippet
-                FROM product_fts pf
+                    snippet(pf.product_fts, 1, '<mark>', '</mark>', '...', 64) as description_snippet,
+                    page.total_matches
+                FROM page
+                JOIN product_fts pf ON pf.rowid = page.fts_rowid
                 JOIN products p ON p.id = pf.product_id
                 WHERE pf.product_fts MATCH :query
-                    AND p.status = 'active'
-                    AND bm25(pf.product_fts) > :min_rank
-                ORDER BY rank
-                LIMIT :limit OFFSET :offset
+                ORDER BY page.rank
             """)
 
+            result = await self.db.execute(search_sql, {**params, "limit": limit, "offset": offset})
+            rows = result.all()
+
+            if rows:
+                total = rows[0][12]
+            elif offset and exact_total:
+                count_sql = text("""
+                    SELECT COUNT(*)
+                    FROM product_fts pf
+                    JOIN products p ON p.id = pf.product_id
+                    WHERE pf.product_fts MATCH :query
+                        AND p.status = :active
+                        AND bm25(pf.product_fts) > :min_rank
+                """)
+                count_result = await self.db.execute(count_sql, params)
+                total = count_result.scalar() or 0
+            else:
+                total = 0
+
+            return self._format_ranked_rows(rows), total
+
+        except Exception as e:
+            logger.error(f"FTS5 search failed: {e}")
+            raise
+
+    async def search_products_pg(
+        self,
+        query: str,
+        limit: int = 20,
+        offset: int = 0,
+        exact_total: bool = False
+    ) -> Tuple[List[Dict], int]:
+        """
+        Search products using the PostgreSQL tsvector with ts_rank_cd ranking.
+
+        ts_headline() re-parses the document, so it only runs on the
+        limited page, not on every match.
+
+        Args:
+            query: Search query
+            limit: Maximum results to return
+            offset: Number of results to skip
+            exact_total: Count separately when the page is past the last
+                result (otherwise the total is reported as 0 there)
+
+        Returns:
+            Tuple of (results list, total count)
+        """
+        tsquery_text = prepare_tsquery(query)
+        if not tsquery_text:
+            return [], 0
+
+        try:
+            tsq = func.to_tsquery(_ts_config, tsquery_text)
+            rank = func.ts_rank_cd(search_vector, tsq)
+            where = (search_vector.op("@@")(tsq), Product.status == ProductStatus.ACTIVE)
+
+            page = (
+                select(
+                    Product.id.label("product_id"),
+                    rank.label("rank"),
+                    func.count().over().label("total_matches"),
+                )
+                .where(*where)
+                .order_by(rank.desc(), Product.id)
+                .limit(limit)
+                .offset(offset)
+                .subquery("page")
+            )
+
             result = await self.db.execute(
-                search_sql,
-                {"query": fts5_query, "limit": limit, "offset": offset, "min_rank": min_rank}
+                select(
+                    Product.id,
+                    Product.name,
+                    Product.slug,
+                    Product.price,
+                    Product.compare_at_price,
+                    Product.currency,
+                    Product.quantity,
+                    Product.rating,
+                    Product.review_count,
+                    page.c.rank,
+                    func.ts_headline(
+                        _ts_config, Product.name, tsq,
+                        "StartSel=<mark>, StopSel=</mark>, HighlightAll=true",
+                    ),
+                    func.ts_headline(
+                        _ts_config, func.coalesce(Product.description, ""), tsq,
+                        "StartSel=<mark>, StopSel=</mark>, MaxWords=64, MinWords=16",
+                    ),
+                    page.c.total_matches,
+                )
+                .join(page, page.c.product_id == Product.id)
+                .order_by(page.c.rank.desc(), Product.id)
             )
             rows = result.all()
 
-            # Get total count
-            count_sql = text("""
-                SELECT COUNT(*)
-                FROM product_fts pf
-                JOIN products p ON p.id = pf.product_id
-                WHERE pf.product_fts MATCH :query
-                    AND p.status = 'active'
-                    AND bm25(pf.product_fts) > :min_rank
-            """)
-            count_result = await self.db.execute(
-                count_sql,
-                {"query": fts5_query, "min_rank": min_rank}
-            )
-            total = count_result.scalar() or 0
+            if rows:
+                total = rows[0][12]
+            elif offset and exact_total:
+                count_result = await self.db.execute(
+                    select(func.count()).select_from(Product).where(*where)
+                )
+                total = count_result.scalar() or 0
+            else:
+                total = 0
 
-            # Format results
-            results = []
-            for row in rows:
-                results.append({
-                    "id": str(row[0]),
-                    "name": row[1],
-                    "slug": row[2],
-                    "price": float(row[3]),
-                    "compare_at_price": float(row[4]) if row[4] else None,
-                    "currency": row[5],
-                    "in_stock": row[6] > 0,
-                    "rating": row[7],
-                    "review_count": row[8],
-                    "rank": row[9],
-                    "name_highlight": row[10],
-                    "description_highlight": row[11]
-                })
-
-            return results, total
+            return self._format_ranked_rows(rows), total
 
         except Exception as e:
-            logger.error(f"FTS5 search failed: {e}")
+            logger.error(f"PostgreSQL full-text search failed: {e}")
             raise
 
+    @staticmethod
+    def _format_ranked_rows(rows: Sequence[Any]) -> List[Dict]:
+        """Result dicts for the rows of search_products_fts5/_pg"""
+        return [
+            {
+                "id": str(row[0]),
+                "name": row[1],
+                "slug": row[2],
+                "price": float(row[3]),
+                "compare_at_price": float(row[4]) if row[4] else None,
+                "currency": row[5],
+                "in_stock": row[6] > 0,
+                "rating": row[7],
+                "review_count": row[8],
+                "rank": row[9],
+                "name_highlight": row[10],
+                "description_highlight": row[11]
+            }
+            for row in rows
+        ]
+
+    async def search_product_cards_fts5(
+        self,
+        query: str,
+        conditions: Sequence = (),
+        limit: int = 20,
+        offset: int = 0,
+        min_rank: float = -10.0,
+        exact_total: bool = False
+    ) -> Tuple[List[Any], int]:
+        """
+        Ranked FTS5 search returning product cards, filtered in the same query.
+
+        The MATCH, the status check and every filter condition are composed
+        into one statement, so LIMIT/OFFSET and the total are exact at any
+        page depth. The total is a window count on the same statement.
+
+        Args:
+            query: Search query
+            conditions: Extra WHERE clauses on Product (price, category, ...)
+            limit: Maximum results to return
+            offset: Number of results to skip
+            min_rank: Minimum BM25 rank score (more negative = less relevant)
+            exact_total: Count separately when the page is past the last
+                result (otherwise the total is reported as 0 there)
+
+        Returns:
+            Tuple of (card rows with a rank column, total count)
+        """
+        fts5_query = self.prepare_fts5_query(query)
+        rank = func.bm25(_fts_table).label("rank")
+        where = (
+            _fts_table.op("MATCH")(fts5_query),
+            Product.status == ProductStatus.ACTIVE,
+            rank > min_rank,
+            *conditions,
+        )
+
+        # bm25() only works inside the MATCH query, so rank there and
+        # count/page the hits outside
+        hits = (
+            select(Product.id.label("product_id"), rank)
+            .join(product_fts, product_fts.c.product_id == Product.id)
+            .where(*where)
+            .subquery("hits")
+        )
+        return await self._ranked_cards(hits, False, limit, offset, exact_total)
+
+    async def search_product_cards_pg(
+        self,
+        query: str,
+        conditions: Sequence = (),
+        limit: int = 20,
+        offset: int = 0,
+        exact_total: bool = False
+    ) -> Tuple[List[Any], int]:
+        """
+        Ranked PostgreSQL full-text search returning product cards.
+
+        Same contract as search_product_cards_fts5(); matches use the GIN
+        index on products.search_vector and rank by ts_rank_cd, so name
+        matches (weight A) outrank description matches (weight C).
+
+        Args:
+            query: Search query
+            conditions: Extra WHERE clauses on Product (price, category, ...)
+            limit: Maximum results to return
+            offset: Number of results to skip
+            exact_total: Count separately when the page is past the last
+                result (otherwise the total is reported as 0 there)
+
+        Returns:
+            Tuple of (card rows with a rank column, total count)
+        """
+        tsquery_text = prepare_tsquery(query)
+        if not tsquery_text:
+            return [], 0
+
+        tsq = func.to_tsquery(_ts_config, tsquery_text)
+        hits = (
+            select(Product.id.label("product_id"), func.ts_rank_cd(search_vector, tsq).label("rank"))
+            .where(
+                search_vector.op("@@")(tsq),
+                Product.status == ProductStatus.ACTIVE,
+                *conditions,
+            )
+            .subquery("hits")
+        )
+        return await self._ranked_cards(hits, True, limit, offset, exact_total)
+
+    async def search_product_cards(
+        self,
+        query: str,
+        conditions: Sequence = (),
+        limit: int = 20,
+        offset: int = 0,
+        exact_total: bool = False
+    ) -> Tuple[List[Any], int]:
+        """
+        Ranked full-text search returning product cards, on whichever
+        backend full_text_backend() reports. Callers check that it is not
+        None first and fall back to LIKE otherwise.
+        """
+        if await self.full_text_backend() == POSTGRES:
+            return await self.search_product_cards_pg(
+                query, conditions, limit=limit, offset=offset, exact_total=exact_total
+            )
+        return await self.search_product_cards_fts5(
+            query, conditions, limit=limit, offset=offset, exact_total=exact_total
+        )
+
+    async def _ranked_cards(
+        self,
+        hits: Any,
+        descending: bool,
+        limit: int,
+        offset: int,
+        exact_total: bool
+    ) -> Tuple[List[Any], int]:
+        """
+        Page card rows for a (product_id, rank) subquery, with a window total.
+
+        The hits are ranked, counted and paged on (product_id, rank) alone;
+        the card columns (image, vendor and category lookups) are computed
+        for the page's rows only.
+        """
+        order = hits.c.rank.desc() if descending else hits.c.rank
+        page = (
+            select(hits.c.product_id, hits.c.rank, func.count().over().label("total_matches"))
+            .order_by(order, hits.c.product_id)
+            .limit(limit)
+            .offset(offset)
+            .subquery("page")
+        )
+
+        result = await self.db.execute(
+            card_query(page.c.rank, page.c.total_matches)
+            .join(page, page.c.product_id == Product.id)
+            .order_by(page.c.rank.desc() if descending else page.c.rank, Product.id)
+        )
+        rows = result.all()
+
+        if rows:
+            total = rows[0].total_matches
+        elif offset and exact_total:
+            count_result = await self.db.execute(select(func.count()).select_from(hits))
+            total = count_result.scalar() or 0
+        else:
+            total = 0
+
+        return rows, total
+
     async def search_products_like(
         self,
         query: str,
@@ -208,16 +579,13 @@ class SearchService:
         search_term = f"%{query}%"
 
         # Build query
-        stmt = select(Product).where(
+        stmt = card_query().where(
             Product.status == ProductStatus.ACTIVE,
             or_(
                 Product.name.ilike(search_term),
                 Product.description.ilike(search_term),
                 Product.short_description.ilike(search_term)
             )
-        ).options(
-            selectinload(Product.images),
-            selectinload(Product.category)
         ).order_by(
             Product.rating.desc(),
             Product.sales_count.desc()
@@ -241,7 +609,7 @@ class SearchService:
         # Get results
         stmt = stmt.offset(offset).limit(limit)
         result = await self.db.execute(stmt)
-        products = result.scalars().all()
+        products = result.all()
 
         # Format results
         results = []
@@ -256,8 +624,8 @@ class SearchService:
                 "in_stock": p.quantity > 0,
                 "rating": p.rating,
                 "review_count": p.review_count,
-                "image": p.images[0].url if p.images else None,
-                "category_name": p.category.name if p.category else None
+                "image": p.primary_image,
+                "category_name": p.category_name
             })
 
         return results, total
@@ -269,7 +637,8 @@ class SearchService:
         offset: int = 0
     ) -> Tuple[List[Dict], int]:
         """
-        Search products using FTS5 if available, otherwise fall back to LIKE.
+        Search products using full-text search if available, otherwise fall
+        back to LIKE.
 
         Args:
             query: Search query
@@ -279,18 +648,114 @@ class SearchService:
         Returns:
             Tuple of (results list, total count)
         """
-        if await self.is_fts5_available():
-            try:
-                return await self.search_products_fts5(query, limit, offset)
-            except Exception as e:
-                logger.warning(f"FTS5 search failed, falling back to LIKE: {e}")
-                return await self.search_products_like(query, limit, offset)
-        else:
+        backend = await self.full_text_backend()
+        if backend is None:
+            return await self.search_products_like(query, limit, offset)
+
+        try:
+            if backend == POSTGRES:
+                return await self.search_products_pg(query, limit, offset)
+            return await self.search_products_fts5(query, limit, offset)
+        except Exception as e:
+            logger.warning(f"Full-text search failed, falling back to LIKE: {e}")
+            if backend == POSTGRES:
+                # The failed statement aborted the transaction
+                await self.db.rollback()
             return await self.search_products_like(query, limit, offset)
 
+    def _entity_hits_fts5(self, query: str) -> Optional[Any]:
+        """(entity_type, entity_id, position) of every search_entities match"""
+        fts5_query = self.prepare_fts5_query(query).strip()
+        if not fts5_query:
+            return None
+
+        # Titles (names) count ten times as much as the body
+        rank = func.bm25(_entities_table, 10.0, 1.0).label("rank")
+        matches = (
+            select(search_entities.c.entity_type, search_entities.c.entity_id, rank)
+            .where(_entities_table.op("MATCH")(fts5_query))
+            .subquery("matches")
+        )
+        # bm25() only works inside the MATCH query, so number the hits outside
+        position = func.row_number().over(
+            partition_by=matches.c.entity_type, order_by=matches.c.rank
+        )
+        return select(
+            matches.c.entity_type, matches.c.entity_id, position.label("position")
+        ).subquery("hits")
+
+    def _entity_hits_pg(self, query: str) -> Optional[Any]:
+        """(entity_type, entity_id, position) of every search_entities match"""
+        tsquery_text = prepare_tsquery(query)
+        if not tsquery_text:
+            return None
+
+        tsq = func.to_tsquery(_ts_config, tsquery_text)
+        position = func.row_number().over(
+            partition_by=search_entities.c.entity_type,
+            order_by=(func.ts_rank_cd(search_entities.c.document, tsq).desc(), search_entities.c.entity_id),
+        )
+        return (
+            select(search_entities.c.entity_type, search_entities.c.entity_id, position.label("position"))
+            .where(search_entities.c.document.op("@@")(tsq))
+            .subquery("hits")
+        )
+
+    async def search_entities(self, query: str, limits: Dict[str, int]) -> Dict[str, List[Any]]:
+        """
+        Best products, categories and vendors for a query, from the
+        search_entities index in a single statement.
+
+        Hits are numbered per entity type by relevance and cut at each
+        type's limit; the display columns of each type are joined in by
+        primary key. Callers check full_text_backend() first.
+
+        Args:
+            query: Search query
+            limits: Maximum results per entity type (PRODUCT, CATEGORY, VENDOR)
+
+        Returns:
+            Rows with entity_type, entity_id, name, slug, image, price,
+            rating and review_count (None where the type has no such
+            column), grouped by entity type, best first
+        """
+        grouped: Dict[str, List[Any]] = {entity_type: [] for entity_type in limits}
+        if await self.full_text_backend() == POSTGRES:
+            hits = self._entity_hits_pg(query)
+        else:
+            hits = self._entity_hits_fts5(query)
+        if hits is None:
+            return grouped
+
+        type_limit = case(
+            *[(hits.c.entity_type == entity_type, limit) for entity_type, limit in limits.items()],
+            else_=0,
+        )
+        result = await self.db.execute(
+            select(
+                hits.c.entity_type,
+                hits.c.entity_id,
+                func.coalesce(Product.name, Category.name, Vendor.business_name).label("name"),
+                func.coalesce(Product.slug, Category.slug, Vendor.slug).label("slug"),
+                func.coalesce(primary_image_url(), Category.image_url, Vendor.logo_url).label("image"),
+                Product.price,
+                func.coalesce(Product.rating, Vendor.rating).label("rating"),
+                Product.review_count,
+            )
+            .select_from(hits)
+            .outerjoin(Product, and_(hits.c.entity_type == PRODUCT, Product.id == hits.c.entity_id))
+            .outerjoin(Category, and_(hits.c.entity_type == CATEGORY, Category.id == hits.c.entity_id))
+            .outerjoin(Vendor, and_(hits.c.entity_type == VENDOR, Vendor.id == hits.c.entity_id))
+            .where(hits.c.position <= type_limit)
+            .order_by(hits.c.entity_type, hits.c.position)
+        )
+        for row in result.all():
+            grouped[row.entity_type].append(row)
+        return grouped
+
     async def get_suggestions(self, query: str, limit: int = 5) -> List[str]:
         """
-        Get search suggestions based on FTS5 matching.
+        Get search suggestions based on FTS5 or trigram matching.
 
         Args:
             query: Partial search query
@@ -300,7 +765,10 @@ class SearchService:
             List of suggested search terms
         """
         try:
-            if not await self.is_fts5_available():
+            backend = await self.full_text_backend()
+            if backend == POSTGRES:
+                return await self._get_suggestions_pg(query, limit)
+            if backend is None:
                 return await self._get_suggestions_like(query, limit)
 
             # Use FTS5 prefix matching for suggestions
@@ -311,12 +779,16 @@ class SearchService:
                 FROM product_fts pf
                 JOIN products p ON p.id = pf.product_id
                 WHERE pf.product_fts MATCH :query
-                    AND p.status = 'active'
+                    AND p.status = :active
                 ORDER BY p.sales_count DESC, p.rating DESC
                 LIMIT :limit
             """)
 
-            result = await self.db.execute(sql, {"query": fts5_query, "limit": limit})
+            result = await self.db.execute(sql, {
+                "query": fts5_query,
+                "active": ProductStatus.ACTIVE.name,
+                "limit": limit,
+            })
             suggestions = [row[0] for row in result.all()]
 
             return suggestions
@@ -325,6 +797,29 @@ class SearchService:
             logger.error(f"Failed to get suggestions: {e}")
             return []
 
+    async def _get_suggestions_pg(self, query: str, limit: int = 5) -> List[str]:
+        """
+        Suggestions from the pg_trgm index on products.name: prefix matches
+        plus names similar enough to catch a typo, closest first.
+        """
+        similarity = func.max(func.similarity(Product.name, query))
+
+        stmt = select(Product.name).where(
+            Product.status == ProductStatus.ACTIVE,
+            or_(
+                Product.name.istartswith(query, autoescape=True),
+                Product.name.op("%")(query),
+            )
+        ).group_by(
+            Product.name
+        ).order_by(
+            similarity.desc(),
+            func.max(Product.sales_count).desc()
+        ).limit(limit)
+
+        result = await self.db.execute(stmt)
+        return [row[0] for row in result.all()]
+
     async def _get_suggestions_like(self, query: str, limit: int = 5) -> List[str]:
         """Fallback suggestions using LIKE"""
         search_term = f"{query}%"
@@ -342,10 +837,11 @@ class SearchService:
 
     async def get_did_you_mean(self, query: str) -> Optional[str]:
         """
-        Suggest alternative query for typos using simple edit distance.
+        Suggest a correction for misspelled words in the query.
 
-        This is a basic implementation. For production, consider using
-        a proper spell checker library like pyspellchecker or SymSpell.
+        Answered by the in-memory spelling index (see app.services.spelling);
+        the database is only read when the index has to be built or has to
+        catch up on changes.
 
         Args:
             query: Search query
@@ -354,59 +850,8 @@ class SearchService:
             Suggested alternative query or None
         """
         try:
-            # Get popular product names and category names
-            sql = text("""
-                SELECT DISTINCT name
-                FROM (
-                    SELECT name FROM products
-                    WHERE status = 'active'
-                    ORDER BY sales_count DESC, rating DESC
-                    LIMIT 100
-                    UNION
-                    SELECT name FROM categories
-                    WHERE is_active = 1
-                )
-            """)
-
-            result = await self.db.execute(sql)
-            candidates = [row[0].lower() for row in result.all()]
-
-            # Simple word-by-word matching
-            query_words = query.lower().split()
-            suggestion_words = []
-
-            for word in query_words:
-                # Find closest match using simple character overlap
-                best_match = word
-                best_score = 0
-
-                for candidate in candidates:
-                    for candidate_word in candidate.split():
-                        if len(candidate_word) < 3:
-                            continue
-
-                        # Calculate similarity (very simple approach)
-                        if candidate_word == word:
-                            best_match = word
-                            best_score = 100
-                            break
-
-                        # Check if word is prefix
-                        if candidate_word.startswith(word) or word.startswith(candidate_word):
-                            score = 50
-                            if score > best_score:
-                                best_match = candidate_word
-                                best_score = score
-
-                suggestion_words.append(best_match)
-
-            suggestion = ' '.join(suggestion_words)
-
-            # Only return if different from original
-            if suggestion != query.lower() and best_score > 0:
-                return suggestion
-
-            return None
+            await spelling_index.ensure_current(self.db)
+            return spelling_index.correct(query)
 
         except Exception as e:
             logger.error(f"Failed to get 'did you mean' suggestion: {e}")
@@ -414,7 +859,7 @@ class SearchService:
 
     async def get_popular_searches(self, limit: int = 10) -> List[Dict]:
         """
-        Get popular search terms from search_queries table.
+        Get popular search terms of the last 7 days from the search rollups.
 
         Args:
             limit: Maximum results to return
@@ -423,32 +868,7 @@ class SearchService:
             List of popular search terms with counts
         """
         try:
-            sql = text("""
-                SELECT
-                    query,
-                    COUNT(*) as search_count,
-                    AVG(results_count) as avg_results,
-                    SUM(clicked) as total_clicks
-                FROM search_queries
-                WHERE created_at >= datetime('now', '-7 days')
-                    AND results_count > 0
-                GROUP BY query
-                ORDER BY search_count DESC
-                LIMIT :limit
-            """)
-
-            result = await self.db.execute(sql, {"limit": limit})
-            rows = result.all()
-
-            return [
-                {
-                    "query": row[0],
-                    "search_count": row[1],
-                    "avg_results": int(row[2]),
-                    "click_rate": row[3] / row[1] if row[1] > 0 else 0
-                }
-                for row in rows
-            ]
+            return await popular_searches(self.db, limit, days=7)
 
         except Exception as e:
             logger.error(f"Failed to get popular searches: {e}")
@@ -456,7 +876,7 @@ class SearchService:
 
     async def get_zero_result_queries(self, limit: int = 20) -> List[Dict]:
         """
-        Get search queries that returned zero results.
+        Get search queries of the last 30 days that returned zero results.
 
         Useful for improving the product catalog or search algorithm.
 
@@ -467,30 +887,7 @@ class SearchService:
             List of zero-result queries
         """
         try:
-            sql = text("""
-                SELECT
-                    query,
-                    COUNT(*) as search_count,
-                    MAX(created_at) as last_searched
-                FROM search_queries
-                WHERE results_count = 0
-                    AND created_at >= datetime('now', '-30 days')
-                GROUP BY query
-                ORDER BY search_count DESC
-                LIMIT :limit
-            """)
-
-            result = await self.db.execute(sql, {"limit": limit})
-            rows = result.all()
-
-            return [
-                {
-                    "query": row[0],
-                    "search_count": row[1],
-                    "last_searched": row[2]
-                }
-                for row in rows
-            ]
+            return await zero_result_queries(self.db, limit, days=30)
 
         except Exception as e:
             logger.error(f"Failed to get zero-result queries: {e}")
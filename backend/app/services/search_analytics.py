@@ -0,0 +1,329 @@
+"""
+Search analytics rollups
+
+Trending searches and the analytics endpoints read search_query_rollups
+instead of grouping the raw search_queries log, which grows by one row per
+search. SearchRollups.run() is started from the app lifespan. Every
+SEARCH_ROLLUP_INTERVAL_SECONDS it aggregates the log into hourly rows per
+lowercased query, then rebuilds the daily rows of the days it touched from
+those hourly rows.
+
+Each bucket is recomputed from scratch and upserted on
+ix_search_query_rollups_key (INSERT ... ON CONFLICT DO UPDATE), so running
+twice, or on two workers at once, never double-counts or trips the unique
+index. A query never drops out of a bucket it was counted in: log rows are
+only pruned behind the last hour rolled up, and hourly rows long after
+their day was summed. Every run starts again at the last
+hour it wrote, or SEARCH_ROLLUP_SETTLE_SECONDS back if that is later, so log
+entries written late by the background search logger are still counted.
+Clicks recorded after an hour has settled are not picked up.
+
+After each run the raw log is pruned to SEARCH_LOG_RETENTION_DAYS (never
+past the last hour rolled up), hourly rows to
+SEARCH_ROLLUP_HOURLY_RETENTION_DAYS and daily rows to
+SEARCH_ROLLUP_DAILY_RETENTION_DAYS.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import uuid
+
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.search_query import SearchQuery, SearchQueryRollup
+
+logger = logging.getLogger(__name__)
+
+HOUR = "hour"
+DAY = "day"
+
+
+def _floor_hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _floor_day(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _rollup_rows(granularity: str, bucket_start: datetime, rows) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": uuid.uuid4(),
+            "granularity": granularity,
+            "bucket_start": bucket_start,
+            "query": query,
+            "search_count": search_count,
+            "results_total": results_total or 0,
+            "click_count": click_count or 0,
+            "zero_result_count": zero_result_count or 0,
+            "last_zero_result_at": last_zero_result_at,
+        }
+        for query, search_count, results_total, click_count, zero_result_count, last_zero_result_at in rows
+    ]
+
+
+class SearchRollups:
+    """Aggregates the search log into hourly and daily rollups and prunes it"""
+
+    def __init__(
+        self,
+        interval_seconds: float,
+        settle_seconds: float,
+        log_retention_days: int,
+        hourly_retention_days: int,
+        daily_retention_days: int,
+    ):
+        self.interval_seconds = interval_seconds
+        self.settle_seconds = settle_seconds
+        self.log_retention_days = log_retention_days
+        self.hourly_retention_days = hourly_retention_days
+        self.daily_retention_days = daily_retention_days
+
+        self.runs = 0
+        self.hours_aggregated = 0
+        self.last_run_at: Optional[datetime] = None
+        self.pruned = {"log": 0, "hourly": 0, "daily": 0}
+
+    async def _last_hour(self, db: AsyncSession) -> Optional[datetime]:
+        result = await db.execute(
+            select(func.max(SearchQueryRollup.bucket_start))
+            .where(SearchQueryRollup.granularity == HOUR)
+        )
+        return result.scalar()
+
+    async def _upsert(self, db: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+        """Insert rollup rows, overwriting the counts of rows already in their bucket"""
+        if not rows:
+            return
+        dialect = db.get_bind().dialect.name
+        upsert = (pg_insert if dialect == "postgresql" else sqlite_insert)(SearchQueryRollup)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[
+                SearchQueryRollup.granularity,
+                SearchQueryRollup.bucket_start,
+                SearchQueryRollup.query,
+            ],
+            set_={
+                column: upsert.excluded[column]
+                for column in (
+                    "search_count", "results_total", "click_count",
+                    "zero_result_count", "last_zero_result_at",
+                )
+            },
+        )
+        await db.execute(upsert, rows)
+
+    async def _aggregate_hour(self, db: AsyncSession, hour: datetime) -> None:
+        """Overwrite the hourly rows of one hour with a fresh aggregate of the log"""
+        query = func.lower(SearchQuery.query)
+        zero_result = SearchQuery.results_count == 0
+        result = await db.execute(
+            select(
+                query,
+                func.count(),
+                func.sum(SearchQuery.results_count),
+                func.sum(SearchQuery.clicked),
+                func.sum(case((zero_result, 1), else_=0)),
+                func.max(case((zero_result, SearchQuery.created_at))),
+            )
+            .where(
+                SearchQuery.created_at >= hour,
+                SearchQuery.created_at < hour + timedelta(hours=1),
+            )
+            .group_by(query)
+        )
+        await self._upsert(db, _rollup_rows(HOUR, hour, result.all()))
+
+    async def _aggregate_day(self, db: AsyncSession, day: datetime) -> None:
+        """Overwrite the daily rows of one day with the sum of its hourly rows"""
+        result = await db.execute(
+            select(
+                SearchQueryRollup.query,
+                func.sum(SearchQueryRollup.search_count),
+                func.sum(SearchQueryRollup.results_total),
+                func.sum(SearchQueryRollup.click_count),
+                func.sum(SearchQueryRollup.zero_result_count),
+                func.max(SearchQueryRollup.last_zero_result_at),
+            )
+            .where(
+                SearchQueryRollup.granularity == HOUR,
+                SearchQueryRollup.bucket_start >= day,
+                SearchQueryRollup.bucket_start < day + timedelta(days=1),
+            )
+            .group_by(SearchQueryRollup.query)
+        )
+        await self._upsert(db, _rollup_rows(DAY, day, result.all()))
+
+    async def roll_up(self, db: AsyncSession, now: Optional[datetime] = None) -> int:
+        """
+        Aggregate every hour since the last run, up to the current one.
+
+        Args:
+            db: Session to write with (committed here)
+            now: Current time (UTC); defaults to utcnow()
+
+        Returns:
+            Number of hours aggregated
+        """
+        now = now or datetime.utcnow()
+        current_hour = _floor_hour(now)
+
+        start = await self._last_hour(db)
+        if start is None:
+            result = await db.execute(select(func.min(SearchQuery.created_at)))
+            first = result.scalar()
+            start = _floor_hour(first) if first else current_hour
+        start = min(start, _floor_hour(now - timedelta(seconds=self.settle_seconds)))
+
+        hours = 0
+        days = set()
+        hour = start
+        while hour <= current_hour:
+            await self._aggregate_hour(db, hour)
+            days.add(_floor_day(hour))
+            hour += timedelta(hours=1)
+            hours += 1
+        for day in sorted(days):
+            await self._aggregate_day(db, day)
+        await db.commit()
+
+        self.runs += 1
+        self.hours_aggregated += hours
+        self.last_run_at = now
+        return hours
+
+    async def prune(self, db: AsyncSession, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Delete log and rollup rows past their retention.
+
+        Log rows are only deleted up to the last hour rolled up.
+
+        Returns:
+            Rows deleted from the log and the hourly and daily rollups
+        """
+        now = now or datetime.utcnow()
+        log_cutoff = now - timedelta(days=self.log_retention_days)
+        last_hour = await self._last_hour(db)
+        log_cutoff = min(log_cutoff, last_hour) if last_hour else None
+
+        deleted = {"log": 0, "hourly": 0, "daily": 0}
+        if log_cutoff is not None:
+            result = await db.execute(delete(SearchQuery).where(SearchQuery.created_at < log_cutoff))
+            deleted["log"] = result.rowcount or 0
+
+        for key, granularity, days in (
+            ("hourly", HOUR, self.hourly_retention_days),
+            ("daily", DAY, self.daily_retention_days),
+        ):
+            result = await db.execute(
+                delete(SearchQueryRollup).where(
+                    SearchQueryRollup.granularity == granularity,
+                    SearchQueryRollup.bucket_start < now - timedelta(days=days),
+                )
+            )
+            deleted[key] = result.rowcount or 0
+        await db.commit()
+
+        for key, count in deleted.items():
+            self.pruned[key] += count
+        return deleted
+
+    async def run(self, session_factory) -> None:
+        """Roll up and prune periodically until cancelled"""
+        while True:
+            try:
+                async with session_factory() as db:
+                    await self.roll_up(db)
+                    await self.prune(db)
+            except Exception as e:
+                logger.error(f"Failed to roll up search analytics: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """Run and prune counters of this worker's aggregator"""
+        return {
+            "runs": self.runs,
+            "hours_aggregated": self.hours_aggregated,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "pruned": dict(self.pruned),
+        }
+
+
+async def popular_searches(db: AsyncSession, limit: int, days: int = 7) -> List[Dict[str, Any]]:
+    """
+    Queries that returned results most often in the last days (today included).
+
+    Returns:
+        Dicts with query, search_count, avg_results and click_rate
+    """
+    since = _floor_day(datetime.utcnow()) - timedelta(days=days - 1)
+    with_results = func.sum(SearchQueryRollup.search_count - SearchQueryRollup.zero_result_count)
+    result = await db.execute(
+        select(
+            SearchQueryRollup.query,
+            with_results,
+            func.sum(SearchQueryRollup.results_total),
+            func.sum(SearchQueryRollup.click_count),
+        )
+        .where(SearchQueryRollup.granularity == DAY, SearchQueryRollup.bucket_start >= since)
+        .group_by(SearchQueryRollup.query)
+        .having(with_results > 0)
+        .order_by(with_results.desc(), SearchQueryRollup.query)
+        .limit(limit)
+    )
+    return [
+        {
+            "query": query,
+            "search_count": search_count,
+            "avg_results": int(results_total / search_count),
+            "click_rate": clicks / search_count
+        }
+        for query, search_count, results_total, clicks in result.all()
+    ]
+
+
+async def zero_result_queries(db: AsyncSession, limit: int, days: int = 30) -> List[Dict[str, Any]]:
+    """
+    Queries that most often returned nothing in the last days (today included).
+
+    Returns:
+        Dicts with query, search_count and last_searched
+    """
+    since = _floor_day(datetime.utcnow()) - timedelta(days=days - 1)
+    zero_results = func.sum(SearchQueryRollup.zero_result_count)
+    result = await db.execute(
+        select(
+            SearchQueryRollup.query,
+            zero_results,
+            func.max(SearchQueryRollup.last_zero_result_at),
+        )
+        .where(SearchQueryRollup.granularity == DAY, SearchQueryRollup.bucket_start >= since)
+        .group_by(SearchQueryRollup.query)
+        .having(zero_results > 0)
+        .order_by(zero_results.desc(), SearchQueryRollup.query)
+        .limit(limit)
+    )
+    return [
+        {
+            "query": query,
+            "search_count": search_count,
+            "last_searched": last_searched
+        }
+        for query, search_count, last_searched in result.all()
+    ]
+
+
+search_rollups = SearchRollups(
+    interval_seconds=settings.SEARCH_ROLLUP_INTERVAL_SECONDS,
+    settle_seconds=settings.SEARCH_ROLLUP_SETTLE_SECONDS,
+    log_retention_days=settings.SEARCH_LOG_RETENTION_DAYS,
+    hourly_retention_days=settings.SEARCH_ROLLUP_HOURLY_RETENTION_DAYS,
+    daily_retention_days=settings.SEARCH_ROLLUP_DAILY_RETENTION_DAYS,
+)
@@ -0,0 +1,82 @@
+"""
+Search result cache
+
+Repeated searches are answered from memory without touching FTS5. Keys are
+built from the raw query, lowercased with its whitespace collapsed (so
+"iPhone " and "iphone" share an entry), the database it runs on, which
+picks the FTS5, PostgreSQL or LIKE path, plus the sorted filters, sort and
+page. The raw query is used because the paths tokenize it differently:
+"men's" and "men s" are one FTS5 query but two LIKE patterns.
+
+Product and category writes that can change what a search returns (names,
+prices, status, ratings, a product selling out or coming back in stock)
+call catalog_changed(), which bumps the catalog generation by clearing
+every search cache; results computed before the bump are not stored. Stock
+changes that leave a product in stock do not, so checkouts keep the caches
+warm. Other workers catch up when their entries' TTL runs out. The
+spelling and autocomplete indexes re-read categories on the same signal.
+Each endpoint has its own cache, so /admin/cache/stats reports hit rates
+separately; autocomplete has none, as its index already answers from
+memory.
+"""
+
+from typing import Any, Awaitable, Callable, Optional
+import json
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.services.autocomplete import completion_index
+from app.services.spelling import spelling_index
+
+SEARCH_GLOBAL = "global"
+SEARCH_PRODUCTS = "products"
+
+search_caches = {
+    endpoint: LRUCache(
+        f"search_{endpoint}",
+        max_entries=settings.SEARCH_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.SEARCH_CACHE_TTL_SECONDS,
+    )
+    for endpoint in (SEARCH_GLOBAL, SEARCH_PRODUCTS)
+}
+
+
+def search_cache_key(query: Optional[str], backend: str, **params: Any) -> str:
+    """
+    Cache key for a normalized query and its filters; None filters are ignored
+
+    Args:
+        query: Raw search query
+        backend: Database dialect the search runs on
+        params: Filters, sort and paging
+    """
+    normalized = " ".join(query.lower().split()) if query else ""
+    filters = sorted((name, str(value)) for name, value in params.items() if value is not None)
+    return json.dumps([normalized, backend, filters], separators=(",", ":"))
+
+
+async def cached_search(endpoint: str, key: str, build: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Return the cached result for key, building and storing it on a miss.
+
+    Args:
+        endpoint: SEARCH_GLOBAL or SEARCH_PRODUCTS
+        key: Key from search_cache_key()
+        build: Coroutine function computing the result
+    """
+    cache = search_caches[endpoint]
+    result = cache.get(key)
+    if result is None:
+        generation = cache.generation
+        result = await build()
+        cache.set(key, result, generation=generation)
+    return result
+
+
+def catalog_changed() -> None:
+    """Bump the catalog generation: drop every cached search result"""
+    for cache in search_caches.values():
+        cache.clear()
+    spelling_index.catalog_changed()
+    completion_index.catalog_changed()
+
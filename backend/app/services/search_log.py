@@ -0,0 +1,152 @@
+"""
+Write-behind search query log
+
+Search endpoints record each query in a bounded in-memory queue instead of
+inserting a SearchQuery row and committing inside the request. SearchLogger.run()
+is started from the app lifespan and bulk-inserts the queue every
+SEARCH_LOG_FLUSH_SECONDS, or sooner once SEARCH_LOG_BATCH_SIZE entries are
+waiting; the lifespan flushes once more on shutdown.
+
+When writes fall behind and the queue is full, the oldest entries are
+dropped. A batch that fails to insert is dropped as well rather than retried,
+so one bad row cannot block the log. Both are counted in stats(); the log
+feeds analytics, not billing, so losing entries under pressure is acceptable.
+"""
+
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import logging
+import uuid
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.search_query import SearchQuery
+
+logger = logging.getLogger(__name__)
+
+
+def _truncate(value: Optional[str], length: int) -> Optional[str]:
+    return value[:length] if value else value
+
+
+class SearchLogger:
+    """Queues search log entries and writes them in bulk"""
+
+    def __init__(self, flush_interval_seconds: float, batch_size: int, max_pending: int):
+        self.flush_interval_seconds = flush_interval_seconds
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+
+        self._queue: deque = deque(maxlen=max_pending)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def pending(self) -> int:
+        """Entries not yet written"""
+        return len(self._queue)
+
+    def record(
+        self,
+        query: str,
+        results_count: int,
+        search_time_ms: Optional[int] = None,
+        filters_applied: Optional[str] = None,
+        ip_address: Optional[str] = None,
+        user_agent: Optional[str] = None,
+    ) -> None:
+        """Queue a search for logging; never touches the database"""
+        if len(self._queue) == self.max_pending:
+            # deque(maxlen) drops the oldest entry on append
+            self.dropped += 1
+        self._queue.append({
+            "id": uuid.uuid4(),
+            "query": _truncate(query, 500),
+            "results_count": results_count,
+            "search_time_ms": search_time_ms,
+            "filters_applied": filters_applied,
+            "ip_address": _truncate(ip_address, 45),
+            "user_agent": _truncate(user_agent, 500),
+            "clicked": 0,
+            "created_at": datetime.utcnow(),
+        })
+        self.recorded += 1
+        if len(self._queue) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    def clear(self) -> None:
+        """Drop pending entries without writing them"""
+        self._queue.clear()
+
+    async def flush(self, db: AsyncSession) -> int:
+        """
+        Write all pending entries, one bulk insert per batch_size entries.
+
+        Args:
+            db: Session to write with (committed here)
+
+        Returns:
+            Number of entries written
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        written = 0
+        async with self._lock:
+            while self._queue:
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                try:
+                    await db.execute(insert(SearchQuery), batch)
+                    await db.commit()
+                except Exception as e:
+                    await db.rollback()
+                    self.failed += len(batch)
+                    logger.error(f"Failed to write {len(batch)} search log entries: {e}")
+                    continue
+                written += len(batch)
+
+        self.written += written
+        return written
+
+    async def run(self, session_factory: Callable[[], AsyncSession]) -> None:
+        """Flush periodically until cancelled"""
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                async with session_factory() as db:
+                    await self.flush(db)
+            except Exception as e:
+                logger.error(f"Failed to flush search log: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and lifetime counters of this worker's search log"""
+        return {
+            "pending": len(self._queue),
+            "max_pending": self.max_pending,
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+search_logger = SearchLogger(
+    flush_interval_seconds=settings.SEARCH_LOG_FLUSH_SECONDS,
+    batch_size=settings.SEARCH_LOG_BATCH_SIZE,
+    max_pending=settings.SEARCH_LOG_MAX_PENDING,
+)
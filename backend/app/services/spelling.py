@@ -0,0 +1,240 @@
+"""
+"Did you mean" spelling index
+
+Typo corrections are answered from memory by a SymSpell index: every
+dictionary term is filed under each string obtained by deleting up to
+SPELLING_MAX_EDIT_DISTANCE characters from its first PREFIX_LENGTH
+characters. A misspelled word generates its own deletes, and only the terms
+sharing one of them need an edit distance computed. The closest term wins;
+ties go to the term found in more products.
+
+The dictionary holds the words of active product names and tags and of
+active category names, counted once per product or category. The FTS5 table
+uses the porter tokenizer, so its fts5vocab vocabulary holds stems such as
+"headphon" that cannot be offered back to the user; the words are tokenized
+from the source columns instead, the same way on SQLite and PostgreSQL.
+
+The index is kept current like the other background indexes (see
+background_index.py): queued products are re-read and their counts
+adjusted, and category words are re-read on every catalog change, as there
+are few categories. A full rebuild runs every SPELLING_REBUILD_SECONDS.
+"""
+
+from typing import Any, Dict, FrozenSet, Hashable, List, Optional, Set
+from uuid import UUID
+import re
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.category import Category
+from app.models.product import Product, ProductStatus
+from app.services.background_index import BackgroundIndex
+
+# Deletes are generated from this many leading characters only
+PREFIX_LENGTH = 7
+# Shorter words are neither indexed nor corrected
+MIN_WORD_LENGTH = 3
+
+_WORD_RE = re.compile(r"[^\W\d_]+")
+
+
+def tokenize(*texts: Optional[str]) -> Set[str]:
+    """Lowercase words of the texts, without digits and short words"""
+    words = set()
+    for value in texts:
+        if value:
+            words.update(w for w in _WORD_RE.findall(value.lower()) if len(w) >= MIN_WORD_LENGTH)
+    return words
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Damerau-Levenshtein (optimal string alignment) distance between a and b.
+
+    Returns max_distance + 1 as soon as the distance is known to exceed
+    max_distance.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+
+    return previous[-1] if previous[-1] <= max_distance else max_distance + 1
+
+
+def deletes(word: str, max_distance: int) -> Set[str]:
+    """The word's prefix and every string with up to max_distance characters deleted from it"""
+    prefix = word[:PREFIX_LENGTH]
+    result = {prefix}
+    frontier = {prefix}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - result
+        result |= frontier
+    return result
+
+
+class SpellingIndex(BackgroundIndex):
+    """In-memory SymSpell dictionary of catalog words, kept up to date incrementally"""
+
+    label = "spelling index"
+
+    def __init__(
+        self,
+        max_edit_distance: int,
+        update_debounce_seconds: float,
+        rebuild_interval_seconds: float,
+    ):
+        super().__init__(update_debounce_seconds, rebuild_interval_seconds)
+        self.max_edit_distance = max_edit_distance
+
+        # term -> number of products/categories containing it
+        self._counts: Dict[str, int] = {}
+        # delete -> terms it was generated from
+        self._deletes: Dict[str, Set[str]] = {}
+        # ("product" | "category", id) -> its terms
+        self._sources: Dict[Hashable, FrozenSet[str]] = {}
+
+    # -- dictionary maintenance --------------------------------------------
+
+    def _add_term(self, term: str) -> None:
+        count = self._counts.get(term, 0)
+        self._counts[term] = count + 1
+        if not count:
+            for delete in deletes(term, self.max_edit_distance):
+                self._deletes.setdefault(delete, set()).add(term)
+
+    def _remove_term(self, term: str) -> None:
+        count = self._counts.get(term, 0)
+        if count > 1:
+            self._counts[term] = count - 1
+            return
+        self._counts.pop(term, None)
+        for delete in deletes(term, self.max_edit_distance):
+            terms = self._deletes.get(delete)
+            if terms is not None:
+                terms.discard(term)
+                if not terms:
+                    del self._deletes[delete]
+
+    def _set_source(self, key: Hashable, terms: Set[str]) -> None:
+        """Replace the terms contributed by one product or category"""
+        old = self._sources.pop(key, frozenset())
+        for term in old - terms:
+            self._remove_term(term)
+        for term in terms - old:
+            self._add_term(term)
+        if terms:
+            self._sources[key] = frozenset(terms)
+
+    def _reset(self) -> None:
+        self._counts = {}
+        self._deletes = {}
+        self._sources = {}
+
+    # -- loading -----------------------------------------------------------
+
+    async def _update_categories(self, db: AsyncSession) -> None:
+        result = await db.execute(
+            select(Category.id, Category.name).where(Category.is_active == True)
+        )
+        current = {("category", cid): tokenize(name) for cid, name in result.all()}
+
+        for key in [k for k in self._sources if k[0] == "category" and k not in current]:
+            self._set_source(key, set())
+        for key, terms in current.items():
+            self._set_source(key, terms)
+
+    async def _build(self, db: AsyncSession) -> None:
+        result = await db.execute(
+            select(Product.id, Product.name, Product.tags)
+            .where(Product.status == ProductStatus.ACTIVE)
+        )
+        rows = result.all()
+
+        self._reset()
+        for product_id, name, tags in rows:
+            self._set_source(("product", product_id), tokenize(name, *(tags or ())))
+        await self._update_categories(db)
+
+    async def _update_products(self, db: AsyncSession, product_ids: List[UUID]) -> None:
+        found = await self._active_products(db, product_ids, Product.name, Product.tags)
+        for product_id in product_ids:
+            row = found.get(product_id)
+            # Deleted and deactivated products drop out of the dictionary
+            terms = tokenize(row.name, *(row.tags or ())) if row else set()
+            self._set_source(("product", product_id), terms)
+
+    # -- lookups -----------------------------------------------------------
+
+    def correct_word(self, word: str) -> Optional[str]:
+        """
+        Closest dictionary term to a word.
+
+        Returns:
+            The word itself if it is in the dictionary, the best correction
+            within the maximum edit distance, or None
+        """
+        if word in self._counts:
+            return word
+
+        best, best_distance, best_count = None, self.max_edit_distance + 1, 0
+        seen = set()
+        for delete in deletes(word, self.max_edit_distance):
+            for term in self._deletes.get(delete, ()):
+                if term in seen:
+                    continue
+                seen.add(term)
+                distance = edit_distance(word, term, self.max_edit_distance)
+                count = self._counts[term]
+                if distance < best_distance or (distance == best_distance and count > best_count):
+                    best, best_distance, best_count = term, distance, count
+        return best
+
+    def correct(self, query: str) -> Optional[str]:
+        """
+        Query with each misspelled word replaced by its correction.
+
+        Words that are short, contain digits or have no correction are kept.
+
+        Returns:
+            The corrected query (lowercase), or None if nothing changed
+        """
+        words = query.lower().split()
+        corrected = []
+        for word in words:
+            if len(word) >= MIN_WORD_LENGTH and _WORD_RE.fullmatch(word):
+                word = self.correct_word(word) or word
+            corrected.append(word)
+
+        return " ".join(corrected) if corrected != words else None
+
+    def stats(self) -> Dict[str, Any]:
+        """Size and update counters of this worker's spelling index"""
+        return {
+            "built": self._built,
+            "terms": len(self._counts),
+            "deletes": len(self._deletes),
+            "pending_products": len(self._pending_products),
+            "rebuilds": self.rebuilds,
+            "updates": self.updates,
+        }
+
+
+spelling_index = SpellingIndex(
+    max_edit_distance=settings.SPELLING_MAX_EDIT_DISTANCE,
+    update_debounce_seconds=settings.SPELLING_UPDATE_DEBOUNCE_SECONDS,
+    rebuild_interval_seconds=settings.SPELLING_REBUILD_SECONDS,
+)
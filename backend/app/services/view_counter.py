@@ -0,0 +1,122 @@
+"""
+Write-behind product view counter
+
+Product page views are counted in memory and written to products.view_count
+in batches, so serving a product page never opens a write transaction.
+ViewCounter.run() is started from the app lifespan and flushes every
+VIEW_COUNT_FLUSH_SECONDS, or sooner once VIEW_COUNT_FLUSH_THRESHOLD views are
+pending; the lifespan flushes once more on shutdown. Views pending in a
+worker that crashes are lost, which is acceptable for a popularity counter.
+"""
+
+from collections import Counter
+from typing import Callable, Dict, Optional
+from uuid import UUID
+import asyncio
+import logging
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.product import Product
+
+logger = logging.getLogger(__name__)
+
+_products = Product.__table__
+
+# One statement, executed once per product in the batch (executemany)
+_increment_views = (
+    update(_products)
+    .where(_products.c.id == bindparam("product_id"))
+    .values(view_count=_products.c.view_count + bindparam("views"))
+)
+
+
+class ViewCounter:
+    """Buffers product views and flushes them as batched increments"""
+
+    def __init__(self, flush_interval_seconds: float, flush_threshold: int):
+        self.flush_interval_seconds = flush_interval_seconds
+        self.flush_threshold = flush_threshold
+
+        self._pending: Counter = Counter()
+        self._pending_views = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def pending(self) -> Dict[UUID, int]:
+        """Views not yet written, by product ID"""
+        return dict(self._pending)
+
+    def record(self, product_id: UUID, views: int = 1) -> None:
+        """Count a product view; never touches the database"""
+        self._pending[product_id] += views
+        self._pending_views += views
+        if self._pending_views >= self.flush_threshold and self._wakeup is not None:
+            self._wakeup.set()
+
+    def clear(self) -> None:
+        """Drop pending views without writing them"""
+        self._pending = Counter()
+        self._pending_views = 0
+
+    async def flush(self, db: AsyncSession) -> int:
+        """
+        Write all pending views in one transaction.
+
+        Args:
+            db: Session to write with (committed here)
+
+        Returns:
+            Number of products updated
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            if not self._pending:
+                return 0
+
+            batch, self._pending = self._pending, Counter()
+            self._pending_views = 0
+
+            try:
+                await db.execute(
+                    _increment_views,
+                    [{"product_id": product_id, "views": views} for product_id, views in batch.items()]
+                )
+                await db.commit()
+            except Exception as e:
+                # Put the views back so the next flush retries them
+                await db.rollback()
+                self._pending.update(batch)
+                self._pending_views += sum(batch.values())
+                logger.error(f"Failed to flush {len(batch)} product view counts: {e}")
+                raise
+
+            return len(batch)
+
+    async def run(self, session_factory: Callable[[], AsyncSession]) -> None:
+        """Flush periodically until cancelled"""
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                async with session_factory() as db:
+                    await self.flush(db)
+            except Exception:
+                # Already logged; the views stay pending for the next round
+                pass
+
+
+view_counter = ViewCounter(
+    flush_interval_seconds=settings.VIEW_COUNT_FLUSH_SECONDS,
+    flush_threshold=settings.VIEW_COUNT_FLUSH_THRESHOLD,
+)
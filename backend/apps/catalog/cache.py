@@ -0,0 +1,48 @@
+"""
+Cached category responses.
+
+Category reads (tree, featured list, detail) are cached under keys that
+include a shared version number. Any category save or delete bumps the
+version (see signals.py), which orphans every cached entry at once on all
+workers sharing the cache backend. Entries also expire after
+CATEGORY_CACHE_TIMEOUT so product counts do not drift for long.
+"""
+import time
+
+from django.core.cache import cache
+
+CATEGORY_CACHE_VERSION_KEY = 'catalog:categories:version'
+CATEGORY_CACHE_TIMEOUT = 300
+
+
+def get_category_cache_version():
+    """Current category cache version, initialising it if missing."""
+    version = cache.get(CATEGORY_CACHE_VERSION_KEY)
+    if version is None:
+        # A fresh, unique version so entries from before an eviction are never reused
+        cache.add(CATEGORY_CACHE_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CATEGORY_CACHE_VERSION_KEY)
+    return version
+
+
+def category_cache_key(name):
+    """Versioned cache key for a category response."""
+    return f'catalog:categories:v{get_category_cache_version()}:{name}'
+
+
+def get_or_build(name, build):
+    """Return the cached response data for name, building it on a miss."""
+    key = category_cache_key(name)
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, CATEGORY_CACHE_TIMEOUT)
+    return data
+
+
+def invalidate_category_cache():
+    """Orphan all cached category responses."""
+    try:
+        cache.incr(CATEGORY_CACHE_VERSION_KEY)
+    except ValueError:
+        cache.set(CATEGORY_CACHE_VERSION_KEY, time.time_ns(), timeout=None)
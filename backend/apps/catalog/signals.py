@@ -1,12 +1,13 @@
 """
 Signals for the catalog app.
 """
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.utils.text import slugify
 from django.utils import timezone
 
-from .models import Product, ProductStatus
+from .cache import invalidate_category_cache
+from .models import Category, Product, ProductStatus
 
 
 @receiver(pre_save, sender=Product)
@@ -27,3 +28,9 @@ def update_published_at(sender, instance, created, **kwargs):
     """Set published_at when product becomes active."""
     if instance.status == ProductStatus.ACTIVE and not instance.published_at:
         Product.objects.filter(pk=instance.pk).update(published_at=timezone.now())
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_cached_categories(sender, instance, **kwargs):
+    """Drop cached category responses whenever a category changes."""
+    invalidate_category_cache()
@@ -8,6 +8,7 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.db.models import F
 
 from common.permissions import IsVendor, IsAdmin
+from .cache import get_or_build
 from .models import Category, Product, ProductImage, ProductStatus
 from .serializers import (
     CategorySerializer,
@@ -54,25 +55,37 @@ class CategoryViewSet(viewsets.ModelViewSet):
                 queryset = queryset.filter(parent__slug=parent)
         return queryset.order_by('sort_order', 'name')
 
+    def retrieve(self, request, *args, **kwargs):
+        """Get a category, served from the category cache."""
+        data = get_or_build(
+            f"slug:{kwargs.get('slug')}",
+            lambda: super(CategoryViewSet, self).retrieve(request, *args, **kwargs).data
+        )
+        return Response(data)
+
     @action(detail=False, methods=['get'])
     def tree(self, request):
         """Get full category tree."""
-        root_categories = Category.objects.filter(
-            is_active=True,
-            parent__isnull=True
-        ).order_by('sort_order', 'name')
-        serializer = CategoryTreeSerializer(root_categories, many=True)
-        return Response(serializer.data)
+        def build():
+            root_categories = Category.objects.filter(
+                is_active=True,
+                parent__isnull=True
+            ).order_by('sort_order', 'name')
+            return CategoryTreeSerializer(root_categories, many=True).data
+
+        return Response(get_or_build('tree', build))
 
     @action(detail=False, methods=['get'])
     def featured(self, request):
         """Get featured categories."""
-        categories = Category.objects.filter(
-            is_active=True,
-            is_featured=True
-        ).order_by('sort_order', 'name')[:10]
-        serializer = CategorySerializer(categories, many=True)
-        return Response(serializer.data)
+        def build():
+            categories = Category.objects.filter(
+                is_active=True,
+                is_featured=True
+            ).order_by('sort_order', 'name')[:10]
+            return CategorySerializer(categories, many=True).data
+
+        return Response(get_or_build('featured', build))
 
     @action(detail=True, methods=['get'])
     def subcategories(self, request, slug=None):
@@ -0,0 +1,44 @@
+"""
+Management command to run the orders outbox (vendor credits of paid orders).
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.orders import outbox
+
+
+class Command(BaseCommand):
+    help = 'Run queued order side effects from the outbox until interrupted'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run one batch and exit',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Seconds to sleep when the outbox is drained',
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            taken = outbox.process_batch()
+            self.stdout.write(self.style.SUCCESS(f'Processed {taken} outbox events'))
+            return
+
+        self.stdout.write('Processing the outbox...')
+        last_prune = None
+        try:
+            while True:
+                taken = outbox.process_batch()
+                if last_prune is None or time.monotonic() - last_prune >= 3600:
+                    outbox.prune()
+                    last_prune = time.monotonic()
+                if taken < outbox.BATCH_SIZE:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
@@ -6,6 +6,7 @@ import secrets
 import string
 from datetime import datetime
 from django.db import models
+from django.utils import timezone
 from django.conf import settings
 
 
@@ -232,3 +233,31 @@ class OrderStatusHistory(models.Model):
 
     def __str__(self):
         return f"{self.order.order_number} - {self.status}"
+
+
+class OutboxEvent(models.Model):
+    """
+    Side effect queued in the same transaction as the change that causes it,
+    run against this database by `manage.py process_outbox` (apps/orders/outbox.py).
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    event_type = models.CharField(max_length=50)
+    payload = models.TextField()  # JSON
+    dedupe_key = models.CharField(max_length=255, unique=True, blank=True, null=True)
+
+    status = models.CharField(max_length=20, default='pending')
+    attempts = models.IntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, null=True)
+
+    created_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'orders_outbox_events'
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='ix_orders_outbox_status_avail'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} ({self.status})"
@@ -0,0 +1,160 @@
+"""
+Outbox consumer for the orders app.
+
+The orders signal queues order.paid in OutboxEvent, in the Django database
+and in the same transaction as the order it belongs to. process_batch()
+runs due events against that same database; `manage.py process_outbox`
+calls it in a loop.
+
+- Each event is leased just before its handler runs, with a conditional
+  UPDATE that counts the attempt and hides it for LEASE_SECONDS. An event
+  whose consumer dies mid-attempt is taken again once its lease runs out.
+- The handler runs in one transaction with marking the event done, which
+  only matches while the attempt still owns the event, so vendor credits
+  apply once.
+- A failed attempt is retried after BACKOFF_BASE_SECONDS, doubling per
+  attempt up to BACKOFF_MAX_SECONDS; after MAX_ATTEMPTS the event is
+  marked dead with its last error.
+"""
+import json
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.catalog.models import Product
+from apps.vendors.models import Vendor
+
+from .models import OrderItem, OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+DONE = 'done'
+DEAD = 'dead'
+
+BATCH_SIZE = 100
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 3600
+RETENTION_DAYS = 7
+
+# event type -> handler(payload); handlers run inside the event's transaction
+HANDLERS = {}
+
+
+def handles(event_type):
+    """Register the decorated function as the handler of event_type."""
+    def register(handler):
+        HANDLERS[event_type] = handler
+        return handler
+    return register
+
+
+class LeaseExpired(Exception):
+    """The event was leased again by another consumer while its handler ran."""
+
+
+def backoff(attempts):
+    """Delay before the attempt after `attempts` failed ones."""
+    seconds = BACKOFF_BASE_SECONDS * 2 ** (attempts - 1)
+    return timedelta(seconds=min(seconds, BACKOFF_MAX_SECONDS))
+
+
+def process_batch(batch_size=BATCH_SIZE):
+    """Run up to batch_size due events; returns the number taken."""
+    taken = 0
+    while taken < batch_size:
+        event = _lease()
+        if event is None:
+            break
+        taken += 1
+        _handle(event)
+    return taken
+
+
+def prune():
+    """Delete events processed more than RETENTION_DAYS ago."""
+    cutoff = timezone.now() - timedelta(days=RETENTION_DAYS)
+    deleted, _ = OutboxEvent.objects.filter(status=DONE, processed_at__lt=cutoff).delete()
+    return deleted
+
+
+def _lease():
+    """Take the oldest due event for one attempt, or None if none is due."""
+    while True:
+        now = timezone.now()
+        event = (
+            OutboxEvent.objects
+            .filter(status=PENDING, available_at__lte=now)
+            .order_by('available_at', 'created_at')
+            .first()
+        )
+        if event is None:
+            return None
+        leased = OutboxEvent.objects.filter(
+            id=event.id, status=PENDING, attempts=event.attempts
+        ).update(
+            attempts=F('attempts') + 1,
+            available_at=now + timedelta(seconds=LEASE_SECONDS),
+        )
+        if leased:
+            event.attempts += 1
+            return event
+        # Another consumer leased it first; take the next one
+
+
+def _owned(event):
+    """The event, matching only while this attempt still owns it."""
+    return OutboxEvent.objects.filter(id=event.id, status=PENDING, attempts=event.attempts)
+
+
+def _handle(event):
+    """Run one event's handler and mark it done, or schedule its retry."""
+    try:
+        handler = HANDLERS.get(event.event_type)
+        if handler is None:
+            raise LookupError(f'No handler for {event.event_type}')
+        with transaction.atomic():
+            handler(json.loads(event.payload))
+            if not _owned(event).update(status=DONE, processed_at=timezone.now(), last_error=None):
+                raise LeaseExpired()
+        return
+    except LeaseExpired:
+        logger.warning(f'Outbox event {event.id} ({event.event_type}) lease expired before its handler finished')
+        return
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+
+    if event.attempts >= MAX_ATTEMPTS:
+        updated = _owned(event).update(status=DEAD, last_error=error)
+        if updated:
+            logger.error(f'Outbox event {event.id} ({event.event_type}) is dead after {event.attempts} attempts: {error}')
+    else:
+        updated = _owned(event).update(available_at=timezone.now() + backoff(event.attempts), last_error=error)
+        if updated:
+            logger.warning(f'Outbox event {event.id} ({event.event_type}) failed, will retry: {error}')
+    if not updated:
+        logger.warning(f'Outbox event {event.id} ({event.event_type}) lease expired before its handler failed: {error}')
+
+
+@handles('order.paid')
+def _credit_paid_order(payload):
+    """Credit the vendors and count the sales of a paid order."""
+    items = OrderItem.objects.filter(order_id=payload['order_id']).values(
+        'vendor_id', 'product_id', 'quantity', 'total', 'vendor_amount'
+    )
+    for item in items:
+        if item['vendor_id']:
+            Vendor.objects.filter(id=item['vendor_id']).update(
+                total_sales=F('total_sales') + item['total'],
+                total_earnings=F('total_earnings') + item['vendor_amount'],
+                balance=F('balance') + item['vendor_amount'],
+            )
+        if item['product_id']:
+            Product.objects.filter(id=item['product_id']).update(
+                sales_count=F('sales_count') + item['quantity']
+            )
@@ -4,9 +4,12 @@ Serializers for order operations.
 from rest_framework import serializers
 from decimal import Decimal
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
 
 from .models import Order, OrderItem, OrderStatusHistory, OrderStatus, PaymentStatus
 from apps.accounts.serializers import UserSerializer
+from apps.catalog.models import Product
 from apps.vendors.serializers import VendorPublicSerializer
 
 
@@ -95,6 +98,7 @@ class OrderCreateSerializer(serializers.Serializer):
     payment_method = serializers.CharField(max_length=50)
     customer_notes = serializers.CharField(required=False, allow_blank=True)
 
+    @transaction.atomic
     def create(self, validated_data):
         cart = self.context['cart']
         user = self.context.get('user')
@@ -102,6 +106,30 @@ class OrderCreateSerializer(serializers.Serializer):
         if not cart.items.exists():
             raise serializers.ValidationError("Cart is empty")
 
+        # Take the stock first: one conditional UPDATE across all SKUs, so
+        # concurrent checkouts cannot oversell. On a shortfall the rows that
+        # were decremented are put back before the short ones are named.
+        needed = {}
+        for product_id, quantity in cart.items.filter(
+            product__track_inventory=True
+        ).values_list('product_id', 'quantity'):
+            needed[product_id] = needed.get(product_id, 0) + quantity
+        if needed:
+            amount = Case(
+                *[When(pk=product_id, then=Value(n)) for product_id, n in needed.items()],
+                output_field=IntegerField(),
+            )
+            savepoint = transaction.savepoint()
+            taken = Product.objects.filter(pk__in=needed, quantity__gte=amount).update(
+                quantity=F('quantity') - amount
+            )
+            if taken != len(needed):
+                transaction.savepoint_rollback(savepoint)
+                short = Product.objects.filter(pk__in=needed, quantity__lt=amount)
+                names = ', '.join(short.values_list('name', flat=True))
+                raise serializers.ValidationError(f"Insufficient stock for {names}")
+            transaction.savepoint_commit(savepoint)
+
         # Calculate totals
         subtotal = cart.subtotal
         tax_rate = Decimal('0.08')  # 8% tax
@@ -124,8 +152,9 @@ class OrderCreateSerializer(serializers.Serializer):
         order.payment_method = validated_data.get('payment_method')
         order.save()
 
-        # Create order items
+        # Create order items in one INSERT
         commission_rate = settings.PLATFORM_COMMISSION_PERCENT
+        order_items = []
         for cart_item in cart.items.select_related('product', 'product__vendor', 'variant').all():
             product = cart_item.product
             vendor = product.vendor
@@ -134,7 +163,7 @@ class OrderCreateSerializer(serializers.Serializer):
             commission_amount = item_total * Decimal(str(commission_rate)) / Decimal('100')
             vendor_amount = item_total - commission_amount
 
-            OrderItem.objects.create(
+            order_items.append(OrderItem(
                 order=order,
                 product=product,
                 vendor=vendor,
@@ -149,14 +178,8 @@ class OrderCreateSerializer(serializers.Serializer):
                 commission_rate=commission_rate,
                 commission_amount=commission_amount,
                 vendor_amount=vendor_amount
-            )
-
-            # Update inventory
-            if product.track_inventory:
-                product.quantity -= cart_item.quantity
-                if product.quantity < 0:
-                    product.quantity = 0
-                product.save(update_fields=['quantity'])
+            ))
+        OrderItem.objects.bulk_create(order_items)
 
         # Create initial status history
         OrderStatusHistory.objects.create(
@@ -1,25 +1,27 @@
 """
 Signals for the orders app.
 """
+import json
+
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
-from .models import Order, OrderItem, OrderStatus
+from .models import Order, OrderItem, OrderStatus, OutboxEvent
 
 
 @receiver(post_save, sender=Order)
 def update_vendor_sales(sender, instance, created, **kwargs):
-    """Update vendor sales when order is paid."""
-    if instance.payment_status == 'paid' and not created:
-        for item in instance.items.all():
-            if item.vendor:
-                vendor = item.vendor
-                vendor.total_sales += item.total
-                vendor.total_earnings += item.vendor_amount
-                vendor.balance += item.vendor_amount
-                vendor.save(update_fields=['total_sales', 'total_earnings', 'balance'])
+    """
+    Queue the vendor credits and sales counts of a paid order.
 
-                # Update product sales count
-                if item.product:
-                    item.product.sales_count += item.quantity
-                    item.product.save(update_fields=['sales_count'])
+    `manage.py process_outbox` applies them; the dedupe key queues them
+    once per order, however often the paid order is saved again.
+    """
+    if instance.payment_status == 'paid' and not created:
+        OutboxEvent.objects.bulk_create([
+            OutboxEvent(
+                event_type='order.paid',
+                payload=json.dumps({'order_id': str(instance.id)}),
+                dedupe_key=f'order.paid:{instance.id}',
+            )
+        ], ignore_conflicts=True)
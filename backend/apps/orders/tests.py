@@ -0,0 +1,95 @@
+"""
+Tests for the orders app.
+"""
+from decimal import Decimal
+
+from django.test import TestCase
+
+from apps.accounts.models import User
+from apps.catalog.models import Product
+from apps.vendors.models import Vendor
+
+from . import outbox
+from .models import Order, OrderItem, OutboxEvent
+
+
+class PaidOrderOutboxTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user(
+            email='vendor@example.com', password='vendor123', first_name='Test', last_name='Vendor'
+        )
+        self.vendor = Vendor.objects.create(
+            user=user, business_name='Test Shop', slug='test-shop', business_email='vendor@example.com'
+        )
+        self.product = Product.objects.create(
+            vendor=self.vendor, name='Test Product', slug='test-product', price=Decimal('25.00')
+        )
+        self.order = Order.objects.create(
+            subtotal=Decimal('50.00'),
+            total=Decimal('50.00'),
+            shipping_first_name='Jane',
+            shipping_last_name='Doe',
+            shipping_email='jane@example.com',
+            shipping_address_line1='123 Test St',
+            shipping_city='Testville',
+            shipping_postal_code='12345',
+            shipping_country='US',
+        )
+        OrderItem.objects.create(
+            order=self.order,
+            product=self.product,
+            vendor=self.vendor,
+            product_name='Test Product',
+            quantity=2,
+            unit_price=Decimal('25.00'),
+            total=Decimal('50.00'),
+            commission_rate=10.0,
+            commission_amount=Decimal('5.00'),
+            vendor_amount=Decimal('45.00'),
+        )
+
+    def pay(self):
+        self.order.payment_status = 'paid'
+        self.order.save()
+
+    def test_paying_an_order_credits_the_vendor(self):
+        self.pay()
+        self.assertEqual(outbox.process_batch(), 1)
+
+        self.vendor.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual(self.vendor.balance, Decimal('45.00'))
+        self.assertEqual(self.vendor.total_earnings, Decimal('45.00'))
+        self.assertEqual(self.vendor.total_sales, Decimal('50.00'))
+        self.assertEqual(self.product.sales_count, 2)
+        self.assertEqual(OutboxEvent.objects.get().status, outbox.DONE)
+
+    def test_saving_a_paid_order_again_credits_once(self):
+        self.pay()
+        outbox.process_batch()
+        self.order.save()
+        self.assertEqual(outbox.process_batch(), 0)
+
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.balance, Decimal('45.00'))
+
+    def test_failed_event_is_retried(self):
+        self.pay()
+
+        def fail(payload):
+            raise RuntimeError('database busy')
+
+        handlers = outbox.HANDLERS.copy()
+        outbox.HANDLERS['order.paid'] = fail
+        try:
+            outbox.process_batch()
+        finally:
+            outbox.HANDLERS.clear()
+            outbox.HANDLERS.update(handlers)
+
+        event = OutboxEvent.objects.get()
+        self.assertEqual((event.status, event.attempts), (outbox.PENDING, 1))
+        self.assertEqual(event.last_error, 'RuntimeError: database busy')
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.balance, Decimal('0.00'))
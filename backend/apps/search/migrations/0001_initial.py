@@ -0,0 +1,57 @@
+from django.db import migrations, models
+
+
+def fill_search_index(apps, schema_editor):
+    """Index the catalog as it is; the signals keep it current afterwards."""
+    SearchEntity = apps.get_model('search', 'SearchEntity')
+    Product = apps.get_model('catalog', 'Product')
+    Category = apps.get_model('catalog', 'Category')
+    Vendor = apps.get_model('vendors', 'Vendor')
+
+    def join(*parts):
+        return ' '.join(part for part in parts if part)
+
+    entries = [
+        SearchEntity(
+            entity_type='product', entity_id=p.pk, title=p.name,
+            body=join(p.description, p.short_description, *(p.tags or [])),
+        )
+        for p in Product.objects.filter(status='active').iterator()
+    ]
+    entries += [
+        SearchEntity(entity_type='category', entity_id=c.pk, title=c.name, body=join(c.description))
+        for c in Category.objects.filter(is_active=True).iterator()
+    ]
+    entries += [
+        SearchEntity(entity_type='vendor', entity_id=v.pk, title=v.business_name, body=join(v.description))
+        for v in Vendor.objects.filter(status='approved').iterator()
+    ]
+    SearchEntity.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+        ('vendors', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity_type', models.CharField(choices=[('product', 'Product'), ('category', 'Category'), ('vendor', 'Vendor')], max_length=16)),
+                ('entity_id', models.UUIDField()),
+                ('title', models.CharField(max_length=500)),
+                ('body', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'db_table': 'search_entity_index',
+                'constraints': [models.UniqueConstraint(fields=('entity_type', 'entity_id'), name='uniq_search_entity')],
+            },
+        ),
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+"""
+Search index models.
+"""
+from django.db import models
+
+
+class EntityType(models.TextChoices):
+    PRODUCT = 'product', 'Product'
+    CATEGORY = 'category', 'Category'
+    VENDOR = 'vendor', 'Vendor'
+
+
+class SearchEntity(models.Model):
+    """
+    One searchable product, category or vendor.
+
+    Global search reads this table alone instead of scanning products,
+    categories and vendors separately. Entries are kept in sync by the
+    signals in apps.search.signals: only active products and categories and
+    approved vendors have one.
+    """
+    entity_type = models.CharField(max_length=16, choices=EntityType.choices)
+    entity_id = models.UUIDField()
+    title = models.CharField(max_length=500)
+    body = models.TextField(blank=True, default='')
+
+    class Meta:
+        db_table = 'search_entity_index'
+        constraints = [
+            models.UniqueConstraint(fields=['entity_type', 'entity_id'], name='uniq_search_entity'),
+        ]
+
+    def __str__(self):
+        return f"{self.entity_type}: {self.title}"
@@ -0,0 +1,50 @@
+"""
+Signals keeping the search index in sync with the catalog.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.catalog.models import Category, Product, ProductStatus
+from apps.vendors.models import Vendor, VendorStatus
+
+from .models import EntityType, SearchEntity
+
+
+def entity_document(instance):
+    """(entity type, searchable, title, body) of a product, category or vendor."""
+    if isinstance(instance, Product):
+        body = [instance.description, instance.short_description, *(instance.tags or [])]
+        return EntityType.PRODUCT, instance.status == ProductStatus.ACTIVE, instance.name, body
+    if isinstance(instance, Category):
+        return EntityType.CATEGORY, instance.is_active, instance.name, [instance.description]
+    return EntityType.VENDOR, instance.status == VendorStatus.APPROVED, instance.business_name, [instance.description]
+
+
+def index_entity(instance):
+    """Add, refresh or remove the search entry of one instance."""
+    entity_type, searchable, title, body = entity_document(instance)
+    if not searchable:
+        SearchEntity.objects.filter(entity_type=entity_type, entity_id=instance.pk).delete()
+        return
+    SearchEntity.objects.update_or_create(
+        entity_type=entity_type,
+        entity_id=instance.pk,
+        defaults={'title': title, 'body': ' '.join(part for part in body if part)},
+    )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Vendor)
+def update_search_entity(sender, instance, **kwargs):
+    """Reindex a product, category or vendor when it is saved."""
+    index_entity(instance)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Vendor)
+def delete_search_entity(sender, instance, **kwargs):
+    """Drop the search entry of a deleted product, category or vendor."""
+    entity_type = entity_document(instance)[0]
+    SearchEntity.objects.filter(entity_type=entity_type, entity_id=instance.pk).delete()
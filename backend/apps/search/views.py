@@ -4,13 +4,24 @@ Views for search functionality.
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
-from django.db.models import Q
+from django.db.models import Case, F, Q, Value, When, Window
+from django.db.models.functions import RowNumber
 
 from apps.catalog.models import Product, Category
 from apps.catalog.serializers import ProductListSerializer, CategorySerializer
 from apps.vendors.models import Vendor
 from apps.vendors.serializers import VendorPublicSerializer
 
+from .models import EntityType, SearchEntity
+
+
+# Results per entity type in global search
+GLOBAL_SEARCH_LIMITS = {
+    EntityType.PRODUCT: 10,
+    EntityType.CATEGORY: 5,
+    EntityType.VENDOR: 5,
+}
+
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -25,30 +36,36 @@ def global_search(request):
             'vendors': []
         })
 
-    # Search products
-    products = Product.objects.filter(
-        status='active'
-    ).filter(
-        Q(name__icontains=query) |
-        Q(description__icontains=query) |
-        Q(tags__contains=[query])
-    )[:10]
-
-    # Search categories
-    categories = Category.objects.filter(
-        is_active=True
-    ).filter(
-        Q(name__icontains=query) |
-        Q(description__icontains=query)
-    )[:5]
-
-    # Search vendors
-    vendors = Vendor.objects.filter(
-        status='approved'
-    ).filter(
-        Q(business_name__icontains=query) |
-        Q(description__icontains=query)
-    )[:5]
+    # One ranked query over the search index: title matches first, numbered
+    # per entity type and cut at each type's limit
+    rank = Case(When(title__icontains=query, then=Value(1)), default=Value(0))
+    hits = (
+        SearchEntity.objects
+        .filter(Q(title__icontains=query) | Q(body__icontains=query))
+        .annotate(position=Window(
+            RowNumber(),
+            partition_by=[F('entity_type')],
+            order_by=[rank.desc(), F('title').asc()],
+        ))
+        .filter(position__lte=Case(
+            *[When(entity_type=entity_type, then=Value(limit))
+              for entity_type, limit in GLOBAL_SEARCH_LIMITS.items()],
+            default=Value(0),
+        ))
+        .order_by('entity_type', 'position')
+        .values_list('entity_type', 'entity_id')
+    )
+    ids = {entity_type: [] for entity_type in GLOBAL_SEARCH_LIMITS}
+    for entity_type, entity_id in hits:
+        ids[entity_type].append(entity_id)
+
+    def in_order(queryset, pks):
+        found = queryset.in_bulk(pks)
+        return [found[pk] for pk in pks if pk in found]
+
+    products = in_order(Product.objects.all(), ids[EntityType.PRODUCT])
+    categories = in_order(Category.objects.all(), ids[EntityType.CATEGORY])
+    vendors = in_order(Vendor.objects.all(), ids[EntityType.VENDOR])
 
     return Response({
         'products': ProductListSerializer(products, many=True).data,
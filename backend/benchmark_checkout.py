@@ -0,0 +1,109 @@
+"""
+Script to count the database round trips and time of one checkout
+(POST /orders/) for carts of 1, 10 and 50 lines, on a scratch SQLite database
+
+A cursor.executemany() call counts once per parameter set, the statements the
+database runs; a multi-row INSERT ... VALUES counts once.
+Run: python benchmark_checkout.py [iterations]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from decimal import Decimal
+
+from sqlalchemy import event
+from sqlalchemy.engine.interfaces import ExecuteStyle
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.api.v1.endpoints.orders import place_order
+from app.core.database import Base
+from app.models.cart import Cart, CartItem
+from app.models.product import Product, ProductStatus
+from app.models.user import User, UserRole
+from app.models.vendor import Vendor, VendorStatus
+from app.schemas.order import OrderCreate
+
+CART_SIZES = [1, 10, 50]
+
+ORDER = OrderCreate(
+    shipping_address={
+        "first_name": "Bench",
+        "last_name": "Customer",
+        "email": "bench@example.com",
+        "address_line1": "1 Bench St",
+        "city": "Benchville",
+        "postal_code": "12345",
+        "country": "US",
+    },
+    billing_same_as_shipping=True,
+    payment_method="stripe",
+)
+
+
+async def seed(engine, lines: int) -> User:
+    async with AsyncSession(engine, expire_on_commit=False) as db:
+        user = User(
+            id=uuid.uuid4(), email=f"bench{uuid.uuid4().hex[:8]}@example.com", password_hash="x",
+            first_name="Bench", last_name="Customer", role=UserRole.VENDOR,
+        )
+        vendor = Vendor(
+            id=uuid.uuid4(), user_id=user.id, business_name="Bench Store", slug=f"bench-{user.id}",
+            business_email=user.email, status=VendorStatus.APPROVED,
+        )
+        cart = Cart(id=uuid.uuid4(), user_id=user.id)
+        db.add_all([user, vendor, cart])
+        for i in range(lines):
+            product = Product(
+                id=uuid.uuid4(), vendor_id=vendor.id, name=f"Bench Product {i}",
+                slug=f"bench-{uuid.uuid4().hex}", price=Decimal("9.99"), quantity=1000,
+                status=ProductStatus.ACTIVE, track_inventory=True, currency="USD",
+            )
+            db.add_all([product, CartItem(cart_id=cart.id, product_id=product.id, quantity=2, price=product.price)])
+        await db.commit()
+        return user
+
+
+async def checkout(engine, user: User) -> tuple:
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(len(parameters) if context.execute_style is ExecuteStyle.EXECUTEMANY else 1)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            start = time.perf_counter()
+            await place_order(ORDER, user, db)
+            elapsed = (time.perf_counter() - start) * 1000
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+    return sum(statements), elapsed
+
+
+async def benchmark_checkout(iterations: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}", poolclass=NullPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        print(f"{iterations} checkouts per cart size\n")
+        print(f"{'cart lines':>10} {'round trips':>12} {'median ms':>10}")
+        for lines in CART_SIZES:
+            trips, timings = set(), []
+            for _ in range(iterations):
+                user = await seed(engine, lines)
+                count, elapsed = await checkout(engine, user)
+                trips.add(count)
+                timings.append(elapsed)
+            print(f"{lines:>10} {'/'.join(map(str, sorted(trips))):>12} {statistics.median(timings):>10.2f}")
+
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(benchmark_checkout(int(sys.argv[1]) if len(sys.argv) > 1 else 10))
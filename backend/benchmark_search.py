@@ -0,0 +1,68 @@
+"""
+Script to compare product search on the ILIKE path with the full-text path
+(FTS5 on SQLite, the products.search_vector column on PostgreSQL)
+Run: python benchmark_search.py [iterations]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from app.core.database import AsyncSessionLocal, init_db
+from app.services.search import SearchService
+
+QUERIES = [
+    "phone",
+    "wireless headphones",
+    "usb cable",
+    "\"stainless steel\"",
+    "organic cotton shirt",
+    "lap",
+    "gaming keyboard mechanical",
+    "waterproof",
+]
+
+
+async def time_search(search, query: str, iterations: int) -> list:
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await search(query, limit=20)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+async def benchmark_search(iterations: int):
+    await init_db()
+    async with AsyncSessionLocal() as db:
+        service = SearchService(db)
+        backend = await service.full_text_backend()
+        if backend is None:
+            print("[!] No full-text index found; run the app once or apply the migrations")
+            return
+
+        print(f"Full-text backend: {backend}, {iterations} iterations per query\n")
+        print(f"{'query':<30} {'ilike ms':>10} {'fts ms':>10} {'ilike hits':>11} {'fts hits':>9}")
+
+        like_medians, fts_medians = [], []
+        for query in QUERIES:
+            like_timings = await time_search(service.search_products_like, query, iterations)
+            fts_timings = await time_search(service.search_products, query, iterations)
+            _, like_total = await service.search_products_like(query, limit=20)
+            _, fts_total = await service.search_products(query, limit=20)
+
+            like_medians.append(statistics.median(like_timings))
+            fts_medians.append(statistics.median(fts_timings))
+            print(
+                f"{query:<30} {like_medians[-1]:>10.2f} {fts_medians[-1]:>10.2f} "
+                f"{like_total:>11} {fts_total:>9}"
+            )
+
+        print(
+            f"\n[OK] Median of medians: ilike {statistics.median(like_medians):.2f} ms, "
+            f"full-text {statistics.median(fts_medians):.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(benchmark_search(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
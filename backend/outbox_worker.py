@@ -0,0 +1,24 @@
+"""
+Script to run the outbox worker: delivers the emails, notifications and
+vendor balance credits queued in outbox_events, until interrupted
+Run several for more throughput; on PostgreSQL they split the backlog.
+Run: python outbox_worker.py
+"""
+import asyncio
+import logging
+
+from app.core.database import AsyncSessionLocal, init_db
+from app.services.outbox import outbox_worker
+
+
+async def main():
+    await init_db()
+    await outbox_worker.run(AsyncSessionLocal)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
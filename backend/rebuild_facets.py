@@ -0,0 +1,19 @@
+"""
+Script to rebuild the precomputed category filter counts
+Run: python rebuild_facets.py
+"""
+import asyncio
+from app.core.database import AsyncSessionLocal, init_db
+from app.services.facets import FacetService
+
+
+async def rebuild_facets():
+    await init_db()
+    async with AsyncSessionLocal() as db:
+        print("Rebuilding category facets...")
+        count = await FacetService(db).rebuild()
+        print(f"[OK] Indexed {count} active products")
+
+
+if __name__ == "__main__":
+    asyncio.run(rebuild_facets())
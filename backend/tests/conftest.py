@@ -29,6 +29,14 @@ from app.models.category import Category
 from app.models.cart import Cart, CartItem
 from app.models.order import Order, OrderItem, OrderStatus, OrderStatusHistory, PaymentStatus
 from app.main import app
+from app.services.category_tree import category_cache
+from app.services.product_cache import product_detail_cache
+from app.services.rails import rail_snapshots
+from app.services.search_cache import catalog_changed
+from app.services.search_log import search_logger
+from app.services.spelling import spelling_index
+from app.services.autocomplete import completion_index
+from app.services.view_counter import view_counter
 
 # Disable rate limiting for tests
 import app.api.v1.endpoints.auth as _auth_module
@@ -63,6 +71,15 @@ async def setup_database():
     """Create all tables before each test and drop them after."""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    # In-process caches would otherwise outlive the per-test database
+    category_cache.clear()
+    product_detail_cache.clear()
+    view_counter.clear()
+    rail_snapshots.clear()
+    catalog_changed()
+    search_logger.clear()
+    spelling_index.clear()
+    completion_index.clear()
     yield
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
@@ -2,11 +2,43 @@
 Tests for order endpoints: /api/v1/orders/*
 """
 
+import asyncio
+import json
+import os
 import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
 import pytest
+import pytest_asyncio
+from fastapi import HTTPException
 from httpx import AsyncClient
+from sqlalchemy import delete, event, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
 
-from tests.conftest import auth_headers
+from app.api.v1.endpoints.orders import place_order
+from app.core.config import settings
+from app.core.database import Base, get_db
+from app.core.security import create_access_token
+from app.main import app
+from app.models.product import Product, ProductStatus
+from app.models.user import User, UserRole
+from app.models.vendor import Vendor, VendorStatus
+from app.models.cart import Cart, CartItem
+from app.models.stock_reservation import StockReservation
+from app.schemas.order import OrderCreate
+from app.models.idempotency_key import IdempotencyKey
+from app.models.order import Order, OrderItem, PaymentStatus
+from app.models.notification import Notification
+from app.models.outbox_event import OutboxEvent
+from app.models.search_query import SearchQuery
+from app.services import email as email_service
+from app.services.idempotency import REPLAYED_HEADER, IdempotencyStore
+from app.services.inventory import StockReaper
+from app.services.outbox import DEAD, DONE, PENDING, OutboxWorker, enqueue, queue_vendor_credit
+from tests.conftest import _create_user, _override_get_db, auth_headers, engine
 
 API = "/api/v1/orders"
 CART_API = "/api/v1/cart"
@@ -102,6 +134,776 @@ class TestCreateOrder:
         assert cart_resp.json()["item_count"] == 0
 
 
+# ---------------------------------------------------------------------------
+# Stock reservation
+# ---------------------------------------------------------------------------
+
+# Units of the contended product in the stress test
+STOCK = 50
+CHECKOUTS = 300
+
+
+@pytest_asyncio.fixture(params=["sqlite", "postgres"])
+async def stock_engine(request, tmp_path):
+    """
+    Engine with separate connections per session (a file database, or
+    TEST_POSTGRES_URL), so checkouts really run concurrently.
+    """
+    if request.param == "sqlite":
+        stock_engine = create_async_engine(
+            f"sqlite+aiosqlite:///{tmp_path / 'stock.db'}",
+            poolclass=NullPool,
+            connect_args={"timeout": 60},
+        )
+    else:
+        url = os.environ.get("TEST_POSTGRES_URL")
+        if not url:
+            pytest.skip("TEST_POSTGRES_URL is not set")
+        stock_engine = create_async_engine(url, pool_size=20, max_overflow=0, pool_timeout=60)
+
+    async with stock_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        yield stock_engine
+    finally:
+        async with stock_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await stock_engine.dispose()
+
+
+class TestStockReservation:
+
+    @pytest.mark.asyncio
+    async def test_insufficient_stock_fails_whole_order(
+        self, client: AsyncClient, db_session, customer_user, sample_products
+    ):
+        _, token = customer_user
+        headers = auth_headers(token)
+        plenty, scarce = sample_products[0], sample_products[1]
+        for product in (plenty, scarce):
+            await client.post(
+                f"{CART_API}/items", json={"product_id": str(product.id), "quantity": 2}, headers=headers
+            )
+        scarce.quantity = 1
+        await db_session.commit()
+
+        resp = await client.post(
+            API,
+            json={"shipping_address": SHIPPING_ADDRESS, "billing_same_as_shipping": True, "payment_method": "stripe"},
+            headers=headers,
+        )
+        assert resp.status_code == 400
+        assert resp.json()["detail"] == "Insufficient stock for Test Product 2"
+
+        # The product with enough stock was not decremented either
+        await db_session.refresh(plenty)
+        await db_session.refresh(scarce)
+        assert (plenty.quantity, plenty.sales_count) == (100, 0)
+        assert scarce.quantity == 1
+        cart_resp = await client.get(CART_API, headers=headers)
+        assert cart_resp.json()["item_count"] == 4
+
+    @pytest.mark.asyncio
+    async def test_concurrent_checkouts_never_oversell(self, client: AsyncClient, stock_engine):
+        async with AsyncSession(stock_engine, expire_on_commit=False) as db:
+            user = User(
+                id=uuid.uuid4(), email="stock@test.com", password_hash="x",
+                first_name="Stock", last_name="Vendor", role=UserRole.VENDOR,
+            )
+            vendor = Vendor(
+                id=uuid.uuid4(), user_id=user.id, business_name="Stock Store",
+                slug="stock-store", business_email="stock@test.com", status=VendorStatus.APPROVED,
+            )
+            hot, other = (
+                Product(
+                    id=uuid.uuid4(), vendor_id=vendor.id, name=name, slug=name.lower(),
+                    price=Decimal("9.99"), quantity=quantity, status=ProductStatus.ACTIVE,
+                    track_inventory=True, currency="USD",
+                )
+                for name, quantity in (("Hot", STOCK), ("Other", CHECKOUTS))
+            )
+            db.add_all([user, vendor, hot, other])
+
+            # One customer per checkout; every other cart also holds a unit
+            # of a product with plenty of stock
+            customers = []
+            for i in range(CHECKOUTS):
+                customer = User(
+                    id=uuid.uuid4(), email=f"buyer{i}@test.com", password_hash="x",
+                    first_name="Buyer", last_name=str(i), role=UserRole.CUSTOMER,
+                )
+                cart = Cart(id=uuid.uuid4(), user_id=customer.id)
+                db.add_all([customer, cart])
+                for product in (hot, other) if i % 2 else (hot,):
+                    db.add(CartItem(cart_id=cart.id, product_id=product.id, quantity=1, price=product.price))
+                customers.append(auth_headers(create_access_token(data={"sub": str(customer.id)})))
+            await db.commit()
+
+        async def stock_db():
+            # Like get_db, with a connection of its own per request
+            async with AsyncSession(stock_engine, expire_on_commit=False, autoflush=False) as session:
+                try:
+                    yield session
+                    await session.commit()
+                except Exception:
+                    await session.rollback()
+                    raise
+
+        async def checkout(headers: dict) -> bool:
+            resp = await client.post(API, json=TestCheckoutHolds.ORDER, headers=headers)
+            if resp.status_code == 400:
+                assert resp.json()["detail"] == "Insufficient stock for Hot"
+                return False
+            assert resp.status_code == 201
+            return True
+
+        app.dependency_overrides[get_db] = stock_db
+        try:
+            results = await asyncio.gather(*(checkout(headers) for headers in customers))
+        finally:
+            app.dependency_overrides[get_db] = _override_get_db
+        assert sum(results) == STOCK
+
+        async with AsyncSession(stock_engine) as db:
+            rows = await db.execute(select(Product.id, Product.quantity, Product.sales_count))
+            stock = {product_id: (quantity, sold) for product_id, quantity, sold in rows.all()}
+            orders = (await db.execute(select(func.count()).select_from(Order))).scalar()
+        assert stock[hot.id] == (0, STOCK)
+        assert orders == STOCK
+        # Failed orders left the other product alone
+        other_sold = sum(ok for i, ok in enumerate(results) if i % 2)
+        assert stock[other.id] == (CHECKOUTS - other_sold, other_sold)
+
+
+class TestCheckoutHolds:
+
+    ORDER = {"shipping_address": SHIPPING_ADDRESS, "billing_same_as_shipping": True, "payment_method": "stripe"}
+
+    @pytest_asyncio.fixture
+    async def other_customer(self, db_session):
+        user, token = await _create_user(
+            db_session, email="other@test.com", first_name="Other", last_name="Customer"
+        )
+        db_session.add(Cart(user_id=user.id))
+        await db_session.commit()
+        return auth_headers(token)
+
+    async def _start_checkout(self, client, db_session, customer_user, product, quantity=3):
+        _, token = customer_user
+        headers = auth_headers(token)
+        product.quantity = 4
+        await db_session.commit()
+        await client.post(
+            f"{CART_API}/items", json={"product_id": str(product.id), "quantity": quantity}, headers=headers
+        )
+        resp = await client.post(f"{API}/checkout/start", headers=headers)
+        assert resp.status_code == 200
+        return headers, resp.json()
+
+    @pytest.mark.asyncio
+    async def test_hold_sets_stock_aside_until_the_order(
+        self, client: AsyncClient, db_session, customer_user, other_customer, sample_products
+    ):
+        product = sample_products[0]
+        headers, hold = await self._start_checkout(client, db_session, customer_user, product)
+        assert hold["items"] == [{"product_id": str(product.id), "quantity": 3}]
+
+        await db_session.refresh(product)
+        assert (product.quantity, product.reserved_quantity) == (4, 3)
+
+        # Only the unheld unit is on sale to other carts
+        add = {"product_id": str(product.id), "quantity": 2}
+        resp = await client.post(f"{CART_API}/items", json=add, headers=other_customer)
+        assert resp.status_code == 400
+        add["quantity"] = 1
+        resp = await client.post(f"{CART_API}/items", json=add, headers=other_customer)
+        assert resp.status_code == 200
+
+        # Starting again replaces the cart's holds instead of adding to them
+        resp = await client.post(f"{API}/checkout/start", headers=headers)
+        assert resp.status_code == 200
+        await db_session.refresh(product)
+        assert product.reserved_quantity == 3
+
+        # The other cart cannot check out more than was free...
+        await client.put(
+            f"{CART_API}/items/{(await client.get(CART_API, headers=other_customer)).json()['items'][0]['id']}",
+            json={"quantity": 1}, headers=other_customer,
+        )
+        product.quantity = 3
+        await db_session.commit()
+        resp = await client.post(API, json=self.ORDER, headers=other_customer)
+        assert resp.status_code == 400
+
+        # ...while the holder's order converts its hold
+        resp = await client.post(API, json=self.ORDER, headers=headers)
+        assert resp.status_code == 201
+        assert resp.json()["items"][0]["quantity"] == 3
+        await db_session.refresh(product)
+        assert (product.quantity, product.reserved_quantity, product.sales_count) == (0, 0, 3)
+        holds = await db_session.execute(select(StockReservation))
+        assert holds.scalars().all() == []
+
+    @pytest.mark.asyncio
+    async def test_hold_for_more_than_available_fails(
+        self, client: AsyncClient, db_session, customer_user, sample_products
+    ):
+        product = sample_products[0]
+        headers, _ = await self._start_checkout(client, db_session, customer_user, product)
+        product.quantity = 2
+        await db_session.commit()
+
+        resp = await client.post(f"{API}/checkout/start", headers=headers)
+        assert resp.status_code == 400
+        assert resp.json()["detail"] == "Insufficient stock for Test Product 1"
+        # The previous hold is kept
+        await db_session.refresh(product)
+        assert product.reserved_quantity == 3
+
+    @pytest.mark.asyncio
+    async def test_order_releases_holds_it_does_not_use(
+        self, client: AsyncClient, db_session, customer_user, other_customer, sample_products
+    ):
+        ordered, dropped = sample_products[0], sample_products[1]
+        headers, _ = await self._start_checkout(client, db_session, customer_user, dropped, quantity=1)
+        resp = await client.post(
+            f"{CART_API}/items", json={"product_id": str(dropped.id), "quantity": 3}, headers=other_customer
+        )
+        assert resp.status_code == 200
+        resp = await client.post(f"{API}/checkout/start", headers=other_customer)
+        assert resp.status_code == 200
+
+        # The customer swaps the held product for another, and the vendor
+        # cuts its stock below what the other cart holds
+        cart = (await client.get(CART_API, headers=headers)).json()
+        await client.delete(f"{CART_API}/items/{cart['items'][0]['id']}", headers=headers)
+        await client.post(
+            f"{CART_API}/items", json={"product_id": str(ordered.id), "quantity": 1}, headers=headers
+        )
+        dropped.quantity = 2
+        await db_session.commit()
+
+        resp = await client.post(API, json=self.ORDER, headers=headers)
+        assert resp.status_code == 201
+        await db_session.refresh(dropped)
+        assert dropped.reserved_quantity == 3
+
+    @pytest.mark.asyncio
+    async def test_reaper_releases_expired_holds(
+        self, client: AsyncClient, db_session, customer_user, other_customer, sample_products
+    ):
+        product = sample_products[0]
+        await self._start_checkout(client, db_session, customer_user, product)
+
+        reaper = StockReaper(interval_seconds=60)
+        assert await reaper.reap(db_session) == 0
+        later = datetime.utcnow() + timedelta(hours=1)
+        assert await reaper.reap(db_session, now=later) == 3
+        assert reaper.stats()["released_units"] == 3
+
+        await db_session.refresh(product)
+        assert (product.quantity, product.reserved_quantity) == (4, 0)
+        resp = await client.post(
+            f"{CART_API}/items", json={"product_id": str(product.id), "quantity": 4}, headers=other_customer
+        )
+        assert resp.status_code == 200
+
+
+class TestCreateOrderWrites:
+
+    async def _checkout(self, db_session, user, products) -> tuple:
+        cart = (await db_session.execute(select(Cart).where(Cart.user_id == user.id))).scalar_one()
+        db_session.add_all(
+            CartItem(cart_id=cart.id, product_id=product.id, quantity=2, price=product.price)
+            for product in products
+        )
+        await db_session.commit()
+
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        order_data = OrderCreate(
+            shipping_address=SHIPPING_ADDRESS, billing_same_as_shipping=True, payment_method="stripe"
+        )
+        event.listen(engine.sync_engine, "before_cursor_execute", record)
+        try:
+            order = await place_order(order_data, user, db_session)
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", record)
+        return order, statements
+
+    @pytest.mark.asyncio
+    async def test_round_trips_do_not_grow_with_the_cart(self, db_session, customer_user, sample_products):
+        user, _ = customer_user
+        _, one_line = await self._checkout(db_session, user, sample_products[:1])
+        order, three_lines = await self._checkout(db_session, user, sample_products)
+
+        assert len(three_lines) == len(one_line)
+        assert sum(s.startswith("INSERT INTO order_items") for s in three_lines) == 1
+        assert sum(s.startswith("DELETE FROM cart_items") for s in three_lines) == 1
+        # The response is built from the rows written, not reloaded
+        assert not any(s.startswith("SELECT orders") for s in three_lines)
+        # Nothing sold out, so the facet counts are left alone
+        assert not any("product_facet_snapshots" in s for s in three_lines)
+        assert [item.product_name for item in order.items] == [p.name for p in sample_products]
+        assert [h.notes for h in order.status_history] == ["Order placed and confirmed"]
+
+        remaining = await db_session.execute(select(CartItem))
+        assert remaining.scalars().all() == []
+
+    @pytest.mark.asyncio
+    async def test_sold_out_products_leave_the_in_stock_facet(self, db_session, customer_user, sample_products):
+        user, _ = customer_user
+        sample_products[0].quantity = 2
+        await db_session.commit()
+
+        _, statements = await self._checkout(db_session, user, sample_products[:2])
+        facet_reads = [s for s in statements if "FROM product_facet_snapshots" in s]
+        assert len(facet_reads) == 1
+
+        await db_session.refresh(sample_products[0])
+        assert sample_products[0].quantity == 0
+
+
+class TestIdempotencyKeys:
+
+    ORDER = {"shipping_address": SHIPPING_ADDRESS, "billing_same_as_shipping": True, "payment_method": "stripe"}
+
+    async def _fill_cart(self, db_session, user, product):
+        cart = (await db_session.execute(select(Cart).where(Cart.user_id == user.id))).scalar_one()
+        db_session.add(CartItem(cart_id=cart.id, product_id=product.id, quantity=2, price=product.price))
+        await db_session.commit()
+
+    async def _create(self, db_session, user, key, **changes):
+        order_data = OrderCreate(**{**self.ORDER, **changes})
+        return await place_order(order_data, user, db_session, idempotency_key=key)
+
+    @pytest.mark.asyncio
+    async def test_retry_replays_the_first_order(self, db_session, customer_user, sample_products):
+        user, _ = customer_user
+        product = sample_products[0]
+        await self._fill_cart(db_session, user, product)
+
+        first = await self._create(db_session, user, "checkout-1")
+        retry = await self._create(db_session, user, "checkout-1")
+
+        assert retry.status_code == 201
+        assert retry.headers[REPLAYED_HEADER] == "true"
+        assert json.loads(retry.body)["order_number"] == first.order_number
+
+        orders = await db_session.execute(select(Order))
+        assert len(orders.scalars().all()) == 1
+        await db_session.refresh(product)
+        assert (product.quantity, product.sales_count) == (98, 2)
+
+    @pytest.mark.asyncio
+    async def test_order_and_key_commit_together(self, db_session, customer_user, sample_products, monkeypatch):
+        # A separate completion after the order's commit could be lost to a
+        # crash, leaving a claim that a retry takes over once it expires
+        async def crash(*args, **kwargs):
+            raise RuntimeError("worker died before completing the key")
+
+        monkeypatch.setattr(IdempotencyStore, "_complete", crash)
+        user, _ = customer_user
+        await self._fill_cart(db_session, user, sample_products[0])
+
+        first = await self._create(db_session, user, "checkout-1")
+
+        await db_session.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.status == "in_progress")
+            .values(expires_at=datetime.utcnow() - timedelta(seconds=1))
+        )
+        await db_session.commit()
+        await self._fill_cart(db_session, user, sample_products[0])
+        retry = await self._create(db_session, user, "checkout-1")
+
+        assert retry.headers[REPLAYED_HEADER] == "true"
+        assert json.loads(retry.body)["order_number"] == first.order_number
+        orders = await db_session.execute(select(Order))
+        assert len(orders.scalars().all()) == 1
+
+    @pytest.mark.asyncio
+    async def test_key_reused_with_another_request(self, db_session, customer_user, sample_products):
+        user, _ = customer_user
+        await self._fill_cart(db_session, user, sample_products[0])
+        await self._create(db_session, user, "checkout-1")
+
+        with pytest.raises(HTTPException) as e:
+            await self._create(db_session, user, "checkout-1", customer_notes="Leave at the door")
+        assert e.value.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_client_error_is_replayed(self, client: AsyncClient, customer_user, sample_products):
+        _, token = customer_user
+        headers = {**auth_headers(token), "Idempotency-Key": "checkout-1"}
+
+        resp = await client.post(API, json=self.ORDER, headers=headers)
+        assert resp.status_code == 400
+        assert REPLAYED_HEADER not in resp.headers
+
+        await client.post(
+            f"{CART_API}/items", json={"product_id": str(sample_products[0].id), "quantity": 1},
+            headers=auth_headers(token),
+        )
+        resp = await client.post(API, json=self.ORDER, headers=headers)
+        assert resp.status_code == 400
+        assert resp.json()["detail"] == "Cart is empty"
+        assert resp.headers[REPLAYED_HEADER] == "true"
+
+    @pytest.mark.asyncio
+    async def test_gateway_outage_is_not_replayed(
+        self, client: AsyncClient, db_session, customer_user, sample_products, monkeypatch
+    ):
+        stripe = pytest.importorskip("stripe")
+        _, token = customer_user
+        resp = await _create_order(client, token, str(sample_products[0].id))
+        order = await db_session.get(Order, uuid.UUID(resp.json()["id"]))
+        order.payment_status = PaymentStatus.PENDING
+        await db_session.commit()
+
+        calls = 0
+
+        def create(**kwargs):
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                raise stripe.APIConnectionError("connection reset")
+            return SimpleNamespace(id="pi_1", client_secret="pi_1_secret")
+
+        monkeypatch.setattr(settings, "STRIPE_SECRET_KEY", "sk_test")
+        monkeypatch.setattr(stripe.PaymentIntent, "create", create)
+        headers = {**auth_headers(token), "Idempotency-Key": "pay-1"}
+        body = {"order_id": str(order.id), "payment_method": "stripe"}
+
+        resp = await client.post("/api/v1/payments/stripe/create-intent", json=body, headers=headers)
+        assert resp.status_code == 503
+
+        # The outage was not stored for the key: the retry reaches Stripe
+        resp = await client.post("/api/v1/payments/stripe/create-intent", json=body, headers=headers)
+        assert resp.status_code == 200
+        assert resp.json()["client_secret"] == "pi_1_secret"
+        assert REPLAYED_HEADER not in resp.headers
+        assert calls == 2
+
+    @pytest.mark.asyncio
+    async def test_browser_clients_may_send_the_key(self, client: AsyncClient):
+        origin = settings.ALLOWED_ORIGINS[0]
+        resp = await client.options(
+            f"{API}/",
+            headers={
+                "Origin": origin,
+                "Access-Control-Request-Method": "POST",
+                "Access-Control-Request-Headers": "authorization,content-type,idempotency-key",
+            },
+        )
+        assert resp.status_code == 200
+
+        resp = await client.get(f"{API}/", headers={"Origin": origin})
+        assert REPLAYED_HEADER in resp.headers["access-control-expose-headers"]
+
+    @pytest.mark.asyncio
+    async def test_server_error_releases_the_key(self, db_session):
+        store = IdempotencyStore(ttl_seconds=60, lock_seconds=60, wait_seconds=1, purge_interval_seconds=60)
+        user_id = uuid.uuid4()
+
+        async def fail(complete):
+            raise RuntimeError("gateway down")
+
+        async def succeed(complete):
+            return {"ok": True}
+
+        with pytest.raises(RuntimeError):
+            await store.run_once(db_session, user_id, "payments.confirm", "pay-1", {}, fail)
+        assert await store.run_once(db_session, user_id, "payments.confirm", "pay-1", {}, succeed) == {"ok": True}
+        assert store.executions == 2
+
+    @pytest.mark.asyncio
+    async def test_expired_keys_are_purged(self, db_session):
+        store = IdempotencyStore(ttl_seconds=60, lock_seconds=60, wait_seconds=1, purge_interval_seconds=60)
+
+        async def succeed(complete):
+            return {"ok": True}
+
+        await store.run_once(db_session, uuid.uuid4(), "payments.confirm", "pay-1", {}, succeed)
+        assert await store.purge(db_session) == 0
+        assert await store.purge(db_session, now=datetime.utcnow() + timedelta(minutes=2)) == 1
+        rows = await db_session.execute(select(IdempotencyKey))
+        assert rows.scalars().all() == []
+
+    @pytest.mark.asyncio
+    async def test_concurrent_duplicates_wait_for_the_first(self, stock_engine):
+        # Two stores stand in for two workers: duplicates on the first wait
+        # for its completion event, those on the second poll the row
+        workers = [
+            IdempotencyStore(ttl_seconds=60, lock_seconds=60, wait_seconds=30, purge_interval_seconds=60)
+            for _ in range(2)
+        ]
+        user_id = uuid.uuid4()
+        calls = 0
+
+        async def pay(complete):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.5)
+            return {"payment": calls}
+
+        async def request(i: int):
+            async with AsyncSession(stock_engine, expire_on_commit=False) as db:
+                return await workers[i % 2].run_once(
+                    db, user_id, "payments.stripe.create_intent", "pay-1", {"order_id": "o1"}, pay
+                )
+
+        results = await asyncio.gather(*(request(i) for i in range(10)))
+
+        assert calls == 1
+        assert sum(isinstance(r, dict) for r in results) == 1
+        assert all(json.loads(r.body) == {"payment": 1} for r in results if not isinstance(r, dict))
+        assert sum(w.replays for w in workers) == 9
+
+    @pytest.mark.asyncio
+    async def test_late_first_owner_keeps_off_a_taken_over_claim(self, stock_engine):
+        # The first worker's claim expires while it runs; the second takes
+        # it over and completes, and the first finishing late must not
+        # overwrite the second's stored response
+        workers = [
+            IdempotencyStore(ttl_seconds=60, lock_seconds=0.3, wait_seconds=5, purge_interval_seconds=60)
+            for _ in range(2)
+        ]
+        user_id = uuid.uuid4()
+
+        def pay(n: int, seconds: float):
+            async def operation(complete):
+                await asyncio.sleep(seconds)
+                return {"payment": n}
+            return operation
+
+        async def request(worker, operation):
+            async with AsyncSession(stock_engine, expire_on_commit=False) as db:
+                return await worker.run_once(db, user_id, "payments.confirm", "pay-1", {}, operation)
+
+        first = asyncio.create_task(request(workers[0], pay(1, 1.0)))
+        await asyncio.sleep(0.5)
+        assert await request(workers[1], pay(2, 0)) == {"payment": 2}
+        assert await first == {"payment": 1}
+
+        replay = await request(workers[1], pay(3, 0))
+        assert json.loads(replay.body) == {"payment": 2}
+
+
+class TestOutbox:
+
+    def _worker(self, handlers=None, **overrides) -> OutboxWorker:
+        options = dict(
+            batch_size=10, poll_interval_seconds=1, lease_seconds=60, max_attempts=3,
+            backoff_base_seconds=5, backoff_max_seconds=60, retention_days=7, handlers=handlers,
+        )
+        return OutboxWorker(**{**options, **overrides})
+
+    async def _events(self, db_session) -> list:
+        db_session.expire_all()
+        result = await db_session.execute(select(OutboxEvent).order_by(OutboxEvent.created_at))
+        return result.scalars().all()
+
+    async def _place_order(self, db_session, user, product):
+        cart = (await db_session.execute(select(Cart).where(Cart.user_id == user.id))).scalar_one()
+        db_session.add(CartItem(cart_id=cart.id, product_id=product.id, quantity=2, price=product.price))
+        await db_session.commit()
+        order_data = OrderCreate(
+            shipping_address=SHIPPING_ADDRESS, billing_same_as_shipping=True, payment_method="stripe"
+        )
+        return await place_order(order_data, user, db_session)
+
+    @pytest.mark.asyncio
+    async def test_order_confirmation_is_queued_with_the_order(self, db_session, customer_user, sample_products):
+        user, _ = customer_user
+        order = await self._place_order(db_session, user, sample_products[0])
+
+        events = await self._events(db_session)
+        assert [e.event_type for e in events] == ["order.confirmed"]
+        payload = json.loads(events[0].payload)
+        assert payload["order_id"] == str(order.id)
+        assert payload["order_number"] == order.order_number
+        assert events[0].status == PENDING
+
+    @pytest.mark.asyncio
+    async def test_batch_runs_handlers_and_marks_events_done(self, db_session):
+        seen = []
+
+        async def record(db, payload):
+            seen.append(payload["n"])
+
+        for n in range(3):
+            await enqueue(db_session, "test.event", {"n": n})
+        await db_session.commit()
+
+        worker = self._worker({"test.event": record})
+        assert await worker.process_batch(db_session) == 3
+        assert sorted(seen) == [0, 1, 2]
+        events = await self._events(db_session)
+        assert {e.status for e in events} == {DONE}
+        assert all(e.processed_at and e.attempts == 1 for e in events)
+        assert await worker.process_batch(db_session) == 0
+
+    @pytest.mark.asyncio
+    async def test_failures_back_off_then_go_dead(self, db_session):
+        async def fail(db, payload):
+            raise RuntimeError("smtp down")
+
+        await enqueue(db_session, "test.event", {})
+        await db_session.commit()
+        worker = self._worker({"test.event": fail})
+
+        now = datetime.utcnow()
+        await worker.process_batch(db_session, now=now)
+        [event] = await self._events(db_session)
+        assert (event.status, event.attempts) == (PENDING, 1)
+        assert event.available_at == now + timedelta(seconds=5)
+        assert event.last_error == "RuntimeError: smtp down"
+
+        # Not due again until the backoff has passed
+        assert await worker.process_batch(db_session, now=now + timedelta(seconds=1)) == 0
+        await worker.process_batch(db_session, now=now + timedelta(seconds=5))
+        [event] = await self._events(db_session)
+        assert event.available_at == now + timedelta(seconds=5 + 10)
+
+        await worker.process_batch(db_session, now=now + timedelta(minutes=1))
+        [event] = await self._events(db_session)
+        assert (event.status, event.attempts) == (DEAD, 3)
+        assert (worker.retried, worker.dead) == (2, 1)
+
+    @pytest.mark.asyncio
+    async def test_failed_confirmation_email_is_retried(
+        self, db_session, customer_user, sample_products, monkeypatch
+    ):
+        user, _ = customer_user
+        order = await self._place_order(db_session, user, sample_products[0])
+
+        def refuse(*args, **kwargs):
+            raise ConnectionRefusedError("smtp down")
+
+        monkeypatch.setattr(settings, "SMTP_USER", "mailer")
+        monkeypatch.setattr(settings, "SMTP_PASSWORD", "secret")
+        monkeypatch.setattr(email_service.smtplib, "SMTP", refuse)
+        worker = self._worker()
+        now = datetime.utcnow()
+        await worker.process_batch(db_session, now=now)
+
+        [event] = await self._events(db_session)
+        assert (event.status, event.attempts) == (PENDING, 1)
+        assert event.last_error.startswith("EmailDeliveryError")
+        # The notification is rolled back with the failed attempt
+        notifications = await db_session.execute(select(Notification))
+        assert notifications.scalars().all() == []
+
+        # Without SMTP the email is only logged, which is not a failure
+        monkeypatch.setattr(settings, "SMTP_USER", "")
+        await worker.process_batch(db_session, now=now + timedelta(seconds=5))
+        [event] = await self._events(db_session)
+        assert event.status == DONE
+        [notification] = (await db_session.execute(select(Notification))).scalars().all()
+        assert (notification.entity_id, notification.is_email_sent) == (order.id, False)
+
+    @pytest.mark.asyncio
+    async def test_admin_test_email_reports_smtp_failure(self, client: AsyncClient, admin_user, monkeypatch):
+        _, token = admin_user
+
+        def refuse(*args, **kwargs):
+            raise ConnectionRefusedError("smtp down")
+
+        monkeypatch.setattr(settings, "SMTP_USER", "mailer")
+        monkeypatch.setattr(settings, "SMTP_PASSWORD", "secret")
+        monkeypatch.setattr(email_service.smtplib, "SMTP", refuse)
+        resp = await client.post(
+            "/api/v1/admin/test-email",
+            json={"email_type": "welcome", "recipient_email": "jane@example.com"},
+            headers=auth_headers(token),
+        )
+        assert resp.status_code == 502
+        assert "smtp down" in resp.json()["detail"]
+
+    @pytest.mark.asyncio
+    async def test_lease_expiring_mid_handler_drops_the_late_attempt(self, stock_engine):
+        # The first worker's handler outlives its lease; a second worker takes
+        # the event and completes it, and the first attempt's writes are
+        # rolled back instead of marking the event done a second time
+        taken_over = asyncio.Event()
+
+        async def slow(db, payload):
+            await taken_over.wait()
+            db.add(SearchQuery(query="slow", results_count=0))
+
+        async def fast(db, payload):
+            db.add(SearchQuery(query="fast", results_count=0))
+
+        async with AsyncSession(stock_engine) as db:
+            await enqueue(db, "test.event", {})
+            await db.commit()
+
+        first = self._worker({"test.event": slow}, lease_seconds=1)
+        second = self._worker({"test.event": fast}, lease_seconds=1)
+
+        async def run(worker, now=None):
+            async with AsyncSession(stock_engine) as db:
+                return await worker.process_batch(db, now=now)
+
+        first_batch = asyncio.create_task(run(first))
+        await asyncio.sleep(0.2)
+        # Still leased to the first worker
+        assert await run(second) == 0
+        assert await run(second, now=datetime.utcnow() + timedelta(seconds=2)) == 1
+        taken_over.set()
+        assert await first_batch == 1
+
+        async with AsyncSession(stock_engine) as db:
+            [event] = (await db.execute(select(OutboxEvent))).scalars().all()
+            writes = (await db.execute(select(SearchQuery.query))).scalars().all()
+        assert (event.status, event.attempts) == (DONE, 2)
+        assert writes == ["fast"]
+        assert (first.processed, first.lost, second.processed) == (0, 1, 1)
+
+    @pytest.mark.asyncio
+    async def test_delivered_item_credits_the_vendor_once(
+        self, db_session, customer_user, vendor_user, sample_products
+    ):
+        user, _ = customer_user
+        _, _, vendor = vendor_user
+        order = await self._place_order(db_session, user, sample_products[0])
+        item = (await db_session.execute(select(OrderItem).where(OrderItem.order_id == order.id))).scalar_one()
+        # Leave only the credits in the outbox
+        await db_session.execute(delete(OutboxEvent))
+
+        await queue_vendor_credit(db_session, item.id)
+        await queue_vendor_credit(db_session, item.id)
+        await db_session.commit()
+
+        worker = self._worker()
+        assert await worker.process_batch(db_session) == 1
+        assert await worker.process_batch(db_session) == 0
+
+        await db_session.refresh(vendor)
+        await db_session.refresh(item)
+        assert vendor.balance == Decimal("500.00") + item.vendor_amount
+        assert vendor.total_sales == Decimal("1000.00") + item.total
+        assert [e.status for e in await self._events(db_session)] == [DONE]
+
+    @pytest.mark.asyncio
+    async def test_processed_events_are_pruned(self, db_session):
+        async def ok(db, payload):
+            pass
+
+        await enqueue(db_session, "test.event", {})
+        await db_session.commit()
+        worker = self._worker({"test.event": ok})
+        await worker.process_batch(db_session)
+
+        assert await worker.prune(db_session) == 0
+        assert await worker.prune(db_session, now=datetime.utcnow() + timedelta(days=8)) == 1
+        assert await self._events(db_session) == []
+
+
 # ---------------------------------------------------------------------------
 # List orders
 # ---------------------------------------------------------------------------
@@ -189,10 +991,6 @@ class TestGetOrder:
 class TestCancelOrder:
 
     @pytest.mark.asyncio
-    @pytest.mark.xfail(
-        reason="App bug: cancel_order accesses item.product via lazy load without selectinload(Order.items -> OrderItem.product)",
-        strict=False,
-    )
     async def test_cancel_order_success(self, client: AsyncClient, customer_user, sample_products):
         user, token = customer_user
         create_resp = await _create_order(client, token, str(sample_products[0].id))
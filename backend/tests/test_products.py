@@ -3,12 +3,22 @@ Tests for product endpoints: /api/v1/products/*
 """
 
 import uuid
+from collections import Counter
 import pytest
 import pytest_asyncio
 from httpx import AsyncClient
-
-from app.models.product import Product
-from tests.conftest import auth_headers
+from sqlalchemy import event, select
+
+from app.models.category import Category, CategoryClosure
+from app.models.facet import CategoryFacetCount
+from app.models.product import Product, ProductAttribute
+from app.core.cache import LRUCache, VersionedCache
+from app.services.category_tree import category_cache, get_descendant_ids, rebuild_category_closure
+from app.services.facets import FacetService
+from app.services.product_cache import product_detail_cache
+from app.services.rails import rail_snapshots
+from app.services.view_counter import view_counter
+from tests.conftest import auth_headers, engine
 
 API = "/api/v1/products"
 
@@ -56,7 +66,7 @@ class TestListProducts:
         resp = await client.get(API, params={"category": "does-not-exist"})
         assert resp.status_code == 200
         # No products should match a non-existent category
-        # (depending on implementation, may return all or none)
+        assert resp.json() == []
 
     @pytest.mark.asyncio
     async def test_list_products_filter_by_price(self, client: AsyncClient, sample_products):
@@ -93,6 +103,106 @@ class TestListProducts:
         # Only product 0 has compare_at_price set
         assert len(resp.json()) == 1
 
+    @pytest.mark.asyncio
+    async def test_list_products_filter_by_attributes(
+        self, client: AsyncClient, db_session, sample_products
+    ):
+        db_session.add_all([
+            ProductAttribute(product_id=sample_products[0].id, name="Brand", value="Acme"),
+            ProductAttribute(product_id=sample_products[0].id, name="Color", value="Red"),
+            ProductAttribute(product_id=sample_products[1].id, name="Brand", value="Acme"),
+            ProductAttribute(product_id=sample_products[1].id, name="Color", value="Blue"),
+            ProductAttribute(product_id=sample_products[2].id, name="Brand", value="Other"),
+        ])
+        await db_session.commit()
+
+        resp = await client.get(API, params={"brands": "Acme"})
+        assert resp.status_code == 200
+        assert {p["slug"] for p in resp.json()} == {"test-product-1", "test-product-2"}
+
+        resp = await client.get(API, params={"brands": "Acme", "colors": "Blue"})
+        assert [p["slug"] for p in resp.json()] == ["test-product-2"]
+
+        resp = await client.get(API, params={"attributes": '{"Color": ["Red", "Blue"]}'})
+        assert len(resp.json()) == 2
+
+    @pytest.mark.asyncio
+    async def test_list_products_attribute_filter_paginates(
+        self, client: AsyncClient, db_session, sample_products
+    ):
+        for product in sample_products:
+            db_session.add(ProductAttribute(product_id=product.id, name="Brand", value="Acme"))
+        await db_session.commit()
+
+        params = {"brands": "Acme", "sort_by": "price", "sort_order": "asc", "limit": 2}
+        first = await client.get(API, params={**params, "skip": 0})
+        second = await client.get(API, params={**params, "skip": 2})
+        assert [p["slug"] for p in first.json()] == ["test-product-1", "test-product-2"]
+        assert [p["slug"] for p in second.json()] == ["test-product-3"]
+
+    @pytest.mark.asyncio
+    async def test_list_products_cursor_pagination(self, client: AsyncClient, sample_products):
+        params = {"sort_by": "price", "sort_order": "asc", "limit": 2}
+        first = await client.get(API, params=params)
+        assert [p["slug"] for p in first.json()] == ["test-product-1", "test-product-2"]
+        cursor = first.headers.get("X-Next-Cursor")
+        assert cursor
+
+        second = await client.get(API, params={**params, "cursor": cursor})
+        assert [p["slug"] for p in second.json()] == ["test-product-3"]
+        # Short page means there is nothing after it
+        assert "X-Next-Cursor" not in second.headers
+
+    @pytest.mark.asyncio
+    async def test_list_products_cursor_default_sort(self, client: AsyncClient, sample_products):
+        seen = []
+        params = {"limit": 1}
+        for _ in range(3):
+            resp = await client.get(API, params=params)
+            seen.extend(p["slug"] for p in resp.json())
+            params["cursor"] = resp.headers.get("X-Next-Cursor")
+        assert sorted(seen) == ["test-product-1", "test-product-2", "test-product-3"]
+
+    @pytest.mark.asyncio
+    async def test_list_products_invalid_cursor(self, client: AsyncClient, sample_products):
+        resp = await client.get(API, params={"cursor": "not-a-cursor"})
+        assert resp.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_list_products_cursor_for_another_sort(self, client: AsyncClient, sample_products):
+        params = {"sort_by": "created_at", "limit": 2}
+        cursor = (await client.get(API, params=params)).headers["X-Next-Cursor"]
+
+        for changed in ({"sort_by": "price"}, {"sort_order": "asc"}):
+            resp = await client.get(API, params={**params, **changed, "cursor": cursor})
+            assert resp.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_list_products_card_fields(self, client: AsyncClient, sample_products, vendor_user):
+        _, _, vendor = vendor_user
+        resp = await client.get(API, params={"sort_by": "price", "sort_order": "asc"})
+        card = resp.json()[0]
+        assert card["slug"] == "test-product-1"
+        assert card["primary_image"] == "https://example.com/img1.jpg"
+        assert card["vendor_name"] == vendor.business_name
+        assert card["category_name"] == "Electronics"
+
+    @pytest.mark.asyncio
+    async def test_list_products_single_query(self, client: AsyncClient, sample_products):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine.sync_engine, "before_cursor_execute", record)
+        try:
+            resp = await client.get(API, params={"category": "electronics"})
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+        assert len(resp.json()) == 3
+        assert len(statements) == 1
+
 
 # ---------------------------------------------------------------------------
 # Get product by slug
@@ -142,6 +252,60 @@ class TestGetProduct:
         assert data["vendor"]["business_name"] == "Test Vendor Store"
 
 
+    @pytest.mark.asyncio
+    async def test_get_product_served_from_cache(self, client: AsyncClient, sample_products):
+        await client.get(f"{API}/test-product-1")
+        hits = product_detail_cache.hits
+
+        resp = await client.get(f"{API}/test-product-1")
+        assert resp.status_code == 200
+        assert resp.json()["slug"] == "test-product-1"
+        assert product_detail_cache.hits == hits + 1
+
+    @pytest.mark.asyncio
+    async def test_get_product_cached_under_id_and_slug(self, client: AsyncClient, sample_products):
+        await client.get(f"{API}/test-product-1")
+        hits = product_detail_cache.hits
+
+        resp = await client.get(f"{API}/{sample_products[0].id}")
+        assert resp.json()["slug"] == "test-product-1"
+        assert product_detail_cache.hits == hits + 1
+
+    @pytest.mark.asyncio
+    async def test_get_product_cache_invalidated_by_update(
+        self, client: AsyncClient, vendor_user, sample_products
+    ):
+        _, token, _ = vendor_user
+        product_id = sample_products[0].id
+        assert (await client.get(f"{API}/test-product-1")).json()["name"] == "Test Product 1"
+        assert (await client.get(f"{API}/{product_id}")).json()["name"] == "Test Product 1"
+
+        resp = await client.put(
+            f"{API}/{product_id}", json={"name": "Renamed"}, headers=auth_headers(token)
+        )
+        assert resp.status_code == 200
+
+        # Both the slug and the id entry are dropped
+        assert (await client.get(f"{API}/test-product-1")).json()["name"] == "Renamed"
+        assert (await client.get(f"{API}/{product_id}")).json()["name"] == "Renamed"
+
+    @pytest.mark.asyncio
+    async def test_get_product_views_written_in_batches(
+        self, client: AsyncClient, db_session, sample_products
+    ):
+        product = sample_products[0]
+        for _ in range(3):
+            assert (await client.get(f"{API}/test-product-1")).status_code == 200
+        # Lookups by id (vendor dashboard) are not counted
+        await client.get(f"{API}/{product.id}")
+        assert view_counter.pending == {product.id: 3}
+
+        assert await view_counter.flush(db_session) == 1
+        assert view_counter.pending == {}
+        await db_session.refresh(product)
+        assert product.view_count == 3
+
+
 # ---------------------------------------------------------------------------
 # Featured / New arrivals / Best sellers
 # ---------------------------------------------------------------------------
@@ -167,3 +331,268 @@ class TestSpecialLists:
         resp = await client.get(f"{API}/best-sellers")
         assert resp.status_code == 200
         assert isinstance(resp.json(), list)
+
+    @pytest.mark.asyncio
+    async def test_rails_served_from_snapshot(self, client: AsyncClient, sample_products):
+        resp = await client.get(f"{API}/new-arrivals", params={"limit": 2})
+        assert len(resp.json()) == 2
+        refreshes = rail_snapshots.refreshes
+
+        await client.get(f"{API}/best-sellers")
+        await client.get(f"{API}/featured")
+        resp = await client.get(f"{API}/new-arrivals")
+        assert len(resp.json()) == 3
+        assert rail_snapshots.refreshes == refreshes
+
+    @pytest.mark.asyncio
+    async def test_rails_rebuilt_after_product_write(
+        self, client: AsyncClient, vendor_user, sample_products
+    ):
+        _, token, _ = vendor_user
+        assert len((await client.get(f"{API}/new-arrivals")).json()) == 3
+
+        resp = await client.delete(f"{API}/{sample_products[0].id}", headers=auth_headers(token))
+        assert resp.status_code == 200
+
+        # Without a background refresher the next read rebuilds inline
+        slugs = [p["slug"] for p in (await client.get(f"{API}/new-arrivals")).json()]
+        assert "test-product-1" not in slugs
+
+    @pytest.mark.asyncio
+    async def test_rail_limit_beyond_snapshot(self, client: AsyncClient, sample_products):
+        resp = await client.get(f"{API}/best-sellers", params={"limit": rail_snapshots.size + 1})
+        assert resp.status_code == 200
+        assert len(resp.json()) == 3
+
+
+# ---------------------------------------------------------------------------
+# Category filters (facet store)
+# ---------------------------------------------------------------------------
+
+class TestCategoryFilters:
+
+    @pytest.mark.asyncio
+    async def test_category_filters_from_rebuild(
+        self, client: AsyncClient, db_session, sample_products
+    ):
+        db_session.add(ProductAttribute(product_id=sample_products[0].id, name="Brand", value="Acme"))
+        await db_session.commit()
+        await FacetService(db_session).rebuild()
+
+        resp = await client.get(f"{API}/filters/electronics")
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["total_count"] == 3
+        assert data["in_stock_count"] == 3
+        assert data["has_on_sale"] is True
+        assert float(data["price_min"]) == 10.99
+        assert float(data["price_max"]) == 30.99
+        assert data["vendors"][0]["count"] == 3
+        assert data["attribute_filters"][0]["label"] == "Brand"
+        assert data["attribute_filters"][0]["options"][0]["count"] == 1
+
+    @pytest.mark.asyncio
+    async def test_category_filters_follow_product_writes(
+        self, client: AsyncClient, db_session, vendor_user, sample_products
+    ):
+        _, token, _ = vendor_user
+        await FacetService(db_session).rebuild()
+
+        resp = await client.put(
+            f"{API}/{sample_products[0].id}/inventory",
+            params={"quantity": 0},
+            headers=auth_headers(token),
+        )
+        assert resp.status_code == 200
+
+        data = (await client.get(f"{API}/filters/electronics")).json()
+        # Out of stock products leave the active listing entirely
+        assert data["total_count"] == 2
+        assert data["has_on_sale"] is False
+        assert float(data["price_min"]) == 20.99
+
+        resp = await client.delete(f"{API}/{sample_products[2].id}", headers=auth_headers(token))
+        assert resp.status_code == 200
+
+        data = (await client.get(f"{API}/filters/electronics")).json()
+        assert data["total_count"] == 1
+        assert float(data["price_max"]) == 20.99
+
+    @pytest.mark.asyncio
+    async def test_creating_an_existing_count_adds_to_it(self, db_session, sample_category):
+        # Two writers that both find no row both "create" it; the second
+        # insert must add to the first instead of hitting the unique key
+        key = (sample_category.id, "attribute", "Color", "Red")
+        for _ in range(2):
+            await FacetService(db_session)._apply_deltas(Counter({key: 2}))
+        await db_session.commit()
+
+        result = await db_session.execute(select(CategoryFacetCount.count).where(
+            CategoryFacetCount.category_id == sample_category.id, CategoryFacetCount.value == "Red"
+        ))
+        assert result.scalars().all() == [4]
+
+    @pytest.mark.asyncio
+    async def test_category_filters_not_found(self, client: AsyncClient):
+        resp = await client.get(f"{API}/filters/does-not-exist")
+        assert resp.status_code == 404
+
+
+# ---------------------------------------------------------------------------
+# Category hierarchy
+# ---------------------------------------------------------------------------
+
+class TestCategoryHierarchy:
+
+    @pytest_asyncio.fixture
+    async def nested_categories(self, db_session, sample_category, sample_products):
+        """electronics > phones > smartphones, with product 2 in smartphones"""
+        phones = Category(name="Phones", slug="phones", parent_id=sample_category.id)
+        db_session.add(phones)
+        await db_session.flush()
+        smartphones = Category(name="Smartphones", slug="smartphones", parent_id=phones.id)
+        db_session.add(smartphones)
+        await db_session.flush()
+        sample_products[2].category_id = smartphones.id
+        await db_session.commit()
+        return phones, smartphones
+
+    @pytest.mark.asyncio
+    async def test_filter_includes_all_depths(self, client: AsyncClient, nested_categories):
+        resp = await client.get(API, params={"category": "electronics"})
+        assert len(resp.json()) == 3
+
+        resp = await client.get(API, params={"category": "phones"})
+        assert len(resp.json()) == 1
+
+    @pytest.mark.asyncio
+    async def test_closure_follows_moves(self, db_session, sample_category, nested_categories):
+        phones, smartphones = nested_categories
+        assert set(await get_descendant_ids(db_session, sample_category.id)) == {
+            sample_category.id, phones.id, smartphones.id
+        }
+
+        # Move the phones subtree to the top level
+        phones.parent_id = None
+        await db_session.commit()
+        assert await get_descendant_ids(db_session, sample_category.id) == [sample_category.id]
+        assert set(await get_descendant_ids(db_session, phones.id)) == {phones.id, smartphones.id}
+
+    @pytest.mark.asyncio
+    async def test_rebuild_matches_maintained_closure(self, db_session, nested_categories):
+        result = await db_session.execute(
+            select(CategoryClosure.ancestor_id, CategoryClosure.descendant_id, CategoryClosure.depth)
+        )
+        maintained = set(result.all())
+
+        await rebuild_category_closure(db_session)
+        result = await db_session.execute(
+            select(CategoryClosure.ancestor_id, CategoryClosure.descendant_id, CategoryClosure.depth)
+        )
+        assert set(result.all()) == maintained
+        assert len(maintained) == 6
+
+    @pytest.mark.asyncio
+    async def test_tree_rolls_up_counts(self, client: AsyncClient, nested_categories):
+        resp = await client.get("/api/v1/categories/tree")
+        assert resp.status_code == 200
+        electronics = resp.json()[0]
+        assert electronics["product_count"] == 3
+        phones = electronics["children"][0]
+        assert phones["product_count"] == 1
+        assert phones["children"][0]["slug"] == "smartphones"
+
+    @pytest.mark.asyncio
+    async def test_cannot_move_under_descendant(
+        self, client: AsyncClient, admin_user, sample_category, nested_categories
+    ):
+        _, token = admin_user
+        _, smartphones = nested_categories
+        resp = await client.put(
+            f"/api/v1/categories/{sample_category.id}",
+            json={"parent_id": str(smartphones.id)},
+            headers=auth_headers(token),
+        )
+        assert resp.status_code == 400
+
+
+# ---------------------------------------------------------------------------
+# Category cache
+# ---------------------------------------------------------------------------
+
+class TestCategoryCache:
+
+    @pytest.mark.asyncio
+    async def test_tree_served_from_cache(self, client: AsyncClient, sample_category):
+        resp = await client.get("/api/v1/categories/tree")
+        assert resp.status_code == 200
+        hits = category_cache.hits
+
+        resp = await client.get("/api/v1/categories/tree")
+        assert resp.status_code == 200
+        assert resp.json()[0]["slug"] == "electronics"
+        assert category_cache.hits == hits + 1
+
+    @pytest.mark.asyncio
+    async def test_writes_invalidate(self, client: AsyncClient, admin_user, sample_category):
+        _, token = admin_user
+        assert len((await client.get("/api/v1/categories/tree")).json()) == 1
+        assert (await client.get("/api/v1/categories/electronics")).json()["name"] == "Electronics"
+
+        resp = await client.post(
+            "/api/v1/categories/", json={"name": "Books"}, headers=auth_headers(token)
+        )
+        assert resp.status_code == 201
+        assert len((await client.get("/api/v1/categories/tree")).json()) == 2
+
+        resp = await client.put(
+            f"/api/v1/admin/categories/{sample_category.id}",
+            json={"name": "Gadgets"},
+            headers=auth_headers(token),
+        )
+        assert resp.status_code == 200
+        assert (await client.get("/api/v1/categories/electronics")).json()["name"] == "Gadgets"
+
+    @pytest.mark.asyncio
+    async def test_version_bump_reaches_other_workers(self, db_session, sample_category):
+        other_worker = VersionedCache("categories", ttl_seconds=300, check_interval_seconds=0)
+
+        async def build():
+            return b"cached"
+
+        await other_worker.get_or_build(db_session, "tree", build)
+        assert other_worker.stats()["entries"] == 1
+
+        await category_cache.invalidate(db_session)
+        await other_worker.get_or_build(db_session, "featured:8", build)
+        # The bump dropped the tree entry built before it
+        assert other_worker.stats()["entries"] == 1
+        assert other_worker.misses == 2
+
+
+class TestLRUCache:
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache("test", max_entries=2, ttl_seconds=60)
+        cache.set("a", 1, tag="p1")
+        cache.set("b", 2, tag="p2")
+        cache.get("a")
+        cache.set("c", 3, tag="p3")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.stats()["evictions"] == 1
+
+    def test_invalidate_by_tag_and_generation(self):
+        cache = LRUCache("test", max_entries=10, ttl_seconds=60)
+        cache.set("id:1", "x", tag="p1")
+        cache.set("slug:one", "x", tag="p1")
+        generation = cache.generation
+
+        cache.invalidate(["p1"])
+        assert cache.get("id:1") is None
+        assert cache.get("slug:one") is None
+
+        # A value loaded before the invalidation is not stored
+        cache.set("id:1", "stale", tag="p1", generation=generation)
+        assert cache.get("id:1") is None
@@ -0,0 +1,154 @@
+"""
+Query plan audit for the hot read paths.
+
+Runs EXPLAIN QUERY PLAN (SQLite) on the queries behind the busiest endpoints
+and fails if any of them falls back to a full scan of a table that grows with
+traffic. Set TEST_POSTGRES_URL to a scratch PostgreSQL database to run the
+same audit with EXPLAIN there (tables are created and dropped; sequential
+scans are disabled so the planner must show an index is usable).
+"""
+
+import os
+import re
+import uuid
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.database import Base
+from app.core.pagination import encode_cursor, keyset_paginate
+from app.models.cart import CartItem
+from app.models.notification import Notification
+from app.models.order import Order, OrderItem, PaymentStatus
+from app.models.product import Product, ProductImage, ProductVariant, ProductStatus
+from app.models.review import Review
+from app.services.category_tree import descendant_ids_query
+from app.services.product_cards import card_query
+from app.services.rails import rail_query, RAIL_FEATURED, RAIL_NEW_ARRIVALS, RAIL_BEST_SELLERS
+from tests.conftest import engine as sqlite_engine
+
+# Tables that grow with catalog size or traffic; small lookup tables may be scanned
+LARGE_TABLES = {
+    "products", "product_images", "product_variants", "product_attributes",
+    "orders", "order_items", "order_status_history",
+    "notifications", "reviews", "cart_items", "search_queries",
+}
+
+_ID = uuid.uuid4()
+_CURSOR = encode_cursor("created_at:desc", datetime(2026, 1, 1), _ID)
+
+
+def _active_products():
+    """The cards list_products runs: category join and primary image subquery included"""
+    return card_query(Product.created_at).where(Product.status == ProductStatus.ACTIVE)
+
+
+HOT_QUERIES = {
+    "list_products": keyset_paginate(_active_products(), Product.created_at, Product.id, limit=20),
+    "list_products_next_page": keyset_paginate(
+        _active_products(), Product.created_at, Product.id, limit=20, cursor=_CURSOR
+    ),
+    "list_products_by_category": keyset_paginate(
+        _active_products().where(Product.category_id.in_(descendant_ids_query(_ID))),
+        Product.created_at, Product.id, limit=20
+    ),
+    "rail_featured": rail_query(RAIL_FEATURED, 48),
+    "rail_new_arrivals": rail_query(RAIL_NEW_ARRIVALS, 48),
+    "rail_best_sellers": rail_query(RAIL_BEST_SELLERS, 48),
+    "vendor_products": keyset_paginate(
+        select(Product).where(Product.vendor_id == _ID), Product.created_at, Product.id, limit=20
+    ),
+    "product_images": select(ProductImage).where(ProductImage.product_id.in_([_ID, uuid.uuid4()])),
+    "product_variants": select(ProductVariant).where(ProductVariant.product_id.in_([_ID])),
+    "my_orders": keyset_paginate(
+        select(Order).where(Order.user_id == _ID), Order.created_at, Order.id, limit=20
+    ),
+    "order_items": select(OrderItem).where(OrderItem.order_id.in_([_ID])),
+    "vendor_orders": select(OrderItem).where(OrderItem.vendor_id == _ID)
+        .order_by(OrderItem.created_at.desc()).limit(20),
+    "product_sales": select(func.sum(OrderItem.quantity)).where(OrderItem.product_id == _ID),
+    "revenue_since": select(func.sum(Order.total)).where(
+        Order.payment_status == PaymentStatus.PAID, Order.paid_at >= datetime(2026, 1, 1)
+    ),
+    "notifications": keyset_paginate(
+        select(Notification).where(Notification.user_id == _ID),
+        Notification.created_at, Notification.id, limit=20
+    ),
+    "unread_notifications": select(func.count(Notification.id)).where(
+        Notification.user_id == _ID, Notification.is_read == False
+    ),
+    "product_reviews": select(Review).where(Review.product_id == _ID, Review.is_approved == True)
+        .order_by(Review.created_at.desc()).limit(10),
+    "cart_items": select(CartItem).where(CartItem.cart_id == _ID),
+}
+
+
+async def _explain(conn, query) -> list[str]:
+    """Plan lines for a query, with every parameter bound to NULL"""
+    compiled = query.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    if conn.dialect.name == "sqlite":
+        params = tuple(None for _ in compiled.positiontup)
+        result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params)
+        return [row[3] for row in result.all()]
+
+    params = tuple(None for _ in compiled.positiontup or ())
+    result = await conn.exec_driver_sql(f"EXPLAIN {compiled}", params)
+    return [row[0] for row in result.all()]
+
+
+def _full_scans(dialect: str, plan: list[str]) -> list[str]:
+    """Large tables the plan reads without an index"""
+    if dialect == "sqlite":
+        # "SCAN t" is a full table scan; "SCAN t USING INDEX" walks an index in order
+        pattern = re.compile(r"^SCAN (\w+)(?! USING (COVERING )?INDEX)")
+    else:
+        pattern = re.compile(r"Seq Scan on (\w+)")
+    scans = []
+    for line in plan:
+        match = pattern.search(line.strip())
+        if match and match.group(1) in LARGE_TABLES:
+            scans.append(match.group(1))
+    return scans
+
+
+@pytest_asyncio.fixture
+async def postgres_conn():
+    url = os.environ.get("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    pg_engine = create_async_engine(url)
+    async with pg_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        async with pg_engine.connect() as conn:
+            await conn.exec_driver_sql("SET enable_seqscan = off")
+            yield conn
+    finally:
+        async with pg_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await pg_engine.dispose()
+
+
+class TestQueryPlans:
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+    async def test_sqlite_hot_query_uses_index(self, name):
+        async with sqlite_engine.connect() as conn:
+            plan = await _explain(conn, HOT_QUERIES[name])
+        assert not _full_scans("sqlite", plan), f"{name} scans {_full_scans('sqlite', plan)}: {plan}"
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+    async def test_postgres_hot_query_uses_index(self, postgres_conn, name):
+        plan = await _explain(postgres_conn, HOT_QUERIES[name])
+        assert not _full_scans("postgresql", plan), f"{name} scans {_full_scans('postgresql', plan)}: {plan}"
+
+    def test_detects_full_scan(self):
+        assert _full_scans("sqlite", ["SCAN products"]) == ["products"]
+        assert _full_scans("sqlite", ["SCAN products USING INDEX ix_products_status_created_at"]) == []
+        assert _full_scans("sqlite", ["SCAN categories"]) == []
+        assert _full_scans("postgresql", ["Seq Scan on orders  (cost=0.00..1.01 rows=1 width=8)"]) == ["orders"]
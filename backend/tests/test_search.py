@@ -2,12 +2,96 @@
 Tests for search endpoints: /api/v1/search/*
 """
 
+import os
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
 import pytest
+import pytest_asyncio
 from httpx import AsyncClient
+from sqlalchemy import event, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.database import Base
+from app.core.config import settings
+from app.core.fts5_setup import (
+    create_fts5_table, populate_fts5_table, check_fts5_triggers_current,
+    install_fts5_triggers, get_fts5_structure,
+)
+from app.core.pg_search_setup import create_pg_search
+from app.models.product import Product, ProductStatus
+from app.models.search_query import SearchQuery, SearchQueryRollup
+from app.models.user import User, UserRole
+from app.models.vendor import Vendor, VendorStatus
+from app.services.search import (
+    SearchService, POSTGRES, PRODUCT, CATEGORY, VENDOR, prepare_tsquery,
+)
+from app.services.search_cache import search_cache_key, search_caches, SEARCH_PRODUCTS
+from app.services import autocomplete
+from app.services.autocomplete import completion_index
+from app.services.fts5_maintenance import FTS5Maintenance
+from app.services.search_analytics import search_rollups
+from app.services.search_log import SearchLogger, search_logger
+from app.services.spelling import edit_distance, spelling_index
+from tests.conftest import auth_headers, engine
 
 API = "/api/v1/search"
 
 
+@pytest_asyncio.fixture
+async def fts_index(db_session, sample_products):
+    """FTS5 indexes over the sample products; dropped again after the test"""
+    await create_fts5_table(db_session)
+    await populate_fts5_table(db_session)
+    yield
+    await db_session.execute(text("DROP TABLE IF EXISTS product_fts"))
+    await db_session.execute(text("DROP TABLE IF EXISTS search_entities"))
+    await db_session.commit()
+
+
+@pytest_asyncio.fixture
+async def pg_search_session():
+    """
+    Session on TEST_POSTGRES_URL with search_vector set up and three
+    products; tables are created and dropped around the test.
+    """
+    url = os.environ.get("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    pg_engine = create_async_engine(url)
+    async with pg_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        async with AsyncSession(pg_engine, expire_on_commit=False) as session:
+            assert await create_pg_search(session)
+            user = User(
+                id=uuid.uuid4(), email="pgvendor@test.com", password_hash="x",
+                first_name="Pg", last_name="Vendor", role=UserRole.VENDOR,
+            )
+            vendor = Vendor(
+                id=uuid.uuid4(), user_id=user.id, business_name="Pg Store",
+                slug="pg-store", business_email="pgvendor@test.com", status=VendorStatus.APPROVED,
+            )
+            session.add_all([user, vendor])
+            for slug, name, description in [
+                ("wireless-headphones", "Wireless Headphones", "Over-ear, noise cancelling"),
+                ("headphone-stand", "Headphone Stand", "Walnut stand for wireless headsets"),
+                ("usb-cable", "USB Cable", "Braided stainless steel cable"),
+            ]:
+                session.add(Product(
+                    id=uuid.uuid4(), vendor_id=vendor.id, name=name, slug=slug,
+                    description=description, price=Decimal("19.99"), quantity=5,
+                    status=ProductStatus.ACTIVE, currency="USD",
+                ))
+            await session.commit()
+            yield session
+    finally:
+        async with pg_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await pg_engine.dispose()
+
+
 # ---------------------------------------------------------------------------
 # Global search
 # ---------------------------------------------------------------------------
@@ -121,6 +205,384 @@ class TestProductSearch:
         assert resp.json()["total"] >= 1
 
 
+class TestFTS5ProductSearch:
+
+    @pytest.mark.asyncio
+    async def test_filters_applied_in_query(self, client: AsyncClient, fts_index):
+        resp = await client.get(f"{API}/products", params={"q": "Test", "min_price": 20, "in_stock": True})
+        data = resp.json()
+        assert data["total"] == 2
+        assert {p["slug"] for p in data["products"]} == {"test-product-2", "test-product-3"}
+        assert all(p["vendor_name"] and p["image"] for p in data["products"])
+
+    @pytest.mark.asyncio
+    async def test_deep_pages(self, client: AsyncClient, fts_index):
+        slugs = []
+        for page in (1, 2, 3):
+            resp = await client.get(f"{API}/products", params={"q": "Test", "page": page, "page_size": 1})
+            data = resp.json()
+            assert data["total"] == 3
+            assert data["total_pages"] == 3
+            slugs.extend(p["slug"] for p in data["products"])
+        assert sorted(slugs) == ["test-product-1", "test-product-2", "test-product-3"]
+
+    @pytest.mark.asyncio
+    async def test_slug_filters_resolved_once(self, client: AsyncClient, fts_index, vendor_user):
+        _, _, vendor = vendor_user
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine.sync_engine, "before_cursor_execute", record)
+        try:
+            resp = await client.get(
+                f"{API}/products",
+                params={"q": "Test", "category": "electronics", "vendor": vendor.slug, "page": 2, "page_size": 2},
+            )
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+        data = resp.json()
+        assert data["total"] == 3
+        assert len(data["products"]) == 1
+        assert sum("FROM categories" in s for s in statements) == 1
+        assert sum("FROM vendors" in s and "product_fts" not in s for s in statements) == 1
+        # Ranked page and total come from the same statement
+        assert sum("product_fts MATCH" in s for s in statements) == 1
+
+    @pytest.mark.asyncio
+    async def test_total_past_last_page(self, client: AsyncClient, fts_index):
+        params = {"q": "Test", "page": 5, "page_size": 2}
+        resp = await client.get(f"{API}/products", params=params)
+        assert resp.json()["products"] == []
+        assert resp.json()["total"] == 0
+
+        resp = await client.get(f"{API}/products", params={**params, "exact_total": True})
+        assert resp.json()["total"] == 3
+
+    @pytest.mark.asyncio
+    async def test_global_search_uses_fts(self, client: AsyncClient, fts_index):
+        resp = await client.get(API, params={"q": "Product 2"})
+        products = resp.json()["products"]
+        assert products[0]["slug"] == "test-product-2"
+        assert products[0]["image"] == "https://example.com/img2.jpg"
+
+
+class TestSearchEntities:
+
+    @pytest.mark.asyncio
+    async def test_one_ranked_query_for_all_types(self, client: AsyncClient, fts_index, sample_category, vendor_user):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine.sync_engine, "before_cursor_execute", record)
+        try:
+            resp = await client.get(API, params={"q": "electronic test vendor", "limit": 2})
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+        data = resp.json()
+        assert len(data["products"]) == 2
+        assert [c["slug"] for c in data["categories"]] == ["electronics"]
+        assert [v["slug"] for v in data["vendors"]] == ["test-vendor-store"]
+        assert data["total_results"] == 4
+        assert sum("search_entities MATCH" in s for s in statements) == 1
+        assert not any("LIKE" in s.upper() for s in statements)
+
+    @pytest.mark.asyncio
+    async def test_name_matches_rank_first(self, client: AsyncClient, db_session, fts_index):
+        products = {p.slug: p for p in (await db_session.execute(select(Product))).scalars()}
+        products["test-product-3"].description = "Pairs well with a walnut stand"
+        products["test-product-1"].name = "Walnut Stand"
+        await db_session.commit()
+
+        resp = await client.get(API, params={"q": "walnut"})
+        assert [p["slug"] for p in resp.json()["products"]] == ["test-product-1", "test-product-3"]
+
+    @pytest.mark.asyncio
+    async def test_triggers_follow_status_and_renames(self, db_session, fts_index, sample_category, vendor_user):
+        _, _, vendor = vendor_user
+        service = SearchService(db_session)
+        limits = {PRODUCT: 10, CATEGORY: 5, VENDOR: 5}
+
+        sample_category.name = "Gadgets"
+        vendor.status = VendorStatus.SUSPENDED
+        await db_session.commit()
+        hits = await service.search_entities("gadgets", limits)
+        assert [h.slug for h in hits[CATEGORY]] == ["electronics"]
+        assert (await service.search_entities("vendor", limits))[VENDOR] == []
+
+        sample_category.is_active = False
+        vendor.status = VendorStatus.APPROVED
+        await db_session.commit()
+        assert (await service.search_entities("gadgets", limits))[CATEGORY] == []
+        hits = await service.search_entities("vendor", limits)
+        assert [h.name for h in hits[VENDOR]] == ["Test Vendor Store"]
+
+        await db_session.delete(vendor)
+        await db_session.commit()
+        count = await db_session.execute(
+            text("SELECT COUNT(*) FROM search_entities WHERE entity_type = 'vendor'")
+        )
+        assert count.scalar() == 0
+
+
+class TestFTS5Maintenance:
+
+    async def _indexed(self, db_session, product_id):
+        result = await db_session.execute(
+            text("SELECT rowid FROM product_fts WHERE product_id = :id"), {"id": str(product_id)}
+        )
+        return result.scalar()
+
+    @pytest.mark.asyncio
+    async def test_triggers_index_active_products_only(self, db_session, fts_index, sample_products):
+        product = sample_products[0]
+        rowid = await self._indexed(db_session, product.id)
+        assert rowid is not None
+
+        # Counter updates leave the index alone
+        product.sales_count += 1
+        await db_session.commit()
+        assert await self._indexed(db_session, product.id) == rowid
+
+        product.status = ProductStatus.INACTIVE
+        await db_session.commit()
+        assert await self._indexed(db_session, product.id) is None
+
+        product.status = ProductStatus.ACTIVE
+        await db_session.commit()
+        assert await self._indexed(db_session, product.id) is not None
+
+    @pytest.mark.asyncio
+    async def test_outdated_triggers_detected(self, db_session, fts_index):
+        assert await check_fts5_triggers_current(db_session)
+        await db_session.execute(text("DROP TRIGGER product_fts_update"))
+        await db_session.execute(text(
+            "CREATE TRIGGER product_fts_update AFTER UPDATE ON products BEGIN SELECT 1; END"
+        ))
+        assert not await check_fts5_triggers_current(db_session)
+
+        await install_fts5_triggers(db_session)
+        assert await check_fts5_triggers_current(db_session)
+
+    @pytest.mark.asyncio
+    async def test_optimize_merges_segments(self, client: AsyncClient, db_session, fts_index, admin_user):
+        _, token = admin_user
+        for product in (await db_session.execute(select(Product))).scalars():
+            product.name += " updated"
+            await db_session.commit()
+        assert (await get_fts5_structure(db_session))["segments"] > 1
+
+        resp = await client.post("/api/v1/admin/fts5/optimize", headers=auth_headers(token))
+        assert resp.status_code == 200
+
+        resp = await client.get("/api/v1/admin/fts5/status", headers=auth_headers(token))
+        data = resp.json()
+        assert data["statistics"]["segments"] == 1
+        assert data["statistics"]["index_size_bytes"] > 0
+        assert data["statistics"]["automerge"] == settings.FTS5_AUTOMERGE
+        assert data["maintenance"]["last_optimize_at"] is not None
+
+    @pytest.mark.asyncio
+    async def test_merge_until_no_work(self, db_session, fts_index):
+        maintenance = FTS5Maintenance(
+            merge_interval_seconds=60, merge_pages=500, merge_max_steps=5, optimize_hour_utc=4
+        )
+        await maintenance.merge(db_session)
+        assert maintenance.last_merge_at is not None
+
+        assert maintenance.optimize_due(datetime(2026, 1, 1, 4, 30))
+        assert not maintenance.optimize_due(datetime(2026, 1, 1, 5, 0))
+        maintenance.last_optimize_at = datetime(2026, 1, 1, 4, 1)
+        assert not maintenance.optimize_due(datetime(2026, 1, 1, 4, 30))
+        assert maintenance.optimize_due(datetime(2026, 1, 2, 4, 0))
+
+        # Once optimized there is nothing left to merge
+        assert await maintenance.optimize(db_session)
+        assert await maintenance.merge(db_session) == 0
+
+
+class TestPostgresSearch:
+
+    def test_prepare_tsquery(self):
+        assert prepare_tsquery("wireless head") == "wireless:* | head:*"
+        assert prepare_tsquery('"stainless steel" cable') == "(stainless <-> steel) | cable:*"
+        assert prepare_tsquery("usb-c & (x)") == "usb:* | c:* | x:*"
+        assert prepare_tsquery("!!") == ""
+
+    @pytest.mark.asyncio
+    async def test_ranks_name_matches_first(self, pg_search_session):
+        service = SearchService(pg_search_session)
+        assert await service.full_text_backend() == POSTGRES
+
+        rows, total = await service.search_product_cards("wireless")
+        assert total == 2
+        # Name (weight A) outranks description (weight C)
+        assert [r.slug for r in rows] == ["wireless-headphones", "headphone-stand"]
+
+    @pytest.mark.asyncio
+    async def test_phrase_prefix_and_snippets(self, pg_search_session):
+        service = SearchService(pg_search_session)
+
+        results, total = await service.search_products('"stainless steel"')
+        assert total == 1
+        assert "<mark>" in results[0]["description_highlight"]
+
+        results, total = await service.search_products("headph")
+        assert {r["slug"] for r in results} == {"wireless-headphones", "headphone-stand"}
+
+    @pytest.mark.asyncio
+    async def test_trigram_suggestions(self, pg_search_session):
+        service = SearchService(pg_search_session)
+        assert await service.get_suggestions("Head") == ["Headphone Stand"]
+        # Typo still finds the name through similarity
+        assert "Wireless Headphones" in await service.get_suggestions("Wireles Headphones")
+
+
+class TestSearchCache:
+
+    ORDER = {
+        "shipping_address": {
+            "first_name": "Jane", "last_name": "Doe", "email": "jane@example.com",
+            "address_line1": "1 Main St", "city": "Springfield", "postal_code": "12345", "country": "US",
+        },
+        "billing_same_as_shipping": True,
+        "payment_method": "stripe",
+    }
+
+    @pytest.mark.asyncio
+    async def test_key_normalizes_query_and_filters(self):
+        assert search_cache_key("iPhone ", "sqlite", page=1, sort="relevance") == search_cache_key(
+            "iphone", "sqlite", sort="relevance", page=1, category=None
+        )
+        assert search_cache_key("iphone", "sqlite", page=1) != search_cache_key("iphone", "sqlite", page=2)
+        assert search_cache_key("iphone case", "sqlite") != search_cache_key("iphone", "sqlite")
+        # One FTS5 query, but two different LIKE patterns
+        assert search_cache_key("men's", "sqlite") != search_cache_key("men s", "sqlite")
+        assert search_cache_key("iphone", "sqlite") != search_cache_key("iphone", "postgresql")
+
+    async def _checkout(self, client: AsyncClient, token: str, product_id, quantity: int):
+        resp = await client.post(
+            "/api/v1/cart/items", json={"product_id": str(product_id), "quantity": quantity},
+            headers=auth_headers(token),
+        )
+        assert resp.status_code in (200, 201)
+        resp = await client.post("/api/v1/orders/", json=self.ORDER, headers=auth_headers(token))
+        assert resp.status_code == 201
+
+    @pytest.mark.asyncio
+    async def test_checkout_keeps_results_unless_stock_runs_out(
+        self, client: AsyncClient, db_session, fts_index, customer_user, sample_products
+    ):
+        _, token = customer_user
+        cache = search_caches[SEARCH_PRODUCTS]
+        params = {"q": "Test", "in_stock": True}
+        assert (await client.get(f"{API}/products", params=params)).json()["total"] == 3
+        hits = cache.hits
+
+        await self._checkout(client, token, sample_products[0].id, 1)
+        assert (await client.get(f"{API}/products", params=params)).json()["total"] == 3
+        assert cache.hits == hits + 1
+
+        sample_products[1].quantity = 2
+        await db_session.commit()
+        await self._checkout(client, token, sample_products[1].id, 2)
+        assert (await client.get(f"{API}/products", params=params)).json()["total"] == 2
+        assert cache.hits == hits + 1
+
+    @pytest.mark.asyncio
+    async def test_repeated_search_served_from_cache(self, client: AsyncClient, fts_index):
+        cache = search_caches[SEARCH_PRODUCTS]
+        first = await client.get(f"{API}/products", params={"q": "Test", "min_price": 20})
+        hits = cache.hits
+
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine.sync_engine, "before_cursor_execute", record)
+        try:
+            second = await client.get(f"{API}/products", params={"q": " test", "min_price": 20})
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+        assert second.json() == first.json()
+        assert cache.hits == hits + 1
+        assert not any("product_fts" in s for s in statements)
+
+    @pytest.mark.asyncio
+    async def test_product_write_invalidates(self, client: AsyncClient, fts_index, vendor_user, sample_products):
+        _, token, _ = vendor_user
+        params = {"q": "Test", "sort": "price_asc"}
+        resp = await client.get(f"{API}/products", params=params)
+        assert resp.json()["products"][0]["price"] == 10.99
+
+        resp = await client.put(
+            f"/api/v1/products/{sample_products[0].id}", json={"price": 99.99}, headers=auth_headers(token)
+        )
+        assert resp.status_code == 200
+
+        resp = await client.get(f"{API}/products", params=params)
+        assert resp.json()["products"][-1]["price"] == 99.99
+
+    @pytest.mark.asyncio
+    async def test_category_write_invalidates(self, client: AsyncClient, admin_user, sample_products, sample_category):
+        _, token = admin_user
+        assert len((await client.get(API, params={"q": "Appliances"})).json()["categories"]) == 0
+
+        resp = await client.put(
+            f"/api/v1/categories/{sample_category.id}", json={"name": "Appliances"}, headers=auth_headers(token)
+        )
+        assert resp.status_code == 200
+
+        assert len((await client.get(API, params={"q": "Appliances"})).json()["categories"]) == 1
+
+
+class TestSearchLog:
+
+    @pytest.mark.asyncio
+    async def test_search_queues_log_without_writing(self, client: AsyncClient, db_session, sample_products):
+        await client.get(API, params={"q": "Test"})
+        await client.get(f"{API}/products", params={"q": "Product", "min_price": 20})
+        await client.get(f"{API}/products")  # no query, not logged
+
+        assert search_logger.pending == 2
+        count = await db_session.execute(select(func.count(SearchQuery.id)))
+        assert count.scalar() == 0
+
+        assert await search_logger.flush(db_session) == 2
+        result = await db_session.execute(select(SearchQuery.query, SearchQuery.results_count))
+        assert sorted(result.all()) == [("Product", 2), ("Test", 4)]
+        assert search_logger.stats()["written"] >= 2
+
+    @pytest.mark.asyncio
+    async def test_bulk_insert_in_batches(self, db_session):
+        log = SearchLogger(flush_interval_seconds=60, batch_size=2, max_pending=10)
+        for i in range(5):
+            log.record(query=f"q{i}", results_count=i)
+
+        assert await log.flush(db_session) == 5
+        assert log.pending == 0
+        count = await db_session.execute(select(func.count(SearchQuery.id)))
+        assert count.scalar() == 5
+
+    @pytest.mark.asyncio
+    async def test_drops_oldest_when_full(self, db_session):
+        log = SearchLogger(flush_interval_seconds=60, batch_size=100, max_pending=3)
+        for i in range(5):
+            log.record(query=f"q{i}", results_count=0)
+
+        assert log.stats()["dropped"] == 2
+        await log.flush(db_session)
+        result = await db_session.execute(select(SearchQuery.query))
+        assert sorted(row[0] for row in result.all()) == ["q2", "q3", "q4"]
+
+
 # ---------------------------------------------------------------------------
 # Autocomplete
 # ---------------------------------------------------------------------------
@@ -152,6 +614,148 @@ class TestAutocomplete:
         assert resp.status_code == 200
         assert len(resp.json()["suggestions"]) <= 1
 
+    @pytest.mark.asyncio
+    async def test_completes_any_word_by_weight(
+        self, client: AsyncClient, db_session, sample_products, sample_category
+    ):
+        for _ in range(3):
+            search_logger.record("Test  gadgets", results_count=2)
+        await search_logger.flush(db_session)
+        await search_rollups.roll_up(db_session)
+
+        resp = await client.get(f"{API}/autocomplete", params={"q": "prod"})
+        # Ordered by sales_count
+        assert resp.json()["suggestions"] == ["Test Product 3", "Test Product 2", "Test Product 1"]
+
+        resp = await client.get(f"{API}/autocomplete", params={"q": "te"})
+        # Popular search terms rank by search count among products by sales
+        assert resp.json()["suggestions"] == [
+            "Test Product 3", "Test Product 2", "test gadgets", "Test Product 1"
+        ]
+        assert resp.json()["categories"] == []
+
+        resp = await client.get(f"{API}/autocomplete", params={"q": "ELEC"})
+        assert resp.json()["categories"] == ["Electronics"]
+
+    @pytest.mark.asyncio
+    async def test_served_from_memory(self, client: AsyncClient, sample_products):
+        await client.get(f"{API}/autocomplete", params={"q": "Test"})
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine.sync_engine, "before_cursor_execute", record)
+        try:
+            resp = await client.get(f"{API}/autocomplete", params={"q": "Test Product 2"})
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", record)
+        assert resp.json()["suggestions"] == ["Test Product 2"]
+        assert not any("products" in s or "categories" in s for s in statements)
+
+    @pytest.mark.asyncio
+    async def test_product_writes_update_incrementally(self, client: AsyncClient, vendor_user, sample_products):
+        _, token, _ = vendor_user
+        await client.get(f"{API}/autocomplete", params={"q": "Test"})
+        before = completion_index.stats()
+
+        await client.put(
+            f"/api/v1/vendors/me/products/{sample_products[0].id}",
+            json={"name": "Renamed Lamp"},
+            headers=auth_headers(token),
+        )
+        resp = await client.get(f"{API}/autocomplete", params={"q": "lam"})
+        assert resp.json()["suggestions"] == ["Renamed Lamp"]
+        resp = await client.get(f"{API}/autocomplete", params={"q": "test"})
+        assert "Test Product 1" not in resp.json()["suggestions"]
+
+        after = completion_index.stats()
+        assert after["rebuilds"] == before["rebuilds"]
+        assert after["updates"] == before["updates"] + 1
+
+    @pytest.mark.asyncio
+    async def test_updates_refresh_prefixes_in_batches(
+        self, client: AsyncClient, vendor_user, sample_products, monkeypatch
+    ):
+        monkeypatch.setattr(autocomplete, "REFRESH_BATCH_SIZE", 1)
+        _, token, _ = vendor_user
+        await client.get(f"{API}/autocomplete", params={"q": "Test"})
+
+        await client.put(
+            f"/api/v1/vendors/me/products/{sample_products[0].id}",
+            json={"name": "Renamed Lamp"},
+            headers=auth_headers(token),
+        )
+        resp = await client.get(f"{API}/autocomplete", params={"q": "renamed l"})
+        assert resp.json()["suggestions"] == ["Renamed Lamp"]
+        resp = await client.get(f"{API}/autocomplete", params={"q": "test product"})
+        assert "Test Product 1" not in resp.json()["suggestions"]
+
+
+class TestDidYouMean:
+
+    def test_edit_distance(self):
+        assert edit_distance("product", "product", 2) == 0
+        assert edit_distance("prodcut", "product", 2) == 1  # transposition
+        assert edit_distance("prduct", "product", 2) == 1
+        assert edit_distance("prdcut", "product", 2) == 2
+        assert edit_distance("widget", "product", 2) == 3
+
+    @pytest.mark.asyncio
+    async def test_corrects_typos(self, client: AsyncClient, sample_products, sample_category):
+        resp = await client.get(f"{API}/autocomplete", params={"q": "Tset Prodcut"})
+        assert resp.json()["did_you_mean"] == "test product"
+
+        resp = await client.get(f"{API}/autocomplete", params={"q": "electornics"})
+        assert resp.json()["did_you_mean"] == "electronics"
+
+        resp = await client.get(f"{API}/autocomplete", params={"q": "qqqqqqqq"})
+        assert resp.json()["did_you_mean"] is None
+
+    @pytest.mark.asyncio
+    async def test_lookup_without_queries(self, db_session, sample_products):
+        service = SearchService(db_session)
+        assert await service.get_did_you_mean("prodct") == "product"
+
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine.sync_engine, "before_cursor_execute", record)
+        try:
+            assert await service.get_did_you_mean("tets") == "test"
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", record)
+        assert statements == []
+
+    @pytest.mark.asyncio
+    async def test_product_writes_update_incrementally(
+        self, client: AsyncClient, db_session, vendor_user, sample_products, sample_category
+    ):
+        _, token, _ = vendor_user
+        service = SearchService(db_session)
+        assert await service.get_did_you_mean("widgt") is None
+        before = spelling_index.stats()
+
+        resp = await client.post(
+            "/api/v1/vendors/me/products",
+            json={
+                "name": "Brand New Widget", "price": 29.99, "stock": 5,
+                "status": "active", "category_id": str(sample_category.id),
+            },
+            headers=auth_headers(token),
+        )
+        product_id = resp.json()["id"]
+        assert await service.get_did_you_mean("widgt") == "widget"
+
+        await client.delete(f"/api/v1/vendors/me/products/{product_id}", headers=auth_headers(token))
+        assert await service.get_did_you_mean("widgt") is None
+        # Applied incrementally, without a rebuild
+        after = spelling_index.stats()
+        assert after["rebuilds"] == before["rebuilds"]
+        assert after["updates"] == before["updates"] + 2
+
 
 # ---------------------------------------------------------------------------
 # Trending
@@ -166,3 +770,77 @@ class TestTrending:
         data = resp.json()
         assert "trending" in data
         assert "popular_categories" in data
+
+
+class TestSearchRollups:
+
+    async def _log(self, db_session, entries):
+        db_session.add_all(
+            SearchQuery(query=query, results_count=results, clicked=clicked, created_at=created_at)
+            for query, results, clicked, created_at in entries
+        )
+        await db_session.commit()
+
+    @pytest.mark.asyncio
+    async def test_analytics_read_rollups(self, client: AsyncClient, db_session):
+        now = datetime.utcnow()
+        await self._log(db_session, [
+            ("Phone", 5, 1, now - timedelta(hours=3)),
+            ("phone", 3, 0, now),
+            ("phone", 0, 0, now),
+            ("case", 2, 0, now - timedelta(days=1)),
+            ("qwzx", 0, 0, now - timedelta(days=2)),
+            ("old", 4, 0, now - timedelta(days=20)),
+        ])
+        assert await search_rollups.roll_up(db_session, now=now) >= 20 * 24
+
+        resp = await client.get(f"{API}/analytics/popular")
+        assert resp.json()["popular_searches"] == [
+            {"query": "phone", "search_count": 2, "avg_results": 4, "click_rate": 0.5},
+            {"query": "case", "search_count": 1, "avg_results": 2, "click_rate": 0.0},
+        ]
+
+        resp = await client.get(f"{API}/analytics/zero-results")
+        assert [(q["query"], q["search_count"]) for q in resp.json()["zero_result_queries"]] == [
+            ("phone", 1), ("qwzx", 1)
+        ]
+
+    @pytest.mark.asyncio
+    async def test_rerun_replaces_buckets(self, db_session):
+        # Mid-hour, past the settle window that would redo the previous hour
+        now = datetime.utcnow().replace(minute=30, second=0, microsecond=0)
+        await self._log(db_session, [("lamp", 1, 0, now)])
+        await search_rollups.roll_up(db_session, now=now)
+        ids = set((await db_session.execute(select(SearchQueryRollup.id))).scalars())
+        # A late log entry for the same hour, then another run
+        await self._log(db_session, [("lamp", 1, 0, now)])
+        assert await search_rollups.roll_up(db_session, now=now) == 1
+
+        rows = (await db_session.execute(
+            select(SearchQueryRollup.granularity, SearchQueryRollup.search_count)
+            .where(SearchQueryRollup.query == "lamp")
+        )).all()
+        assert sorted(rows) == [("day", 2), ("hour", 2)]
+        # Updated in place rather than deleted and inserted again
+        assert set((await db_session.execute(select(SearchQueryRollup.id))).scalars()) == ids
+
+    @pytest.mark.asyncio
+    async def test_prune_by_retention(self, db_session):
+        now = datetime.utcnow()
+        await self._log(db_session, [
+            ("lamp", 1, 0, now - timedelta(days=10)),
+            ("lamp", 1, 0, now),
+        ])
+        await search_rollups.roll_up(db_session, now=now)
+        deleted = await search_rollups.prune(db_session, now=now)
+        assert deleted["log"] == 1
+        assert deleted["hourly"] == 1
+
+        remaining = (await db_session.execute(select(func.count()).select_from(SearchQuery))).scalar()
+        assert remaining == 1
+        # The daily row of the pruned entry still counts it
+        days = (await db_session.execute(
+            select(func.sum(SearchQueryRollup.search_count))
+            .where(SearchQueryRollup.granularity == "day")
+        )).scalar()
+        assert days == 2
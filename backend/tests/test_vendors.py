@@ -207,6 +207,47 @@ class TestVendorProductsCRUD:
         assert "items" in data
         assert data["total"] >= 1
 
+    @pytest.mark.asyncio
+    async def test_get_vendor_products_cursor(self, client: AsyncClient, vendor_user, sample_products):
+        user, token, vendor = vendor_user
+        params = {"limit": 2, "include_total": False}
+        resp = await client.get(f"{API}/me/products", params=params, headers=auth_headers(token))
+        data = resp.json()
+        assert data["total"] is None
+        assert len(data["items"]) == 2
+        assert data["next_cursor"]
+
+        resp = await client.get(
+            f"{API}/me/products",
+            params={**params, "cursor": data["next_cursor"]},
+            headers=auth_headers(token),
+        )
+        data2 = resp.json()
+        assert len(data2["items"]) == 1
+        assert data2["next_cursor"] is None
+        ids = {p["id"] for p in data["items"] + data2["items"]}
+        assert ids == {str(p.id) for p in sample_products}
+
+    @pytest.mark.asyncio
+    async def test_get_vendor_products_category_filter(
+        self, client: AsyncClient, vendor_user, sample_products, sample_category
+    ):
+        user, token, vendor = vendor_user
+        resp = await client.get(
+            f"{API}/me/products",
+            params={"category": "electronics", "ordering": "price"},
+            headers=auth_headers(token),
+        )
+        items = resp.json()["items"]
+        assert [p["slug"] for p in items] == ["test-product-1", "test-product-2", "test-product-3"]
+        assert items[0]["category"] == {"id": str(sample_category.id), "name": "Electronics"}
+        assert items[0]["primary_image"] == "https://example.com/img1.jpg"
+
+        resp = await client.get(
+            f"{API}/me/products", params={"category": "does-not-exist"}, headers=auth_headers(token)
+        )
+        assert resp.json()["items"] == []
+
     @pytest.mark.asyncio
     async def test_create_vendor_product(self, client: AsyncClient, vendor_user, sample_category):
         user, token, vendor = vendor_user